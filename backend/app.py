@@ -9,6 +9,8 @@ from flask_cors import CORS
 from config import Config
 from firebase_config import initialize_firebase
 import app_utils
+from utils.lock_reaper import start_lock_reaper
+from utils.notification_sweeper import start_notification_sweeper
 
 # Import route modules
 from routes.auth import auth_bp
@@ -82,6 +84,8 @@ def main():
     try:
         # Create Flask application
         app = create_app()
+        start_notification_sweeper('worker')
+        start_lock_reaper('worker')
         
         # Get configuration
         debug_mode = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
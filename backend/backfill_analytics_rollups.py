@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Rebuild the analytics rollups from direct_claims.
+
+Run from the backend directory after deploying the rollup indexes, then set
+ANALYTICS_ROLLUPS_SERVE=true:
+
+    python backfill_analytics_rollups.py [--dry-run]
+"""
+import argparse
+import logging
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from firebase_config import get_firestore
+from utils.analytics_rollups import rebuild_rollups
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Scan claims and report counts without writing rollups'
+    )
+    args = parser.parse_args()
+
+    db = get_firestore()
+    logger.info("Rebuilding analytics rollups%s...", " (dry run)" if args.dry_run else "")
+    summary = rebuild_rollups(db, dry_run=args.dry_run)
+    for key, value in summary.items():
+        logger.info("  %s: %s", key, value)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Write claim_id_aliases documents for claims stored under generated IDs.
+
+Claims whose document ID is a variant of their claim ID need no alias. Run
+from the backend directory once after deploying the claim resolver:
+
+    python backfill_claim_aliases.py [--dry-run]
+"""
+import argparse
+import logging
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from firebase_config import get_firestore
+from utils.claim_resolver import backfill_aliases
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Scan claims and report counts without writing aliases'
+    )
+    args = parser.parse_args()
+
+    db = get_firestore()
+    logger.info("Backfilling claim ID aliases%s...", " (dry run)" if args.dry_run else "")
+    summary = backfill_aliases(db, dry_run=args.dry_run)
+    for key, value in summary.items():
+        logger.info("  %s: %s", key, value)
+
+
+if __name__ == "__main__":
+    main()
@@ -47,6 +47,126 @@ class Config:
     # Verbose logging (set to False to reduce console output)
     VERBOSE_LOGGING = os.environ.get('VERBOSE_LOGGING', 'False').lower() == 'true'
 
+    # Verified ID-token cache (skips repeated Firebase signature checks)
+    TOKEN_CACHE_ENABLED = os.environ.get('TOKEN_CACHE_ENABLED', 'True').lower() == 'true'
+    TOKEN_CACHE_MAX_ENTRIES = int(os.environ.get('TOKEN_CACHE_MAX_ENTRIES', 2048))
+
+    # User-profile cache for users/{uid} lookups in the auth middleware
+    USER_CACHE_ENABLED = os.environ.get('USER_CACHE_ENABLED', 'True').lower() == 'true'
+    USER_CACHE_TTL_SECONDS = int(os.environ.get('USER_CACHE_TTL_SECONDS', 300))
+    USER_CACHE_MAX_ENTRIES = int(os.environ.get('USER_CACHE_MAX_ENTRIES', 1024))
+    # Evict cached profiles on role/assignment changes via a Firestore listener
+    USER_CACHE_LISTENER_ENABLED = os.environ.get('USER_CACHE_LISTENER_ENABLED', 'False').lower() == 'true'
+
+    # Hospital -> notification recipients index (rebuilt from one users query
+    # per TTL; also invalidated by the users listener above when it is enabled)
+    RECIPIENT_CACHE_ENABLED = os.environ.get('RECIPIENT_CACHE_ENABLED', 'True').lower() == 'true'
+    RECIPIENT_CACHE_TTL_SECONDS = int(os.environ.get('RECIPIENT_CACHE_TTL_SECONDS', 300))
+
+    # Analytics rollups: maintain them on claim writes, and serve the overview
+    # endpoints from them (enable serving once backfill_analytics_rollups.py has run)
+    ANALYTICS_ROLLUPS_ENABLED = os.environ.get('ANALYTICS_ROLLUPS_ENABLED', 'True').lower() == 'true'
+    ANALYTICS_ROLLUPS_SERVE = os.environ.get('ANALYTICS_ROLLUPS_SERVE', 'False').lower() == 'true'
+
+    # Analytics overview response cache ('memory' or 'redis' backend)
+    ANALYTICS_CACHE_ENABLED = os.environ.get('ANALYTICS_CACHE_ENABLED', 'True').lower() == 'true'
+    ANALYTICS_CACHE_BACKEND = os.environ.get('ANALYTICS_CACHE_BACKEND', 'memory').lower()
+    ANALYTICS_CACHE_REDIS_URL = os.environ.get('ANALYTICS_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    ANALYTICS_CACHE_TTL_SECONDS = int(os.environ.get('ANALYTICS_CACHE_TTL_SECONDS', 600))
+    ANALYTICS_CACHE_MAX_ENTRIES = int(os.environ.get('ANALYTICS_CACHE_MAX_ENTRIES', 256))
+    # Browser max-age for overview responses; 0 makes browsers revalidate via ETag
+    ANALYTICS_CACHE_BROWSER_MAX_AGE = int(os.environ.get('ANALYTICS_CACHE_BROWSER_MAX_AGE', 0))
+
+    # Signed download URLs: signed locally and reused per (path, expiry bucket)
+    SIGNED_URL_CACHE_ENABLED = os.environ.get('SIGNED_URL_CACHE_ENABLED', 'True').lower() == 'true'
+    SIGNED_URL_CACHE_MAX_ENTRIES = int(os.environ.get('SIGNED_URL_CACHE_MAX_ENTRIES', 4096))
+
+    # Document proxy: bytes read from storage per chunk, and an optional on-disk
+    # LRU cache of hot documents shared by the workers on a host ('' disables it)
+    DOCUMENT_PROXY_CHUNK_SIZE = int(os.environ.get('DOCUMENT_PROXY_CHUNK_SIZE', 1024 * 1024))
+    DOCUMENT_CACHE_DIR = os.environ.get('DOCUMENT_CACHE_DIR', '')
+    DOCUMENT_CACHE_MAX_BYTES = int(os.environ.get('DOCUMENT_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+    DOCUMENT_CACHE_MAX_FILE_BYTES = int(os.environ.get('DOCUMENT_CACHE_MAX_FILE_BYTES', 25 * 1024 * 1024))
+
+    # Resumable document uploads ('storage' streams chunks into a Cloud Storage
+    # resumable session, 'local' stages them in DOCUMENT_UPLOADS_LOCAL_DIR)
+    DOCUMENT_UPLOADS_BACKEND = os.environ.get('DOCUMENT_UPLOADS_BACKEND', 'storage').lower()
+    DOCUMENT_UPLOADS_LOCAL_DIR = os.environ.get('DOCUMENT_UPLOADS_LOCAL_DIR', '')
+    DOCUMENT_UPLOAD_CHUNK_SIZE = int(os.environ.get('DOCUMENT_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+    DOCUMENT_UPLOAD_MAX_BYTES = int(os.environ.get('DOCUMENT_UPLOAD_MAX_BYTES', 100 * 1024 * 1024))
+    DOCUMENT_UPLOAD_SESSION_TTL_SECONDS = int(os.environ.get('DOCUMENT_UPLOAD_SESSION_TTL_SECONDS', 24 * 3600))
+
+    # Processor claim locks: how many unexpired locks a processor may hold and
+    # how long a lock lasts before another processor can take the claim over
+    CLAIM_LOCK_MAX_PER_PROCESSOR = int(os.environ.get('CLAIM_LOCK_MAX_PER_PROCESSOR', 3))
+    CLAIM_LOCK_TTL_SECONDS = int(os.environ.get('CLAIM_LOCK_TTL_SECONDS', 3600))
+
+    # Claim IDs reserved per counter transaction; >1 leases blocks per worker
+    # (fewer transactions, but IDs are no longer in submission order)
+    CLAIM_ID_BLOCK_SIZE = int(os.environ.get('CLAIM_ID_BLOCK_SIZE', 1))
+
+    # Store identical uploads of a hospital once (SHA-256 addressed, reference counted)
+    DOCUMENT_DEDUP_ENABLED = os.environ.get('DOCUMENT_DEDUP_ENABLED', 'True').lower() == 'true'
+
+    # Large image/PDF uploads are stored as is and compressed by a background
+    # process pool per worker; False compresses inline during the upload request
+    COMPRESSION_ASYNC = os.environ.get('COMPRESSION_ASYNC', 'True').lower() == 'true'
+    COMPRESSION_WORKERS = int(os.environ.get('COMPRESSION_WORKERS', 2))
+
+    # Streaming claims CSV export
+    CLAIMS_EXPORT_PAGE_SIZE = int(os.environ.get('CLAIMS_EXPORT_PAGE_SIZE', 500))
+    CLAIMS_EXPORT_GZIP = os.environ.get('CLAIMS_EXPORT_GZIP', 'True').lower() == 'true'
+
+    # Background export jobs ('storage' writes to the Firebase bucket, 'local' to EXPORT_JOBS_LOCAL_DIR)
+    EXPORT_JOBS_BACKEND = os.environ.get('EXPORT_JOBS_BACKEND', 'storage').lower()
+    EXPORT_JOBS_LOCAL_DIR = os.environ.get('EXPORT_JOBS_LOCAL_DIR', '')
+    EXPORT_JOBS_WORKERS = int(os.environ.get('EXPORT_JOBS_WORKERS', 2))
+    EXPORT_JOB_LEASE_SECONDS = int(os.environ.get('EXPORT_JOB_LEASE_SECONDS', 120))
+    # How long a finished report is reused for identical requests
+    EXPORT_JOB_RESULT_TTL_SECONDS = int(os.environ.get('EXPORT_JOB_RESULT_TTL_SECONDS', 3600))
+
+    # Notification expiry sweeper. Mode picks where the background thread runs:
+    # 'worker' (each gunicorn worker / app.run server), 'master' (gunicorn master;
+    # set GRPC_ENABLE_FORK_SUPPORT=1 since the master then forks after using gRPC)
+    # or 'off' (run sweep_notifications.py from cron instead)
+    NOTIFICATION_TTL_HOURS = int(os.environ.get('NOTIFICATION_TTL_HOURS', 6))
+    NOTIFICATION_SWEEPER_MODE = os.environ.get('NOTIFICATION_SWEEPER_MODE', 'worker').lower()
+    NOTIFICATION_SWEEP_INTERVAL_SECONDS = int(os.environ.get('NOTIFICATION_SWEEP_INTERVAL_SECONDS', 300))
+    NOTIFICATION_SWEEP_JITTER_SECONDS = int(os.environ.get('NOTIFICATION_SWEEP_JITTER_SECONDS', 60))
+    NOTIFICATION_SWEEP_DELETE_BUDGET = int(os.environ.get('NOTIFICATION_SWEEP_DELETE_BUDGET', 2000))
+
+    # Expired processor lock reaper; modes as for the notification sweeper
+    # ('off': run reap_claim_locks.py from cron instead)
+    LOCK_REAPER_MODE = os.environ.get('LOCK_REAPER_MODE', 'worker').lower()
+    LOCK_REAPER_INTERVAL_SECONDS = int(os.environ.get('LOCK_REAPER_INTERVAL_SECONDS', 60))
+    LOCK_REAPER_JITTER_SECONDS = int(os.environ.get('LOCK_REAPER_JITTER_SECONDS', 15))
+    LOCK_REAPER_CLEAR_BUDGET = int(os.environ.get('LOCK_REAPER_CLEAR_BUDGET', 2000))
+
+    # Threads per worker for the notifications of bulk processing
+    BULK_PROCESS_WORKERS = int(os.environ.get('BULK_PROCESS_WORKERS', 8))
+
+    # Claim reference resolver: per-process cache of claim ID -> document ID,
+    # with unknown references remembered for a shorter time
+    CLAIM_RESOLVER_TTL_SECONDS = int(os.environ.get('CLAIM_RESOLVER_TTL_SECONDS', 600))
+    CLAIM_RESOLVER_NEGATIVE_TTL_SECONDS = int(os.environ.get('CLAIM_RESOLVER_NEGATIVE_TTL_SECONDS', 30))
+    CLAIM_RESOLVER_CACHE_SIZE = int(os.environ.get('CLAIM_RESOLVER_CACHE_SIZE', 10000))
+
+    # Outbound notification delivery: queued and sent by background threads
+    # (set NOTIFICATION_DISPATCH_ASYNC=false to post inline). NOTIFICATION_OUTBOX
+    # ('firestore' or 'sqlite') persists queued messages so they survive restarts;
+    # NOTIFICATION_BATCH_API posts grouped payloads to '<endpoint>/batch'.
+    NOTIFICATION_DISPATCH_ASYNC = os.environ.get('NOTIFICATION_DISPATCH_ASYNC', 'True').lower() == 'true'
+    NOTIFICATION_DISPATCH_WORKERS = int(os.environ.get('NOTIFICATION_DISPATCH_WORKERS', 1))
+    NOTIFICATION_DISPATCH_BATCH_SIZE = int(os.environ.get('NOTIFICATION_DISPATCH_BATCH_SIZE', 20))
+    NOTIFICATION_DISPATCH_FLUSH_SECONDS = float(os.environ.get('NOTIFICATION_DISPATCH_FLUSH_SECONDS', 0.5))
+    NOTIFICATION_DISPATCH_MAX_ATTEMPTS = int(os.environ.get('NOTIFICATION_DISPATCH_MAX_ATTEMPTS', 5))
+    NOTIFICATION_DISPATCH_BACKOFF_SECONDS = float(os.environ.get('NOTIFICATION_DISPATCH_BACKOFF_SECONDS', 2))
+    NOTIFICATION_DISPATCH_TIMEOUT_SECONDS = float(os.environ.get('NOTIFICATION_DISPATCH_TIMEOUT_SECONDS', 5))
+    NOTIFICATION_DISPATCH_QUEUE_SIZE = int(os.environ.get('NOTIFICATION_DISPATCH_QUEUE_SIZE', 1000))
+    NOTIFICATION_BATCH_API = os.environ.get('NOTIFICATION_BATCH_API', 'False').lower() == 'true'
+    NOTIFICATION_OUTBOX = os.environ.get('NOTIFICATION_OUTBOX', '').lower()
+    NOTIFICATION_OUTBOX_SQLITE_PATH = os.environ.get('NOTIFICATION_OUTBOX_SQLITE_PATH', 'notification_outbox.sqlite3')
+
 class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
@@ -3,14 +3,23 @@ Authentication middleware for hospital users with role-based access control.
 
 All decorators now require a fully verified Firebase ID token. Unsigned or
 tampered tokens are explicitly rejected.
+
+Every ``require_*_access`` decorator is an ``AccessPolicy`` applied through
+``require_access``. The caller's identity (token, user record, hospital and
+assignment info) is resolved once per request and memoized on ``flask.g``,
+so stacked or nested checks do not repeat verification or Firestore reads.
 """
+import logging
 from functools import wraps
-from typing import Dict, Tuple
+from typing import Callable, Dict, Iterable, Optional, Tuple
 
-from flask import request, jsonify
+from flask import g, request, jsonify
 from firebase_admin import auth
 
+from config import Config
 from firebase_config import get_firestore
+from utils.token_cache import get_token_cache
+from utils.user_cache import get_user_cache
 
 # Allowed roles for claims module
 ALLOWED_CLAIMS_ROLES = [
@@ -35,24 +44,27 @@ BLOCKED_ROLES = [
     'employee'
 ]
 
-PROCESSOR_ROLES = {
+PROCESSOR_ROLES = frozenset({
     'claim_processor',
     'claim_processor_l1',
     'claim_processor_l2',
     'claim_processor_l3',
     'claim_processor_l4',
-}
+})
 
-RM_ROLES = {'rm', 'reconciler'}
+RM_ROLES = frozenset({'rm', 'reconciler'})
 HOSPITAL_ROLE = 'hospital_user'
 HOSPITAL_ACCESS_ROLES = ['hospital_user', 'rp', 'employee', 'hospital_admin']  # Roles that can access hospital analytics
 REVIEW_REQUEST_ROLE = 'review_request'
 
+logger = logging.getLogger(__name__)
+
 
 def _extract_and_verify_token(raw_token: str) -> Tuple[Dict, str]:
     """
-    Normalize the Authorization header value, verify it against Firebase,
-    and return the decoded token & uid.
+    Normalize the Authorization header value, verify it against Firebase
+    (or reuse a cached verification until the token expires), and return the
+    decoded token & uid.
     """
     if not raw_token:
         raise ValueError('No token provided')
@@ -65,9 +77,15 @@ def _extract_and_verify_token(raw_token: str) -> Tuple[Dict, str]:
     if not token:
         raise ValueError('No token provided')
 
-    # Debug logging for token verification issues (truncate token for safety)
-    token_preview = f"{token[:10]}..." if len(token) > 10 else token
-    print(f"[AUTH] Verifying Firebase token: {token_preview}")
+    token_cache = get_token_cache()
+    cached_token = token_cache.get(token)
+    if cached_token is not None:
+        return cached_token, cached_token['uid']
+
+    if Config.VERBOSE_LOGGING:
+        # Truncate token for safety
+        token_preview = f"{token[:10]}..." if len(token) > 10 else token
+        logger.debug("auth.verify_token token=%s", token_preview)
 
     try:
         decoded_token = auth.verify_id_token(token)
@@ -84,18 +102,30 @@ def _extract_and_verify_token(raw_token: str) -> Tuple[Dict, str]:
     if not uid:
         raise ValueError('Token missing uid claim')
 
+    token_cache.put(token, decoded_token)
     return decoded_token, uid
 
 
 def _get_user_record(uid: str) -> Dict:
     """
-    Fetch the user document from Firestore.
+    Fetch the user document, served from the per-process profile cache when
+    a fresh copy is available and from Firestore otherwise.
     """
+    user_cache = get_user_cache()
+    cached_user = user_cache.get(uid)
+    if cached_user is not None:
+        return cached_user
+
     db = get_firestore()
+    if Config.USER_CACHE_LISTENER_ENABLED:
+        user_cache.start_listener(db)
+
     user_doc = db.collection('users').document(uid).get()
     if not user_doc.exists:
         raise LookupError('User not found')
-    return user_doc.to_dict()
+    user_data = user_doc.to_dict()
+    user_cache.put(uid, user_data)
+    return user_data
 
 
 def _derive_user_name(user_data: Dict) -> str:
@@ -112,238 +142,199 @@ def _derive_user_name(user_data: Dict) -> str:
     )
 
 
-def require_claims_access(f):
-    """Decorator for claims module - allows hospital_user, claim_processor, reconciler ONLY"""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if request.method == 'OPTIONS':
-            return f(*args, **kwargs)
-            
-        try:
-            decoded_token, uid = _extract_and_verify_token(request.headers.get('Authorization'))
-            user_data = _get_user_record(uid)
-            user_role = user_data.get('role', '').lower()
-            
-            if user_role in BLOCKED_ROLES:
-                return jsonify({
-                    'error': 'Access denied',
-                    'message': 'Administrators cannot access the claims module',
-                    'allowed_roles': ALLOWED_CLAIMS_ROLES
-                }), 403
-            
-            if user_role not in ALLOWED_CLAIMS_ROLES:
-                return jsonify({
-                    'error': 'Access denied',
-                    'message': f'Your role ({user_role}) is not authorized to access claims',
-                    'allowed_roles': ALLOWED_CLAIMS_ROLES
-                }), 403
-            
-            request.user = decoded_token
-            request.user_data = user_data
-            request.user_role = user_role
-            
-            entity_assignments = user_data.get('entity_assignments', {})
-            hospitals = entity_assignments.get('hospitals', [])
-            
-            print(f"\n{'='*80}")
-            print(f"MIDDLEWARE (require_claims_access): Extracting hospital info")
-            print(f"  User Email: {user_data.get('email', '')}")
-            print(f"  User Role: {user_role}")
-            print(f"  Entity Assignments: {entity_assignments}")
-            print(f"  Hospitals: {hospitals}")
-            
-            hospital_id = ''
-            hospital_name = ''
-            if hospitals:
-                hospital_id = hospitals[0].get('id', '')
-                hospital_name = hospitals[0].get('name', '')
-                print(f"  ✓ Extracted Hospital ID: '{hospital_id}'")
-                print(f"  ✓ Extracted Hospital Name: '{hospital_name}'")
-            else:
-                print(f"  ⚠️ WARNING: No hospital assignments found!")
-                print(f"  Full user_data keys: {list(user_data.keys())}")
-            print(f"{'='*80}\n")
-            
-            request.user_id = uid
-            request.user_email = user_data.get('email', '')
-            request.user_name = _derive_user_name(user_data)
-            request.hospital_id = hospital_id
-            request.hospital_name = hospital_name
-            
-            return f(*args, **kwargs)
-        except ValueError as err:
-            return jsonify({'error': 'Invalid token', 'details': str(err)}), 401
-        except LookupError as err:
-            return jsonify({'error': str(err)}), 404
-    
-    return decorated_function
-
-def require_processor_access(f):
-    """Decorator for claim processor role ONLY"""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if request.method == 'OPTIONS':
-            return f(*args, **kwargs)
-            
-        try:
-            decoded_token, uid = _extract_and_verify_token(request.headers.get('Authorization'))
-            user_data = _get_user_record(uid)
-            user_role = user_data.get('role', '').lower()
-            
-            if user_role not in PROCESSOR_ROLES:
-                return jsonify({
-                    'error': 'Access denied',
-                    'message': f'Claim processor access required. Your role: {user_role}',
-                    'required_role': 'claim_processor (any level)'
-                }), 403
-            
-            request.user = decoded_token
-            request.user_data = user_data
-            request.user_role = user_role
-            request.user_id = uid
-            request.user_email = user_data.get('email', '')
-            request.user_name = _derive_user_name(user_data)
-
-            entity_assignments = user_data.get('entity_assignments', {})
-            hospitals = entity_assignments.get('hospitals', [])
-            hospital_id = hospitals[0].get('id', '') if hospitals else ''
-            hospital_name = hospitals[0].get('name', '') if hospitals else ''
-            
-            request.hospital_id = hospital_id
-            request.hospital_name = hospital_name
-            
-            return f(*args, **kwargs)
-        except ValueError as err:
-            return jsonify({'error': 'Invalid token', 'details': str(err)}), 401
-        except LookupError as err:
-            return jsonify({'error': str(err)}), 404
-    
-    return decorated_function
-
+class AccessPolicy:
+    """
+    Role policy for one family of endpoints.
 
-def require_hospital_access(f):
-    """Decorator for hospital-related roles - allows hospital_user, rp, employee, hospital_admin"""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if request.method == 'OPTIONS':
-            return f(*args, **kwargs)
-            
-        try:
-            decoded_token, uid = _extract_and_verify_token(request.headers.get('Authorization'))
-            user_data = _get_user_record(uid)
-            user_role = user_data.get('role', '').lower()
-            
-            if user_role not in HOSPITAL_ACCESS_ROLES:
-                return jsonify({
-                    'error': 'Access denied',
-                    'message': f'Hospital access required. Your role: {user_role}. Allowed roles: {HOSPITAL_ACCESS_ROLES}',
-                    'required_roles': HOSPITAL_ACCESS_ROLES
-                }), 403
-            
-            request.user = decoded_token
-            request.user_data = user_data
-            request.user_role = user_role
-            
-            entity_assignments = user_data.get('entity_assignments', {})
-            hospitals = entity_assignments.get('hospitals', [])
-            hospital_id = hospitals[0].get('id', '') if hospitals else ''
-            hospital_name = hospitals[0].get('name', '') if hospitals else ''
-
-            request.user_id = uid
-            request.user_email = user_data.get('email', '')
-            request.user_name = _derive_user_name(user_data)
-            request.hospital_id = hospital_id
-            request.hospital_name = hospital_name
-            
-            return f(*args, **kwargs)
-        except ValueError as err:
-            return jsonify({'error': 'Invalid token', 'details': str(err)}), 401
-        except LookupError as err:
-            return jsonify({'error': str(err)}), 404
-    
-    return decorated_function
+    Role sets are frozen when the policy is built at import time, so each
+    check is a single set lookup. ``denied_message`` builds the 403 payload
+    for roles outside ``allowed_roles``; ``blocked_message`` (optional) is
+    used for roles in ``blocked_roles``, which are checked first.
+    """
 
+    __slots__ = ('name', 'allowed_roles', 'blocked_roles', 'denied_message', 'blocked_message')
+
+    def __init__(
+        self,
+        name: str,
+        allowed_roles: Iterable[str],
+        denied_message: Callable[[str], Dict],
+        blocked_roles: Iterable[str] = (),
+        blocked_message: Optional[Callable[[str], Dict]] = None
+    ):
+        self.name = name
+        self.allowed_roles = frozenset(allowed_roles)
+        self.blocked_roles = frozenset(blocked_roles)
+        self.denied_message = denied_message
+        self.blocked_message = blocked_message or denied_message
+
+    def check(self, user_role: str) -> Optional[Dict]:
+        """Return the 403 payload for ``user_role``, or None when allowed."""
+        if user_role in self.blocked_roles:
+            return self.blocked_message(user_role)
+        if user_role not in self.allowed_roles:
+            return self.denied_message(user_role)
+        return None
+
+
+CLAIMS_POLICY = AccessPolicy(
+    'claims',
+    allowed_roles=ALLOWED_CLAIMS_ROLES,
+    blocked_roles=BLOCKED_ROLES,
+    blocked_message=lambda role: {
+        'error': 'Access denied',
+        'message': 'Administrators cannot access the claims module',
+        'allowed_roles': ALLOWED_CLAIMS_ROLES
+    },
+    denied_message=lambda role: {
+        'error': 'Access denied',
+        'message': f'Your role ({role}) is not authorized to access claims',
+        'allowed_roles': ALLOWED_CLAIMS_ROLES
+    }
+)
+
+PROCESSOR_POLICY = AccessPolicy(
+    'processor',
+    allowed_roles=PROCESSOR_ROLES,
+    denied_message=lambda role: {
+        'error': 'Access denied',
+        'message': f'Claim processor access required. Your role: {role}',
+        'required_role': 'claim_processor (any level)'
+    }
+)
+
+HOSPITAL_POLICY = AccessPolicy(
+    'hospital',
+    allowed_roles=HOSPITAL_ACCESS_ROLES,
+    denied_message=lambda role: {
+        'error': 'Access denied',
+        'message': f'Hospital access required. Your role: {role}. Allowed roles: {HOSPITAL_ACCESS_ROLES}',
+        'required_roles': HOSPITAL_ACCESS_ROLES
+    }
+)
+
+RM_POLICY = AccessPolicy(
+    'rm',
+    allowed_roles=RM_ROLES,
+    denied_message=lambda role: {
+        'error': 'Access denied',
+        'message': f'RM/Reconciler access required. Your role: {role}',
+        'required_role': 'rm or reconciler'
+    }
+)
+
+REVIEW_REQUEST_POLICY = AccessPolicy(
+    'review_request',
+    allowed_roles={REVIEW_REQUEST_ROLE},
+    denied_message=lambda role: {
+        'error': 'Access denied',
+        'message': f'Review Request access required. Your role: {role}',
+        'required_role': REVIEW_REQUEST_ROLE
+    }
+)
+
+
+def _verify_request_token() -> Tuple[Dict, str]:
+    """Verify the request's bearer token once and memoize it on ``g``."""
+    verified = g.get('auth_token')
+    if verified is None:
+        verified = _extract_and_verify_token(request.headers.get('Authorization'))
+        g.auth_token = verified
+    return verified
+
+
+def _resolve_identity() -> Dict:
+    """
+    Resolve the caller's token, user record and derived assignment fields
+    once per request; later checks reuse the copy stored on ``g``.
+    """
+    identity = g.get('auth_identity')
+    if identity is not None:
+        return identity
+
+    decoded_token, uid = _verify_request_token()
+    user_data = _get_user_record(uid)
+    entity_assignments = user_data.get('entity_assignments', {}) or {}
+    hospitals = entity_assignments.get('hospitals', []) or []
+    primary_hospital = hospitals[0] if hospitals else {}
+
+    identity = {
+        'user': decoded_token,
+        'user_data': user_data,
+        'user_role': user_data.get('role', '').lower(),
+        'user_id': uid,
+        'user_email': user_data.get('email', ''),
+        'user_name': _derive_user_name(user_data),
+        'hospital_id': primary_hospital.get('id', ''),
+        'hospital_name': primary_hospital.get('name', ''),
+        'entity_assignments': entity_assignments,
+        'assigned_payers': entity_assignments.get('payers', []),
+        'assigned_hospitals': hospitals,
+        'review_level': entity_assignments.get('review_level'),
+        'max_claim_amount': entity_assignments.get('max_claim_amount'),
+    }
+    g.auth_identity = identity
+    return identity
+
+
+def _apply_identity(identity: Dict) -> None:
+    """Expose the resolved identity on ``request`` for route handlers."""
+    for attribute, value in identity.items():
+        setattr(request, attribute, value)
+
+
+def require_access(policy: AccessPolicy):
+    """Build a decorator that enforces ``policy`` on the wrapped view."""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method == 'OPTIONS':
+                return f(*args, **kwargs)
+
+            try:
+                identity = _resolve_identity()
+            except ValueError as err:
+                return jsonify({'error': 'Invalid token', 'details': str(err)}), 401
+            except LookupError as err:
+                return jsonify({'error': str(err)}), 404
+
+            denial = policy.check(identity['user_role'])
+            if denial is not None:
+                if Config.VERBOSE_LOGGING:
+                    logger.debug(
+                        "auth.denied policy=%s uid=%s role=%s",
+                        policy.name, identity['user_id'], identity['user_role']
+                    )
+                return jsonify(denial), 403
+
+            _apply_identity(identity)
+            if Config.VERBOSE_LOGGING:
+                logger.debug(
+                    "auth.granted policy=%s uid=%s role=%s hospital_id=%s hospitals=%d",
+                    policy.name,
+                    identity['user_id'],
+                    identity['user_role'],
+                    identity['hospital_id'],
+                    len(identity['assigned_hospitals'])
+                )
 
-def require_rm_access(f):
-    """Decorator for RM (Relationship Manager) and Reconciler roles"""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if request.method == 'OPTIONS':
             return f(*args, **kwargs)
-            
-        try:
-            decoded_token, uid = _extract_and_verify_token(request.headers.get('Authorization'))
-            user_data = _get_user_record(uid)
-            user_role = user_data.get('role', '').lower()
-            
-            if user_role not in RM_ROLES:
-                return jsonify({
-                    'error': 'Access denied',
-                    'message': f'RM/Reconciler access required. Your role: {user_role}',
-                    'required_role': 'rm or reconciler'
-                }), 403
-            
-            request.user = decoded_token
-            request.user_data = user_data
-            request.user_role = user_role
-            request.user_id = uid
-            request.user_email = user_data.get('email', '')
-            request.user_name = _derive_user_name(user_data)
-
-            entity_assignments = user_data.get('entity_assignments', {})
-            request.entity_assignments = entity_assignments
-            request.assigned_payers = entity_assignments.get('payers', [])
-            request.assigned_hospitals = entity_assignments.get('hospitals', [])
-            
-            return f(*args, **kwargs)
-        except ValueError as err:
-            return jsonify({'error': 'Invalid token', 'details': str(err)}), 401
-        except LookupError as err:
-            return jsonify({'error': str(err)}), 404
-    
-    return decorated_function
 
+        return decorated_function
 
-def require_review_request_access(f):
-    """Decorator for Review Request role (second-level reviewers)"""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if request.method == 'OPTIONS':
-            return f(*args, **kwargs)
+    return decorator
 
-        try:
-            decoded_token, uid = _extract_and_verify_token(request.headers.get('Authorization'))
-            user_data = _get_user_record(uid)
-            user_role = user_data.get('role', '').lower()
-
-            if user_role != REVIEW_REQUEST_ROLE:
-                return jsonify({
-                    'error': 'Access denied',
-                    'message': f'Review Request access required. Your role: {user_role}',
-                    'required_role': REVIEW_REQUEST_ROLE
-                }), 403
-
-            request.user = decoded_token
-            request.user_data = user_data
-            request.user_role = user_role
-            request.user_id = uid
-            request.user_email = user_data.get('email', '')
-            request.user_name = _derive_user_name(user_data)
-
-            entity_assignments = user_data.get('entity_assignments', {}) or {}
-            request.entity_assignments = entity_assignments
-            request.assigned_payers = entity_assignments.get('payers', [])
-            request.assigned_hospitals = entity_assignments.get('hospitals', [])
-            request.review_level = entity_assignments.get('review_level')
-            request.max_claim_amount = entity_assignments.get('max_claim_amount')
 
-            return f(*args, **kwargs)
-        except ValueError as err:
-            return jsonify({'error': 'Invalid token', 'details': str(err)}), 401
-        except LookupError as err:
-            return jsonify({'error': str(err)}), 404
-
-    return decorated_function
+# Decorator for claims module - allows hospital_user, claim_processor, reconciler ONLY
+require_claims_access = require_access(CLAIMS_POLICY)
+# Decorator for claim processor role ONLY
+require_processor_access = require_access(PROCESSOR_POLICY)
+# Decorator for hospital-related roles - allows hospital_user, rp, employee, hospital_admin
+require_hospital_access = require_access(HOSPITAL_POLICY)
+# Decorator for RM (Relationship Manager) and Reconciler roles
+require_rm_access = require_access(RM_POLICY)
+# Decorator for Review Request role (second-level reviewers)
+require_review_request_access = require_access(REVIEW_REQUEST_POLICY)
 
 
 def require_auth(f):
@@ -352,12 +343,13 @@ def require_auth(f):
     def decorated_function(*args, **kwargs):
         if request.method == 'OPTIONS':
             return f(*args, **kwargs)
-            
+
         try:
-            decoded_token, _ = _extract_and_verify_token(request.headers.get('Authorization'))
-            request.user = decoded_token
-            return f(*args, **kwargs)
+            decoded_token, _ = _verify_request_token()
         except ValueError as err:
             return jsonify({'error': 'Invalid token', 'details': str(err)}), 401
-    
+
+        request.user = decoded_token
+        return f(*args, **kwargs)
+
     return decorated_function
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Clear expired processor locks on direct_claims.
+
+Runs one reap and exits (for cron, with LOCK_REAPER_MODE=off), or keeps
+reaping on the configured interval with --loop. --migrate converts
+lock_expires_at values stored as ISO strings by older versions to
+Timestamps (run it once after deploying; the reaper only sees Timestamps):
+
+    python reap_claim_locks.py [--migrate [--dry-run]] [--force] [--loop]
+"""
+import argparse
+import logging
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from firebase_config import get_firestore
+from utils.lock_reaper import get_lock_reaper
+from utils.lock_utils import migrate_lock_expiry
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '--migrate',
+        action='store_true',
+        help='Convert ISO-string lock_expires_at values to Timestamps and exit'
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='With --migrate, count the values to convert without writing'
+    )
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Reap even if another process reaped within the interval'
+    )
+    parser.add_argument(
+        '--loop',
+        action='store_true',
+        help='Keep running and reap every interval (plus jitter)'
+    )
+    args = parser.parse_args()
+
+    if args.migrate:
+        logger.info("Migrating lock_expires_at values%s...", " (dry run)" if args.dry_run else "")
+        summary = migrate_lock_expiry(get_firestore(), dry_run=args.dry_run)
+        for key, value in summary.items():
+            logger.info("  %s: %s", key, value)
+        return
+
+    reaper = get_lock_reaper()
+    summary = reaper.run_once(force=args.force)
+    if summary is None:
+        logger.info("Skipped: another process reaped within the last %ss", reaper.interval_seconds)
+    else:
+        for key, value in summary.items():
+            logger.info("  %s: %s", key, value)
+
+    if args.loop:
+        reaper.start()
+        try:
+            reaper._thread.join()
+        except KeyboardInterrupt:
+            reaper.stop()
+
+
+if __name__ == "__main__":
+    main()
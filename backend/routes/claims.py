@@ -2,16 +2,29 @@
 Shared Claims Routes - For all authenticated users
 These routes handle general claim viewing and shared functionality
 """
-import csv
-from io import StringIO
 from datetime import datetime, timedelta
+from itertools import chain
 
-from flask import Blueprint, request, jsonify, make_response
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from config import Config
 from firebase_config import get_firestore
 from middleware import require_claims_access
 from firebase_admin import firestore
 from utils.transaction_helper import create_transaction, get_claim_transactions, TransactionType
 from utils.notification_client import get_notification_client
+from utils.claims_export import (
+    ExportProgress,
+    belongs_to_hospital,
+    claim_list_entry,
+    hospital_claims_query,
+    iter_csv,
+    iter_hospital_claims,
+    iter_query_pages,
+)
+from utils.claim_resolver import get_claim_resolver, normalize_claim_id
+from utils.document_hydration import hydrate_claim_documents
+from utils.export_jobs import get_export_job_service, normalize_export_filters, public_job
+from utils.signed_urls import get_signed_url_service
 
 claims_bp = Blueprint('claims', __name__)
 
@@ -19,20 +32,7 @@ claims_bp = Blueprint('claims', __name__)
 def _fetch_claims_for_user(status, limit, start_date, end_date, user_hospital_id, user_hospital_name, user_email):
     db = get_firestore()
 
-    query = db.collection('direct_claims')
-
-    if status != 'all':
-        query = query.where('claim_status', '==', status)
-
-    if start_date:
-        start_datetime = datetime.strptime(start_date, '%Y-%m-%d')
-        query = query.where('created_at', '>=', start_datetime)
-        print(f"DEBUG: Filtering from date: {start_date}")
-
-    if end_date:
-        end_datetime = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
-        query = query.where('created_at', '<', end_datetime)
-        print(f"DEBUG: Filtering to date: {end_date}")
+    query = hospital_claims_query(db, status, start_date, end_date)
 
     # Sort by updated_at descending to show latest updated claims first
     try:
@@ -71,81 +71,15 @@ def _fetch_claims_for_user(status, limit, start_date, end_date, user_hospital_id
 
     for doc in claims:
         claim_data = doc.to_dict()
-        claim_id = claim_data.get('claim_id', doc.id)
-
-        claim_hospital_id = (claim_data.get('hospital_id') or '').strip()
-        claim_hospital_name = (claim_data.get('hospital_name') or '').strip()
-
-        print(f"\n--- Checking Claim: {claim_id} ---")
-        print(f"  Claim Hospital ID: '{claim_hospital_id}'")
-        print(f"  Claim Hospital Name: '{claim_hospital_name}'")
-        print(f"  User Hospital ID: '{user_hospital_id}'")
-        print(f"  User Hospital Name: '{user_hospital_name}'")
-
-        belongs_to_user_hospital = False
-        match_reason = None
-
-        if claim_hospital_id and user_hospital_id and claim_hospital_id == user_hospital_id:
-            belongs_to_user_hospital = True
-            match_reason = "hospital_id exact match"
-            print("  ✓ MATCH: Hospital ID exact match")
-        elif claim_hospital_name and user_hospital_name and claim_hospital_name.upper() == user_hospital_name.upper():
-            belongs_to_user_hospital = True
-            match_reason = "hospital_name case-insensitive match"
-            print("  ✓ MATCH: Hospital Name match (case-insensitive)")
-        else:
-            print("  ✗ NO MATCH: Hospital mismatch")
 
-        if not belongs_to_user_hospital:
+        if not belongs_to_hospital(claim_data, user_hospital_id, user_hospital_name):
             excluded_count += 1
-            print("  ❌ EXCLUDED: Different hospital")
             continue
 
         included_count += 1
-        print(f"  ✅ INCLUDED: {match_reason}")
-
-        status_value = claim_data.get('claim_status', '') or claim_data.get('status', '')
-        claim_id_value = claim_data.get('claim_id', doc.id)
-
-        # Skip drafts (drafts have claim_status == 'draft')
-        if (status_value == 'draft' or 'draft' in claim_id_value.lower()):
-            continue
-
-        if not (claim_id_value.startswith('CSHLSIP') or claim_id_value.startswith('CLS')):
-            print(f"DEBUG: Excluded claim {claim_id_value} - not a claim form submission")
-            continue
-
-        form_data = claim_data.get('form_data', {})
-        patient_name = (
-            form_data.get('patient_name', '') or
-            claim_data.get('email', '') or
-            claim_data.get('created_by_name', '')
-        )
-        payer_name = form_data.get('payer_name', '') or claim_data.get('payer_name', '')
-        claimed_amount = form_data.get('claimed_amount', '') or claim_data.get('total_bill_amount', '')
-        specialty = form_data.get('specialty', '') or claim_data.get('stage', '')
-
-        created_at = claim_data.get('created_at', '')
-        if hasattr(created_at, 'isoformat'):
-            created_at = created_at.isoformat()
-
-        submission_date = claim_data.get('submission_date', '')
-        if hasattr(submission_date, 'isoformat'):
-            submission_date = submission_date.isoformat()
-
-        claims_list.append({
-            'claim_id': claim_id_value,
-            'claim_status': status_value,
-            'created_at': str(created_at),
-            'submission_date': str(submission_date),
-            'patient_name': patient_name,
-            'payer_name': payer_name,
-            'claimed_amount': claimed_amount,
-            'specialty': specialty,
-            'hospital_name': claim_data.get('hospital_name', ''),
-            'hospital_id': claim_data.get('hospital_id', ''),
-            'created_by_email': claim_data.get('created_by_email', '') or claim_data.get('email', '')
-        })
+        entry = claim_list_entry(doc.id, claim_data)
+        if entry is not None:
+            claims_list.append(entry)
 
     total_matched = len(claims_list)
     if limit is not None:
@@ -338,7 +272,12 @@ def contest_denial(claim_id):
 @claims_bp.route('/export', methods=['GET'])
 @require_claims_access
 def export_claims():
-    """Export claims as CSV for the authenticated hospital user."""
+    """
+    Export claims as CSV for the authenticated hospital user.
+
+    The CSV is streamed page by page (newest claims first); pass
+    ``gzip=false`` to disable gzip encoding for clients that accept it.
+    """
     try:
         status = request.args.get('status', 'all')
         limit_param = request.args.get('limit', '1000')
@@ -365,61 +304,50 @@ def export_claims():
                 'details': 'User profile does not have proper hospital assignment'
             }), 400
 
-        claims_list, debug_info = _fetch_claims_for_user(
-            status=status,
-            limit=limit,
-            start_date=start_date,
-            end_date=end_date,
-            user_hospital_id=user_hospital_id,
-            user_hospital_name=user_hospital_name,
-            user_email=user_email
+        db = get_firestore()
+        query = hospital_claims_query(db, status, start_date, end_date)
+        page_size = getattr(Config, 'CLAIMS_EXPORT_PAGE_SIZE', 500)
+
+        progress = ExportProgress(user_email or user_hospital_id)
+        entries = iter_hospital_claims(
+            iter_query_pages(query, 'created_at', page_size, progress),
+            user_hospital_id, user_hospital_name, limit, progress
         )
+        try:
+            # Pull the first row before committing to a 200 so a missing
+            # index can fall back and an empty export can still 404.
+            first_entry = next(entries, None)
+        except Exception as e:
+            print(f"⚠️ Claims export: Could not page by created_at: {e}. Streaming unordered query.")
+            progress = ExportProgress(user_email or user_hospital_id)
+            entries = iter_hospital_claims(
+                query.stream(), user_hospital_id, user_hospital_name, limit, progress
+            )
+            first_entry = next(entries, None)
 
-        if not claims_list:
+        if first_entry is None:
             return jsonify({
                 'success': False,
                 'error': 'No claims found for the specified filters'
             }), 404
 
-        csv_buffer = StringIO()
-        writer = csv.writer(csv_buffer)
-        headers = [
-            'Claim ID',
-            'Status',
-            'Patient Name',
-            'Claimed Amount',
-            'Specialty',
-            'Hospital Name',
-            'Hospital ID',
-            'Created By (Email)',
-            'Created At',
-            'Submission Date'
-        ]
-        writer.writerow(headers)
-
-        for claim in claims_list:
-            writer.writerow([
-                claim.get('claim_id', ''),
-                claim.get('claim_status', ''),
-                claim.get('patient_name', ''),
-                claim.get('claimed_amount', ''),
-                claim.get('specialty', ''),
-                claim.get('hospital_name', ''),
-                claim.get('hospital_id', ''),
-                claim.get('created_by_email', ''),
-                claim.get('created_at', ''),
-                claim.get('submission_date', '')
-            ])
-
-        csv_buffer.seek(0)
+        use_gzip = (
+            getattr(Config, 'CLAIMS_EXPORT_GZIP', True)
+            and request.args.get('gzip', 'true').lower() != 'false'
+            and 'gzip' in request.accept_encodings
+        )
+        body = iter_csv(chain([first_entry], entries), progress, gzip=use_gzip)
+
         filename_date = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f"claims_report_{filename_date}.csv"
 
-        response = make_response(csv_buffer.getvalue())
+        response = Response(stream_with_context(body), mimetype='text/csv')
         response.headers['Content-Disposition'] = f'attachment; filename={filename}'
-        response.headers['Content-Type'] = 'text/csv'
-        response.headers['X-Report-Records'] = str(len(claims_list))
-        response.headers['X-Report-Debug'] = str(debug_info)
+        response.headers['Cache-Control'] = 'no-store'
+        response.headers['X-Accel-Buffering'] = 'no'
+        response.vary.add('Accept-Encoding')
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
 
         return response
 
@@ -429,6 +357,117 @@ def export_claims():
             'error': str(e)
         }), 500
 
+
+def _export_job_for_user(job_id):
+    """Load an export job, or return an error response if the user cannot see it."""
+    job = get_export_job_service().get_job(job_id)
+    if job is None or not belongs_to_hospital(
+        job, getattr(request, 'hospital_id', ''), getattr(request, 'hospital_name', '')
+    ):
+        return None, (jsonify({'success': False, 'error': 'Export job not found'}), 404)
+    return job, None
+
+
+@claims_bp.route('/export-jobs', methods=['POST'])
+@require_claims_access
+def create_export_job():
+    """
+    Queue a background CSV export for the authenticated hospital user.
+
+    Accepts the same filters as ``/export`` (JSON body or query string).
+    Repeating a request while its report is still fresh returns the existing
+    job instead of starting a new one.
+    """
+    try:
+        params = request.get_json(silent=True) or request.args
+        user_hospital_id = getattr(request, 'hospital_id', '')
+        user_hospital_name = getattr(request, 'hospital_name', '')
+
+        if not user_hospital_id and not user_hospital_name:
+            return jsonify({
+                'success': False,
+                'error': 'Hospital information not found for user. Please contact support.',
+                'details': 'User profile does not have proper hospital assignment'
+            }), 400
+
+        try:
+            filters = normalize_export_filters(
+                status=params.get('status'),
+                limit=params.get('limit', 'all'),
+                start_date=params.get('start_date'),
+                end_date=params.get('end_date')
+            )
+        except ValueError as e:
+            return jsonify({'success': False, 'error': f'Invalid export filters: {e}'}), 400
+
+        job, reused = get_export_job_service().request_job(
+            user_hospital_id, user_hospital_name, getattr(request, 'user_email', ''), filters
+        )
+        return jsonify({
+            'success': True,
+            'reused': reused,
+            'job': public_job(job)
+        }), 200 if job.get('status') == 'completed' else 202
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@claims_bp.route('/export-jobs/<job_id>', methods=['GET'])
+@require_claims_access
+def get_export_job(job_id):
+    """Poll an export job."""
+    try:
+        job, error_response = _export_job_for_user(job_id)
+        if error_response:
+            return error_response
+        return jsonify({'success': True, 'job': public_job(job)}), 200
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@claims_bp.route('/export-jobs/<job_id>/download', methods=['GET'])
+@require_claims_access
+def download_export_job(job_id):
+    """Download the CSV produced by a completed export job."""
+    try:
+        job, error_response = _export_job_for_user(job_id)
+        if error_response:
+            return error_response
+        if job.get('status') != 'completed':
+            return jsonify({
+                'success': False,
+                'error': 'Export is not ready yet',
+                'job': public_job(job)
+            }), 409
+
+        completed_at = job.get('completed_at') or datetime.now()
+        filename = f"claims_report_{completed_at.strftime('%Y%m%d_%H%M%S')}.csv"
+
+        response = Response(
+            stream_with_context(get_export_job_service().iter_result(job_id)),
+            mimetype='text/csv'
+        )
+        response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+        response.headers['Cache-Control'] = 'no-store'
+        if job.get('size_bytes'):
+            response.headers['Content-Length'] = str(job['size_bytes'])
+        return response
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
 def _generate_claim_details_response(claim_id: str, *, skip_hospital_check: bool = False):
     try:
         # Debug: Check what token is being received
@@ -437,33 +476,10 @@ def _generate_claim_details_response(claim_id: str, *, skip_hospital_check: bool
         
         db = get_firestore()
         
-        normalized_claim_id = str(claim_id).replace('CSHLSIP ', 'CSHLSIP-').replace('CLS ', 'CLS-').replace('  ', ' ').replace(' ', '-')
+        normalized_claim_id = normalize_claim_id(claim_id)
         print(f"DEBUG get_claim: raw='{claim_id}' normalized='{normalized_claim_id}'")
 
-        direct_claims = (
-            db.collection('direct_claims')
-            .where('claim_id', '>=', normalized_claim_id)
-            .where('claim_id', '<=', normalized_claim_id + '\uf8ff')
-            .limit(1)
-            .get()
-        )
-        claim_doc = direct_claims[0] if direct_claims else None
-
-        if not claim_doc:
-            fallback_ids = {
-                str(claim_id),
-                normalized_claim_id,
-                str(claim_id).replace(' ', '-'),
-                str(claim_id).replace(' ', ''),
-                str(claim_id).upper(),
-                str(claim_id).lower(),
-            }
-
-            for fallback_id in fallback_ids:
-                doc_candidate = db.collection('direct_claims').document(fallback_id).get()
-                if doc_candidate.exists:
-                    claim_doc = doc_candidate
-                    break
+        claim_doc = get_claim_resolver().get(claim_id, db)
 
         if not claim_doc:
             claims_collection = db.collection('claims').document(str(claim_id)).get()
@@ -502,89 +518,19 @@ def _generate_claim_details_response(claim_id: str, *, skip_hospital_check: bool
                     'error': 'Access denied - claim belongs to different hospital'
                 }
         
-        # Get documents for this claim (same comprehensive logic as processor route)
-        documents = claim_data.get('documents', []) or []
-        if not documents:
-            documents = claim_data.get('document_uploads', []) or []
-        if not documents:
-            # Some legacy records keep uploads within form_data
-            form_documents = (claim_data.get('form_data') or {}).get('documents') or []
-            if isinstance(form_documents, list):
-                documents = form_documents
-        if not isinstance(documents, list):
-            documents = []
-        
-        # Get detailed document information from documents array
-        detailed_documents = []
-        for doc in documents:
-            doc_id = None
-            if isinstance(doc, dict):
-                doc_id = doc.get('document_id') or doc.get('id') or doc.get('documentId')
-            elif isinstance(doc, str):
-                doc_id = doc
-
-            if doc_id:
-                doc_detailed = db.collection('documents').document(doc_id).get()
-                if doc_detailed.exists:
-                    doc_data = doc_detailed.to_dict()
-                    detailed_documents.append({
-                        'document_id': doc_data.get('document_id'),
-                        'document_type': doc_data.get('document_type'),
-                        'document_name': doc_data.get('document_name'),
-                        'original_filename': doc_data.get('original_filename'),
-                        'download_url': doc_data.get('download_url'),
-                        'file_size': doc_data.get('file_size'),
-                        'file_type': doc_data.get('file_type'),
-                        'uploaded_at': str(doc_data.get('uploaded_at', '')),
-                        'status': doc_data.get('status')
-                    })
-        
-        # ALSO query documents collection directly by claim_id (same as processor route)
-        # This ensures we get all documents even if they weren't properly linked
-        # We always query this to catch any documents that might have been uploaded but not linked
+        # Get documents for this claim (same comprehensive logic as processor route):
+        # referenced documents in one batched read plus any only linked by claim_id
         claim_id_for_query = claim_data.get('claim_id', claim_id)
-        print(f"🔍 Querying documents collection by claim_id: {claim_id_for_query}")
-        try:
-            documents_query = db.collection('documents').where('claim_id', '==', claim_id_for_query).get()
-            existing_doc_ids = {d.get('document_id') for d in detailed_documents if d.get('document_id')}
-            
-            for doc_doc in documents_query:
-                doc_data = doc_doc.to_dict()
-                # Check if we already have this document
-                doc_id = doc_data.get('document_id')
-                if doc_id and doc_id not in existing_doc_ids:
-                    # Regenerate download URL if expired (signed URLs expire after 7 days)
-                    download_url = doc_data.get('download_url', '')
-                    if not download_url:
-                        try:
-                            from datetime import timedelta
-                            from firebase_config import get_storage
-                            storage_path = doc_data.get('storage_path', '')
-                            if storage_path:
-                                bucket = get_storage()
-                                blob = bucket.blob(storage_path)
-                                if blob.exists():
-                                    download_url = blob.generate_signed_url(expiration=timedelta(days=7))
-                        except Exception as e:
-                            print(f"⚠️ Could not regenerate download URL: {e}")
-                    
-                    detailed_documents.append({
-                        'document_id': doc_data.get('document_id'),
-                        'document_type': doc_data.get('document_type'),
-                        'document_name': doc_data.get('document_name'),
-                        'original_filename': doc_data.get('original_filename'),
-                        'download_url': download_url or doc_data.get('download_url', ''),
-                        'file_size': doc_data.get('file_size'),
-                        'file_type': doc_data.get('file_type'),
-                        'uploaded_at': str(doc_data.get('uploaded_at', '')),
-                        'status': doc_data.get('status', 'uploaded')
-                    })
-                    existing_doc_ids.add(doc_id)
-            
-            print(f"🔍 Found {len(detailed_documents)} total documents for claim {claim_id_for_query} (from claim doc: {len(documents)}, from documents collection: {len(documents_query)})")
-        except Exception as doc_query_error:
+        
+        def report_query_error(doc_query_error):
             print(f"⚠️ Warning: Could not query documents collection: {doc_query_error}")
         
+        detailed_documents = hydrate_claim_documents(
+            db, claim_data, claim_id=claim_id_for_query,
+            on_query_error=report_query_error, signer=get_signed_url_service()
+        )
+        print(f"🔍 Found {len(detailed_documents)} total documents for claim {claim_id_for_query}")
+        
         # Resolve payer details (address for cover letter)
         payer_details = {}
         form_data = claim_data.get('form_data', {}) or {}
@@ -963,27 +909,16 @@ def dispatch_claim(claim_id):
         claim_doc = claims_ref.get()
         source_collection = 'claims'
         if not claim_doc.exists:
-            direct_claims_ref = db.collection('direct_claims').document(claim_id)
-            claim_doc = direct_claims_ref.get()
+            # Some direct claims are stored under generated IDs; the resolver finds those too
+            claim_doc = get_claim_resolver().get(claim_id, db)
             source_collection = 'direct_claims'
 
-            if not claim_doc.exists:
-                # Fallback: search by `claim_id` field (some documents use generated IDs)
-                fallback = (
-                    db.collection('direct_claims')
-                    .where('claim_id', '==', claim_id)
-                    .limit(1)
-                    .get()
-                )
-                if fallback:
-                    claim_doc = fallback[0]
-                    direct_claims_ref = db.collection('direct_claims').document(claim_doc.id)
-                    source_collection = 'direct_claims'
-                else:
-                    return jsonify({
-                        'success': False,
-                        'error': 'Claim not found'
-                    }), 404
+            if not claim_doc:
+                return jsonify({
+                    'success': False,
+                    'error': 'Claim not found'
+                }), 404
+            direct_claims_ref = claim_doc.reference
         else:
             direct_claims_ref = db.collection('direct_claims').document(claim_id)
         
@@ -1044,19 +979,10 @@ def dispatch_claim(claim_id):
                     mirror_claim_ref.update(update_data)
             else:
                 # Primary document was in `claims`; ensure `direct_claims` reflects the same status
-                direct_doc = direct_claims_ref.get()
-                if direct_doc.exists:
-                    direct_claims_ref.update(update_data)
-                else:
-                    # Handle documents stored under generated IDs
-                    fallback = (
-                        db.collection('direct_claims')
-                        .where('claim_id', '==', canonical_claim_id)
-                        .limit(1)
-                        .get()
-                    )
-                    if fallback:
-                        db.collection('direct_claims').document(fallback[0].id).update(update_data)
+                # Handles documents stored under generated IDs too
+                direct_doc = get_claim_resolver().get(canonical_claim_id, db)
+                if direct_doc:
+                    direct_doc.reference.update(update_data)
         except Exception as sync_error:
             # Log and continue without failing the dispatch if mirror updates fail
             print(f"⚠️ Dispatch mirror update failed for claim {claim_id}: {sync_error}")
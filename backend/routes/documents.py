@@ -3,14 +3,26 @@ Document management routes for file uploads and storage
 Role-based access: hospital_user, claim_processor, reconciler ONLY
 """
 from flask import Blueprint, request, jsonify, Response
+from config import Config
 from firebase_config import get_firestore, get_storage
 from middleware import require_claims_access
-from firebase_admin import firestore, storage
+from firebase_admin import firestore
 from datetime import datetime, timedelta
 import uuid
 import os
 from werkzeug.utils import secure_filename
-from utils.compression import compress_document, get_compression_stats
+from utils.compression_pipeline import STATUS_PENDING, compression_metadata, get_compression_pipeline
+from utils.document_dedup import get_content_store
+from utils.document_proxy import (
+    RangeNotSatisfiable,
+    document_stream,
+    etag_for,
+    etag_matches,
+    get_document_cache,
+    parse_range,
+)
+from utils.resumable_uploads import UploadError, get_upload_service, public_session
+from utils.signed_urls import get_signed_url_service
 
 documents_bp = Blueprint('documents', __name__)
 
@@ -61,9 +73,9 @@ def upload_document():
         user_id = getattr(request, 'user_id', '')
         hospital_id = getattr(request, 'hospital_id', '')
         
-        # Compress file if needed
-        print(f"🔧 Compressing file: {file.filename}")
-        compressed_file, original_size, was_compressed = compress_document(file, max_size_mb=5.0, quality=85)
+        # Store the original; large images/PDFs are compressed in the background
+        compression_pipeline = get_compression_pipeline()
+        compressed_file, original_size, was_compressed, compress_later = compression_pipeline.prepare(file)
         
         # Generate unique filename
         file_extension = file.filename.rsplit('.', 1)[1].lower()
@@ -72,27 +84,22 @@ def upload_document():
         # Create storage path: IP_Claims/{hospital_id}/{claim_id}/{document_type}/{filename}
         storage_path = f"IP_Claims/{hospital_id}/{claim_id}/{document_type}/{unique_filename}"
         
-        # Upload to Firebase Storage
-        bucket = get_storage()
-        blob = bucket.blob(storage_path)
+        # Upload to Firebase Storage, reusing an identical earlier upload of the hospital
+        stored = get_content_store().store(compressed_file, hospital_id, storage_path)
+        storage_path = stored['storage_path']
+        if stored['deduplicated']:
+            # Already stored, and compressed or queued for it by the first upload
+            compress_later = False
+            was_compressed = stored['size'] < original_size
         
-        # Upload compressed file
-        blob.upload_from_file(compressed_file, content_type=compressed_file.content_type)
-        
-        # Generate signed URL for download (valid for 7 days)
-        download_url = blob.generate_signed_url(expiration=timedelta(days=7))
+        # Signed URL for download (valid for at least 7 days, signed locally)
+        download_url = get_signed_url_service().sign(storage_path, timedelta(days=7))
         
         # Save document metadata to Firestore
         db = get_firestore()
         document_id = f"doc_{uuid.uuid4().hex[:8]}"
         
-        # Get compressed file size
-        compressed_file.seek(0, 2)
-        compressed_size = compressed_file.tell()
-        compressed_file.seek(0)
-        
-        # Calculate compression stats
-        compression_stats = get_compression_stats(original_size, compressed_size)
+        compressed_size = stored['size']
         
         document_metadata = {
             'document_id': document_id,
@@ -104,21 +111,22 @@ def upload_document():
             'download_url': download_url,
             'file_size': compressed_size,
             'original_file_size': original_size,
-            'file_type': compressed_file.content_type,
+            'file_type': stored['content_type'],
+            'content_sha256': stored['sha256'],
             'uploaded_by': user_id,
             'hospital_id': hospital_id,
             'uploaded_at': firestore.SERVER_TIMESTAMP,
             'status': 'uploaded',
-            'compression': {
-                'was_compressed': was_compressed,
-                'compression_ratio': compression_stats['compression_ratio'],
-                'size_reduction_percent': compression_stats['size_reduction_percent'],
-                'bytes_saved': compression_stats['bytes_saved']
-            }
+            'compression': compression_metadata(
+                original_size, compressed_size, was_compressed,
+                STATUS_PENDING if compress_later else None
+            )
         }
         
         # Save to documents collection
         db.collection('documents').document(document_id).set(document_metadata)
+        if compress_later:
+            compression_pipeline.submit(document_id, storage_path, stored['content_type'])
         
         # Update claim document to include document reference
         claim_ref = db.collection('claims').document(claim_id)
@@ -242,11 +250,9 @@ def delete_document(document_id):
                 'error': 'Access denied'
             }), 403
         
-        # Delete from Firebase Storage
+        # Delete from Firebase Storage, unless other documents share the stored file
         try:
-            bucket = storage.bucket()
-            blob = bucket.blob(doc_data.get('storage_path'))
-            blob.delete()
+            get_content_store().release(doc_data)
         except Exception as e:
             print(f"Error deleting from storage: {e}")
         
@@ -298,21 +304,13 @@ def download_document(document_id):
         
         doc_data = doc_doc.to_dict()
         
-        # Generate a fresh signed URL (since the stored one might be expired)
+        # Fresh signed URL (the stored one might be expired), reused from the
+        # signed-URL cache while it is valid for at least an hour
         try:
-            storage_client = get_storage()
-            
-            # Get the actual storage path from the document metadata
             storage_path = doc_data.get('storage_path')
             
             if storage_path:
-                # Fix double slash issue in storage path
-                if 'IP_Claims//' in storage_path:
-                    storage_path = storage_path.replace('IP_Claims//', 'IP_Claims/')
-                    print(f"🔧 Fixed storage path for download: {storage_path}")
-                
-                blob = storage_client.blob(storage_path)
-                fresh_download_url = blob.generate_signed_url(expiration=timedelta(hours=1))
+                fresh_download_url = get_signed_url_service().sign(storage_path, timedelta(hours=1))
             else:
                 # Fallback to existing URL
                 fresh_download_url = doc_data.get('download_url', '')
@@ -385,23 +383,52 @@ def proxy_document(document_id):
             print(f"🔧 Fixed storage path: {storage_path}")
         
         try:
-            storage_client = get_storage()
-            blob = storage_client.blob(storage_path)
+            # One metadata read: size and generation (the ETag)
+            blob = get_storage().get_blob(storage_path)
+            if blob is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'File not found in storage'
+                }), 404
             
-            # Download the file content
-            file_content = blob.download_as_bytes()
+            etag = etag_for(blob.generation)
+            headers = {
+                'Content-Disposition': f'inline; filename="{doc_data.get("document_name", "document")}.pdf"',
+                'Accept-Ranges': 'bytes',
+                'ETag': etag,
+                'Cache-Control': 'private, no-cache'
+            }
+            if etag_matches(request.headers.get('If-None-Match'), etag):
+                return Response(status=304, headers=headers)
             
             # Get content type
             content_type = doc_data.get('file_type', 'application/pdf')
+            size = blob.size or 0
             
-            # Return the file content directly
-            return Response(
-                file_content,
-                mimetype=content_type,
-                headers={
-                    'Content-Disposition': f'inline; filename="{doc_data.get("document_name", "document")}.pdf"'
-                }
+            # A Range is only honoured for the version the client already has
+            range_header = request.headers.get('Range')
+            if_range = request.headers.get('If-Range')
+            if if_range and not etag_matches(if_range, etag):
+                range_header = None
+            try:
+                byte_range = parse_range(range_header, size)
+            except RangeNotSatisfiable:
+                headers['Content-Range'] = f'bytes */{size}'
+                return Response(status=416, headers=headers)
+            
+            status = 200
+            if byte_range is not None:
+                status = 206
+                headers['Content-Range'] = f'bytes {byte_range[0]}-{byte_range[1]}/{size}'
+            headers['Content-Length'] = str(byte_range[1] - byte_range[0] + 1 if byte_range else size)
+            
+            # Stream the file in bounded chunks instead of loading it into memory
+            chunks = document_stream(
+                blob, storage_path, byte_range,
+                chunk_size=Config.DOCUMENT_PROXY_CHUNK_SIZE,
+                cache=get_document_cache()
             )
+            return Response(chunks, status=status, mimetype=content_type, headers=headers, direct_passthrough=True)
             
         except Exception as e:
             return jsonify({
@@ -414,3 +441,119 @@ def proxy_document(document_id):
             'success': False,
             'error': str(e)
         }), 500
+
+
+def _upload_error_response(error: UploadError):
+    return jsonify({'success': False, 'error': str(error), **error.details}), error.status_code
+
+
+@documents_bp.route('/uploads', methods=['POST'])
+@require_claims_access
+def start_resumable_upload():
+    """
+    Open a resumable upload for a claim (``claim_id``) or draft (``draft_id``).
+
+    JSON body: document_type, document_name, filename, content_type, size and
+    optionally md5 (hex or base64) of the whole file.
+    """
+    try:
+        payload = request.get_json(silent=True) or {}
+        filename = payload.get('filename') or ''
+        if not allowed_file(filename):
+            return jsonify({
+                'success': False,
+                'error': f'File type not allowed. Allowed types: {", ".join(ALLOWED_EXTENSIONS)}'
+            }), 400
+        try:
+            size = int(payload.get('size') or 0)
+        except (TypeError, ValueError):
+            size = 0
+        
+        target = 'draft' if payload.get('draft_id') else 'claim'
+        session = get_upload_service().start(
+            user_id=getattr(request, 'user_id', ''),
+            hospital_id=getattr(request, 'hospital_id', ''),
+            target=target,
+            target_id=payload.get('draft_id') or payload.get('claim_id'),
+            document_type=payload.get('document_type'),
+            document_name=payload.get('document_name'),
+            filename=filename,
+            content_type=payload.get('content_type'),
+            size=size,
+            md5=payload.get('md5')
+        )
+        return jsonify({'success': True, 'upload': public_session(session)}), 201
+        
+    except UploadError as e:
+        return _upload_error_response(e)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@documents_bp.route('/uploads/<upload_id>', methods=['GET'])
+@require_claims_access
+def get_resumable_upload(upload_id):
+    """Committed offset of a resumable upload; resend from here after a failure."""
+    try:
+        session = get_upload_service().status(upload_id, getattr(request, 'user_id', ''))
+        return jsonify({'success': True, 'upload': public_session(session)}), 200
+    except UploadError as e:
+        return _upload_error_response(e)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@documents_bp.route('/uploads/<upload_id>', methods=['PUT'])
+@require_claims_access
+def put_resumable_upload_chunk(upload_id):
+    """Store one chunk; the body is the raw bytes named by the Content-Range header."""
+    try:
+        service = get_upload_service()
+        # Refuse oversized bodies before reading them into memory
+        if (request.content_length or 0) > service.chunk_size:
+            return jsonify({
+                'success': False,
+                'error': f'Chunks may be at most {service.chunk_size} bytes'
+            }), 413
+        session = service.write_chunk(
+            upload_id,
+            getattr(request, 'user_id', ''),
+            request.headers.get('Content-Range'),
+            request.get_data(cache=False)
+        )
+        return jsonify({'success': True, 'upload': public_session(session)}), 200
+    except UploadError as e:
+        return _upload_error_response(e)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@documents_bp.route('/uploads/<upload_id>/finalize', methods=['POST'])
+@require_claims_access
+def finalize_resumable_upload(upload_id):
+    """Verify the checksum and record the uploaded document."""
+    try:
+        payload = request.get_json(silent=True) or {}
+        session = get_upload_service().finalize(upload_id, getattr(request, 'user_id', ''), payload.get('md5'))
+        result = session.get('result') or {}
+        return jsonify({
+            'success': True,
+            'message': 'Document uploaded successfully',
+            'document_id': result.get('document_id'),
+            'download_url': result.get('download_url'),
+            'storage_path': result.get('storage_path'),
+            'upload': public_session(session)
+        }), 201
+    except UploadError as e:
+        return _upload_error_response(e)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
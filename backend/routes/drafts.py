@@ -5,6 +5,11 @@ Role-based access: hospital_user, claim_processor, reconciler ONLY
 from flask import Blueprint, request, jsonify
 from firebase_config import get_firestore
 from middleware import require_claims_access
+from utils.projections import select_fields
+from utils.analytics_rollups import record_claim_change
+from utils.claim_resolver import get_claim_resolver
+from utils.document_hydration import fetch_documents
+from utils.signed_urls import get_signed_url_service
 from firebase_admin import firestore
 from datetime import datetime, date, timedelta
 import uuid
@@ -144,6 +149,23 @@ def save_draft():
         }), 500
 
 
+def _serialize_draft(doc, draft_data):
+    """Serialize a draft for the drafts list."""
+    # Format dates for JSON serialization
+    return {
+        'draft_id': draft_data.get('draft_id', doc.id),
+        'status': draft_data.get('claim_status', 'draft'),
+        'created_at': str(draft_data.get('created_at', '')),
+        'updated_at': str(draft_data.get('updated_at', '')),
+        'patient_name': draft_data.get('form_data', {}).get('patient_name', ''),
+        'claimed_amount': draft_data.get('form_data', {}).get('claimed_amount', ''),
+        'specialty': draft_data.get('form_data', {}).get('specialty', ''),
+        'hospital_id': draft_data.get('hospital_id', ''),
+        'hospital_name': draft_data.get('hospital_name', ''),
+        'created_by_email': draft_data.get('created_by_email', '')
+    }
+
+
 @drafts_bp.route('/get-drafts', methods=['GET'])
 @require_claims_access
 def get_drafts():
@@ -161,7 +183,7 @@ def get_drafts():
             }), 400
         
         # Query drafts for this hospital - include drafts without hospital info for backward compatibility
-        query = db.collection('claims').where('claim_status', '==', 'draft')
+        query = select_fields(db.collection('claims'), 'drafts').where('claim_status', '==', 'draft')
         all_drafts = query.get()
         
         # STRICT HOSPITAL FILTERING - Only show drafts with proper hospital info
@@ -195,22 +217,7 @@ def get_drafts():
         
         drafts_list = []
         for doc in drafts:
-            draft_data = doc.to_dict()
-            
-            # Format dates for JSON serialization
-            formatted_draft = {
-                'draft_id': draft_data.get('draft_id', doc.id),
-                'status': draft_data.get('claim_status', 'draft'),
-                'created_at': str(draft_data.get('created_at', '')),
-                'updated_at': str(draft_data.get('updated_at', '')),
-                'patient_name': draft_data.get('form_data', {}).get('patient_name', ''),
-                'claimed_amount': draft_data.get('form_data', {}).get('claimed_amount', ''),
-                'specialty': draft_data.get('form_data', {}).get('specialty', ''),
-                'hospital_id': draft_data.get('hospital_id', ''),
-                'hospital_name': draft_data.get('hospital_name', ''),
-                'created_by_email': draft_data.get('created_by_email', '')
-            }
-            drafts_list.append(formatted_draft)
+            drafts_list.append(_serialize_draft(doc, doc.to_dict()))
         
         return jsonify({
             'success': True,
@@ -259,29 +266,22 @@ def get_draft(draft_id):
                 'error': 'Access denied'
             }), 403
         
-        # Get fresh download URLs for documents
+        # Get fresh download URLs for documents: one batched metadata read,
+        # then locally signed (and cached) URLs
         documents = draft_data.get('documents', [])
-        for doc in documents:
-            if doc.get('document_id'):
-                try:
-                    # Get document metadata from documents collection
-                    doc_ref = db.collection('documents').document(doc['document_id'])
-                    doc_meta = doc_ref.get()
-                    if doc_meta.exists:
-                        doc_data = doc_meta.to_dict()
-                        storage_path = doc_data.get('storage_path')
-                        if storage_path:
-                            # Generate fresh signed URL
-                            from firebase_config import get_storage
-                            from datetime import timedelta
-                            storage = get_storage()
-                            blob = storage.blob(storage_path)
-                            fresh_url = blob.generate_signed_url(expiration=timedelta(days=7))
-                            doc['download_url'] = fresh_url
-                except Exception as e:
-                    print(f"Error generating fresh URL for document {doc.get('document_id')}: {e}")
-                    # Keep existing URL if available
-                    pass
+        try:
+            storage_paths = {
+                doc_id: doc_data.get('storage_path')
+                for doc_id, doc_data in fetch_documents(db, [doc.get('document_id') for doc in documents])
+            }
+            fresh_urls = get_signed_url_service().sign_many(storage_paths.values())
+            for doc in documents:
+                # Keep existing URL if a fresh one is not available
+                fresh_url = fresh_urls.get(storage_paths.get(doc.get('document_id')))
+                if fresh_url:
+                    doc['download_url'] = fresh_url
+        except Exception as e:
+            print(f"Error generating fresh URLs for draft {draft_id} documents: {e}")
 
         # Format response
         formatted_draft = {
@@ -553,6 +553,8 @@ def submit_draft(draft_id):
         
         # Save new claim document
         db.collection('direct_claims').document(claim_id).set(claim_document)
+        get_claim_resolver().register(claim_id, claim_id, db)
+        record_claim_change(db, claim_id)
         
         # Delete the original draft
         draft_ref.delete()
@@ -574,7 +576,6 @@ def submit_draft(draft_id):
 def upload_draft_document(draft_id):
     """Upload document for a draft"""
     try:
-        from firebase_config import get_storage
         from werkzeug.utils import secure_filename
         import uuid
         from datetime import timedelta
@@ -607,10 +608,11 @@ def upload_draft_document(draft_id):
         user_id = getattr(request, 'user_id', '')
         hospital_id = getattr(request, 'hospital_id', '')
         
-        # Compress file if needed
-        from utils.compression import compress_document, get_compression_stats
-        print(f"🔧 Compressing draft file: {file.filename}")
-        compressed_file, original_size, was_compressed = compress_document(file, max_size_mb=5.0, quality=85)
+        # Store the original; large images/PDFs are compressed in the background
+        from utils.compression_pipeline import STATUS_PENDING, compression_metadata, get_compression_pipeline
+        from utils.document_dedup import get_content_store
+        compression_pipeline = get_compression_pipeline()
+        compressed_file, original_size, was_compressed, compress_later = compression_pipeline.prepare(file)
         
         # Generate unique filename
         file_extension = file.filename.rsplit('.', 1)[1].lower()
@@ -619,27 +621,22 @@ def upload_draft_document(draft_id):
         # Create storage path: IP_Claims/{hospital_id}/{draft_id}/{document_type}/{filename}
         storage_path = f"IP_Claims/{hospital_id}/{draft_id}/{document_type}/{unique_filename}"
         
-        # Upload to Firebase Storage
-        bucket = get_storage()
-        blob = bucket.blob(storage_path)
-        
-        # Upload compressed file
-        blob.upload_from_file(compressed_file, content_type=compressed_file.content_type)
+        # Upload to Firebase Storage, reusing an identical earlier upload of the hospital
+        stored = get_content_store().store(compressed_file, hospital_id, storage_path)
+        storage_path = stored['storage_path']
+        if stored['deduplicated']:
+            # Already stored, and compressed or queued for it by the first upload
+            compress_later = False
+            was_compressed = stored['size'] < original_size
         
-        # Generate signed URL for download (valid for 7 days)
-        download_url = blob.generate_signed_url(expiration=timedelta(days=7))
+        # Signed URL for download (valid for at least 7 days, signed locally)
+        download_url = get_signed_url_service().sign(storage_path, timedelta(days=7))
         
         # Save document metadata to Firestore
         db = get_firestore()
         document_id = f"doc_{uuid.uuid4().hex[:8]}"
         
-        # Get compressed file size
-        compressed_file.seek(0, 2)
-        compressed_size = compressed_file.tell()
-        compressed_file.seek(0)
-        
-        # Calculate compression stats
-        compression_stats = get_compression_stats(original_size, compressed_size)
+        compressed_size = stored['size']
         
         document_metadata = {
             'document_id': document_id,
@@ -651,21 +648,22 @@ def upload_draft_document(draft_id):
             'download_url': download_url,
             'file_size': compressed_size,
             'original_file_size': original_size,
-            'file_type': compressed_file.content_type,
+            'file_type': stored['content_type'],
+            'content_sha256': stored['sha256'],
             'uploaded_by': user_id,
             'hospital_id': hospital_id,
             'uploaded_at': firestore.SERVER_TIMESTAMP,
             'status': 'uploaded',
-            'compression': {
-                'was_compressed': was_compressed,
-                'compression_ratio': compression_stats['compression_ratio'],
-                'size_reduction_percent': compression_stats['size_reduction_percent'],
-                'bytes_saved': compression_stats['bytes_saved']
-            }
+            'compression': compression_metadata(
+                original_size, compressed_size, was_compressed,
+                STATUS_PENDING if compress_later else None
+            )
         }
         
         # Save to documents collection
         db.collection('documents').document(document_id).set(document_metadata)
+        if compress_later:
+            compression_pipeline.submit(document_id, storage_path, stored['content_type'])
         
         # Update draft document to include document reference
         draft_ref = db.collection('claims').document(draft_id)
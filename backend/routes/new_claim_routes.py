@@ -120,6 +120,8 @@ def _calculate_dob_from_age(age_value, age_unit):
 
 import uuid
 from utils.transaction_helper import create_transaction, TransactionType
+from utils.claim_ids import get_claim_id_allocator
+from utils.claim_resolver import get_claim_resolver
 from utils.notification_client import get_notification_client
 
 new_claim_bp = Blueprint('new_claim', __name__)
@@ -169,26 +171,7 @@ def submit_claim():
             }), 400
         
         # Generate claim ID
-        today = datetime.now().strftime('%Y%m%d')
-        prefix = f'CSHLSIP-{today}-'
-        
-        # Find next sequence number
-        try:
-            claims_today = db.collection('direct_claims').where('claim_id', '>=', prefix).where('claim_id', '<', f'CSHLSIP-{today}-9999').get()
-            sequence_numbers = []
-            for claim in claims_today:
-                claim_id_str = claim.to_dict().get('claim_id', '')
-                if claim_id_str.startswith(prefix):
-                    try:
-                        seq_num = int(claim_id_str.replace(prefix, ''))
-                        sequence_numbers.append(seq_num)
-                    except ValueError:
-                        continue
-            
-            next_seq = max(sequence_numbers) + 1 if sequence_numbers else 0
-            claim_id = f'{prefix}{next_seq}'
-        except Exception as e:
-            claim_id = f'{prefix}{int(datetime.now().timestamp())}'
+        claim_id = get_claim_id_allocator().allocate()
         
         age_value, age_unit = _calculate_age_details(data.get('date_of_birth'))
         if age_value is not None:
@@ -268,6 +251,7 @@ def submit_claim():
         
         # Save to Firestore
         db.collection('direct_claims').document(claim_id).set(claim_document)
+        get_claim_resolver().register(claim_id, claim_id, db)
         
         # Create transaction record for claim creation
         create_transaction(
@@ -3,14 +3,24 @@ Notification Routes - In-app notifications API
 """
 from flask import Blueprint, request, jsonify
 from firebase_config import get_firestore
-from firebase_admin import firestore as firebase_firestore
 from middleware import require_claims_access
 from datetime import datetime, timedelta
 import pytz
-from utils.notification_cleanup import cleanup_expired_notifications, DEFAULT_NOTIFICATION_TTL_HOURS
+from utils.notification_inbox import (
+    delete_entries,
+    entries_ref,
+    list_inbox,
+    mark_read,
+    purge_entries,
+    serialize_entry,
+    unread_count,
+)
+from utils.pagination import decode_page_token, encode_page_token
 
 notifications_bp = Blueprint('notifications', __name__)
 
+MAX_PAGE_SIZE = 200
+
 
 @notifications_bp.route('/', methods=['GET', 'OPTIONS'])
 @notifications_bp.route('', methods=['GET', 'OPTIONS'])  # Handle both with and without trailing slash
@@ -32,95 +42,37 @@ def list_notifications():
         logger = logging.getLogger(__name__)
         logger.info(f"Fetching notifications for user_id: {user_id}, email: {user_email}")
 
-        cleaned_count = cleanup_expired_notifications(
-            ttl_hours=DEFAULT_NOTIFICATION_TTL_HOURS,
-            db_override=db
-        )
-        if cleaned_count:
-            logger.debug("Auto-deleted %d expired notifications before fetch", cleaned_count)
-
-        # Get all notifications and filter client-side to avoid Firestore index requirement
-        # Firestore requires composite index for where + order_by on different fields
-        all_notifications = db.collection('claims_notifications').limit(500).get()
-        
-        # Filter and sort in memory
-        user_notifications = []
-        for doc in all_notifications:
-            data = doc.to_dict() or {}
-            recipient_ids = data.get('recipient_ids', []) or []
-            
-            # Also check recipients array for user_id or email match
-            recipients = data.get('recipients', []) or []
-            recipient_emails = [r.get('email', '') for r in recipients if r.get('email')]
-            
-            # Check if user is a recipient by ID or email
-            is_recipient = (
-                user_id in recipient_ids or
-                user_email in recipient_emails or
-                any(r.get('user_id') == user_id for r in recipients)
-            )
-            
-            if is_recipient:
-                user_notifications.append((doc, data))
-        
-        # Sort by created_at descending
-        # Handle Firestore timestamps and None values
-        def get_sort_key(item):
-            created_at = item[1].get('created_at')
-            if created_at is None:
-                return datetime.min
-            # If it's a Firestore timestamp, convert to datetime
-            if hasattr(created_at, 'to_pydatetime'):
-                return created_at.to_pydatetime()
-            # If it's already a datetime, use it
-            if isinstance(created_at, datetime):
-                return created_at
-            # Otherwise return min datetime
-            return datetime.min
-        
-        user_notifications.sort(key=get_sort_key, reverse=True)
-        
-        # Apply limit
-        user_notifications = user_notifications[:limit]
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        try:
+            cursor = decode_page_token(request.args.get('page_token'))
+        except ValueError as err:
+            return jsonify({'success': False, 'error': str(err)}), 400
 
-        notifications = []
-        for doc, data in user_notifications:
-            read_by = data.get('read_by', []) or []
-            is_read = user_id in read_by
+        entries, next_cursor = list_inbox(db, user_id, limit, unread_only=unread_only, cursor=cursor)
+        notifications = [serialize_entry(doc.id, doc.to_dict() or {}) for doc in entries]
 
-            if unread_only and is_read:
-                continue
-
-            created_at = data.get('created_at')
-            if created_at and hasattr(created_at, 'isoformat'):
-                created_at = created_at.isoformat()
-            elif created_at:
-                created_at = str(created_at)
-
-            updated_at = data.get('updated_at')
-            if updated_at and hasattr(updated_at, 'isoformat'):
-                updated_at = updated_at.isoformat()
-            elif updated_at:
-                updated_at = str(updated_at)
+        return jsonify({
+            'success': True,
+            'notifications': notifications,
+            'unread_count': unread_count(db, user_id),
+            'next_page_token': encode_page_token(*next_cursor) if next_cursor else None
+        }), 200
+    except Exception as err:
+        return jsonify({
+            'success': False,
+            'error': str(err)
+        }), 500
 
-            notifications.append({
-                'id': doc.id,
-                'claim_id': data.get('claim_id'),
-                'event_type': data.get('event_type'),
-                'title': data.get('title'),
-                'message': data.get('message'),
-                'metadata': data.get('metadata', {}),
-                'status': data.get('status'),
-                'triggered_by': data.get('triggered_by', {}),
-                'delivery_success': data.get('delivery_success', False),
-                'created_at': created_at,
-                'updated_at': updated_at,
-                'read': is_read
-            })
 
+@notifications_bp.route('/unread-count', methods=['GET'])
+@require_claims_access
+def get_unread_count():
+    """Unread notification count for the current user"""
+    try:
+        db = get_firestore()
         return jsonify({
             'success': True,
-            'notifications': notifications
+            'unread_count': unread_count(db, getattr(request, 'user_id', ''))
         }), 200
     except Exception as err:
         return jsonify({
@@ -145,20 +97,13 @@ def mark_notifications_read():
             }), 400
 
         db = get_firestore()
-        batch = db.batch()
-
-        for notification_id in notification_ids:
-            doc_ref = db.collection('claims_notifications').document(notification_id)
-            batch.update(doc_ref, {
-                'read_by': firebase_firestore.ArrayUnion([user_id]),
-                'updated_at': firebase_firestore.SERVER_TIMESTAMP
-            })
-
-        batch.commit()
+        marked_count = mark_read(db, user_id, notification_ids)
 
         return jsonify({
             'success': True,
-            'message': 'Notifications marked as read'
+            'message': 'Notifications marked as read',
+            'marked_count': marked_count,
+            'unread_count': unread_count(db, user_id)
         }), 200
     except Exception as err:
         return jsonify({
@@ -187,35 +132,11 @@ def delete_notifications():
                 'error': 'notification_ids is required'
             }), 400
 
+        # Removes the notifications from this user's inbox only; other
+        # recipients keep their copies
         db = get_firestore()
-        deleted_count = 0
-        not_found_count = 0
-
-        for notification_id in notification_ids:
-            doc_ref = db.collection('claims_notifications').document(notification_id)
-            doc = doc_ref.get()
-            
-            if not doc.exists:
-                not_found_count += 1
-                continue
-            
-            # Verify user is a recipient before allowing deletion
-            doc_data = doc.to_dict() or {}
-            recipient_ids = doc_data.get('recipient_ids', []) or []
-            recipients = doc_data.get('recipients', []) or []
-            recipient_emails = [r.get('email', '') for r in recipients if r.get('email')]
-            
-            is_recipient = (
-                user_id in recipient_ids or
-                user_email in recipient_emails or
-                any(r.get('user_id') == user_id for r in recipients)
-            )
-            
-            if is_recipient:
-                doc_ref.delete()
-                deleted_count += 1
-            else:
-                not_found_count += 1
+        deleted_count = delete_entries(db, user_id, notification_ids)
+        not_found_count = len(set(notification_ids)) - deleted_count
 
         return jsonify({
             'success': True,
@@ -254,53 +175,13 @@ def cleanup_old_notifications():
         ist = pytz.timezone('Asia/Kolkata')
         cutoff_date = datetime.now(ist) - timedelta(days=days_old)
         
-        # Get all notifications
-        all_notifications = db.collection('claims_notifications').limit(1000).get()
-        
-        deleted_count = 0
-        for doc in all_notifications:
-            doc_data = doc.to_dict() or {}
-            
-            # Check if user is a recipient
-            recipient_ids = doc_data.get('recipient_ids', []) or []
-            recipients = doc_data.get('recipients', []) or []
-            recipient_emails = [r.get('email', '') for r in recipients if r.get('email')]
-            
-            is_recipient = (
-                user_id in recipient_ids or
-                user_email in recipient_emails or
-                any(r.get('user_id') == user_id for r in recipients)
-            )
-            
-            if not is_recipient:
-                continue
-            
-            # Check if notification is read by this user
-            read_by = doc_data.get('read_by', []) or []
-            is_read = user_id in read_by
-            
-            if not is_read:
-                continue  # Don't delete unread notifications
-            
-            # Check if notification is older than cutoff date
-            created_at = doc_data.get('created_at')
-            if created_at:
-                if hasattr(created_at, 'to_pydatetime'):
-                    created_at_dt = created_at.to_pydatetime()
-                elif isinstance(created_at, datetime):
-                    created_at_dt = created_at
-                else:
-                    continue
-                
-                # Ensure timezone awareness
-                if created_at_dt.tzinfo is None:
-                    created_at_dt = ist.localize(created_at_dt)
-                else:
-                    created_at_dt = created_at_dt.astimezone(ist)
-                
-                if created_at_dt < cutoff_date:
-                    doc.reference.delete()
-                    deleted_count += 1
+        old_read_entries = (
+            entries_ref(db, user_id)
+            .where('read', '==', True)
+            .where('created_at', '<', cutoff_date)
+            .get()
+        )
+        deleted_count = purge_entries(db, old_read_entries)
 
         return jsonify({
             'success': True,
@@ -7,13 +7,25 @@ from firebase_config import get_firestore
 from middleware import require_processor_access
 from firebase_admin import firestore
 from datetime import datetime, timedelta
+import logging
 import pytz
+from config import Config
 from utils.transaction_helper import create_transaction, TransactionType
 from utils import lock_utils
+from utils.lock_utils import get_claim_lock_service
+from utils.lock_reaper import MARKER_DOCUMENT as LOCK_REAPER_MARKER, get_lock_reaper
+from utils.background_runs import marker_ref as run_marker
 from utils.notification_client import get_notification_client
 from utils.letter_templates import build_processor_letter_metadata
+from utils.pagination import DOCUMENT_ID_FIELD, cursor_for, decode_page_token, encode_page_token
+from utils.projections import select_fields
+from utils.document_hydration import hydrate_claim_documents
+from utils.signed_urls import get_signed_url_service
+from utils.bulk_processing import get_bulk_claim_processor
+from utils.claim_resolver import get_claim_resolver, normalize_claim_id
 
 processor_bp = Blueprint('processor_routes', __name__)
+logger = logging.getLogger(__name__)
 
 
 def get_processor_status_options(db, hospital_id):
@@ -166,12 +178,225 @@ PROCESSOR_APPROVAL_LIMITS = {
     'claim_processor_l4': float('inf')  # All amounts
 }
 
+# Claim statuses shown in each processor inbox tab
+INBOX_TAB_STATUSES = {
+    'unprocessed': ['qc_pending', 'need_more_info', 'qc_answered', 'claim_contested'],
+    'processed': ['qc_query', 'qc_clear', 'claim_approved', 'claim_denial'],
+}
+DEFAULT_INBOX_STATUSES = ['qc_pending', 'need_more_info', 'qc_answered']
+
+MAX_INBOX_PAGE_SIZE = 200
+# Largest batch read while filling a page whose Python-side filters (hospital
+# match, approval limit) reject most candidates; batches double up to this.
+MAX_INBOX_BATCH_SIZE = 1000
+# Firestore allows at most 30 disjunctions per query (status IN x hospital IN)
+MAX_QUERY_DISJUNCTIONS = 30
+
+
+def _get_processor_hospitals(user_data):
+    """Return the processor's affiliated hospitals as id/name/code dicts."""
+    processor_hospitals = []
+    entity_assignments = (user_data or {}).get('entity_assignments', {}) or {}
+    for hospital in entity_assignments.get('hospitals', []) or []:
+        processor_hospitals.append({
+            'id': hospital.get('id', ''),
+            'name': hospital.get('name', ''),
+            'code': hospital.get('code', '')
+        })
+    return processor_hospitals
+
+
+def _inbox_hospital_ids(processor_hospitals, statuses):
+    """
+    Hospital IDs that can be pushed into the inbox query as ``hospital_id IN``.
+
+    Returns None when the filter has to stay in Python. A claim also belongs
+    to a processor when its ``hospital_name`` contains the name of one of the
+    processor's hospitals, whatever its ``hospital_id``; Firestore cannot
+    express that, so the filter is only pushed down when none of the
+    hospitals has a name. It also stays in Python when a hospital has no ID
+    or when the hospitals would exceed the Firestore disjunction limit.
+    """
+    if not processor_hospitals:
+        return None
+    if any(hospital['name'] for hospital in processor_hospitals):
+        return None
+    hospital_ids = [hospital['id'] for hospital in processor_hospitals]
+    if not all(hospital_ids):
+        return None
+    hospital_ids = sorted(set(hospital_ids))
+    if len(hospital_ids) * len(statuses) > MAX_QUERY_DISJUNCTIONS:
+        return None
+    return hospital_ids
+
+
+def _processor_can_view(doc, claim_data, processor_hospitals, processor_limit):
+    """Apply the inbox visibility rules that cannot be expressed in the query."""
+    status = claim_data.get('claim_status', '')
+    claim_id = claim_data.get('claim_id', doc.id)
+
+    # SKIP DRAFT CLAIMS - drafts should only appear in the Drafts section
+    if status == 'draft' or 'draft' in claim_id.lower():
+        return False
+
+    # If no hospital filtering (processor has no hospitals), include all claims
+    if processor_hospitals:
+        claim_hospital_id = claim_data.get('hospital_id', '')
+        claim_hospital_name = claim_data.get('hospital_name', '')
+        belongs_to_processor = False
+        for hospital in processor_hospitals:
+            if (hospital['id'] and hospital['id'] == claim_hospital_id) or \
+               (hospital['name'] and hospital['name'].upper() in claim_hospital_name.upper()):
+                belongs_to_processor = True
+                break
+        if not belongs_to_processor:
+            return False
+
+    # Check processor approval limit
+    claimed_amount = (claim_data.get('form_data', {}) or {}).get('claimed_amount', 0)
+    if isinstance(claimed_amount, str):
+        try:
+            claimed_amount = float(claimed_amount)
+        except ValueError:
+            claimed_amount = 0
+    return (claimed_amount or 0) <= processor_limit
+
+
+def _inbox_sort_time(claim_data):
+    """Sort key used when the inbox has to be ordered in Python."""
+    # Try updated_at first (most recent activity)
+    time_field = claim_data.get('updated_at') or claim_data.get('processed_at') or claim_data.get('created_at')
+    if time_field:
+        # Handle Firestore timestamps and datetime objects
+        if hasattr(time_field, 'timestamp') and callable(getattr(time_field, 'timestamp', None)):
+            return time_field.timestamp()
+        # Handle ISO format strings
+        if isinstance(time_field, str):
+            try:
+                return datetime.fromisoformat(time_field.replace('Z', '+00:00')).timestamp()
+            except ValueError:
+                pass
+    return 0  # Put items without timestamp at the end
+
+
+def _fetch_inbox_page_indexed(query, limit, cursor, accept):
+    """
+    Read one inbox page ordered by ``updated_at`` desc using ``start_after``.
+
+    Batches start at ``limit`` documents and double (up to
+    ``MAX_INBOX_BATCH_SIZE``) while ``accept`` rejects most of them, and
+    reading continues until the page is full or the results run out, so a
+    page is only short when it is the last one. Returns
+    ``(rows, last_consumed, exhausted)``.
+    """
+    ordered = query.order_by('updated_at', direction=firestore.Query.DESCENDING) \
+        .order_by(DOCUMENT_ID_FIELD, direction=firestore.Query.DESCENDING)
+
+    rows = []
+    last_consumed = cursor
+    batch_size = limit
+
+    while True:
+        batch_query = ordered
+        if last_consumed is not None:
+            batch_query = batch_query.start_after(cursor_for('updated_at', *last_consumed))
+        docs = list(batch_query.limit(batch_size).stream())
+
+        for position, doc in enumerate(docs):
+            claim_data = doc.to_dict() or {}
+            last_consumed = (claim_data.get('updated_at'), doc.id)
+            if accept(doc, claim_data):
+                rows.append((doc, claim_data))
+                if len(rows) == limit:
+                    return rows, last_consumed, len(docs) < batch_size and position == len(docs) - 1
+
+        if len(docs) < batch_size:
+            return rows, last_consumed, True
+        batch_size = min(batch_size * 2, MAX_INBOX_BATCH_SIZE)
+
+
+def _fetch_inbox_page_unindexed(query, limit, cursor, accept):
+    """
+    Fallback for environments missing the inbox index: read the matching
+    claims, order them in Python and resume after the cursor.
+    """
+    docs = query.get()
+    keyed = []
+    for doc in docs:
+        claim_data = doc.to_dict() or {}
+        keyed.append(((_inbox_sort_time(claim_data), doc.id), doc, claim_data))
+    keyed.sort(key=lambda item: item[0], reverse=True)
+
+    if cursor is not None:
+        cursor_value, cursor_id = cursor
+        cursor_key = (_inbox_sort_time({'updated_at': cursor_value}), cursor_id)
+        keyed = [item for item in keyed if item[0] < cursor_key]
+
+    rows = []
+    last_consumed = cursor
+    for position, (_, doc, claim_data) in enumerate(keyed):
+        order_value = claim_data.get('updated_at') or claim_data.get('processed_at') or claim_data.get('created_at')
+        last_consumed = (order_value, doc.id)
+        if accept(doc, claim_data):
+            rows.append((doc, claim_data))
+            if len(rows) == limit:
+                return rows, last_consumed, position == len(keyed) - 1
+    return rows, last_consumed, True
+
+
+def _fetch_inbox_page(query, simple_query, limit, cursor, accept):
+    """
+    Read one inbox page, falling back to in-memory ordering when the
+    composite index is missing and to ``simple_query`` (status only) when
+    ``query`` cannot run at all.
+    """
+    try:
+        return _fetch_inbox_page_indexed(query, limit, cursor, accept)
+    except Exception as e:
+        # If the composite index doesn't exist, page through the
+        # unordered result set in Python instead
+        print(f"⚠️ Processor: Indexed inbox query failed: {e}. Falling back to in-memory ordering.")
+    try:
+        return _fetch_inbox_page_unindexed(query, limit, cursor, accept)
+    except Exception as e2:
+        print(f"⚠️ Processor: Base query also failed: {e2}. Trying simpler query.")
+    return _fetch_inbox_page_unindexed(simple_query, limit, cursor, accept)
+
+
+def _serialize_inbox_claim(doc, claim_data):
+    form_data = claim_data.get('form_data', {}) or {}
+    return {
+        'claim_id': claim_data.get('claim_id', doc.id),
+        'claim_status': claim_data.get('claim_status', ''),
+        'created_at': str(claim_data.get('created_at', '')),
+        'submission_date': str(claim_data.get('submission_date', '')),
+        'patient_name': form_data.get('patient_name', ''),
+        'claimed_amount': form_data.get('claimed_amount', ''),
+        'payer_name': form_data.get('payer_name', ''),
+        'specialty': form_data.get('specialty', ''),
+        'hospital_name': claim_data.get('hospital_name', ''),
+        'created_by_email': claim_data.get('created_by_email', ''),
+        # Lock information
+        'locked_by_processor': claim_data.get('locked_by_processor', ''),
+        'locked_by_processor_email': claim_data.get('locked_by_processor_email', ''),
+        'locked_by_processor_name': claim_data.get('locked_by_processor_name', ''),
+        'locked_at': str(claim_data.get('locked_at', '')) if claim_data.get('locked_at') else '',
+        'lock_expires_at': str(claim_data.get('lock_expires_at', '')) if claim_data.get('lock_expires_at') else ''
+    }
+
+
 @processor_bp.route('/get-claims-to-process', methods=['GET'])
 @require_processor_access
 def get_claims_to_process():
-    """Get claims assigned to processor for processing - PROCESSORS ONLY"""
+    """
+    Get claims assigned to processor for processing - PROCESSORS ONLY
+
+    Paginated with Firestore cursors: pass the ``next_page_token`` from a
+    response as ``page_token`` to fetch the following page. A page holds
+    ``limit`` claims unless it is the last one; ``page_claims`` counts the
+    claims on this page only.
+    """
     try:
-        import pytz
         ist = pytz.timezone('Asia/Kolkata')
         db = get_firestore()
         
@@ -181,262 +406,62 @@ def get_claims_to_process():
         
         # Get query parameters
         tab = request.args.get('tab', 'unprocessed')  # Default to 'unprocessed'
-        limit = int(request.args.get('limit', 50))
+        limit = min(max(int(request.args.get('limit', 50)), 1), MAX_INBOX_PAGE_SIZE)
         start_date = request.args.get('start_date')  # Format: YYYY-MM-DD
         end_date = request.args.get('end_date')      # Format: YYYY-MM-DD
+        try:
+            cursor = decode_page_token(request.args.get('page_token'))
+        except ValueError as err:
+            return jsonify({'success': False, 'error': str(err)}), 400
         
-        # Build query for claims to process
-        query = db.collection('direct_claims')
-        
-        # Filter by status based on tab
-        if tab == 'unprocessed':
-            # Show qc_pending, need_more_info, qc_answered claims (claims that need processing)
-            query = query.where('claim_status', 'in', ['qc_pending', 'need_more_info', 'qc_answered', 'claim_contested'])
-        elif tab == 'processed':
-            # Show qc_query, qc_clear, claim_approved, claim_denial claims (claims that have been processed)
-            query = query.where('claim_status', 'in', ['qc_query', 'qc_clear', 'claim_approved', 'claim_denial'])
-        else:
-            # Default to unprocessed
-            query = query.where('claim_status', 'in', ['qc_pending', 'need_more_info', 'qc_answered'])
+        statuses = INBOX_TAB_STATUSES.get(tab, DEFAULT_INBOX_STATUSES)
+        processor_hospitals = _get_processor_hospitals(getattr(request, 'user_data', None))
+        hospital_ids = _inbox_hospital_ids(processor_hospitals, statuses)
+
+        # Build query for claims to process (projected to the inbox fields)
+        base_query = select_fields(db.collection('direct_claims'), 'processor_inbox') \
+            .where('claim_status', 'in', statuses)
         
         # Apply date filtering if provided
         if start_date:
-            import pytz
-            ist = pytz.timezone('Asia/Kolkata')
-            start_datetime = datetime.strptime(start_date, '%Y-%m-%d')
-            start_datetime = ist.localize(start_datetime)
-            query = query.where('created_at', '>=', start_datetime)
+            start_datetime = ist.localize(datetime.strptime(start_date, '%Y-%m-%d'))
+            base_query = base_query.where('created_at', '>=', start_datetime)
         
         if end_date:
-            import pytz
-            ist = pytz.timezone('Asia/Kolkata')
-            end_datetime = datetime.strptime(end_date, '%Y-%m-%d')
             # Add one day to include the entire end date
-            end_datetime = end_datetime + timedelta(days=1)
-            end_datetime = ist.localize(end_datetime)
-            query = query.where('created_at', '<', end_datetime)
-        
-        # Get all claims first, then filter by hospital, then apply limit
-        # Sort by updated_at descending to show latest updated claims first
-        claims = None
-        try:
-            # Try to sort by updated_at (most recent first)
-            query_with_order = query.order_by('updated_at', direction=firestore.Query.DESCENDING)
-            claims = query_with_order.get()
-        except Exception as e:
-            # If index doesn't exist or query fails, fallback to unsorted query
-            print(f"⚠️ Processor: Could not sort by updated_at: {e}. Using unsorted query.")
-            try:
-                # Try to get claims without order_by
-                claims = query.get()
-            except Exception as e2:
-                # If even the base query fails, it might be a missing index issue
-                print(f"⚠️ Processor: Base query also failed: {e2}. Trying simpler query.")
-                # Try a simpler query - just status filter, no date filters
-                simple_query = db.collection('direct_claims')
-                if tab == 'unprocessed':
-                    simple_query = simple_query.where('claim_status', 'in', ['qc_pending', 'need_more_info', 'qc_answered', 'claim_contested'])
-                elif tab == 'processed':
-                    simple_query = simple_query.where('claim_status', 'in', ['qc_query', 'qc_clear', 'claim_approved', 'claim_denial'])
-                else:
-                    simple_query = simple_query.where('claim_status', 'in', ['qc_pending', 'need_more_info', 'qc_answered'])
-                claims = simple_query.get()
-            
-            # Sort in Python by updated_at or processed_at (latest first)
-            if claims:
-                def get_sort_time(doc):
-                    data = doc.to_dict()
-                    # Try updated_at first (most recent activity)
-                    time_field = data.get('updated_at') or data.get('processed_at') or data.get('created_at')
-                    if time_field:
-                        # Handle Firestore timestamp objects
-                        if hasattr(time_field, 'timestamp') and callable(getattr(time_field, 'timestamp', None)):
-                            return time_field.timestamp()
-                        # Handle datetime objects
-                        elif isinstance(time_field, datetime):
-                            return time_field.timestamp()
-                        # Handle ISO format strings
-                        elif isinstance(time_field, str):
-                            try:
-                                return datetime.fromisoformat(time_field.replace('Z', '+00:00')).timestamp()
-                            except:
-                                pass
-                    return 0  # Put items without timestamp at the end
-                
-                claims = sorted(claims, key=get_sort_time, reverse=True)
-        
-        # Get processor's affiliated hospitals
-        processor_hospitals = []
-        if hasattr(request, 'user_data') and request.user_data:
-            entity_assignments = request.user_data.get('entity_assignments', {})
-            hospitals = entity_assignments.get('hospitals', [])
-            for hospital in hospitals:
-                processor_hospitals.append({
-                    'id': hospital.get('id', ''),
-                    'name': hospital.get('name', ''),
-                    'code': hospital.get('code', '')
-                })
+            end_datetime = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
+            base_query = base_query.where('created_at', '<', ist.localize(end_datetime))
+
+        # Push the hospital predicate into Firestore only when it is exactly
+        # what _processor_can_view checks (see _inbox_hospital_ids)
+        query = base_query.where('hospital_id', 'in', hospital_ids) if hospital_ids else base_query
+        simple_query = select_fields(db.collection('direct_claims'), 'processor_inbox') \
+            .where('claim_status', 'in', statuses)
+
+        def accept(doc, claim_data):
+            return _processor_can_view(doc, claim_data, processor_hospitals, processor_limit)
+
+        rows, last_consumed, exhausted = _fetch_inbox_page(query, simple_query, limit, cursor, accept)
         
         # Debug logging (only if VERBOSE_LOGGING is enabled)
-        from config import Config
         if Config.VERBOSE_LOGGING:
-            import logging
-            logger = logging.getLogger(__name__)
             logger.debug(f"Processor approval limit check: Role={user_role}, Limit=₹{processor_limit}")
             logger.debug(f"Processing tab '{tab}' for processor inbox")
-            logger.debug(f"Found {len(claims)} claims from query for tab '{tab}'")
-            logger.debug(f"Processor hospitals: {processor_hospitals}")
+            logger.debug(f"Returned {len(rows)} claims for tab '{tab}' (exhausted={exhausted})")
+            logger.debug(f"Processor hospitals: {processor_hospitals}, pushed down: {hospital_ids}")
             logger.debug(f"Processor user ID: {request.user_id}")
-            logger.debug(f"Processor email: {request.user_email}")
-        
-        # Filter by processor's affiliated hospitals AND approval limit
-        processed_claims = []
-        
-        for doc in claims:
-            claim_data = doc.to_dict()
-            claim_hospital_id = claim_data.get('hospital_id', '')
-            claim_hospital_name = claim_data.get('hospital_name', '')
-            
-            # SKIP DRAFT CLAIMS - drafts should only appear in the Drafts section
-            status = claim_data.get('claim_status', '')
-            claim_id = claim_data.get('claim_id', doc.id)
-            
-            # Skip drafts (drafts have claim_status == 'draft')
-            if (status == 'draft' or 'draft' in claim_id.lower()):
-                # Skip drafts - they should only appear in Drafts section
-                continue  # Skip drafts - they should only appear in Drafts section
-            
-            # Debug logging (only if VERBOSE_LOGGING is enabled)
-            from config import Config
-            if Config.VERBOSE_LOGGING:
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.debug(f"Processing claim {claim_data.get('claim_id', doc.id)} - status: {claim_data.get('claim_status', '')}, hospital: {claim_hospital_name}")
-            
-            # Check if claim belongs to processor's affiliated hospitals
-            belongs_to_processor = False
-            for hospital in processor_hospitals:
-                if (hospital['id'] and hospital['id'] == claim_hospital_id) or \
-                   (hospital['name'] and hospital['name'].upper() in claim_hospital_name.upper()):
-                    belongs_to_processor = True
-                    # Claim matches processor's hospital
-                    break
-            
-            # If no hospital filtering (processor has no hospitals), include all claims
-            if not processor_hospitals or belongs_to_processor:
-                # Check processor approval limit
-                form_data = claim_data.get('form_data', {})
-                claimed_amount = form_data.get('claimed_amount', 0)
-                
-                # Convert to float if it's a string
-                if isinstance(claimed_amount, str):
-                    try:
-                        claimed_amount = float(claimed_amount)
-                    except ValueError:
-                        claimed_amount = 0
-                
-                if claimed_amount > processor_limit:
-                    # Skip claim - amount exceeds processor limit
-                    continue
-                
-                # Check if lock has expired and clear it if needed
-                lock_expires_at = claim_data.get('lock_expires_at', None)
-                # Temporarily disable all lock expiry checks
-                if False and lock_expires_at and claim_data.get('locked_by_processor'):
-                    import pytz
-                    ist = pytz.timezone('Asia/Kolkata')
-                    current_time = datetime.now(ist)
-                    # Handle both datetime objects and Firestore timestamps
-                    if hasattr(lock_expires_at, 'to_pydatetime'):
-                        expires_time = lock_expires_at.to_pydatetime()
-                        # Ensure timezone awareness
-                        if expires_time.tzinfo is None:
-                            expires_time = ist.localize(expires_time)
-                        else:
-                            expires_time = expires_time.astimezone(ist)
-                    elif isinstance(lock_expires_at, str):
-                        # Handle ISO format strings - convert to IST
-                        if 'T' in lock_expires_at:
-                            # Parse ISO format and convert to IST
-                            expires_time = datetime.fromisoformat(lock_expires_at.replace('Z', '+00:00'))
-                            if expires_time.tzinfo is None:
-                                expires_time = ist.localize(expires_time)
-                            else:
-                                expires_time = expires_time.astimezone(ist)
-                        else:
-                            # Handle other string formats
-                            expires_time = datetime.fromisoformat(lock_expires_at)
-                            if expires_time.tzinfo is None:
-                                expires_time = ist.localize(expires_time)
-                    else:
-                        # Handle any other datetime format
-                        if hasattr(lock_expires_at, 'tzinfo'):
-                            expires_time = lock_expires_at
-                            # Ensure timezone awareness
-                            if expires_time.tzinfo is None:
-                                expires_time = ist.localize(expires_time)
-                            else:
-                                expires_time = expires_time.astimezone(ist)
-                        else:
-                            # Skip comparison if we can't handle this format
-                            print(f"🔍 DEBUG: Skipping lock expiry check for unsupported format: {type(lock_expires_at)}")
-                            continue
-                    
-                    if current_time > expires_time:
-                        # Lock expired, clear it
-                        print(f"🔍 DEBUG: Lock expired for claim {claim_data.get('claim_id', doc.id)}, clearing lock")
-                        db.collection('direct_claims').document(doc.id).update({
-                            'locked_by_processor': None,
-                            'locked_by_processor_email': None,
-                            'locked_by_processor_name': None,
-                            'locked_at': None,
-                            'lock_expires_at': None
-                        })
-                        # Update the claim_data for this iteration
-                        claim_data['locked_by_processor'] = None
-                        claim_data['locked_by_processor_email'] = None
-                        claim_data['locked_by_processor_name'] = None
-                        claim_data['locked_at'] = None
-                        claim_data['lock_expires_at'] = None
-                
-                processed_claims.append((doc, claim_data))
-            else:
-                # Debug logging (only if VERBOSE_LOGGING is enabled)
-                from config import Config
-                if Config.VERBOSE_LOGGING:
-                    import logging
-                    logger = logging.getLogger(__name__)
-                    logger.debug(f"Skipping claim {claim_data.get('claim_id', doc.id)} - doesn't belong to processor's hospitals")
-        
-        
-        claims_list = []
-        for doc, claim_data in processed_claims:
-            claims_list.append({
-                'claim_id': claim_data.get('claim_id', doc.id),
-                'claim_status': claim_data.get('claim_status', ''),
-                'created_at': str(claim_data.get('created_at', '')),
-                'submission_date': str(claim_data.get('submission_date', '')),
-                'patient_name': claim_data.get('form_data', {}).get('patient_name', ''),
-                'claimed_amount': claim_data.get('form_data', {}).get('claimed_amount', ''),
-                'payer_name': claim_data.get('form_data', {}).get('payer_name', ''),
-                'specialty': claim_data.get('form_data', {}).get('specialty', ''),
-                'hospital_name': claim_data.get('hospital_name', ''),
-                'created_by_email': claim_data.get('created_by_email', ''),
-                # Lock information
-                'locked_by_processor': claim_data.get('locked_by_processor', ''),
-                'locked_by_processor_email': claim_data.get('locked_by_processor_email', ''),
-                'locked_by_processor_name': claim_data.get('locked_by_processor_name', ''),
-                'locked_at': str(claim_data.get('locked_at', '')) if claim_data.get('locked_at') else '',
-                'lock_expires_at': str(claim_data.get('lock_expires_at', '')) if claim_data.get('lock_expires_at') else ''
-            })
         
-        # Apply limit after filtering
-        claims_list = claims_list[:limit]
+        claims_list = [_serialize_inbox_claim(doc, claim_data) for doc, claim_data in rows]
+        next_page_token = None
+        if not exhausted and last_consumed is not None:
+            next_page_token = encode_page_token(*last_consumed)
         
         return jsonify({
             'success': True,
-            'total_claims': len(claims_list),
-            'claims': claims_list
+            'page_claims': len(claims_list),
+            'claims': claims_list,
+            'next_page_token': next_page_token,
+            'has_more': next_page_token is not None
         }), 200
         
     except Exception as e:
@@ -457,22 +482,12 @@ def get_transition_trail(claim_id):
     try:
         db = get_firestore()
         
-        # First try to get the claim by document ID (most common case)
-        claim_doc = db.collection('direct_claims').document(claim_id).get()
-        
-        if not claim_doc.exists:
-            # If not found by document ID, search by claim_id field
-            claims_query = db.collection('direct_claims').where('claim_id', '==', claim_id)
-            claims_docs = claims_query.get()
-            
-            if not claims_docs:
-                return jsonify({
-                    'success': False,
-                    'error': 'Claim not found'
-                }), 404
-            
-            # Get the first matching claim
-            claim_doc = claims_docs[0]
+        claim_doc = get_claim_resolver().get(claim_id, db)
+        if not claim_doc:
+            return jsonify({
+                'success': False,
+                'error': 'Claim not found'
+            }), 404
         
         claim_data = claim_doc.to_dict()
         
@@ -531,22 +546,12 @@ def process_claim(claim_id):
 
         db = get_firestore()
         
-        # First try to get the claim by document ID (most common case)
-        claim_doc = db.collection('direct_claims').document(claim_id).get()
-        
-        if not claim_doc.exists:
-            # If not found by document ID, search by claim_id field
-            claims_query = db.collection('direct_claims').where('claim_id', '==', claim_id)
-            claims_docs = claims_query.get()
-            
-            if not claims_docs:
-                return jsonify({
-                    'success': False,
-                    'error': 'Claim not found'
-                }), 404
-            
-            # Get the first matching claim
-            claim_doc = claims_docs[0]
+        claim_doc = get_claim_resolver().get(claim_id, db)
+        if not claim_doc:
+            return jsonify({
+                'success': False,
+                'error': 'Claim not found'
+            }), 404
         
         claim_data = claim_doc.to_dict()
 
@@ -613,115 +618,17 @@ def process_claim(claim_id):
                 'hospital_id': hospital_id
             }), 400
         
-        # 🔒 CHECK CLAIM LOCK - Prevent concurrent processing
-        current_processor = claim_data.get('locked_by_processor', '')
-        current_processor_email = claim_data.get('locked_by_processor_email', '')
-        lock_timestamp = claim_data.get('locked_at', None)
-        lock_expires_at = claim_data.get('lock_expires_at', None)
-        
-        # If claim is locked by another processor, check if lock has expired
-        if current_processor and current_processor != request.user_id:
-            # Check if lock has expired - temporarily disabled
-            if False and lock_expires_at:
-                import pytz
-                # Use Indian Standard Time (IST)
-                ist = pytz.timezone('Asia/Kolkata')
-                current_time = datetime.now(ist)
-                # Handle both datetime objects and Firestore timestamps
-                if hasattr(lock_expires_at, 'to_pydatetime'):
-                    expires_time = lock_expires_at.to_pydatetime()
-                    # Ensure timezone awareness
-                    if expires_time.tzinfo is None:
-                        expires_time = ist.localize(expires_time)
-                    else:
-                        expires_time = expires_time.astimezone(ist)
-                elif isinstance(lock_expires_at, str):
-                    # Handle ISO format strings - convert to IST
-                    if 'T' in lock_expires_at:
-                        # Parse ISO format and convert to IST
-                        expires_time = datetime.fromisoformat(lock_expires_at.replace('Z', '+00:00'))
-                        if expires_time.tzinfo is None:
-                            expires_time = ist.localize(expires_time)
-                        else:
-                            expires_time = expires_time.astimezone(ist)
-                    else:
-                        # Handle other string formats
-                        expires_time = datetime.fromisoformat(lock_expires_at)
-                        if expires_time.tzinfo is None:
-                            expires_time = ist.localize(expires_time)
-                else:
-                    expires_time = lock_expires_at
-                    # Ensure timezone awareness
-                    if expires_time.tzinfo is None:
-                        expires_time = ist.localize(expires_time)
-                    else:
-                        expires_time = expires_time.astimezone(ist)
-                
-                if current_time > expires_time:
-                    # Lock expired, clear it and allow processing
-                    print(f"🔍 DEBUG: Lock expired for claim {claim_id}, clearing lock before processing")
-                    db.collection('direct_claims').document(claim_id).update({
-                        'locked_by_processor': None,
-                        'locked_by_processor_email': None,
-                        'locked_by_processor_name': None,
-                        'locked_at': None,
-                        'lock_expires_at': None
-                    })
-                    # Continue with processing
-                else:
-                    # Lock is still valid
-                    return jsonify({
-                        'success': False,
-                        'error': f'Claim is currently being processed by {current_processor_email}. Please try again later.',
-                        'locked_by': current_processor_email,
-                        'locked_at': str(lock_timestamp) if lock_timestamp else 'Unknown',
-                        'expires_at': str(expires_time)
-                    }), 409  # Conflict status
-            else:
-                # No expiry time set, consider it locked
-                return jsonify({
-                    'success': False,
-                    'error': f'Claim is currently being processed by {current_processor_email}. Please try again later.',
-                    'locked_by': current_processor_email,
-                    'locked_at': str(lock_timestamp) if lock_timestamp else 'Unknown'
-                }), 409  # Conflict status
-        
-        # 🔒 CHECK MAXIMUM LOCK LIMIT - Processors can only lock up to 3 claims at a time
-        # Clean up expired locks first
-        lock_utils.cleanup_expired_locks(db)
-        
-        # Count how many claims are currently locked by this processor
-        locked_by_processor_claims = db.collection('direct_claims').where('locked_by_processor', '==', request.user_id).get()
-        current_locked_count = len(locked_by_processor_claims)
-        
-        # If the current claim is already locked by this processor, don't count it
-        if current_processor == request.user_id:
-            current_locked_count = max(0, current_locked_count - 1)
-        
-        MAX_LOCKS_PER_PROCESSOR = 3
-        
-        if current_locked_count >= MAX_LOCKS_PER_PROCESSOR:
-            return jsonify({
-                'success': False,
-                'error': f'You have reached the maximum limit of {MAX_LOCKS_PER_PROCESSOR} locked claims. Please unlock a claim before processing another one.',
-                'current_locked_count': current_locked_count,
-                'max_allowed': MAX_LOCKS_PER_PROCESSOR
-            }), 400
-        
-        # 🔒 LOCK THE CLAIM - Set lock before processing
-        import pytz
-        ist = pytz.timezone('Asia/Kolkata')
-        lock_expiry = datetime.now(ist) + timedelta(hours=1)
-        lock_data = {
-            'locked_by_processor': request.user_id,
-            'locked_by_processor_email': request.user_email,
-            'locked_by_processor_name': getattr(request, 'user_name', '') or getattr(request, 'user_display_name', '') or 'Unknown User',
-            'locked_at': firestore.SERVER_TIMESTAMP,
-            'lock_expires_at': lock_expiry.isoformat()  # Store as ISO string
-        }
-        
-        # Update lock first
-        db.collection('direct_claims').document(claim_id).update(lock_data)
+        # 🔒 LOCK THE CLAIM - Prevent concurrent processing. One transaction checks
+        # the current holder, the lock expiry and the processor's lock limit
+        try:
+            get_claim_lock_service().acquire(
+                claim_doc.id,
+                request.user_id,
+                request.user_email,
+                getattr(request, 'user_name', '') or getattr(request, 'user_display_name', '') or 'Unknown User'
+            )
+        except lock_utils.LockError as e:
+            return jsonify({'success': False, 'error': e.message, **e.details}), e.status_code
         
         # Use the provided status directly
         new_status = status
@@ -746,12 +653,6 @@ def process_claim(claim_id):
             'processed_by_name': user_name,
             'processing_remarks': remarks,
             'updated_at': firestore.SERVER_TIMESTAMP,
-            # 🔓 UNLOCK THE CLAIM - Remove lock after processing
-            'locked_by_processor': None,
-            'locked_by_processor_email': None,
-            'locked_by_processor_name': None,
-            'locked_at': None,
-            'lock_expires_at': None,
             'qc_query_details': cleaned_query_details if new_status == 'qc_query' else firestore.DELETE_FIELD
         }
         
@@ -810,8 +711,8 @@ def process_claim(claim_id):
                 except (ValueError, TypeError):
                     update_data['approved_amount'] = 0
         
-        # Update the claim
-        db.collection('direct_claims').document(claim_id).update(update_data)
+        # Update the claim and 🔓 unlock it in one transaction
+        get_claim_lock_service().release(claim_doc.id, request.user_id, updates=update_data)
         
         # Create transaction record
         transaction_type_map = {
@@ -946,62 +847,11 @@ def get_claim_details(claim_id):
         import urllib.parse
         claim_id = urllib.parse.unquote(claim_id)  # Decode URL encoding
         
-        # Normalize claim ID format (similar to hospital endpoint)
-        normalized_claim_id = str(claim_id).replace('CSHLSIP ', 'CSHLSIP-').replace('CLS ', 'CLS-').replace('  ', ' ').replace(' ', '-')
+        normalized_claim_id = normalize_claim_id(claim_id)
         print(f"🔍 Processor get-claim-details: raw='{claim_id}' normalized='{normalized_claim_id}'")
         
-        claim_doc = None
-        
-        # Try multiple approaches to find the claim
-        # 1. Try by document ID (original and normalized)
-        for test_id in [claim_id, normalized_claim_id]:
-            claim_doc = db.collection('direct_claims').document(test_id).get()
-            if claim_doc.exists:
-                print(f"🔍 Found claim by document ID: {test_id}")
-                break
-        
-        # 2. If not found by document ID, search by claim_id field (exact match)
-        if not claim_doc or not claim_doc.exists:
-            for test_id in [claim_id, normalized_claim_id]:
-                claims_query = db.collection('direct_claims').where('claim_id', '==', test_id)
-                claims_docs = claims_query.get()
-                if claims_docs:
-                    claim_doc = claims_docs[0]
-                    print(f"🔍 Found claim by claim_id field: {test_id}")
-                    break
-        
-        # 3. Try prefix search (for partial matches)
-        if not claim_doc or not claim_doc.exists:
-            direct_claims = (
-                db.collection('direct_claims')
-                .where('claim_id', '>=', normalized_claim_id)
-                .where('claim_id', '<=', normalized_claim_id + '\uf8ff')
-                .limit(1)
-                .get()
-            )
-            if direct_claims:
-                claim_doc = direct_claims[0]
-                print(f"🔍 Found claim by prefix search: {normalized_claim_id}")
-        
-        # 4. Try fallback IDs (various formats)
-        if not claim_doc or not claim_doc.exists:
-            fallback_ids = {
-                str(claim_id),
-                normalized_claim_id,
-                str(claim_id).replace(' ', '-'),
-                str(claim_id).replace(' ', ''),
-                str(claim_id).upper(),
-                str(claim_id).lower(),
-            }
-            
-            for fallback_id in fallback_ids:
-                doc_candidate = db.collection('direct_claims').document(fallback_id).get()
-                if doc_candidate.exists:
-                    claim_doc = doc_candidate
-                    print(f"🔍 Found claim by fallback ID: {fallback_id}")
-                    break
-        
-        if not claim_doc or not claim_doc.exists:
+        claim_doc = get_claim_resolver().get(claim_id, db)
+        if not claim_doc:
             return jsonify({
                 'success': False,
                 'error': f'Claim not found: {claim_id}',
@@ -1060,84 +910,11 @@ def get_claim_details(claim_id):
         # Extract form_data for easier access
         form_data = claim_data.get('form_data', {})
         
-        # Get documents for this claim (support legacy storage)
-        documents = claim_data.get('documents', []) or []
-        if not documents:
-            documents = claim_data.get('document_uploads', []) or []
-        if not documents:
-            # Some legacy records keep uploads within form_data
-            form_documents = (claim_data.get('form_data') or {}).get('documents') or []
-            if isinstance(form_documents, list):
-                documents = form_documents
-        if not isinstance(documents, list):
-            documents = []
-        
-        # Get detailed document information from documents array
-        detailed_documents = []
-        for doc in documents:
-            doc_id = None
-            if isinstance(doc, dict):
-                doc_id = doc.get('document_id') or doc.get('id') or doc.get('documentId')
-            elif isinstance(doc, str):
-                doc_id = doc
-
-            if doc_id:
-                doc_detailed = db.collection('documents').document(doc_id).get()
-                if doc_detailed.exists:
-                    doc_data = doc_detailed.to_dict()
-                    detailed_documents.append({
-                        'document_id': doc_data.get('document_id'),
-                        'document_type': doc_data.get('document_type'),
-                        'document_name': doc_data.get('document_name'),
-                        'original_filename': doc_data.get('original_filename'),
-                        'download_url': doc_data.get('download_url'),
-                        'file_size': doc_data.get('file_size'),
-                        'file_type': doc_data.get('file_type'),
-                        'uploaded_at': str(doc_data.get('uploaded_at', '')),
-                        'status': doc_data.get('status')
-                    })
-        
-        # ALSO query documents collection directly by claim_id (in case documents weren't linked to claim document)
-        # This ensures we get all documents even if they weren't properly linked
-        # We always query this to catch any documents that might have been uploaded but not linked
-        print(f"🔍 Querying documents collection by claim_id: {claim_id}")
-        documents_query = db.collection('documents').where('claim_id', '==', claim_id).get()
-        existing_doc_ids = {d.get('document_id') for d in detailed_documents if d.get('document_id')}
-        
-        for doc_doc in documents_query:
-            doc_data = doc_doc.to_dict()
-            # Check if we already have this document
-            doc_id = doc_data.get('document_id')
-            if doc_id and doc_id not in existing_doc_ids:
-                # Regenerate download URL if expired (signed URLs expire after 7 days)
-                download_url = doc_data.get('download_url', '')
-                if not download_url:
-                    try:
-                        from datetime import timedelta
-                        from firebase_config import get_storage
-                        storage_path = doc_data.get('storage_path', '')
-                        if storage_path:
-                            bucket = get_storage()
-                            blob = bucket.blob(storage_path)
-                            if blob.exists():
-                                download_url = blob.generate_signed_url(expiration=timedelta(days=7))
-                    except Exception as e:
-                        print(f"⚠️ Could not regenerate download URL: {e}")
-                
-                detailed_documents.append({
-                    'document_id': doc_data.get('document_id'),
-                    'document_type': doc_data.get('document_type'),
-                    'document_name': doc_data.get('document_name'),
-                    'original_filename': doc_data.get('original_filename'),
-                    'download_url': download_url or doc_data.get('download_url', ''),
-                    'file_size': doc_data.get('file_size'),
-                    'file_type': doc_data.get('file_type'),
-                    'uploaded_at': str(doc_data.get('uploaded_at', '')),
-                    'status': doc_data.get('status', 'uploaded')
-                })
-                existing_doc_ids.add(doc_id)
-        
-        print(f"🔍 Found {len(detailed_documents)} total documents for claim {claim_id} (from claim doc: {len(documents)}, from documents collection: {len(documents_query)})")
+        # Referenced documents in one batched read, plus any only linked by claim_id
+        # (in case documents weren't linked to claim document)
+        detailed_documents = hydrate_claim_documents(db, claim_data, claim_id=claim_id,
+                                                     signer=get_signed_url_service())
+        print(f"🔍 Found {len(detailed_documents)} total documents for claim {claim_id}")
         
         # Return detailed claim information with proper structure
         return jsonify({
@@ -1292,148 +1069,31 @@ def lock_claim(claim_id):
     try:
         db = get_firestore()
         
-        # First try to get the claim by document ID (most common case)
-        claim_doc = db.collection('direct_claims').document(claim_id).get()
-        
-        if not claim_doc.exists:
-            # If not found by document ID, search by claim_id field
-            claims_query = db.collection('direct_claims').where('claim_id', '==', claim_id)
-            claims_docs = claims_query.get()
-            
-            if not claims_docs:
-                return jsonify({
-                    'success': False,
-                    'error': 'Claim not found'
-                }), 404
-            
-            # Get the first matching claim
-            claim_doc = claims_docs[0]
-        
-        claim_data = claim_doc.to_dict()
-        
-        # Check if claim is already locked by another processor
-        current_processor = claim_data.get('locked_by_processor', '')
-        current_processor_email = claim_data.get('locked_by_processor_email', '')
-        lock_timestamp = claim_data.get('locked_at', None)
-        lock_expires_at = claim_data.get('lock_expires_at', None)
-        
-        # Check if claim is locked by another processor AND not expired
-        if current_processor and current_processor != request.user_id:
-            # Check if lock has expired - temporarily disabled
-            if False and lock_expires_at:
-                import pytz
-                # Use Indian Standard Time (IST)
-                ist = pytz.timezone('Asia/Kolkata')
-                current_time = datetime.now(ist)
-                # Handle both datetime objects and Firestore timestamps
-                if hasattr(lock_expires_at, 'to_pydatetime'):
-                    expires_time = lock_expires_at.to_pydatetime()
-                    # Ensure timezone awareness
-                    if expires_time.tzinfo is None:
-                        expires_time = ist.localize(expires_time)
-                    else:
-                        expires_time = expires_time.astimezone(ist)
-                elif isinstance(lock_expires_at, str):
-                    # Handle ISO format strings - convert to IST
-                    if 'T' in lock_expires_at:
-                        # Parse ISO format and convert to IST
-                        expires_time = datetime.fromisoformat(lock_expires_at.replace('Z', '+00:00'))
-                        if expires_time.tzinfo is None:
-                            expires_time = ist.localize(expires_time)
-                        else:
-                            expires_time = expires_time.astimezone(ist)
-                    else:
-                        # Handle other string formats
-                        expires_time = datetime.fromisoformat(lock_expires_at)
-                        if expires_time.tzinfo is None:
-                            expires_time = ist.localize(expires_time)
-                else:
-                    expires_time = lock_expires_at
-                    # Ensure timezone awareness
-                    if expires_time.tzinfo is None:
-                        expires_time = ist.localize(expires_time)
-                    else:
-                        expires_time = expires_time.astimezone(ist)
-                
-                if current_time > expires_time:
-                    # Lock expired, clear it and allow locking
-                    print(f"🔍 DEBUG: Lock expired for claim {claim_id}, clearing lock")
-                    print(f"🔍 DEBUG: Current time: {current_time}")
-                    print(f"🔍 DEBUG: Expires time: {expires_time}")
-                    print(f"🔍 DEBUG: Time difference: {current_time - expires_time}")
-                    db.collection('direct_claims').document(claim_id).update({
-                        'locked_by_processor': None,
-                        'locked_by_processor_email': None,
-                        'locked_by_processor_name': None,
-                        'locked_at': None,
-                        'lock_expires_at': None
-                    })
-                    # Continue with locking process
-                else:
-                    # Lock is still valid
-                    print(f"🔍 DEBUG: Lock still valid for claim {claim_id}")
-                    print(f"🔍 DEBUG: Current time: {current_time}")
-                    print(f"🔍 DEBUG: Expires time: {expires_time}")
-                    print(f"🔍 DEBUG: Time difference: {expires_time - current_time}")
-                    return jsonify({
-                        'success': False,
-                        'error': f'Claim is currently being processed by {current_processor_email}. Please try again later.',
-                        'locked_by': current_processor_email,
-                        'locked_at': str(lock_timestamp) if lock_timestamp else 'Unknown',
-                        'expires_at': str(expires_time)
-                    }), 409  # Conflict status
-            else:
-                # No expiry time set, consider it locked
-                return jsonify({
-                    'success': False,
-                    'error': f'Claim is currently being processed by {current_processor_email}. Please try again later.',
-                    'locked_by': current_processor_email,
-                    'locked_at': str(lock_timestamp) if lock_timestamp else 'Unknown'
-                }), 409  # Conflict status
-        
-        # 🔒 CHECK MAXIMUM LOCK LIMIT - Processors can only lock up to 3 claims at a time
-        # Clean up expired locks first
-        lock_utils.cleanup_expired_locks(db)
-        
-        # Count how many claims are currently locked by this processor
-        locked_by_processor_claims = db.collection('direct_claims').where('locked_by_processor', '==', request.user_id).get()
-        current_locked_count = len(locked_by_processor_claims)
-        
-        # If the current claim is already locked by this processor, don't count it
-        if current_processor == request.user_id:
-            current_locked_count = max(0, current_locked_count - 1)
-        
-        MAX_LOCKS_PER_PROCESSOR = 3
-        
-        if current_locked_count >= MAX_LOCKS_PER_PROCESSOR:
+        claim_doc = get_claim_resolver().get(claim_id, db)
+        if not claim_doc:
             return jsonify({
                 'success': False,
-                'error': f'You have reached the maximum limit of {MAX_LOCKS_PER_PROCESSOR} locked claims. Please unlock a claim before locking another one.',
-                'current_locked_count': current_locked_count,
-                'max_allowed': MAX_LOCKS_PER_PROCESSOR
-            }), 400
-        
-        # Lock the claim for 1 hour
-        import pytz
-        ist = pytz.timezone('Asia/Kolkata')
-        lock_expiry = datetime.now(ist) + timedelta(hours=1)
-        lock_data = {
-            'locked_by_processor': request.user_id,
-            'locked_by_processor_email': request.user_email,
-            'locked_by_processor_name': getattr(request, 'user_name', '') or getattr(request, 'user_display_name', '') or 'Unknown User',
-            'locked_at': firestore.SERVER_TIMESTAMP,
-            'lock_expires_at': lock_expiry.isoformat()  # Store as ISO string
-        }
+                'error': 'Claim not found'
+            }), 404
         
-        # Update lock
-        db.collection('direct_claims').document(claim_id).update(lock_data)
+        # Lock the claim for the lock TTL (1 hour by default), checking the current
+        # holder and the processor's lock limit in one transaction
+        try:
+            lock_data = get_claim_lock_service().acquire(
+                claim_doc.id,
+                request.user_id,
+                request.user_email,
+                getattr(request, 'user_name', '') or getattr(request, 'user_display_name', '') or 'Unknown User'
+            )
+        except lock_utils.LockError as e:
+            return jsonify({'success': False, 'error': e.message, **e.details}), e.status_code
         
         return jsonify({
             'success': True,
             'message': 'Claim locked successfully',
             'claim_id': claim_id,
             'locked_by': request.user_email,
-            'locked_at': lock_expiry.isoformat()
+            'locked_at': lock_data['lock_expires_at'].isoformat()
         }), 200
         
     except Exception as e:
@@ -1449,50 +1109,18 @@ def unlock_claim(claim_id):
     try:
         db = get_firestore()
         
-        # First try to get the claim by document ID (most common case)
-        claim_doc = db.collection('direct_claims').document(claim_id).get()
-        
-        if not claim_doc.exists:
-            # If not found by document ID, search by claim_id field
-            claims_query = db.collection('direct_claims').where('claim_id', '==', claim_id)
-            claims_docs = claims_query.get()
-            
-            if not claims_docs:
-                return jsonify({
-                    'success': False,
-                    'error': 'Claim not found'
-                }), 404
-            
-            # Get the first matching claim
-            claim_doc = claims_docs[0]
-        
-        claim_data = claim_doc.to_dict()
-        
-        # Check if claim is locked by current processor
-        current_processor = claim_data.get('locked_by_processor', '')
-        
-        if not current_processor:
+        claim_doc = get_claim_resolver().get(claim_id, db)
+        if not claim_doc:
             return jsonify({
                 'success': False,
-                'error': 'Claim is not currently locked'
-            }), 400
-        
-        if current_processor != request.user_id:
-            return jsonify({
-                'success': False,
-                'error': 'You can only unlock claims that you have locked'
-            }), 403
-        
-        # Unlock the claim
-        unlock_data = {
-            'locked_by_processor': None,
-            'locked_by_processor_email': None,
-            'locked_by_processor_name': None,
-            'locked_at': None,
-            'lock_expires_at': None
-        }
+                'error': 'Claim not found'
+            }), 404
         
-        db.collection('direct_claims').document(claim_id).update(unlock_data)
+        # Unlock the claim if it is locked by the current processor
+        try:
+            get_claim_lock_service().release(claim_doc.id, request.user_id, require_owner=True)
+        except lock_utils.LockError as e:
+            return jsonify({'success': False, 'error': e.message, **e.details}), e.status_code
         
         return jsonify({
             'success': True,
@@ -1513,84 +1141,23 @@ def check_claim_lock(claim_id):
     try:
         db = get_firestore()
         
-        # First try to get the claim by document ID (most common case)
-        claim_doc = db.collection('direct_claims').document(claim_id).get()
-        
-        if not claim_doc.exists:
-            # If not found by document ID, search by claim_id field
-            claims_query = db.collection('direct_claims').where('claim_id', '==', claim_id)
-            claims_docs = claims_query.get()
-            
-            if not claims_docs:
-                return jsonify({
-                    'success': False,
-                    'error': 'Claim not found'
-                }), 404
-            
-            # Get the first matching claim
-            claim_doc = claims_docs[0]
+        claim_doc = get_claim_resolver().get(claim_id, db)
+        if not claim_doc:
+            return jsonify({
+                'success': False,
+                'error': 'Claim not found'
+            }), 404
         
         claim_data = claim_doc.to_dict()
         
         # Check if claim is locked
-        locked_by = claim_data.get('locked_by_processor', '')
         locked_by_email = claim_data.get('locked_by_processor_email', '')
         locked_by_name = claim_data.get('locked_by_processor_name', '')
         locked_at = claim_data.get('locked_at', None)
         lock_expires_at = claim_data.get('lock_expires_at', None)
         
-        # Check if lock has expired
-        is_locked = False
-        if locked_by and locked_by != request.user_id:
-            # Check if lock has expired - temporarily disabled
-            if False and lock_expires_at:
-                import pytz
-                ist = pytz.timezone('Asia/Kolkata')
-                current_time = datetime.now(ist)
-                # Handle both datetime objects and Firestore timestamps
-                if hasattr(lock_expires_at, 'to_pydatetime'):
-                    expires_time = lock_expires_at.to_pydatetime()
-                    # Ensure timezone awareness
-                    if expires_time.tzinfo is None:
-                        expires_time = ist.localize(expires_time)
-                    else:
-                        expires_time = expires_time.astimezone(ist)
-                elif isinstance(lock_expires_at, str):
-                    # Handle ISO format strings - convert to IST
-                    if 'T' in lock_expires_at:
-                        # Parse ISO format and convert to IST
-                        expires_time = datetime.fromisoformat(lock_expires_at.replace('Z', '+00:00'))
-                        if expires_time.tzinfo is None:
-                            expires_time = ist.localize(expires_time)
-                        else:
-                            expires_time = expires_time.astimezone(ist)
-                    else:
-                        # Handle other string formats
-                        expires_time = datetime.fromisoformat(lock_expires_at)
-                        if expires_time.tzinfo is None:
-                            expires_time = ist.localize(expires_time)
-                else:
-                    expires_time = lock_expires_at
-                    # Ensure timezone awareness
-                    if expires_time.tzinfo is None:
-                        expires_time = ist.localize(expires_time)
-                    else:
-                        expires_time = expires_time.astimezone(ist)
-                
-                if current_time > expires_time:
-                    # Lock expired, clear it
-                    db.collection('direct_claims').document(claim_id).update({
-                        'locked_by_processor': None,
-                        'locked_by_processor_email': None,
-                        'locked_by_processor_name': None,
-                        'locked_at': None,
-                        'lock_expires_at': None
-                    })
-                    is_locked = False
-                else:
-                    is_locked = True
-            else:
-                is_locked = True
+        # Locked by someone else and not expired (expired locks are taken over on acquire)
+        is_locked = lock_utils.lock_is_active(claim_data, processor_id=request.user_id)
         
         return jsonify({
             'success': True,
@@ -1607,6 +1174,30 @@ def check_claim_lock(claim_id):
             'error': str(e)
         }), 500
 
+@processor_bp.route('/lock-reaper-stats', methods=['GET'])
+@require_processor_access
+def lock_reaper_stats():
+    """Expired-lock reaper metrics: this worker's counters and the last run of any worker"""
+    try:
+        db = get_firestore()
+        marker = run_marker(db, LOCK_REAPER_MARKER).get()
+        marker_data = marker.to_dict() if marker.exists else {}
+        last_result = marker_data.get('last_result')
+        last_finished_at = marker_data.get('last_finished_at')
+        return jsonify({
+            'success': True,
+            'worker': get_lock_reaper().stats(),
+            'last_run': {
+                **(last_result or {}),
+                'finished_at': str(last_finished_at) if last_finished_at else None
+            } if last_result else None
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @processor_bp.route('/bulk-process-claims', methods=['POST'])
 @require_processor_access
 def bulk_process_claims():
@@ -1636,109 +1227,23 @@ def bulk_process_claims():
                 'error': 'Bulk processing for QC Query is not supported. Please process queries individually.'
             }), 400
 
-        db = get_firestore()
-        
-        # Process each claim
-        processed_count = 0
-        errors = []
-        
-        for claim_id in claim_ids:
-            try:
-                # First try to get the claim by document ID (most common case)
-                claim_doc = db.collection('direct_claims').document(claim_id).get()
-                
-                if not claim_doc.exists:
-                    # If not found by document ID, search by claim_id field
-                    claims_query = db.collection('direct_claims').where('claim_id', '==', claim_id)
-                    claims_docs = claims_query.get()
-                    
-                    if claims_docs:
-                        claim_doc = claims_docs[0]
-                
-                if claim_doc.exists:
-                    claim_data = claim_doc.to_dict() or {}
-                    hospital_id = claim_data.get('hospital_id', '')
-                    processor_status_options = get_processor_status_options(db, hospital_id)
-                    optional_flag = OPTIONAL_STATUS_FLAG_MAP.get(status)
-                    if optional_flag and not processor_status_options.get(optional_flag, False):
-                        errors.append(
-                            f"Status '{status}' is disabled for hospital {hospital_id or 'UNKNOWN'}"
-                        )
-                        continue
-                    # Use the provided status directly
-                    new_status = status
-                    
-                    update_data = {
-                        'claim_status': new_status,
-                        'processed_at': firestore.SERVER_TIMESTAMP,
-                        'processed_by': request.user_id,
-                        'processed_by_email': request.user_email,
-                        'processing_remarks': remarks,
-                        'updated_at': firestore.SERVER_TIMESTAMP
-                    }
-                    
-                    db.collection('direct_claims').document(claim_id).update(update_data)
-                    
-                    # Send notification for each processed claim
-                    try:
-                        notification_client = get_notification_client()
-                        user_name = getattr(request, 'user_name', '') or getattr(request, 'user_display_name', '') or 'Unknown User'
-                        updated_claim_data = {**claim_data, **update_data}
-                        
-                        if new_status == 'need_more_info':
-                            notification_client.notify_need_more_info(
-                                claim_id=claim_id,
-                                claim_data=updated_claim_data,
-                                processor_id=request.user_id,
-                                processor_name=user_name,
-                                processor_email=request.user_email,
-                                remarks=remarks
-                            )
-                        elif new_status == 'qc_clear':
-                            notification_client.notify_qc_clear(
-                                claim_id=claim_id,
-                                claim_data=updated_claim_data,
-                                processor_id=request.user_id,
-                                processor_name=user_name,
-                                processor_email=request.user_email,
-                                remarks=remarks
-                            )
-                        elif new_status == 'claim_approved':
-                            notification_client.notify_approved(
-                                claim_id=claim_id,
-                                claim_data=updated_claim_data,
-                                processor_id=request.user_id,
-                                processor_name=user_name,
-                                processor_email=request.user_email,
-                                remarks=remarks
-                            )
-                        elif new_status == 'claim_denial':
-                            notification_client.notify_denial(
-                                claim_id=claim_id,
-                                claim_data=updated_claim_data,
-                                processor_id=request.user_id,
-                                processor_name=user_name,
-                                processor_email=request.user_email,
-                                remarks=remarks,
-                                rejection_reason=remarks
-                            )
-                    except Exception as notif_error:
-                        # Log but don't fail bulk processing if notification fails
-                        import logging
-                        logging.error(f"Failed to send notification for bulk processed claim {claim_id}: {str(notif_error)}")
-                    
-                    processed_count += 1
-                else:
-                    errors.append(f'Claim {claim_id} not found')
-            except Exception as e:
-                errors.append(f'Error processing claim {claim_id}: {str(e)}')
-        
+        user_name = getattr(request, 'user_name', '') or getattr(request, 'user_display_name', '') or 'Unknown User'
+        results = get_bulk_claim_processor().process(
+            claim_ids,
+            status,
+            remarks,
+            actor={'id': request.user_id, 'email': request.user_email, 'name': user_name},
+            status_options=get_processor_status_options,
+            optional_flags=OPTIONAL_STATUS_FLAG_MAP
+        )
+
         return jsonify({
             'success': True,
             'message': f'Bulk processing completed',
-            'processed_count': processed_count,
+            'processed_count': sum(1 for result in results if result['success']),
             'total_claims': len(claim_ids),
-            'errors': errors
+            'errors': [result['error'] for result in results if not result['success']],
+            'results': results
         }), 200
         
     except Exception as e:
@@ -6,6 +6,7 @@ from flask import Blueprint, request, jsonify
 from firebase_config import get_firestore
 from firebase_admin import firestore
 from datetime import datetime
+from utils.claim_resolver import get_claim_resolver
 
 public_bp = Blueprint('public', __name__)
 
@@ -15,18 +16,9 @@ def get_claim_public(claim_id):
     try:
         db = get_firestore()
         
-        # First try to get the claim by document ID
-        claim_doc = db.collection('direct_claims').document(claim_id).get()
-        
-        if not claim_doc.exists:
-            # If not found by document ID, search by claim_id field
-            claims_query = db.collection('direct_claims').where('claim_id', '==', claim_id)
-            claims_docs = claims_query.get()
-            
-            if not claims_docs:
-                return jsonify({'error': 'Claim not found'}), 404
-            
-            claim_doc = claims_docs[0]
+        claim_doc = get_claim_resolver().get(claim_id, db)
+        if not claim_doc:
+            return jsonify({'error': 'Claim not found'}), 404
         
         claim_data = claim_doc.to_dict()
         form_data = claim_data.get('form_data', {})
@@ -84,15 +76,9 @@ def submit_medical_info(claim_id):
         db = get_firestore()
         
         # Validate claim exists
-        claim_doc = db.collection('direct_claims').document(claim_id).get()
-        if not claim_doc.exists:
-            # Try searching by claim_id field
-            claims_query = db.collection('direct_claims').where('claim_id', '==', claim_id)
-            claims_docs = claims_query.get()
-            if claims_docs:
-                claim_doc = claims_docs[0]
-            else:
-                return jsonify({'error': 'Claim not found'}), 404
+        claim_doc = get_claim_resolver().get(claim_id, db)
+        if not claim_doc:
+            return jsonify({'error': 'Claim not found'}), 404
         
         # Store medical information
         update_data = {
@@ -120,15 +106,9 @@ def submit_billing_info(claim_id):
         db = get_firestore()
         
         # Validate claim exists
-        claim_doc = db.collection('direct_claims').document(claim_id).get()
-        if not claim_doc.exists:
-            # Try searching by claim_id field
-            claims_query = db.collection('direct_claims').where('claim_id', '==', claim_id)
-            claims_docs = claims_query.get()
-            if claims_docs:
-                claim_doc = claims_docs[0]
-            else:
-                return jsonify({'error': 'Claim not found'}), 404
+        claim_doc = get_claim_resolver().get(claim_id, db)
+        if not claim_doc:
+            return jsonify({'error': 'Claim not found'}), 404
         
         # Store billing information
         update_data = {
@@ -14,6 +14,11 @@ from firebase_admin import firestore
 
 from firebase_config import get_firestore
 from middleware import require_review_request_access
+from utils.claim_ids import get_claim_id_allocator
+from utils.claim_resolver import get_claim_resolver
+from utils.document_hydration import fetch_documents, hydrate_claim_documents
+from utils.projections import select_fields
+from utils.signed_urls import get_signed_url_service
 from utils.transaction_helper import TransactionType, create_transaction
 
 
@@ -102,63 +107,6 @@ def _to_iso(value: Any) -> Optional[str]:
     return dt.isoformat()
 
 
-def _normalize_claim_id(raw_claim_id: str) -> str:
-    """Normalize claim IDs to a canonical format used in Firestore."""
-    if not raw_claim_id:
-        return ''
-    value = str(raw_claim_id).strip()
-    replacements = (
-        ('CSHLSIP ', 'CSHLSIP-'),
-        ('CLS ', 'CLS-'),
-    )
-    for old, new in replacements:
-        value = value.replace(old, new)
-    value = value.replace('  ', ' ')
-    return value.replace(' ', '-')
-
-
-def _claim_id_candidates(raw_claim_id: str) -> List[str]:
-    """Generate possible variations of a claim ID for lookup."""
-    base = str(raw_claim_id or '').strip()
-    normalized = _normalize_claim_id(base)
-
-    variants = {
-        base,
-        normalized,
-        base.replace(' ', '-'),
-        base.replace(' ', ''),
-        normalized.replace(' ', ''),
-        base.upper(),
-        base.lower(),
-        normalized.upper(),
-        normalized.lower(),
-    }
-
-    return [candidate for candidate in variants if candidate]
-
-
-def _get_claim_document(db, claim_id: str):
-    """Fetch a claim document from direct_claims using multiple lookup strategies."""
-    candidates = _claim_id_candidates(claim_id)
-    for candidate in candidates:
-        doc = db.collection('direct_claims').document(candidate).get()
-        if doc.exists:
-            return doc
-
-    for candidate in candidates:
-        query = db.collection('direct_claims').where('claim_id', '==', candidate).limit(1)
-        results = query.get()
-        if results:
-            return results[0]
-
-    # Final fallback: raw ID as provided
-    doc = db.collection('direct_claims').document(str(claim_id)).get()
-    if doc.exists:
-        return doc
-
-    return None
-
-
 def _build_payer_details(db, claim_data: Dict[str, Any], user_hospital_id: Optional[str]) -> Dict[str, Any]:
     form_data = claim_data.get('form_data', {}) or {}
     payer_name = (form_data.get('payer_name') or '').strip()
@@ -216,89 +164,15 @@ def _build_payer_details(db, claim_data: Dict[str, Any], user_hospital_id: Optio
 
 def _build_document_list(db, claim_data: Dict[str, Any]) -> List[Dict[str, Any]]:
     """Build comprehensive document list (same logic as processor/claims routes)"""
-    # Get documents for this claim (same comprehensive logic as processor route)
-    documents = claim_data.get('documents', []) or []
-    if not documents:
-        documents = claim_data.get('document_uploads', []) or []
-    if not documents:
-        # Some legacy records keep uploads within form_data
-        form_documents = (claim_data.get('form_data') or {}).get('documents') or []
-        if isinstance(form_documents, list):
-            documents = form_documents
-    if not isinstance(documents, list):
-        documents = []
-    
-    # Get detailed document information from documents array
-    detailed_documents: List[Dict[str, Any]] = []
-    for doc in documents:
-        doc_id = None
-        if isinstance(doc, dict):
-            doc_id = doc.get('document_id') or doc.get('id') or doc.get('documentId')
-        elif isinstance(doc, str):
-            doc_id = doc
-
-        if doc_id:
-            doc_snapshot = db.collection('documents').document(doc_id).get()
-            if doc_snapshot.exists:
-                doc_data = doc_snapshot.to_dict() or {}
-                detailed_documents.append({
-                    'document_id': doc_data.get('document_id', doc_id),
-                    'document_type': doc_data.get('document_type'),
-                    'document_name': doc_data.get('document_name'),
-                    'original_filename': doc_data.get('original_filename', doc_data.get('filename')),
-                    'download_url': doc_data.get('download_url', doc_data.get('url')),
-                    'file_size': doc_data.get('file_size'),
-                    'file_type': doc_data.get('file_type'),
-                    'uploaded_at': _to_iso(doc_data.get('uploaded_at')),
-                    'status': doc_data.get('status'),
-                })
-    
-    # ALSO query documents collection directly by claim_id (same as processor route)
-    # This ensures we get all documents even if they weren't properly linked
-    claim_id = claim_data.get('claim_id', '')
-    if claim_id:
-        print(f"🔍 Review Request: Querying documents collection by claim_id: {claim_id}")
-        try:
-            documents_query = db.collection('documents').where('claim_id', '==', claim_id).get()
-            existing_doc_ids = {d.get('document_id') for d in detailed_documents if d.get('document_id')}
-            
-            for doc_doc in documents_query:
-                doc_data = doc_doc.to_dict() or {}
-                # Check if we already have this document
-                doc_id = doc_data.get('document_id')
-                if doc_id and doc_id not in existing_doc_ids:
-                    # Regenerate download URL if expired (signed URLs expire after 7 days)
-                    download_url = doc_data.get('download_url', '')
-                    if not download_url:
-                        try:
-                            from datetime import timedelta
-                            from firebase_config import get_storage
-                            storage_path = doc_data.get('storage_path', '')
-                            if storage_path:
-                                bucket = get_storage()
-                                blob = bucket.blob(storage_path)
-                                if blob.exists():
-                                    download_url = blob.generate_signed_url(expiration=timedelta(days=7))
-                        except Exception as e:
-                            print(f"⚠️ Could not regenerate download URL: {e}")
-                    
-                    detailed_documents.append({
-                        'document_id': doc_data.get('document_id'),
-                        'document_type': doc_data.get('document_type'),
-                        'document_name': doc_data.get('document_name'),
-                        'original_filename': doc_data.get('original_filename', doc_data.get('filename')),
-                        'download_url': download_url or doc_data.get('download_url', doc_data.get('url', '')),
-                        'file_size': doc_data.get('file_size'),
-                        'file_type': doc_data.get('file_type'),
-                        'uploaded_at': _to_iso(doc_data.get('uploaded_at')),
-                        'status': doc_data.get('status', 'uploaded')
-                    })
-                    existing_doc_ids.add(doc_id)
-            
-            print(f"🔍 Review Request: Found {len(detailed_documents)} total documents for claim {claim_id}")
-        except Exception as doc_query_error:
-            print(f"⚠️ Warning: Could not query documents collection: {doc_query_error}")
+    def report_query_error(doc_query_error):
+        print(f"⚠️ Warning: Could not query documents collection: {doc_query_error}")
 
+    detailed_documents = hydrate_claim_documents(
+        db, claim_data, format_timestamp=_to_iso, on_query_error=report_query_error,
+        signer=get_signed_url_service()
+    )
+    if claim_data.get('claim_id'):
+        print(f"🔍 Review Request: Found {len(detailed_documents)} total documents for claim {claim_data.get('claim_id')}")
     return detailed_documents
 
 
@@ -326,6 +200,196 @@ def _to_float(value: Any) -> Optional[float]:
             return None
 
 
+def _first_non_empty(*values):
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, str):
+            if value.strip():
+                return value
+            continue
+        return value
+    return None
+
+
+def _serialize_review_list_claim(doc, claim_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Serialize a claim for the review request inbox."""
+    review_history = claim_data.get('review_history', []) or []
+    sanitized_history = [_sanitize_review_entry(entry) for entry in review_history]
+    last_review_entry = sanitized_history[-1] if sanitized_history else {}
+    raw_review_data = claim_data.get('review_data', {}) or {}
+    review_data = raw_review_data.copy() if isinstance(raw_review_data, dict) else {}
+
+    raw_form_data = claim_data.get('form_data', {}) or {}
+    form_data = raw_form_data if isinstance(raw_form_data, dict) else {}
+
+    raw_payer_details = claim_data.get('payer_details', {}) or {}
+    payer_details = raw_payer_details if isinstance(raw_payer_details, dict) else {}
+
+    raw_claim_metadata = claim_data.get('claim_metadata', {}) or {}
+    claim_metadata = raw_claim_metadata if isinstance(raw_claim_metadata, dict) else {}
+
+    authorization_number = (
+        _first_non_empty(
+            form_data.get('authorization_number'),
+            form_data.get('ccn_number'),
+            payer_details.get('authorization_number'),
+            claim_data.get('authorization_number'),
+            claim_metadata.get('authorization_number'),
+        )
+        or ''
+    )
+    admission_date = (
+        _first_non_empty(
+            form_data.get('admission_date'),
+            form_data.get('date_of_admission'),
+            claim_metadata.get('admission_date'),
+        )
+        or ''
+    )
+    discharge_date = (
+        _first_non_empty(
+            form_data.get('discharge_date'),
+            form_data.get('date_of_discharge'),
+            claim_metadata.get('discharge_date'),
+        )
+        or ''
+    )
+
+    payer_type = _first_non_empty(
+        form_data.get('payer_type'),
+        payer_details.get('payer_type'),
+        claim_metadata.get('payer_type'),
+    ) or ''
+
+    payer_name = _first_non_empty(
+        form_data.get('payer_name'),
+        payer_details.get('payer_name'),
+        claim_metadata.get('payer_name'),
+    ) or ''
+
+    doctor_name = _first_non_empty(
+        form_data.get('doctor'),
+        form_data.get('doctor_name'),
+        form_data.get('treating_doctor'),
+        form_data.get('treating_doctor_name'),
+        claim_metadata.get('doctor_name'),
+    ) or ''
+
+    raw_patient_details = claim_data.get('patient_details') or {}
+    patient_details = raw_patient_details if isinstance(raw_patient_details, dict) else {}
+
+    patient_name = _first_non_empty(
+        form_data.get('patient_name'),
+        claim_metadata.get('patient_name'),
+        patient_details.get('patient_name'),
+    ) or ''
+
+    claim_type = _first_non_empty(
+        form_data.get('claim_type'),
+        claim_data.get('claim_type'),
+        claim_metadata.get('claim_type'),
+    ) or ''
+
+    billed_amount_value = _first_non_empty(
+        form_data.get('total_bill_amount'),
+        form_data.get('total_bill_amount_value'),
+        form_data.get('total_billed_amount'),
+        claim_metadata.get('total_bill_amount'),
+    )
+
+    patient_paid_amount_value = _first_non_empty(
+        form_data.get('patient_paid_amount'),
+        form_data.get('advance_paid_amount'),
+        form_data.get('patient_share_amount'),
+        claim_metadata.get('patient_paid_amount'),
+    )
+
+    discount_amount_value = _first_non_empty(
+        form_data.get('discount_amount'),
+        form_data.get('total_discount_amount'),
+        claim_metadata.get('discount_amount'),
+    )
+
+    claimed_amount_value = _first_non_empty(
+        form_data.get('claimed_amount'),
+        claim_data.get('claimed_amount'),
+        claim_metadata.get('claimed_amount'),
+    )
+
+    review_requested_amount_value = _first_non_empty(
+        review_data.get('review_request_amount'),
+        claim_metadata.get('review_request_amount'),
+    )
+
+    approved_amount_value = _first_non_empty(
+        review_data.get('approved_amount'),
+        claim_metadata.get('approved_amount'),
+    )
+
+    disallowed_amount_value = _first_non_empty(
+        review_data.get('disallowed_amount'),
+        claim_metadata.get('disallowed_amount'),
+    )
+
+    reviewer_name = _first_non_empty(
+        last_review_entry.get('reviewer_name'),
+        last_review_entry.get('reviewed_by'),
+        last_review_entry.get('reviewed_by_name'),
+        review_data.get('reviewer_name'),
+        review_data.get('reviewed_by'),
+    )
+    reviewer_email = _first_non_empty(
+        last_review_entry.get('reviewer_email'),
+        last_review_entry.get('reviewed_by_email'),
+        review_data.get('reviewer_email'),
+        review_data.get('reviewed_by_email'),
+    )
+    reviewed_at = _first_non_empty(
+        last_review_entry.get('reviewed_at'),
+        last_review_entry.get('reviewed_on'),
+        last_review_entry.get('completed_at'),
+        review_data.get('reviewed_at'),
+        review_data.get('completed_at'),
+    )
+
+    history_count = len(sanitized_history) if sanitized_history else (1 if review_data else 0)
+
+    return {
+        'claim_id': claim_data.get('claim_id') or doc.id,
+        'document_id': doc.id,
+        'claim_status': claim_data.get('claim_status', ''),
+        'created_at': _to_iso(claim_data.get('created_at')),
+        'submission_date': _to_iso(claim_data.get('submission_date')),
+        'hospital_name': claim_data.get('hospital_name', ''),
+        'hospital_id': claim_data.get('hospital_id', ''),
+        'patient_name': patient_name,
+        'payer_name': payer_name,
+        'payer_type': payer_type,
+        'doctor_name': doctor_name,
+        'provider_name': claim_data.get('hospital_name', ''),
+        'authorization_number': authorization_number,
+        'date_of_admission': admission_date,
+        'date_of_discharge': discharge_date,
+        'billed_amount': _to_float(
+            billed_amount_value
+        ),
+        'patient_paid_amount': _to_float(patient_paid_amount_value),
+        'discount_amount': _to_float(discount_amount_value),
+        'claimed_amount': _to_float(claimed_amount_value),
+        'approved_amount': _to_float(approved_amount_value),
+        'disallowed_amount': _to_float(disallowed_amount_value),
+        'review_requested_amount': _to_float(review_requested_amount_value),
+        'review_data': review_data,
+        'processor_decision': claim_data.get('processor_decision', {}),
+        'review_history_count': history_count,
+        'last_reviewed_at': reviewed_at,
+        'reviewed_by': reviewer_name,
+        'reviewed_by_email': reviewer_email,
+        'claim_type': claim_type,
+    }
+
+
 def _build_review_claim_payload(db, claim_doc, claim_data: Dict[str, Any]) -> Dict[str, Any]:
     payer_details = _build_payer_details(db, claim_data, claim_data.get('hospital_id'))
     detailed_documents = _build_document_list(db, claim_data)
@@ -365,7 +429,7 @@ def _build_review_claim_payload(db, claim_doc, claim_data: Dict[str, Any]) -> Di
 
 
 def _get_review_claim_full_response(db, claim_id: str):
-    claim_doc = _get_claim_document(db, claim_id)
+    claim_doc = get_claim_resolver().get(claim_id, db)
     if not claim_doc:
         return 404, {'success': False, 'error': 'Claim not found'}
 
@@ -408,7 +472,7 @@ def get_review_claims():
             end_dt = ist.localize(datetime.strptime(end_date_str, '%Y-%m-%d') + timedelta(days=1))
 
         # UNIVERSAL: Simple Firestore query by claim_status (same as processor pattern)
-        query = db.collection('direct_claims')
+        query = select_fields(db.collection('direct_claims'), 'review_inbox')
         
         if status_key == 'completed':
             # Query for reviewed/completed claims using 'in' operator
@@ -512,191 +576,7 @@ def get_review_claims():
             ):
                 continue
 
-            review_history = claim_data.get('review_history', []) or []
-            sanitized_history = [_sanitize_review_entry(entry) for entry in review_history]
-            last_review_entry = sanitized_history[-1] if sanitized_history else {}
-            raw_review_data = claim_data.get('review_data', {}) or {}
-            review_data = raw_review_data.copy() if isinstance(raw_review_data, dict) else {}
-
-            raw_form_data = claim_data.get('form_data', {}) or {}
-            form_data = raw_form_data if isinstance(raw_form_data, dict) else {}
-
-            raw_payer_details = claim_data.get('payer_details', {}) or {}
-            payer_details = raw_payer_details if isinstance(raw_payer_details, dict) else {}
-
-            raw_claim_metadata = claim_data.get('claim_metadata', {}) or {}
-            claim_metadata = raw_claim_metadata if isinstance(raw_claim_metadata, dict) else {}
-
-            def _first_non_empty(*values):
-                for value in values:
-                    if value is None:
-                        continue
-                    if isinstance(value, str):
-                        if value.strip():
-                            return value
-                        continue
-                    return value
-                return None
-
-            authorization_number = (
-                _first_non_empty(
-                    form_data.get('authorization_number'),
-                    form_data.get('ccn_number'),
-                    payer_details.get('authorization_number'),
-                    claim_data.get('authorization_number'),
-                    claim_metadata.get('authorization_number'),
-                )
-                or ''
-            )
-            admission_date = (
-                _first_non_empty(
-                    form_data.get('admission_date'),
-                    form_data.get('date_of_admission'),
-                    claim_metadata.get('admission_date'),
-                )
-                or ''
-            )
-            discharge_date = (
-                _first_non_empty(
-                    form_data.get('discharge_date'),
-                    form_data.get('date_of_discharge'),
-                    claim_metadata.get('discharge_date'),
-                )
-                or ''
-            )
-
-            payer_type = _first_non_empty(
-                form_data.get('payer_type'),
-                payer_details.get('payer_type'),
-                claim_metadata.get('payer_type'),
-            ) or ''
-
-            payer_name = _first_non_empty(
-                form_data.get('payer_name'),
-                payer_details.get('payer_name'),
-                claim_metadata.get('payer_name'),
-            ) or ''
-
-            doctor_name = _first_non_empty(
-                form_data.get('doctor'),
-                form_data.get('doctor_name'),
-                form_data.get('treating_doctor'),
-                form_data.get('treating_doctor_name'),
-                claim_metadata.get('doctor_name'),
-            ) or ''
-
-            raw_patient_details = claim_data.get('patient_details') or {}
-            patient_details = raw_patient_details if isinstance(raw_patient_details, dict) else {}
-
-            patient_name = _first_non_empty(
-                form_data.get('patient_name'),
-                claim_metadata.get('patient_name'),
-                patient_details.get('patient_name'),
-            ) or ''
-
-            claim_type = _first_non_empty(
-                form_data.get('claim_type'),
-                claim_data.get('claim_type'),
-                claim_metadata.get('claim_type'),
-            ) or ''
-
-            billed_amount_value = _first_non_empty(
-                form_data.get('total_bill_amount'),
-                form_data.get('total_bill_amount_value'),
-                form_data.get('total_billed_amount'),
-                claim_metadata.get('total_bill_amount'),
-            )
-
-            patient_paid_amount_value = _first_non_empty(
-                form_data.get('patient_paid_amount'),
-                form_data.get('advance_paid_amount'),
-                form_data.get('patient_share_amount'),
-                claim_metadata.get('patient_paid_amount'),
-            )
-
-            discount_amount_value = _first_non_empty(
-                form_data.get('discount_amount'),
-                form_data.get('total_discount_amount'),
-                claim_metadata.get('discount_amount'),
-            )
-
-            claimed_amount_value = _first_non_empty(
-                form_data.get('claimed_amount'),
-                claim_data.get('claimed_amount'),
-                claim_metadata.get('claimed_amount'),
-            )
-
-            review_requested_amount_value = _first_non_empty(
-                review_data.get('review_request_amount'),
-                claim_metadata.get('review_request_amount'),
-            )
-
-            approved_amount_value = _first_non_empty(
-                review_data.get('approved_amount'),
-                claim_metadata.get('approved_amount'),
-            )
-
-            disallowed_amount_value = _first_non_empty(
-                review_data.get('disallowed_amount'),
-                claim_metadata.get('disallowed_amount'),
-            )
-
-            reviewer_name = _first_non_empty(
-                last_review_entry.get('reviewer_name'),
-                last_review_entry.get('reviewed_by'),
-                last_review_entry.get('reviewed_by_name'),
-                review_data.get('reviewer_name'),
-                review_data.get('reviewed_by'),
-            )
-            reviewer_email = _first_non_empty(
-                last_review_entry.get('reviewer_email'),
-                last_review_entry.get('reviewed_by_email'),
-                review_data.get('reviewer_email'),
-                review_data.get('reviewed_by_email'),
-            )
-            reviewed_at = _first_non_empty(
-                last_review_entry.get('reviewed_at'),
-                last_review_entry.get('reviewed_on'),
-                last_review_entry.get('completed_at'),
-                review_data.get('reviewed_at'),
-                review_data.get('completed_at'),
-            )
-
-            history_count = len(sanitized_history) if sanitized_history else (1 if review_data else 0)
-
-            claims.append({
-                'claim_id': claim_data.get('claim_id') or doc.id,
-                'document_id': doc.id,
-                'claim_status': claim_data.get('claim_status', ''),
-                'created_at': _to_iso(claim_data.get('created_at')),
-                'submission_date': _to_iso(claim_data.get('submission_date')),
-                'hospital_name': claim_data.get('hospital_name', ''),
-                'hospital_id': claim_data.get('hospital_id', ''),
-                'patient_name': patient_name,
-                'payer_name': payer_name,
-                'payer_type': payer_type,
-                'doctor_name': doctor_name,
-                'provider_name': claim_data.get('hospital_name', ''),
-                'authorization_number': authorization_number,
-                'date_of_admission': admission_date,
-                'date_of_discharge': discharge_date,
-                'billed_amount': _to_float(
-                    billed_amount_value
-                ),
-                'patient_paid_amount': _to_float(patient_paid_amount_value),
-                'discount_amount': _to_float(discount_amount_value),
-                'claimed_amount': _to_float(claimed_amount_value),
-                'approved_amount': _to_float(approved_amount_value),
-                'disallowed_amount': _to_float(disallowed_amount_value),
-                'review_requested_amount': _to_float(review_requested_amount_value),
-                'review_data': review_data,
-                'processor_decision': claim_data.get('processor_decision', {}),
-                'review_history_count': history_count,
-                'last_reviewed_at': reviewed_at,
-                'reviewed_by': reviewer_name,
-                'reviewed_by_email': reviewer_email,
-                'claim_type': claim_type,
-            })
+            claims.append(_serialize_review_list_claim(doc, claim_data))
 
             if len(claims) >= limit:
                 break
@@ -737,7 +617,7 @@ def get_review_claim_details(claim_id: str):
         if request.method == 'OPTIONS':
             return '', 204
         db = get_firestore()
-        claim_doc = _get_claim_document(db, claim_id)
+        claim_doc = get_claim_resolver().get(claim_id, db)
 
         if not claim_doc:
             return jsonify({'success': False, 'error': 'Claim not found'}), 404
@@ -747,22 +627,14 @@ def get_review_claim_details(claim_id: str):
 
         # Confirm reviewer has access to this claim via assignments
         documents_summary = []
-        documents = claim_data.get('documents', []) or []
-        for doc_entry in documents:
-            try:
-                if isinstance(doc_entry, str):
-                    doc_id = doc_entry
-                else:
-                    doc_id = doc_entry.get('document_id') or doc_entry.get('id')
-
-                if not doc_id:
-                    continue
-
-                doc_snapshot = db.collection('documents').document(doc_id).get()
-                if not doc_snapshot.exists:
-                    continue
-
-                doc_data = doc_snapshot.to_dict() or {}
+        document_ids = []
+        for doc_entry in claim_data.get('documents', []) or []:
+            if isinstance(doc_entry, str):
+                document_ids.append(doc_entry)
+            elif isinstance(doc_entry, dict):
+                document_ids.append(doc_entry.get('document_id') or doc_entry.get('id'))
+        try:
+            for doc_id, doc_data in fetch_documents(db, document_ids):
                 documents_summary.append({
                     'document_id': doc_data.get('document_id', doc_id),
                     'document_type': doc_data.get('document_type', doc_data.get('type', 'Unknown')),
@@ -774,9 +646,8 @@ def get_review_claim_details(claim_id: str):
                     'uploaded_at': _to_iso(doc_data.get('uploaded_at')),
                     'status': doc_data.get('status'),
                 })
-            except Exception as doc_exc:  # pragma: no cover - continue gracefully
-                print(f"⚠️ Review Request WARN: Failed to load document {doc_entry}: {doc_exc}")
-                continue
+        except Exception as doc_exc:  # pragma: no cover - continue gracefully
+            print(f"⚠️ Review Request WARN: Failed to load documents: {doc_exc}")
 
         transactions = []
         try:
@@ -852,20 +723,9 @@ def review_claim(claim_id: str):
 
         db = get_firestore()
         
-        # CRITICAL FIX: Use same pattern as processor (which works!)
-        # First try to get the claim by document ID (most common case)
-        claim_doc = db.collection('direct_claims').document(claim_id).get()
-        
-        if not claim_doc.exists:
-            # If not found by document ID, search by claim_id field
-            claims_query = db.collection('direct_claims').where('claim_id', '==', claim_id)
-            claims_docs = claims_query.get()
-            
-            if not claims_docs:
-                return jsonify({'success': False, 'error': 'Claim not found'}), 404
-            
-            # Get the first matching claim
-            claim_doc = claims_docs[0]
+        claim_doc = get_claim_resolver().get(claim_id, db)
+        if not claim_doc:
+            return jsonify({'success': False, 'error': 'Claim not found'}), 404
 
         claim_data = claim_doc.to_dict() or {}
         previous_claim_status = claim_data.get('claim_status', 'dispatched')
@@ -1080,20 +940,9 @@ def escalate_claim(claim_id: str):
 
         db = get_firestore()
         
-        # CRITICAL FIX: Use same pattern as processor (which works!)
-        # First try to get the claim by document ID (most common case)
-        claim_doc = db.collection('direct_claims').document(claim_id).get()
-        
-        if not claim_doc.exists:
-            # If not found by document ID, search by claim_id field
-            claims_query = db.collection('direct_claims').where('claim_id', '==', claim_id)
-            claims_docs = claims_query.get()
-            
-            if not claims_docs:
-                return jsonify({'success': False, 'error': 'Claim not found'}), 404
-            
-            # Get the first matching claim
-            claim_doc = claims_docs[0]
+        claim_doc = get_claim_resolver().get(claim_id, db)
+        if not claim_doc:
+            return jsonify({'success': False, 'error': 'Claim not found'}), 404
 
         claim_data = claim_doc.to_dict() or {}
         previous_claim_status = claim_data.get('claim_status', 'dispatched')
@@ -1296,26 +1145,7 @@ def submit_review_claim():
                 hospital_name = hospital_id
 
         # Generate claim ID using the same pattern as normal claims
-        today = datetime.now().strftime('%Y%m%d')
-        prefix = f'CSHLSIP-{today}-'
-        
-        # Find next sequence number
-        try:
-            claims_today = db.collection('direct_claims').where('claim_id', '>=', prefix).where('claim_id', '<', f'CSHLSIP-{today}-9999').get()
-            sequence_numbers = []
-            for claim in claims_today:
-                claim_id_str = claim.to_dict().get('claim_id', '')
-                if claim_id_str.startswith(prefix):
-                    try:
-                        seq_num = int(claim_id_str.replace(prefix, ''))
-                        sequence_numbers.append(seq_num)
-                    except ValueError:
-                        continue
-            
-            next_seq = max(sequence_numbers) + 1 if sequence_numbers else 0
-            claim_id = f'{prefix}{next_seq}'
-        except Exception as e:
-            claim_id = f'{prefix}{int(datetime.now().timestamp())}'
+        claim_id = get_claim_id_allocator().allocate()
 
         # Calculate disallowed amount if not provided
         total_bill_amount = float(data.get('total_bill_amount', 0))
@@ -1416,6 +1246,7 @@ def submit_review_claim():
         
         # Save to Firestore
         db.collection('direct_claims').document(claim_id).set(claim_document)
+        get_claim_resolver().register(claim_id, claim_id, db)
         
         # Create transaction record
         create_transaction(
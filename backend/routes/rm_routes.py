@@ -10,6 +10,9 @@ from firebase_config import get_firestore
 from firebase_admin import firestore
 from middleware import require_rm_access
 from utils.transaction_helper import create_transaction, TransactionType
+from utils.claim_resolver import get_claim_resolver
+from utils.projections import select_fields
+from utils.signed_urls import get_signed_url_service
 import pytz
 
 rm_bp = Blueprint('rm_routes', __name__)
@@ -60,6 +63,28 @@ def _status_label(value: Optional[str]) -> str:
 def _status_is_settlement(value: Optional[str]) -> bool:
     return _canonicalize_status(value) in SETTLEMENT_STATUSES
 
+
+def _serialize_rm_claim(doc, claim_data):
+    """Serialize a claim for the RM inbox."""
+    form_data = claim_data.get('form_data', {})
+    return {
+        'claim_id': claim_data.get('claim_id', doc.id),
+        'claim_status': _canonicalize_status(claim_data.get('claim_status')),
+        'claim_status_label': _status_label(claim_data.get('claim_status')),
+        'created_at': str(claim_data.get('created_at', '')),
+        'submission_date': str(claim_data.get('submission_date', '')),
+        'patient_name': form_data.get('patient_name', ''),
+        'claimed_amount': form_data.get('claimed_amount', ''),
+        'payer_name': form_data.get('payer_name', ''),
+        'specialty': form_data.get('specialty', ''),
+        'hospital_name': claim_data.get('hospital_name', ''),
+        'hospital_id': claim_data.get('hospital_id', ''),
+        'created_by_email': claim_data.get('created_by_email', ''),
+        'rm_updated_at': str(claim_data.get('rm_updated_at', '')),
+        'rm_updated_by': claim_data.get('rm_updated_by_name', '')
+    }
+
+
 @rm_bp.route('/get-claims', methods=['GET'])
 @require_rm_access
 def get_rm_claims():
@@ -75,7 +100,7 @@ def get_rm_claims():
         end_date = request.args.get('end_date')
         
         # Build base query - RMs work with dispatched AND reviewed claims
-        query = db.collection('direct_claims')
+        query = select_fields(db.collection('direct_claims'), 'rm_inbox')
         
         # Get RM's assigned payers and hospitals
         assigned_payers = request.assigned_payers if hasattr(request, 'assigned_payers') else []
@@ -196,23 +221,7 @@ def get_rm_claims():
         # Build response
         claims_list = []
         for doc, claim_data in filtered_claims[:limit]:
-            form_data = claim_data.get('form_data', {})
-            claims_list.append({
-                'claim_id': claim_data.get('claim_id', doc.id),
-                'claim_status': _canonicalize_status(claim_data.get('claim_status')),
-                'claim_status_label': _status_label(claim_data.get('claim_status')),
-                'created_at': str(claim_data.get('created_at', '')),
-                'submission_date': str(claim_data.get('submission_date', '')),
-                'patient_name': form_data.get('patient_name', ''),
-                'claimed_amount': form_data.get('claimed_amount', ''),
-                'payer_name': form_data.get('payer_name', ''),
-                'specialty': form_data.get('specialty', ''),
-                'hospital_name': claim_data.get('hospital_name', ''),
-                'hospital_id': claim_data.get('hospital_id', ''),
-                'created_by_email': claim_data.get('created_by_email', ''),
-                'rm_updated_at': str(claim_data.get('rm_updated_at', '')),
-                'rm_updated_by': claim_data.get('rm_updated_by_name', '')
-            })
+            claims_list.append(_serialize_rm_claim(doc, claim_data))
         
         return jsonify({
             'success': True,
@@ -235,21 +244,12 @@ def get_rm_claim_details(claim_id):
     try:
         db = get_firestore()
         
-        # Get claim by document ID
-        claim_doc = db.collection('direct_claims').document(claim_id).get()
-        
-        if not claim_doc.exists:
-            # Search by claim_id field
-            claims_query = db.collection('direct_claims').where('claim_id', '==', claim_id)
-            claims_docs = claims_query.get()
-            
-            if not claims_docs:
-                return jsonify({
-                    'success': False,
-                    'error': 'Claim not found'
-                }), 404
-            
-            claim_doc = claims_docs[0]
+        claim_doc = get_claim_resolver().get(claim_id, db)
+        if not claim_doc:
+            return jsonify({
+                'success': False,
+                'error': 'Claim not found'
+            }), 404
         
         claim_data = claim_doc.to_dict()
         form_data = claim_data.get('form_data', {})
@@ -336,10 +336,7 @@ def get_rm_claim_details(claim_id):
                 download_url = doc_data.get('download_url', '')
                 if not download_url and doc_data.get('storage_path'):
                     try:
-                        from firebase_config import get_storage
-                        bucket = get_storage()
-                        blob = bucket.blob(doc_data.get('storage_path'))
-                        download_url = blob.generate_signed_url(expiration=timedelta(days=7))
+                        download_url = get_signed_url_service().sign(doc_data.get('storage_path'), timedelta(days=7))
                     except Exception as url_error:
                         print(f"⚠️ Warning: Could not generate download URL: {str(url_error)}")
                 
@@ -471,19 +468,12 @@ def update_rm_claim(claim_id):
         db = get_firestore()
         
         # Get claim
-        claim_doc = db.collection('direct_claims').document(claim_id).get()
-        
-        if not claim_doc.exists:
-            claims_query = db.collection('direct_claims').where('claim_id', '==', claim_id)
-            claims_docs = claims_query.get()
-            
-            if not claims_docs:
-                return jsonify({
-                    'success': False,
-                    'error': 'Claim not found'
-                }), 404
-            
-            claim_doc = claims_docs[0]
+        claim_doc = get_claim_resolver().get(claim_id, db)
+        if not claim_doc:
+            return jsonify({
+                'success': False,
+                'error': 'Claim not found'
+            }), 404
         
         claim_data = claim_doc.to_dict()
         previous_claim_status = _canonicalize_status(claim_data.get('claim_status'))
@@ -570,19 +560,12 @@ def reevaluate_rm_claim(claim_id):
         db = get_firestore()
         
         # Get claim
-        claim_doc = db.collection('direct_claims').document(claim_id).get()
-        
-        if not claim_doc.exists:
-            claims_query = db.collection('direct_claims').where('claim_id', '==', claim_id)
-            claims_docs = claims_query.get()
-            
-            if not claims_docs:
-                return jsonify({
-                    'success': False,
-                    'error': 'Claim not found'
-                }), 404
-            
-            claim_doc = claims_docs[0]
+        claim_doc = get_claim_resolver().get(claim_id, db)
+        if not claim_doc:
+            return jsonify({
+                'success': False,
+                'error': 'Claim not found'
+            }), 404
         
         claim_data = claim_doc.to_dict()
         previous_claim_status = _canonicalize_status(claim_data.get('claim_status'))
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Delete expired notifications and inbox entries.
+
+Runs one sweep and exits (for cron, with NOTIFICATION_SWEEPER_MODE=off), or
+keeps sweeping on the configured interval with --loop:
+
+    python sweep_notifications.py [--force] [--loop]
+"""
+import argparse
+import logging
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.notification_sweeper import get_notification_sweeper
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Sweep even if another process swept within the interval'
+    )
+    parser.add_argument(
+        '--loop',
+        action='store_true',
+        help='Keep running and sweep every interval (plus jitter)'
+    )
+    args = parser.parse_args()
+
+    sweeper = get_notification_sweeper()
+    summary = sweeper.run_once(force=args.force)
+    if summary is None:
+        logger.info("Skipped: another process swept within the last %ss", sweeper.interval_seconds)
+    else:
+        for key, value in summary.items():
+            logger.info("  %s: %s", key, value)
+
+    if args.loop:
+        sweeper.start()
+        try:
+            sweeper._thread.join()
+        except KeyboardInterrupt:
+            sweeper.stop()
+
+
+if __name__ == "__main__":
+    main()
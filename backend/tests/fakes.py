@@ -0,0 +1,132 @@
+"""
+In-memory Firestore stand-ins shared by the tests.
+
+``FakeDb`` keeps every collection as a dict of document ID to data in
+``collections``. References read the live data, transactions apply their
+writes immediately (enough for tests that serialize their transactions) and
+queries support the ``==``, ``in`` and range filters the code under test
+uses. ``round_trips`` counts reads sent to the database, ``queries`` the
+queries among them.
+"""
+import operator
+from unittest.mock import MagicMock
+
+_OPERATORS = {
+    '==': operator.eq,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'in': lambda value, values: value in values,
+}
+
+
+class FakeRef:
+    def __init__(self, db, collection, doc_id):
+        self.db = db
+        self.collection_name = collection
+        self.id = doc_id
+        self.path = f'{collection}/{doc_id}'
+
+    @property
+    def store(self):
+        return self.db.docs(self.collection_name)
+
+    def snapshot(self):
+        data = self.store.get(self.id)
+        return MagicMock(id=self.id, exists=data is not None, reference=self,
+                         **{'to_dict.return_value': dict(data) if data is not None else None})
+
+    def get(self, transaction=None):
+        self.db.round_trips += 1
+        return self.snapshot()
+
+    def set(self, data, merge=False):
+        if merge:
+            self.store.setdefault(self.id, {}).update(data)
+        else:
+            self.store[self.id] = dict(data)
+
+    def update(self, data):
+        self.store[self.id].update(data)
+
+    def delete(self):
+        self.store.pop(self.id, None)
+
+
+class FakeQuery:
+    def __init__(self, db, collection, filters=(), max_results=None):
+        self.db = db
+        self.collection_name = collection
+        self.filters = tuple(filters)
+        self.max_results = max_results
+
+    def where(self, field, op, value):
+        return FakeQuery(self.db, self.collection_name, self.filters + ((field, op, value),), self.max_results)
+
+    def select(self, field_paths):
+        return self
+
+    def limit(self, count):
+        return FakeQuery(self.db, self.collection_name, self.filters, count)
+
+    def get(self, transaction=None):
+        self.db.round_trips += 1
+        self.db.queries += 1
+        matches = [
+            FakeRef(self.db, self.collection_name, doc_id).snapshot()
+            for doc_id, data in self.db.docs(self.collection_name).items()
+            if all(field in data and _OPERATORS[op](data[field], value) for field, op, value in self.filters)
+        ]
+        return matches[:self.max_results] if self.max_results is not None else matches
+
+    def stream(self, transaction=None):
+        return iter(self.get())
+
+
+class FakeCollection(FakeQuery):
+    def document(self, doc_id):
+        return FakeRef(self.db, self.collection_name, doc_id)
+
+
+class FakeTransaction:
+    """Applies writes immediately; enough for single-threaded tests."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def get(self, ref_or_query):
+        return ref_or_query.get(transaction=self)
+
+    def get_all(self, refs):
+        return self.db.get_all(refs)
+
+    def set(self, ref, data, merge=False):
+        ref.set(data, merge=merge)
+
+    def update(self, ref, data):
+        ref.update(data)
+
+    def delete(self, ref):
+        ref.delete()
+
+
+class FakeDb:
+    def __init__(self, collections=None):
+        self.collections = {name: dict(docs) for name, docs in (collections or {}).items()}
+        self.round_trips = 0
+        self.queries = 0
+
+    def docs(self, collection):
+        """The documents of ``collection``, created empty on first use."""
+        return self.collections.setdefault(collection, {})
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def transaction(self):
+        return FakeTransaction(self)
+
+    def get_all(self, refs, field_paths=None, transaction=None):
+        self.round_trips += 1
+        return [ref.snapshot() for ref in refs]
@@ -0,0 +1,231 @@
+import os
+import sys
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from flask import Flask  # noqa: E402
+
+from utils.analytics_cache import AnalyticsResponseCache, MemoryResponseStore  # noqa: E402
+from utils.analytics_kernel import (  # noqa: E402
+    AnalyticsFrame,
+    hospital_overview,
+    processor_overview,
+    review_overview,
+    rm_overview,
+)
+from utils import analytics_rollups  # noqa: E402
+from utils.analytics_rollups import _accumulate, _as_increments, claim_facts, record_claim_changes  # noqa: E402
+
+
+def _claim(**overrides):
+    claim = {
+        'claim_status': 'qc_pending',
+        'hospital_id': 'H1',
+        'hospital_name': 'Nano Hospital',
+        'created_at': datetime(2025, 1, 10, 8, 30, tzinfo=timezone.utc),
+        'form_data': {
+            'claimed_amount': 1000,
+            'total_bill_amount': 1200,
+            'payer_name': 'CGHS',
+            'payer_type': 'Government',
+            'discharge_date': '2025-01-07',
+        },
+        'review_data': {},
+        'rm_data': {},
+    }
+    claim.update(overrides)
+    return claim
+
+
+def _cells(*claims):
+    docs = {}
+    for claim in claims:
+        _accumulate(docs, claim_facts(claim))
+    return [
+        (doc['day'], cell)
+        for doc in docs.values()
+        for cell in doc['cells'].values()
+        if cell['count'] > 0
+    ]
+
+
+class AnalyticsRollupsTestCase(unittest.TestCase):
+    def test_drafts_do_not_contribute(self):
+        self.assertIsNone(claim_facts(_claim(claim_status='draft')))
+
+    def test_reverting_a_contribution_leaves_no_update(self):
+        facts = claim_facts(_claim())
+        docs = {}
+        _accumulate(docs, facts, 1)
+        _accumulate(docs, facts, -1)
+        update = _as_increments(next(iter(docs.values())))
+        self.assertNotIn('cells', update)
+
+    def test_bulk_refresh_writes_each_rollup_document_once(self):
+        claims = {'C1': _claim(claim_status='qc_clear'), 'C2': _claim(claim_status='qc_clear'), 'C3': _claim()}
+        # C3 is unchanged since its last refresh
+        states = {'C3': {'contribution': claim_facts(claims['C3'])}}
+        db = MagicMock()
+        db.collection.side_effect = lambda name: MagicMock(document=lambda doc_id: MagicMock(
+            id=doc_id, path=f'{name}/{doc_id}', collection_name=name
+        ))
+        transaction = db.transaction.return_value
+
+        def get_all(refs):
+            for ref in refs:
+                data = (claims if ref.collection_name == 'direct_claims' else states).get(ref.id)
+                yield MagicMock(reference=ref, exists=data is not None, **{'to_dict.return_value': data})
+        transaction.get_all.side_effect = get_all
+
+        with patch.object(analytics_rollups, '_refresh_in_transaction', analytics_rollups._refresh_in_transaction.to_wrap), \
+                patch.object(analytics_rollups, 'bump_data_versions') as bump:
+            record_claim_changes(db, ['C1', 'C2', 'C3', 'C1'])
+
+        transaction.get_all.assert_called_once()
+        written = [call[0][0].path for call in transaction.set.call_args_list]
+        self.assertEqual(sorted(written), [
+            'analytics_rollup_state/C1', 'analytics_rollup_state/C2', 'analytics_rollups/H1__2025-01-10'
+        ])
+        bump.assert_called_once_with(db, ['H1'])
+
+
+
+class AnalyticsKernelTestCase(unittest.TestCase):
+    def test_hospital_overview_matches_per_claim_rules(self):
+        settled = _claim(
+            claim_status='settled',
+            review_data={'approved_amount': 800, 'disallowance_reason': 'Room rent'},
+            rm_data={'settled_amount': 750},
+        )
+        stats = hospital_overview(AnalyticsFrame.from_claims([_claim(), _claim(), settled]))
+
+        self.assertEqual(stats['total_claims'], 3)
+        self.assertEqual(stats['settled_claims'], 1)
+        self.assertEqual(stats['settled_amount'], 750)
+        self.assertEqual(stats['outstanding_claims'], 2)
+        self.assertEqual(stats['outstanding_amount'], 2000)
+        self.assertEqual(stats['approved_amount'], 800)
+        self.assertEqual(stats['status_distribution'], {'qc_pending': 2, 'settled': 1})
+        self.assertEqual(stats['claims_over_time'], {'2025-01-10': 3})
+        self.assertEqual(stats['payer_performance']['CGHS'], {'count': 3, 'amount': 3000, 'approved': 1})
+        self.assertEqual(stats['disallowance_reasons'], {'Room rent': 1})
+        self.assertEqual(stats['tat_metrics']['discharge_to_qc_pending'], [3, 3, 3])
+        self.assertEqual(stats['tat_summary']['discharge_to_qc_pending']['p50'], 3)
+
+    def test_rm_overview_uses_settled_amount_only(self):
+        frame = AnalyticsFrame.from_claims([
+            _claim(claim_status='dispatched', rm_data={'settled_amount_without_tds': 500}),
+            _claim(claim_status='dispatched', rm_data={'settled_amount': 900, 'tds_amount': 90,
+                                                       'payment_mode': 'NEFT'}),
+        ])
+        stats = rm_overview(frame.filter(claim_statuses=['dispatched']))
+
+        self.assertEqual(stats['settled_claims'], 1)
+        self.assertEqual(stats['financials']['tds'], 90)
+        self.assertEqual(stats['payment_modes'], {'NEFT': 1})
+        self.assertEqual(stats['active_claims'], 1)
+
+    def test_filters_apply_to_dimensions(self):
+        frame = AnalyticsFrame.from_claims([
+            _claim(), _claim(form_data={'payer_name': 'Star Health', 'payer_type': 'TPA'})
+        ])
+        self.assertEqual(len(frame.filter(payer_name='star')), 1)
+        self.assertEqual(len(frame.filter(payer_type='government')), 1)
+        self.assertEqual(len(frame.filter(assigned_payer_names=['CGHS'])), 1)
+
+    def test_offset_timestamps_keep_their_wall_clock_date(self):
+        # 02:00 IST on the 10th is still the 9th in UTC
+        claim = _claim(created_at='2025-01-10T02:00:00+05:30')
+        self.assertEqual(analytics_rollups.day_key(claim['created_at']), '2025-01-10')
+
+        for frame in (AnalyticsFrame.from_claims([claim]), AnalyticsFrame.from_cells(_cells(claim))):
+            stats = hospital_overview(frame)
+            self.assertEqual(stats['claims_over_time'], {'2025-01-10': 1})
+            self.assertEqual(stats['tat_metrics']['discharge_to_qc_pending'], [3])
+
+    def test_rollup_cells_and_claim_scan_agree(self):
+        claims = [
+            _claim(),
+            _claim(claim_status='qc_clear', processed_at=datetime(2025, 1, 12, tzinfo=timezone.utc)),
+            _claim(claim_status='dispatched', review_status='reviewed',
+                   review_data={'approved_amount': 600, 'disallowed_amount': 400},
+                   dispatched_at='2025-01-15T10:00:00'),
+            _claim(claim_status='settled', rm_status='settled',
+                   rm_data={'settled_amount': 550, 'net_payable': 500, 'payment_mode': 'NEFT',
+                            'disallowance_entries': [{'reason': 'Consumables', 'amount': 50}]}),
+            _claim(created_at=None, submission_date='2025-01-11'),
+        ]
+        scanned = AnalyticsFrame.from_claims(claims)
+        rolled_up = AnalyticsFrame.from_cells(_cells(*claims))
+
+        for build in (hospital_overview, processor_overview, review_overview, rm_overview):
+            expected = build(scanned)
+            actual = build(rolled_up)
+            for metrics in (expected, actual):
+                for samples in metrics['tat_metrics'].values():
+                    samples.sort()
+            self.assertEqual(actual, expected, build.__name__)
+
+
+class _Versions:
+    def __init__(self):
+        self.versions = {}
+
+    def read(self, db, hospital_ids):
+        return [self.versions.get(hid, 0) for hid in hospital_ids]
+
+    def read_all(self, db):
+        return dict(self.versions)
+
+    def bump(self, db, hospital_ids):
+        for hid in hospital_ids:
+            self.versions[hid] = self.versions.get(hid, 0) + 1
+
+
+class AnalyticsResponseCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.cache = AnalyticsResponseCache(MemoryResponseStore(), _Versions())
+
+    def _entry(self, hospitals=('H1',), **filters):
+        return self.cache.entry(None, 'hospital', list(hospitals), filters=filters)
+
+    def test_hit_after_store_and_not_modified_on_etag(self):
+        with self.app.test_request_context('/'):
+            entry = self._entry()
+            self.assertIsNone(entry.cached_response())
+            response = entry.store({'success': True, 'data': {'total_claims': 1}})
+            etag = response.get_etag()[0]
+
+            cached = self._entry().cached_response()
+            self.assertEqual(cached.status_code, 200)
+            self.assertEqual(cached.get_json(), {'success': True, 'data': {'total_claims': 1}})
+            self.assertIsNone(self._entry(payer_name='cghs').cached_response())
+
+        with self.app.test_request_context('/', headers={'If-None-Match': f'"{etag}"'}):
+            self.assertEqual(self._entry().cached_response().status_code, 304)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_bump_invalidates_only_affected_hospitals(self):
+        with self.app.test_request_context('/'):
+            self._entry().store({'data': 'h1'})
+            self._entry(hospitals=('H2',)).store({'data': 'h2'})
+            self.cache.entry(None, 'hospital', None).store({'data': 'all'})
+
+            self.cache.bump(None, ['H1'])
+
+            self.assertIsNone(self._entry().cached_response())
+            self.assertIsNone(self.cache.entry(None, 'hospital', None).cached_response())
+            self.assertIsNotNone(self._entry(hospitals=('H2',)).cached_response())
+            self.assertEqual(self.cache.versions.versions, {'H1': 1})
+
+            self.cache.entry(None, 'hospital', None).store({'data': 'all'})
+            self.cache.bump(None, ['H3'])
+            self.assertIsNone(self.cache.entry(None, 'hospital', None).cached_response())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import os
+import sys
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils.bulk_processing import BulkClaimProcessor, resolve_claims  # noqa: E402
+
+ACTOR = {'id': 'p1', 'email': 'p1@example.com', 'name': 'P One'}
+
+
+def _snapshot(doc_id, data=None, exists=True):
+    return MagicMock(id=doc_id, exists=exists, **{'to_dict.return_value': data or {}})
+
+
+class ResolveClaimsTestCase(unittest.TestCase):
+    def test_document_ids_then_claim_id_field(self):
+        db = MagicMock()
+        db.get_all.return_value = [_snapshot('D1'), _snapshot('CSHLSIP-1', exists=False)]
+        by_field = _snapshot('D2', {'claim_id': 'CSHLSIP-1'})
+        db.collection.return_value.where.return_value.stream.return_value = [by_field]
+
+        resolved = resolve_claims(db, ['D1', 'CSHLSIP-1', 'missing'])
+
+        self.assertEqual(set(resolved), {'D1', 'CSHLSIP-1'})
+        self.assertIs(resolved['CSHLSIP-1'], by_field)
+        db.get_all.assert_called_once()
+        db.collection.return_value.where.assert_called_once_with('claim_id', 'in', ['CSHLSIP-1', 'missing'])
+
+
+class BulkClaimProcessorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.db = MagicMock()
+        self.client = MagicMock()
+        self.processor = BulkClaimProcessor(lambda: self.db, workers=4, notification_client_factory=lambda: self.client)
+        patcher = patch('utils.bulk_processing.record_claim_changes')
+        self.record_claim_changes = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _claims(self, count, hospital_id='H1'):
+        snapshots = [
+            _snapshot(f'C{i}', {'hospital_id': hospital_id, 'claim_status': 'qc_pending'})
+            for i in range(count)
+        ]
+        self.db.get_all.return_value = snapshots
+        return [snapshot.id for snapshot in snapshots]
+
+    def test_writes_are_batched_and_results_reported_per_claim(self):
+        claim_ids = self._claims(300)
+        status_options = MagicMock(return_value={'claim_approved_option': True})
+        # Notifications run on several threads; MagicMock call counts are not thread-safe
+        notified = []
+        notified_lock = threading.Lock()
+
+        def notify_approved(**kwargs):
+            with notified_lock:
+                notified.append(kwargs['claim_id'])
+            return True
+        self.client.notify_approved.side_effect = notify_approved
+
+        results = self.processor.process(
+            claim_ids + ['C0'], 'claim_approved', 'ok', ACTOR, status_options,
+            optional_flags={'claim_approved': 'claim_approved_option'}
+        )
+
+        self.assertEqual(len(results), 300)
+        self.assertTrue(all(result['success'] for result in results))
+        # 600 writes: one batch of 500 and one of 100
+        self.assertEqual(self.db.batch.return_value.commit.call_count, 2)
+        self.assertEqual(self.db.batch.return_value.update.call_count, 300)
+        self.assertEqual(self.db.batch.return_value.set.call_count, 300)
+        transaction = self.db.batch.return_value.set.call_args_list[0][0][1]
+        self.assertEqual((transaction['transaction_type'], transaction['previous_status']), ('APPROVED', 'qc_pending'))
+        # Hospital options are read once per hospital
+        status_options.assert_called_once_with(self.db, 'H1')
+        self.assertEqual(len(notified), 300)
+        # Rollups are refreshed once for the whole request
+        self.record_claim_changes.assert_called_once_with(self.db, claim_ids)
+
+    def test_disabled_status_and_missing_claims_fail_individually(self):
+        self._claims(2, hospital_id='H2')
+
+        results = self.processor.process(
+            ['C0', 'C1', 'nope'], 'need_more_info', '', ACTOR,
+            lambda db, hospital_id: {'need_more_info_option': False},
+            optional_flags={'need_more_info': 'need_more_info_option'}
+        )
+
+        self.assertEqual([result['success'] for result in results], [False, False, False])
+        self.assertIn('disabled for hospital H2', results[0]['error'])
+        self.assertEqual(results[2]['error'], 'Claim nope not found')
+        self.db.batch.return_value.commit.assert_not_called()
+
+    def test_failed_batch_and_failed_notification(self):
+        claim_ids = self._claims(2)
+        self.client.notify_qc_clear.side_effect = Exception('service down')
+
+        results = self.processor.process(claim_ids, 'qc_clear', '', ACTOR, MagicMock())
+        self.assertEqual([(r['success'], r['notified']) for r in results], [(True, False), (True, False)])
+
+        self.db.batch.return_value.commit.side_effect = Exception('aborted')
+        results = self.processor.process(claim_ids, 'qc_clear', '', ACTOR, MagicMock())
+        self.assertFalse(any(result['success'] for result in results))
+        self.assertIn('aborted', results[0]['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import sys
+import threading
+import unittest
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils import claim_ids  # noqa: E402
+from utils.claim_ids import CLAIMS_COLLECTION, SEQUENCES_COLLECTION, ClaimIdAllocator  # noqa: E402
+from tests.fakes import FakeDb  # noqa: E402
+
+
+_unwrapped_reserve = claim_ids._reserve.to_wrap
+_reserve_lock = threading.Lock()
+
+
+def _reserve(transaction, db, counter_ref, prefix, count):
+    # Serialize transactions, as Firestore's retries effectively do
+    with _reserve_lock:
+        return _unwrapped_reserve(transaction, db, counter_ref, prefix, count)
+
+
+def _db(legacy_ids=()):
+    return FakeDb({CLAIMS_COLLECTION: {claim_id: {'claim_id': claim_id} for claim_id in legacy_ids}})
+
+
+def _counter(db, prefix):
+    return db.collections[SEQUENCES_COLLECTION][prefix]
+
+
+class ClaimIdAllocatorTestCase(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(claim_ids, '_reserve', _reserve)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_ids_count_up_per_day(self):
+        self.db = _db()
+        allocator = ClaimIdAllocator(lambda: self.db, block_size=1)
+
+        self.assertEqual(allocator.allocate('20260101'), 'CSHLSIP-20260101-0')
+        self.assertEqual(allocator.allocate('20260101'), 'CSHLSIP-20260101-1')
+        self.assertEqual(allocator.allocate('20260102'), 'CSHLSIP-20260102-0')
+        self.assertEqual(_counter(self.db, 'CSHLSIP-20260101')['next'], 2)
+
+    def test_new_counter_is_seeded_past_existing_claims_once(self):
+        self.db = _db(legacy_ids=['CSHLSIP-20260101-0', 'CSHLSIP-20260101-11', 'CSHLSIP-20260101-1767225600', 'CSHLSIP-20260101-x'])
+        allocator = ClaimIdAllocator(lambda: self.db)
+
+        self.assertEqual(allocator.allocate('20260101'), 'CSHLSIP-20260101-12')
+        self.assertEqual(allocator.allocate('20260101'), 'CSHLSIP-20260101-13')
+        self.assertEqual(self.db.queries, 1)
+
+    def test_blocks_are_leased_per_worker(self):
+        self.db = _db()
+        first = ClaimIdAllocator(lambda: self.db, block_size=10)
+        second = ClaimIdAllocator(lambda: self.db, block_size=10)
+
+        self.assertEqual(first.allocate('20260101'), 'CSHLSIP-20260101-0')
+        self.assertEqual(second.allocate('20260101'), 'CSHLSIP-20260101-10')
+        self.assertEqual(first.allocate('20260101'), 'CSHLSIP-20260101-1')
+        self.assertEqual(_counter(self.db, 'CSHLSIP-20260101')['next'], 20)
+
+    def test_concurrent_allocations_never_collide(self):
+        self.db = _db()
+        allocators = [ClaimIdAllocator(lambda: self.db, block_size=size) for size in (1, 1, 3, 5)]
+        issued = []
+        issued_lock = threading.Lock()
+
+        def submit(allocator):
+            for _ in range(50):
+                claim_id = allocator.allocate('20260101')
+                with issued_lock:
+                    issued.append(claim_id)
+
+        threads = [threading.Thread(target=submit, args=(allocator,)) for allocator in allocators for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(issued), 400)
+        self.assertEqual(len(set(issued)), 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
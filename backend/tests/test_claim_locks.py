@@ -0,0 +1,101 @@
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils import lock_utils  # noqa: E402
+from utils.lock_utils import IST, ClaimLockService, LockError, lock_is_active  # noqa: E402
+from tests.fakes import FakeDb  # noqa: E402
+
+
+class ClaimLockServiceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeDb({'direct_claims': {claim_id: {'claim_id': claim_id} for claim_id in ('C1', 'C2', 'C3', 'C4')}})
+        self.service = ClaimLockService(lambda: self.db, max_locks=3, ttl_seconds=3600)
+        for name in ('_acquire', '_release'):
+            patcher = patch.object(lock_utils, name, getattr(lock_utils, name).to_wrap)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _claim(self, claim_id):
+        return self.db.collections['direct_claims'][claim_id]
+
+    def _ledger(self, processor_id):
+        return self.db.collections['processor_lock_ledgers'][processor_id]['claims']
+
+    def test_lock_limit_is_checked_from_the_ledger(self):
+        for claim_id in ('C1', 'C2', 'C3'):
+            self.service.acquire(claim_id, 'p1', 'p1@example.com', 'P One')
+
+        with self.assertRaises(LockError) as caught:
+            self.service.acquire('C4', 'p1')
+        self.assertEqual(caught.exception.status_code, 400)
+        self.assertEqual(caught.exception.details['current_locked_count'], 3)
+        # Renewing a held lock does not count against the limit
+        self.service.acquire('C1', 'p1')
+        self.assertEqual(sorted(self._ledger('p1')), ['C1', 'C2', 'C3'])
+        # Only the first acquire had no ledger to read
+        self.assertEqual(self.db.queries, 1)
+
+    def test_claim_held_by_another_processor_is_refused_until_expired(self):
+        self.service.acquire('C1', 'p1', 'p1@example.com')
+
+        with self.assertRaises(LockError) as caught:
+            self.service.acquire('C1', 'p2')
+        self.assertEqual(caught.exception.status_code, 409)
+        self.assertEqual(caught.exception.details['locked_by'], 'p1@example.com')
+
+        self._claim('C1')['lock_expires_at'] = (datetime.now(IST) - timedelta(minutes=1)).isoformat()
+        self.service.acquire('C1', 'p2')
+        self.assertEqual(self._claim('C1')['locked_by_processor'], 'p2')
+
+    def test_expired_ledger_entries_stop_counting(self):
+        for claim_id in ('C1', 'C2', 'C3'):
+            self.service.acquire(claim_id, 'p1')
+        self._ledger('p1')['C1'] = (datetime.now(IST) - timedelta(seconds=1)).isoformat()
+
+        self.service.acquire('C4', 'p1')
+
+        self.assertEqual(sorted(self._ledger('p1')), ['C2', 'C3', 'C4'])
+
+    def test_release_writes_updates_and_clears_the_lock(self):
+        self.service.acquire('C1', 'p1')
+
+        self.assertTrue(self.service.release('C1', 'p1', updates={'claim_status': 'qc_clear'}))
+
+        claim = self._claim('C1')
+        self.assertEqual(claim['claim_status'], 'qc_clear')
+        self.assertIsNone(claim['locked_by_processor'])
+        self.assertEqual(self._ledger('p1'), {})
+
+    def test_unlock_requires_the_owner(self):
+        self.service.acquire('C1', 'p1')
+
+        with self.assertRaises(LockError) as caught:
+            self.service.release('C1', 'p2', require_owner=True)
+        self.assertEqual(caught.exception.status_code, 403)
+        with self.assertRaises(LockError) as caught:
+            self.service.release('C2', 'p1', require_owner=True)
+        self.assertEqual(caught.exception.status_code, 400)
+        self.assertEqual(self._claim('C1')['locked_by_processor'], 'p1')
+
+    def test_missing_claim(self):
+        with self.assertRaises(LockError) as caught:
+            self.service.acquire('missing', 'p1')
+        self.assertEqual(caught.exception.status_code, 404)
+
+    def test_lock_is_active(self):
+        future = (datetime.now(IST) + timedelta(minutes=5)).isoformat()
+        past = (datetime.now(IST) - timedelta(minutes=5)).isoformat()
+        self.assertTrue(lock_is_active({'locked_by_processor': 'p1', 'lock_expires_at': future}, processor_id='p2'))
+        self.assertFalse(lock_is_active({'locked_by_processor': 'p1', 'lock_expires_at': future}, processor_id='p1'))
+        self.assertFalse(lock_is_active({'locked_by_processor': 'p1', 'lock_expires_at': past}, processor_id='p2'))
+        # Locks without an expiry never expire
+        self.assertTrue(lock_is_active({'locked_by_processor': 'p1'}, processor_id='p2'))
+
+
+if __name__ == '__main__':
+    unittest.main()
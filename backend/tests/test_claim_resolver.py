@@ -0,0 +1,78 @@
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils.claim_resolver import ClaimResolver, alias_key, backfill_aliases, claim_id_candidates  # noqa: E402
+from tests.fakes import FakeDb, FakeRef  # noqa: E402
+
+
+class ClaimResolverTestCase(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeDb({'direct_claims': {
+            'CSHLSIP-20260101-5': {'claim_id': 'CSHLSIP-20260101-5'},
+            'generated123': {'claim_id': 'CSHLSIP-20260101-6'},
+        }})
+        self.resolver = ClaimResolver(lambda: self.db)
+
+    def test_claim_stored_under_its_claim_id_resolves_in_one_round_trip(self):
+        snapshot = self.resolver.get('cshlsip 20260101 5')
+
+        self.assertEqual(snapshot.id, 'CSHLSIP-20260101-5')
+        self.assertEqual(self.db.round_trips, 1)
+        # Cached: one read of the claim itself
+        self.assertEqual(self.resolver.get('CSHLSIP-20260101-5').id, 'CSHLSIP-20260101-5')
+        self.assertEqual(self.db.round_trips, 2)
+
+    def test_query_fallback_stores_an_alias(self):
+        self.assertEqual(self.resolver.get('CSHLSIP-20260101-6').id, 'generated123')
+        self.assertEqual(self.db.round_trips, 2)
+        self.assertEqual(self.db.collections['claim_id_aliases']['CSHLSIP-20260101-6']['doc_id'], 'generated123')
+
+        # Another process finds it through the alias without the query
+        other = ClaimResolver(lambda: self.db)
+        self.db.round_trips = 0
+        self.assertEqual(other.get('CSHLSIP 20260101 6').id, 'generated123')
+        self.assertEqual(self.db.round_trips, 2)
+
+    def test_unknown_references_are_cached_briefly(self):
+        self.assertIsNone(self.resolver.get('CSHLSIP-19990101-1'))
+        self.assertEqual(self.db.round_trips, 2)
+        self.assertIsNone(self.resolver.get('cshlsip-19990101-1'))
+        self.assertEqual(self.db.round_trips, 2)
+        self.assertEqual(self.resolver.stats()['negative_hits'], 1)
+
+        # Registering the claim replaces the negative entry
+        self.db.collections['direct_claims']['CSHLSIP-19990101-1'] = {'claim_id': 'CSHLSIP-19990101-1'}
+        self.resolver.register('CSHLSIP-19990101-1', 'CSHLSIP-19990101-1', self.db)
+        self.assertEqual(self.resolver.get('CSHLSIP-19990101-1').id, 'CSHLSIP-19990101-1')
+        self.assertFalse(self.db.collections.get('claim_id_aliases'))
+
+    def test_deleted_claim_is_not_served_from_cache(self):
+        self.resolver.get('CSHLSIP-20260101-5')
+        del self.db.collections['direct_claims']['CSHLSIP-20260101-5']
+
+        self.assertIsNone(self.resolver.get('CSHLSIP-20260101-5'))
+
+    def test_unusable_references(self):
+        self.assertEqual(alias_key('a/b'), '')
+        self.assertIsNone(self.resolver.get(''))
+        self.assertIsNone(self.resolver.get('../x'))
+        self.assertEqual(self.db.round_trips, 0)
+        self.assertEqual(claim_id_candidates(' CLS 12 ')[:2], ['CLS 12', 'CLS-12'])
+
+    def test_backfill_writes_aliases_for_generated_ids_only(self):
+        db = MagicMock()
+        db.collection.return_value.select.return_value.stream.return_value = [
+            FakeRef(self.db, 'direct_claims', doc_id).snapshot() for doc_id in self.db.collections['direct_claims']
+        ]
+
+        self.assertEqual(backfill_aliases(db), {'scanned': 2, 'aliases': 1})
+        db.collection.return_value.document.assert_called_once_with('CSHLSIP-20260101-6')
+        db.batch.return_value.commit.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,183 @@
+import csv
+import gzip
+import io
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils import claims_export  # noqa: E402
+from utils.claims_export import (  # noqa: E402
+    EXPORT_COLUMNS,
+    ExportProgress,
+    iter_csv,
+    iter_hospital_claims,
+    iter_query_pages,
+)
+from utils.export_jobs import (  # noqa: E402
+    LocalArtifactStore,
+    export_job_id,
+    normalize_export_filters,
+    write_export_parts,
+)
+
+
+class _Snapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class _Query:
+    """Ordered, cursor-paged query over in-memory snapshots."""
+
+    def __init__(self, snapshots, page_size=None, after=None):
+        self.snapshots = snapshots
+        self.page_size = page_size
+        self.after = after
+        self.streams = 0
+
+    def order_by(self, field, direction=None):
+        return self
+
+    def limit(self, page_size):
+        query = _Query(self.snapshots, page_size)
+        query.parent = self
+        return query
+
+    def start_after(self, snapshot):
+        query = _Query(self.snapshots, self.page_size, snapshot)
+        query.parent = self.parent
+        return query
+
+    def stream(self):
+        self.parent.streams += 1
+        start = self.snapshots.index(self.after) + 1 if self.after is not None else 0
+        return iter(self.snapshots[start:start + self.page_size])
+
+
+def _claim(index, hospital_id='H1', **overrides):
+    claim = {
+        'claim_id': f'CSHLSIP-2025-{index:04d}',
+        'claim_status': 'qc_pending',
+        'hospital_id': hospital_id,
+        'hospital_name': 'Nano Hospital',
+        'created_at': datetime(2025, 1, 1) - timedelta(minutes=index),
+        'form_data': {'patient_name': f'Patient {index}', 'claimed_amount': 100 + index},
+    }
+    claim.update(overrides)
+    return _Snapshot(f'doc{index:04d}', claim)
+
+
+class ClaimsExportTestCase(unittest.TestCase):
+    def test_pages_cover_every_document_once(self):
+        snapshots = [_claim(i) for i in range(7)]
+        query = _Query(snapshots)
+        progress = ExportProgress('test')
+
+        streamed = list(iter_query_pages(query, 'created_at', page_size=3, progress=progress))
+
+        self.assertEqual([s.id for s in streamed], [s.id for s in snapshots])
+        self.assertEqual(query.streams, 3)
+        self.assertEqual(progress.pages, 3)
+
+    def test_filters_hospital_drafts_and_limit(self):
+        snapshots = [
+            _claim(0),
+            _claim(1, hospital_id='H2', hospital_name='Other'),
+            _claim(2, hospital_id='', hospital_name='NANO HOSPITAL'),
+            _claim(3, claim_status='draft'),
+            _claim(4, claim_id='MISC-1'),
+            _claim(5),
+        ]
+        entries = list(iter_hospital_claims(snapshots, 'H1', 'Nano Hospital'))
+        self.assertEqual(
+            [e['claim_id'] for e in entries],
+            ['CSHLSIP-2025-0000', 'CSHLSIP-2025-0002', 'CSHLSIP-2025-0005']
+        )
+        limited = list(iter_hospital_claims(iter(snapshots), 'H1', 'Nano Hospital', limit=2))
+        self.assertEqual(len(limited), 2)
+
+    def test_csv_chunks_and_gzip_round_trip(self):
+        entries = list(iter_hospital_claims([_claim(i) for i in range(50)], 'H1', ''))
+        original_chunk_size = claims_export.CHUNK_SIZE
+        claims_export.CHUNK_SIZE = 512
+        try:
+            progress = ExportProgress('test')
+            plain_chunks = list(iter_csv(iter(entries), progress))
+            gzip_body = b''.join(iter_csv(iter(entries), gzip=True))
+        finally:
+            claims_export.CHUNK_SIZE = original_chunk_size
+
+        self.assertGreater(len(plain_chunks), 1)
+        self.assertEqual(progress.rows, 50)
+        self.assertEqual(progress.bytes, sum(len(chunk) for chunk in plain_chunks))
+
+        plain_body = b''.join(plain_chunks)
+        self.assertEqual(gzip.decompress(gzip_body), plain_body)
+        rows = list(csv.reader(io.StringIO(plain_body.decode('utf-8'))))
+        self.assertEqual(rows[0], [header for header, _ in EXPORT_COLUMNS])
+        self.assertEqual(rows[1][0], 'CSHLSIP-2025-0000')
+        self.assertEqual(len(rows), 51)
+
+
+class ExportJobsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = LocalArtifactStore(self.tmp.name)
+        self.snapshots = [_claim(i) for i in range(9)]
+        self.pages = [self.snapshots[i:i + 3] for i in range(0, 9, 3)]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _job(self, **state):
+        job = {'job_id': 'job1', 'hospital_id': 'H1', 'hospital_name': '', 'filters': {'limit': None}}
+        job.update(state)
+        return job
+
+    def _read(self):
+        return b''.join(self.store.iter_bytes('job1')).decode('utf-8')
+
+    def test_filters_hash_to_the_same_job(self):
+        first = normalize_export_filters(status='', limit='all', start_date='2025-01-01')
+        second = normalize_export_filters(status='all', limit=None, start_date='2025-01-01', end_date='')
+        self.assertEqual(export_job_id('H1', 'Nano', first), export_job_id('H1', 'NANO', second))
+        self.assertNotEqual(export_job_id('H1', 'Nano', first), export_job_id('H2', 'Nano', first))
+        with self.assertRaises(ValueError):
+            normalize_export_filters(start_date='01/01/2025')
+
+    def test_resume_from_checkpoint_matches_uninterrupted_run(self):
+        state = write_export_parts(self._job(), iter(self.pages), self.store, lambda _: None)
+        self.store.finalize('job1', state['part_count'])
+        uninterrupted = self._read()
+        self.assertEqual(state['rows_written'], 9)
+        self.assertEqual(state['cursor'], {'value': self.snapshots[-1].to_dict()['created_at'], 'id': 'doc0008'})
+
+        # Worker dies after checkpointing the first page and writing a part it never checkpointed
+        checkpoints = []
+        write_export_parts(self._job(), iter(self.pages[:1]), self.store, checkpoints.append)
+        resume_state = checkpoints[-1]
+        self.store.write_part('job1', resume_state['part_count'], b'stale part from crashed worker')
+
+        state = write_export_parts(self._job(**resume_state), iter(self.pages[1:]), self.store, lambda _: None)
+        self.store.finalize('job1', state['part_count'])
+        self.assertEqual(self._read(), uninterrupted)
+        self.assertEqual(len(list(csv.reader(io.StringIO(uninterrupted)))), 10)
+
+    def test_limit_stops_mid_page(self):
+        job = self._job(filters={'limit': 4})
+        state = write_export_parts(job, iter(self.pages), self.store, lambda _: None)
+        self.store.finalize('job1', state['part_count'])
+        self.assertEqual(state['rows_written'], 4)
+        self.assertEqual(len(list(csv.reader(io.StringIO(self._read())))), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import io
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+from PIL import Image
+from google.api_core import exceptions as gcloud_exceptions
+from werkzeug.datastructures import FileStorage
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils import compression  # noqa: E402
+from utils.compression_pipeline import (  # noqa: E402
+    STATUS_COMPLETED,
+    STATUS_FAILED,
+    STATUS_SKIPPED,
+    CompressionPipeline,
+)
+
+
+def _noisy_image(width, height):
+    return Image.frombytes('RGB', (width, height), os.urandom(width * height * 3))
+
+
+class CompressBytesTestCase(unittest.TestCase):
+    def test_large_image_is_resized_to_jpeg(self):
+        buffer = io.BytesIO()
+        _noisy_image(2400, 600).save(buffer, format='PNG')
+
+        data, content_type = compression.compress_bytes(buffer.getvalue(), 'image/png')
+
+        self.assertEqual(content_type, 'image/jpeg')
+        self.assertLess(len(data), len(buffer.getvalue()))
+        self.assertEqual(Image.open(io.BytesIO(data)).width, 1920)
+
+    @unittest.skipIf(compression.pypdf is None, 'pypdf is not installed')
+    def test_pdf_images_are_downsampled(self):
+        buffer = io.BytesIO()
+        _noisy_image(3000, 1500).save(buffer, format='PDF', quality=95)
+
+        data, content_type = compression.compress_bytes(buffer.getvalue(), 'application/pdf')
+
+        self.assertEqual(content_type, 'application/pdf')
+        self.assertLess(len(data), len(buffer.getvalue()))
+        reader = compression.pypdf.PdfReader(io.BytesIO(data))
+        self.assertEqual(len(reader.pages), 1)
+        self.assertLessEqual(reader.pages[0].images[0].image.width, compression.PDF_IMAGE_MAX_WIDTH)
+
+    def test_other_types_are_returned_unchanged(self):
+        self.assertEqual(compression.compress_bytes(b'text', 'text/plain'), (b'text', 'text/plain'))
+
+
+class CompressionPipelineTestCase(unittest.TestCase):
+    def setUp(self):
+        self.db = MagicMock()
+        self.document_ref = self.db.collection.return_value.document.return_value
+        self.original = MagicMock(generation=7)
+        self.original.download_as_bytes.return_value = b'x' * 100
+        self.bucket = MagicMock()
+        self.bucket.get_blob.return_value = self.original
+        self.pipeline = CompressionPipeline(
+            lambda: self.db, lambda: self.bucket, threshold_bytes=10, use_processes=False
+        )
+
+    def tearDown(self):
+        self.pipeline.shutdown()
+
+    def test_needs_compression_only_for_large_images_and_pdfs(self):
+        self.assertTrue(self.pipeline.needs_compression(11, 'image/png'))
+        self.assertTrue(self.pipeline.needs_compression(11, 'application/pdf'))
+        self.assertFalse(self.pipeline.needs_compression(10, 'image/png'))
+        self.assertFalse(self.pipeline.needs_compression(11, 'text/plain'))
+
+    def test_prepare_defers_instead_of_compressing(self):
+        upload = FileStorage(stream=io.BytesIO(b'x' * 20), filename='scan.png', content_type='image/png')
+
+        with patch('utils.compression_pipeline.compress_document') as compress_document:
+            stored, original_size, was_compressed, deferred = self.pipeline.prepare(upload)
+
+        compress_document.assert_not_called()
+        self.assertIs(stored, upload)
+        self.assertEqual((original_size, was_compressed, deferred), (20, False, True))
+
+    def test_prepare_compresses_inline_when_disabled(self):
+        self.pipeline.enabled = False
+        upload = FileStorage(stream=io.BytesIO(b'x' * 20), filename='scan.png', content_type='image/png')
+        compressed = MagicMock()
+
+        with patch('utils.compression_pipeline.compress_document', return_value=(compressed, 20, True)):
+            result = self.pipeline.prepare(upload)
+
+        self.assertEqual(result, (compressed, 20, True, False))
+
+    def test_smaller_result_replaces_the_original_in_place(self):
+        with patch('utils.compression_pipeline.compress_bytes', return_value=(b'y' * 40, 'image/jpeg')):
+            status = self.pipeline.run('doc_1', 'IP_Claims/h/c/t/a.png', 'image/png')
+
+        self.assertEqual(status, STATUS_COMPLETED)
+        self.bucket.blob.assert_called_once_with('IP_Claims/h/c/t/a.png')
+        self.bucket.blob.return_value.upload_from_string.assert_called_once_with(
+            b'y' * 40, content_type='image/jpeg', if_generation_match=7
+        )
+        fields = self.document_ref.update.call_args[0][0]
+        self.assertEqual(fields['file_size'], 40)
+        self.assertEqual(fields['file_type'], 'image/jpeg')
+        self.assertEqual(fields['compression']['status'], STATUS_COMPLETED)
+        self.assertEqual(fields['compression']['bytes_saved'], 60)
+
+    def test_result_that_is_not_smaller_is_skipped(self):
+        with patch('utils.compression_pipeline.compress_bytes', return_value=(b'y' * 100, 'image/jpeg')):
+            status = self.pipeline.run('doc_1', 'path', 'image/png')
+
+        self.assertEqual(status, STATUS_SKIPPED)
+        self.bucket.blob.assert_not_called()
+        self.assertEqual(self.document_ref.update.call_args[0][0]['compression']['status'], STATUS_SKIPPED)
+
+    def test_replaced_original_is_not_overwritten(self):
+        self.bucket.blob.return_value.upload_from_string.side_effect = gcloud_exceptions.PreconditionFailed('gone')
+
+        with patch('utils.compression_pipeline.compress_bytes', return_value=(b'y', 'image/jpeg')):
+            status = self.pipeline.run('doc_1', 'path', 'image/png')
+
+        self.assertEqual(status, STATUS_SKIPPED)
+        self.document_ref.update.assert_called_once_with({'compression.status': STATUS_SKIPPED})
+
+    def test_failed_job_is_recorded(self):
+        self.bucket.get_blob.return_value = None
+
+        status = self.pipeline.submit('doc_1', 'path', 'image/png').result(timeout=5)
+
+        self.assertEqual(status, STATUS_FAILED)
+        self.assertEqual(self.document_ref.update.call_args[0][0]['compression.status'], STATUS_FAILED)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import hashlib
+import io
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+from werkzeug.datastructures import FileStorage
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils import document_dedup  # noqa: E402
+from utils.document_dedup import CONTENTS_COLLECTION, ContentStore, hash_file  # noqa: E402
+from tests.fakes import FakeDb  # noqa: E402
+
+
+def _upload(content, content_type='application/pdf'):
+    return FileStorage(stream=io.BytesIO(content), filename='bill.pdf', content_type=content_type)
+
+
+class ContentStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeDb()
+        self.contents = self.db.docs(CONTENTS_COLLECTION)
+        self.objects = {}
+        self.bucket = MagicMock()
+        self.bucket.blob.side_effect = self._blob
+        self.bucket.get_blob.side_effect = lambda path: (
+            MagicMock(size=len(self.objects[path]), content_type='application/pdf')
+            if path in self.objects else None
+        )
+        self.store = ContentStore(lambda: self.db, lambda: self.bucket, chunk_size=4)
+        for name in ('_acquire', '_release'):
+            patcher = patch.object(document_dedup, name, getattr(document_dedup, name).to_wrap)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _blob(self, path):
+        blob = MagicMock()
+        blob.upload_from_file.side_effect = lambda file, **_: self.objects.__setitem__(path, file.read())
+        blob.delete.side_effect = lambda: self.objects.pop(path)
+        return blob
+
+    def test_hash_file_streams_and_rewinds(self):
+        upload = _upload(b'discharge summary')
+        self.assertEqual(hash_file(upload, chunk_size=4),
+                         (hashlib.sha256(b'discharge summary').hexdigest(), 17))
+        self.assertEqual(upload.stream.tell(), 0)
+
+    def test_identical_uploads_share_one_object(self):
+        first = self.store.store(_upload(b'same bill'), 'H1', 'IP_Claims/H1/DRAFT-1/bill/a.pdf')
+        second = self.store.store(_upload(b'same bill'), 'H1', 'IP_Claims/H1/CLAIM-1/bill/b.pdf')
+
+        self.assertFalse(first['deduplicated'])
+        self.assertTrue(second['deduplicated'])
+        self.assertEqual(first['storage_path'], second['storage_path'])
+        self.assertTrue(first['storage_path'].startswith(f"IP_Claims/H1/content/{first['sha256']}-"))
+        self.assertTrue(first['storage_path'].endswith('.pdf'))
+        self.assertEqual(list(self.objects), [first['storage_path']])
+        self.assertEqual(self.contents[f"H1_{first['sha256']}"]['ref_count'], 2)
+
+    def test_contents_are_not_shared_across_hospitals(self):
+        first = self.store.store(_upload(b'same bill'), 'H1', 'a.pdf')
+        second = self.store.store(_upload(b'same bill'), 'H2', 'b.pdf')
+
+        self.assertFalse(second['deduplicated'])
+        self.assertNotEqual(first['storage_path'], second['storage_path'])
+
+    def test_object_is_deleted_with_the_last_reference(self):
+        stored = self.store.store(_upload(b'same bill'), 'H1', 'a.pdf')
+        self.store.store(_upload(b'same bill'), 'H1', 'b.pdf')
+        document = {'hospital_id': 'H1', 'content_sha256': stored['sha256'], 'storage_path': stored['storage_path']}
+
+        self.assertFalse(self.store.release(document))
+        self.assertIn(stored['storage_path'], self.objects)
+        self.assertTrue(self.store.release(document))
+        self.assertEqual(self.objects, {})
+        self.assertEqual(self.contents, {})
+
+        # Uploading it again stores a fresh object
+        again = self.store.store(_upload(b'same bill'), 'H1', 'c.pdf')
+        self.assertFalse(again['deduplicated'])
+        self.assertNotEqual(again['storage_path'], stored['storage_path'])
+
+    def test_failed_upload_releases_its_reference(self):
+        self.bucket.blob.side_effect = None
+        self.bucket.blob.return_value.upload_from_file.side_effect = IOError('network')
+
+        with self.assertRaises(IOError):
+            self.store.store(_upload(b'bill'), 'H1', 'a.pdf')
+        self.assertEqual(self.contents, {})
+
+    def test_legacy_documents_delete_their_own_object(self):
+        self.objects['IP_Claims/H1/C1/bill/old.pdf'] = b'old'
+
+        self.assertTrue(self.store.release({'hospital_id': 'H1', 'storage_path': 'IP_Claims/H1/C1/bill/old.pdf'}))
+        self.assertEqual(self.objects, {})
+
+    def test_disabled_store_keeps_per_upload_paths(self):
+        self.store.enabled = False
+
+        stored = self.store.store(_upload(b'bill'), 'H1', 'IP_Claims/H1/C1/bill/a.pdf')
+
+        self.assertEqual(stored['storage_path'], 'IP_Claims/H1/C1/bill/a.pdf')
+        self.assertIsNone(stored['sha256'])
+        self.assertEqual(self.contents, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
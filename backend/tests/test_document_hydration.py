@@ -0,0 +1,74 @@
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils.document_hydration import hydrate_claim_documents, referenced_document_ids  # noqa: E402
+
+
+def _snapshot(doc_id, data, exists=True):
+    return MagicMock(id=doc_id, exists=exists, **{'to_dict.return_value': data})
+
+
+def _documents_db(stored, by_claim_id):
+    """MagicMock db serving ``stored`` through get_all and ``by_claim_id`` from the claim_id query."""
+    db = MagicMock()
+    db.collection.return_value.document.side_effect = lambda doc_id: doc_id
+    db.collection.return_value.where.return_value.get.return_value = by_claim_id
+    # get_all does not guarantee order
+    db.get_all.side_effect = lambda refs: [
+        _snapshot(ref, stored[ref]) if ref in stored else _snapshot(ref, None, exists=False)
+        for ref in reversed(refs)
+    ]
+    return db
+
+
+class DocumentHydrationTestCase(unittest.TestCase):
+    def test_referenced_ids_support_legacy_layouts(self):
+        self.assertEqual(referenced_document_ids({'documents': ['d1', {'id': 'd2'}, {'documentId': 'd3'}, {}]}),
+                         ['d1', 'd2', 'd3'])
+        self.assertEqual(referenced_document_ids({'document_uploads': [{'document_id': 'd4'}]}), ['d4'])
+        self.assertEqual(referenced_document_ids({'form_data': {'documents': ['d5']}}), ['d5'])
+        self.assertEqual(referenced_document_ids({'documents': 'broken'}), [])
+
+    def test_one_batched_read_merged_with_claim_query(self):
+        stored = {
+            'd1': {'document_id': 'd1', 'document_type': 'bill', 'download_url': 'https://signed/d1', 'status': 'verified'},
+            'd2': {'document_id': 'd2', 'document_type': 'discharge', 'storage_path': 'IP_Claims/d2.pdf'},
+        }
+        unlinked = [
+            _snapshot('d2', stored['d2']),
+            _snapshot('d9', {'document_id': 'd9', 'document_type': 'other', 'url': 'https://legacy/d9'}),
+        ]
+        db = _documents_db(stored, unlinked)
+
+        documents = hydrate_claim_documents(db, {'claim_id': 'CSHLSIP-1', 'documents': ['d1', 'd2', 'gone', 'd1']})
+
+        db.get_all.assert_called_once_with(['d1', 'd2', 'gone'])
+        self.assertEqual([d['document_id'] for d in documents], ['d1', 'd2', 'd9'])
+        self.assertEqual(documents[0]['download_url'], 'https://signed/d1')
+        self.assertNotIn('download_endpoint', documents[0])
+        # No URL is signed while hydrating; the client asks for one on demand
+        self.assertEqual(documents[1]['download_url'], '')
+        self.assertEqual(documents[1]['download_endpoint'], '/api/v1/documents/download/d2')
+        self.assertIsNone(documents[1]['status'])
+        self.assertEqual(documents[2]['download_url'], 'https://legacy/d9')
+        self.assertEqual(documents[2]['status'], 'uploaded')
+
+    def test_query_errors_keep_referenced_documents(self):
+        db = _documents_db({'d1': {'document_id': 'd1'}}, [])
+        db.collection.return_value.where.return_value.get.side_effect = RuntimeError('index missing')
+        errors = []
+
+        documents = hydrate_claim_documents(db, {'claim_id': 'C1', 'documents': ['d1']}, on_query_error=errors.append)
+
+        self.assertEqual([d['document_id'] for d in documents], ['d1'])
+        self.assertEqual(len(errors), 1)
+        with self.assertRaises(RuntimeError):
+            hydrate_claim_documents(db, {'claim_id': 'C1', 'documents': ['d1']})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils.document_proxy import (  # noqa: E402
+    DiskDocumentCache,
+    RangeNotSatisfiable,
+    document_stream,
+    etag_matches,
+    parse_range,
+)
+
+CONTENT = bytes(range(256)) * 40
+
+
+def _blob(content=CONTENT, generation=7):
+    blob = MagicMock(size=len(content), generation=generation)
+    blob.download_as_bytes.side_effect = lambda start, end, **_: content[start:end + 1]
+    return blob
+
+
+class DocumentProxyTestCase(unittest.TestCase):
+    def test_parse_range(self):
+        self.assertIsNone(parse_range(None, 100))
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 100))
+        self.assertEqual(parse_range('bytes=10-19', 100), (10, 19))
+        self.assertEqual(parse_range('bytes=90-', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=95-500', 100), (95, 99))
+        self.assertEqual(parse_range('bytes=-30', 100), (70, 99))
+        for header in ('bytes=100-', 'bytes=20-10', 'bytes=-0'):
+            with self.assertRaises(RangeNotSatisfiable):
+                parse_range(header, 100)
+
+    def test_etag_matching(self):
+        self.assertTrue(etag_matches('"6", W/"7"', '"7"'))
+        self.assertTrue(etag_matches('*', '"7"'))
+        self.assertFalse(etag_matches('"6"', '"7"'))
+        self.assertFalse(etag_matches(None, '"7"'))
+
+    def test_streams_in_bounded_chunks_pinned_to_generation(self):
+        blob = _blob()
+        chunks = list(document_stream(blob, 'IP_Claims/a.pdf', (100, 3099), chunk_size=1024))
+
+        self.assertEqual(b''.join(chunks), CONTENT[100:3100])
+        self.assertEqual([len(chunk) for chunk in chunks], [1024, 1024, 952])
+        for call in blob.download_as_bytes.call_args_list:
+            self.assertEqual(call.kwargs['if_generation_match'], 7)
+
+    def test_disk_cache_fills_on_full_reads_and_serves_ranges(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DiskDocumentCache(directory, max_bytes=len(CONTENT) * 2)
+            blob = _blob()
+
+            # Ranged reads and abandoned downloads don't populate the cache
+            list(document_stream(blob, 'a.pdf', (0, 9), chunk_size=4096, cache=cache))
+            partial = document_stream(blob, 'a.pdf', None, chunk_size=4096, cache=cache)
+            next(partial)
+            partial.close()
+            self.assertEqual(os.listdir(directory), [])
+
+            self.assertEqual(b''.join(document_stream(blob, 'a.pdf', None, chunk_size=4096, cache=cache)), CONTENT)
+            blob.download_as_bytes.reset_mock()
+            self.assertEqual(b''.join(document_stream(blob, 'a.pdf', (5, 9), cache=cache)), CONTENT[5:10])
+            blob.download_as_bytes.assert_not_called()
+
+            # A new generation is a different entry; the oldest is evicted over max_bytes
+            for name in ('b.pdf', 'c.pdf'):
+                b''.join(document_stream(_blob(generation=8), name, None, cache=cache))
+            self.assertIsNone(cache.open('a.pdf', 7))
+            self.assertEqual(len(os.listdir(directory)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils.background_runs import claim_run  # noqa: E402
+from utils.lock_reaper import LockReaper  # noqa: E402
+from utils.lock_utils import IST, CLEARED_LOCK_FIELDS, cleanup_expired_locks, migrate_lock_expiry  # noqa: E402
+
+
+def _snapshot(doc_id, data=None):
+    return MagicMock(id=doc_id, update_time=f't-{doc_id}', **{'to_dict.return_value': data or {}})
+
+
+class CleanupExpiredLocksTestCase(unittest.TestCase):
+    def setUp(self):
+        self.db = MagicMock()
+        self.query = self.db.collection.return_value.where.return_value
+        self.batch = self.db.batch.return_value
+
+    def test_expired_locks_are_cleared_in_batches(self):
+        pages = [[_snapshot('C1'), _snapshot('C2')], [_snapshot('C3')]]
+        self.query.limit.return_value.stream.side_effect = lambda: pages.pop(0)
+
+        cleared = cleanup_expired_locks(self.db, batch_size=2, now=datetime(2026, 1, 1, tzinfo=IST))
+
+        self.assertEqual(cleared, 3)
+        self.db.collection.assert_called_with('direct_claims')
+        field, op, _ = self.db.collection.return_value.where.call_args[0]
+        self.assertEqual((field, op), ('lock_expires_at', '<'))
+        self.assertEqual(self.batch.commit.call_count, 2)
+        self.assertEqual(self.batch.update.call_args_list[0][0][1], CLEARED_LOCK_FIELDS)
+        self.db.write_option.assert_any_call(last_update_time='t-C1')
+
+    def test_claims_changed_since_read_are_left_alone(self):
+        changed, expired = _snapshot('C1'), _snapshot('C2')
+        changed.reference.update.side_effect = Exception('precondition failed')
+        self.query.limit.return_value.stream.return_value = [changed, expired]
+        self.batch.commit.side_effect = Exception('precondition failed')
+
+        self.assertEqual(cleanup_expired_locks(self.db, batch_size=10), 1)
+        expired.reference.update.assert_called_once()
+
+    def test_budget_limits_a_run(self):
+        self.query.limit.return_value.stream.return_value = [_snapshot('C1'), _snapshot('C2')]
+
+        self.assertEqual(cleanup_expired_locks(self.db, batch_size=2, max_clears=2), 2)
+        self.query.limit.assert_called_once_with(2)
+
+
+class MigrateLockExpiryTestCase(unittest.TestCase):
+    def test_iso_strings_become_timestamps(self):
+        db = MagicMock()
+        docs = [
+            _snapshot('C1', {'lock_expires_at': '2026-01-01T10:00:00+05:30'}),
+            _snapshot('C2', {'lock_expires_at': 'soon'}),
+        ]
+        db.collection.return_value.where.return_value.stream.return_value = docs
+
+        summary = migrate_lock_expiry(db)
+
+        self.assertEqual(summary, {'scanned': 2, 'converted': 1, 'unparseable': 1})
+        db.collection.return_value.where.assert_called_once_with('lock_expires_at', '>=', '')
+        reference, fields = db.batch.return_value.update.call_args[0]
+        self.assertIs(reference, docs[0].reference)
+        self.assertEqual(fields['lock_expires_at'], datetime.fromisoformat('2026-01-01T10:00:00+05:30'))
+        db.batch.return_value.commit.assert_called_once()
+
+    def test_dry_run_writes_nothing(self):
+        db = MagicMock()
+        db.collection.return_value.where.return_value.stream.return_value = [
+            _snapshot('C1', {'lock_expires_at': '2026-01-01T10:00:00'})
+        ]
+
+        self.assertEqual(migrate_lock_expiry(db, dry_run=True)['converted'], 1)
+        db.batch.return_value.update.assert_not_called()
+
+
+class LockReaperTestCase(unittest.TestCase):
+    def setUp(self):
+        self.db = MagicMock()
+        self.reaper = LockReaper(lambda: self.db, clear_budget=5)
+
+    def test_run_records_metrics(self):
+        with patch('utils.lock_reaper.claim_run', return_value=True), \
+                patch('utils.lock_reaper.cleanup_expired_locks', return_value=5) as cleanup:
+            summary = self.reaper.run_once()
+
+        cleanup.assert_called_once_with(self.db, batch_size=self.reaper.batch_size, max_clears=5)
+        self.assertTrue(summary['budget_exhausted'])
+        stats = self.reaper.stats()
+        self.assertEqual((stats['runs'], stats['locks_cleared']), (1, 5))
+        marker_fields = self.db.collection.return_value.document.return_value.set.call_args[0][0]
+        self.assertEqual(marker_fields['last_result']['cleared'], 5)
+
+    def test_run_is_skipped_when_another_process_reaped(self):
+        with patch('utils.lock_reaper.claim_run', return_value=False), \
+                patch('utils.lock_reaper.cleanup_expired_locks') as cleanup:
+            self.assertIsNone(self.reaper.run_once())
+
+        cleanup.assert_not_called()
+        self.assertEqual(self.reaper.stats()['skipped_runs'], 1)
+
+
+class ClaimRunTestCase(unittest.TestCase):
+    def _claim(self, marker, owner='me', force=False):
+        marker_ref = MagicMock(**{'get.return_value': MagicMock(exists=marker is not None, **{'to_dict.return_value': marker})})
+        transaction = MagicMock()
+        return claim_run.to_wrap(transaction, marker_ref, owner, 60, 300, force), transaction
+
+    def test_first_run_takes_the_lease(self):
+        claimed, transaction = self._claim(None)
+
+        self.assertTrue(claimed)
+        fields = transaction.set.call_args[0][1]
+        self.assertEqual(fields['owner'], 'me')
+        self.assertGreater(fields['running_until'], fields['last_started_at'])
+
+    def test_recent_or_running_runs_are_respected(self):
+        now = datetime.now(timezone.utc)
+        self.assertFalse(self._claim({'last_started_at': now - timedelta(seconds=10)})[0])
+        self.assertTrue(self._claim({'last_started_at': now - timedelta(seconds=10)}, force=True)[0])
+        running = {'owner': 'other', 'running_until': now + timedelta(seconds=30), 'last_started_at': now - timedelta(hours=1)}
+        self.assertFalse(self._claim(running, force=True)[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
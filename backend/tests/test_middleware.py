@@ -1,13 +1,19 @@
 import os
 import sys
+import time
 import unittest
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 from flask import Flask, jsonify
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-from backend.middleware import require_claims_access, require_processor_access  # noqa: E402
+from backend.middleware import (  # noqa: E402
+    require_claims_access,
+    require_processor_access,
+)
+from utils.token_cache import VerifiedTokenCache, get_token_cache  # noqa: E402
+from utils.user_cache import UserProfileCache, get_user_cache  # noqa: E402
 
 
 class MiddlewareAuthFailureTestCase(unittest.TestCase):
@@ -25,7 +31,15 @@ class MiddlewareAuthFailureTestCase(unittest.TestCase):
         def processor_protected():
             return jsonify(success=True)
 
+        @self.app.route('/stacked-protected')
+        @require_claims_access
+        @require_processor_access
+        def stacked_protected():
+            return jsonify(success=True)
+
         self.client = self.app.test_client()
+        get_token_cache().clear()
+        get_user_cache().clear()
 
     def test_claims_access_missing_token(self):
         response = self.client.get('/claims-protected')
@@ -58,6 +72,111 @@ class MiddlewareAuthFailureTestCase(unittest.TestCase):
         self.assertIn('Failed to verify Firebase token', payload['details'])
         mock_verify.assert_called_once_with('fake-token')
 
+    @patch('backend.middleware._get_user_record', return_value={'role': 'hospital_user'})
+    @patch('backend.middleware.auth.verify_id_token')
+    def test_verified_token_is_cached_until_expiry(self, mock_verify, _mock_user):
+        mock_verify.return_value = {'uid': 'user-1', 'exp': time.time() + 3600}
+
+        for _ in range(3):
+            response = self.client.get(
+                '/claims-protected',
+                headers={'Authorization': 'Bearer good-token'}
+            )
+            self.assertEqual(response.status_code, 200)
+
+        mock_verify.assert_called_once_with('good-token')
+        stats = get_token_cache().stats()
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 1)
+
+    @patch('backend.middleware.get_firestore')
+    @patch('backend.middleware.auth.verify_id_token')
+    def test_user_profile_is_read_once(self, mock_verify, mock_get_firestore):
+        mock_verify.return_value = {'uid': 'proc-1', 'exp': time.time() + 3600}
+        user_doc = MagicMock(exists=True)
+        user_doc.to_dict.return_value = {'role': 'claim_processor_l2', 'email': 'p@example.com'}
+        user_ref = mock_get_firestore.return_value.collection.return_value.document.return_value
+        user_ref.get.return_value = user_doc
+
+        for _ in range(3):
+            response = self.client.get(
+                '/processor-protected',
+                headers={'Authorization': 'Bearer good-token'}
+            )
+            self.assertEqual(response.status_code, 200)
+
+        user_ref.get.assert_called_once_with()
+
+    @patch('backend.middleware._get_user_record')
+    @patch('backend.middleware.auth.verify_id_token')
+    def test_stacked_checks_resolve_identity_once(self, mock_verify, mock_user_record):
+        mock_verify.return_value = {'uid': 'proc-1', 'exp': time.time() + 3600}
+        mock_user_record.return_value = {'role': 'claim_processor_l1'}
+        get_token_cache().enabled = False
+        try:
+            response = self.client.get(
+                '/stacked-protected',
+                headers={'Authorization': 'Bearer good-token'}
+            )
+        finally:
+            get_token_cache().enabled = True
+
+        self.assertEqual(response.status_code, 200)
+        mock_verify.assert_called_once_with('good-token')
+        mock_user_record.assert_called_once_with('proc-1')
+
+    @patch('backend.middleware._get_user_record', return_value={'role': 'hospital_admin'})
+    @patch('backend.middleware.auth.verify_id_token')
+    def test_blocked_role_is_denied(self, mock_verify, _mock_user):
+        mock_verify.return_value = {'uid': 'admin-1', 'exp': time.time() + 3600}
+        response = self.client.get(
+            '/claims-protected',
+            headers={'Authorization': 'Bearer admin-token'}
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(
+            response.get_json()['message'],
+            'Administrators cannot access the claims module'
+        )
+
+
+class UserProfileCacheTestCase(unittest.TestCase):
+    def test_access_change_evicts_and_profile_edit_refreshes(self):
+        cache = UserProfileCache(ttl_seconds=60)
+        cache.put('u1', {'role': 'hospital_user', 'name': 'A'})
+        cache.put('u2', {'role': 'hospital_user', 'name': 'B'})
+
+        cache.apply_change('u1', {'role': 'hospital_user', 'name': 'A. Kumar'})
+        cache.apply_change('u2', {'role': 'claim_processor', 'name': 'B'})
+
+        self.assertEqual(cache.get('u1')['name'], 'A. Kumar')
+        self.assertIsNone(cache.get('u2'))
+
+    def test_zero_ttl_disables_caching(self):
+        cache = UserProfileCache(ttl_seconds=0)
+        cache.put('u1', {'role': 'rm'})
+        self.assertIsNone(cache.get('u1'))
+
+
+class VerifiedTokenCacheTestCase(unittest.TestCase):
+    def test_expired_entries_are_not_returned(self):
+        cache = VerifiedTokenCache(expiry_leeway_seconds=0)
+        cache.put('token', {'uid': 'u1', 'exp': time.time() - 1})
+        self.assertIsNone(cache.get('token'))
+
+    def test_lru_bound_and_uid_invalidation(self):
+        cache = VerifiedTokenCache(max_entries=2)
+        exp = time.time() + 3600
+        cache.put('a', {'uid': 'u1', 'exp': exp})
+        cache.put('b', {'uid': 'u2', 'exp': exp})
+        cache.put('c', {'uid': 'u1', 'exp': exp})
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.invalidate_uid('u1'), 1)
+        self.assertIsNone(cache.get('c'))
+        self.assertIsNotNone(cache.get('b'))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,82 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils.notification_dispatcher import (  # noqa: E402
+    NotificationDispatcher,
+    OutboundMessage,
+    SQLiteOutbox,
+)
+
+
+def _response(status_code):
+    response = MagicMock()
+    response.status_code = status_code
+    response.text = ''
+    return response
+
+
+def _dispatcher(*status_codes, **kwargs):
+    session = MagicMock()
+    session.post.side_effect = [_response(code) for code in status_codes]
+    kwargs.setdefault('backoff_seconds', 0.01)
+    kwargs.setdefault('flush_seconds', 0.05)
+    return NotificationDispatcher('http://notify.local/', session=session, **kwargs), session
+
+
+def _wait_for(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class NotificationDispatcherTestCase(unittest.TestCase):
+    def test_enqueue_returns_immediately_and_retries_until_delivered(self):
+        dispatcher, session = _dispatcher(503, 200)
+        self.assertTrue(dispatcher.enqueue('api/notifications/claims/pending', {'claim_id': 'C1'}))
+
+        self.assertTrue(_wait_for(lambda: dispatcher.stats['sent'] == 1))
+        self.assertEqual(dispatcher.stats['retried'], 1)
+        self.assertEqual(session.post.call_args[0][0], 'http://notify.local/api/notifications/claims/pending')
+        dispatcher.flush(timeout=1)
+
+    def test_client_errors_are_not_retried(self):
+        dispatcher, session = _dispatcher(400)
+        dispatcher.deliver('api/x', [OutboundMessage('api/x', {'claim_id': 'C1'})])
+        self.assertEqual(dispatcher.stats['failed'], 1)
+        self.assertEqual(session.post.call_count, 1)
+
+    def test_batch_api_posts_one_request_per_endpoint(self):
+        dispatcher, session = _dispatcher(200, batch_api=True)
+        messages = [OutboundMessage('api/x', {'claim_id': f'C{i}'}) for i in range(3)]
+        dispatcher.deliver('api/x', messages)
+        url, = session.post.call_args[0]
+        self.assertEqual(url, 'http://notify.local/api/x/batch')
+        self.assertEqual(len(session.post.call_args[1]['json']['notifications']), 3)
+        self.assertEqual(dispatcher.stats['sent'], 3)
+
+    def test_sqlite_outbox_replays_only_expired_pending_messages(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            outbox = SQLiteOutbox(os.path.join(tmp, 'outbox.sqlite3'), owner='w1')
+            sent_id = outbox.add(OutboundMessage('api/x', {'claim_id': 'C1'}))
+            lost_id = outbox.add(OutboundMessage('api/y', {'claim_id': 'C2'}))
+            outbox.mark_sent(sent_id)
+            self.assertEqual(outbox.claim_expired(10), [])
+
+            outbox._execute('UPDATE notification_outbox SET leased_until = 0')
+            replayed = SQLiteOutbox(os.path.join(tmp, 'outbox.sqlite3'), owner='w2').claim_expired(10)
+            self.assertEqual([(m.outbox_id, m.endpoint, m.payload) for m in replayed],
+                             [(lost_id, 'api/y', {'claim_id': 'C2'})])
+            self.assertEqual(outbox.claim_expired(10), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,201 @@
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import firestore
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils.notification_cleanup import cleanup_expired_notifications  # noqa: E402
+from utils.notification_inbox import fan_out_notification, purge_entries, serialize_entry  # noqa: E402
+from utils.notification_sweeper import NotificationSweeper  # noqa: E402
+from utils.recipient_cache import RecipientIndex  # noqa: E402
+
+
+def _offline_client():
+    db = firestore.Client(project='test-project', credentials=AnonymousCredentials())
+    db.batch = MagicMock()
+    return db
+
+
+def _writes(db):
+    """(method, path, args, kwargs) for each set/delete queued on the batch."""
+    return [
+        (name, args[0].path, args[1:], kwargs)
+        for name, args, kwargs in db.batch.return_value.method_calls
+        if name in ('set', 'delete')
+    ]
+
+
+class NotificationInboxTestCase(unittest.TestCase):
+    def test_fan_out_writes_entry_and_counter_per_recipient(self):
+        db = _offline_client()
+        notification_id = fan_out_notification(db, {
+            'claim_id': 'CSHLSIP-1',
+            'event_type': 'claim_pending',
+            'title': 'Claim Submitted',
+            'recipients': [{'user_id': 'u1'}, {'user_id': 'u2'}],
+            'recipient_ids': ['u2', 'u1', 'u1'],
+        })
+
+        writes = _writes(db)
+        paths = [path for _, path, _, _ in writes]
+        self.assertEqual(paths, [
+            f'claims_notifications/{notification_id}',
+            f'notification_inboxes/u1/inbox_entries/{notification_id}',
+            'notification_inboxes/u1',
+            f'notification_inboxes/u2/inbox_entries/{notification_id}',
+            'notification_inboxes/u2',
+        ])
+        entry = writes[1][2][0]
+        self.assertEqual(entry['title'], 'Claim Submitted')
+        self.assertFalse(entry['read'])
+        self.assertTrue(writes[2][3]['merge'])
+        self.assertEqual(db.batch.return_value.commit.call_count, 1)
+
+    def test_purge_decrements_counters_for_unread_entries_only(self):
+        db = _offline_client()
+        entries = db.collection('notification_inboxes').document('u1').collection('inbox_entries')
+        snapshots = []
+        for doc_id, read in (('n1', False), ('n2', True)):
+            snapshot = MagicMock()
+            snapshot.reference = entries.document(doc_id)
+            snapshot.to_dict.return_value = {'read': read}
+            snapshots.append(snapshot)
+
+        self.assertEqual(purge_entries(db, snapshots), 2)
+        writes = _writes(db)
+        self.assertEqual([(name, path) for name, path, _, _ in writes], [
+            ('delete', 'notification_inboxes/u1/inbox_entries/n1'),
+            ('set', 'notification_inboxes/u1'),
+            ('delete', 'notification_inboxes/u1/inbox_entries/n2'),
+        ])
+
+    def test_serialize_entry(self):
+        payload = serialize_entry('n1', {'title': 'Claim Submitted', 'read': True, 'metadata': None})
+        self.assertEqual(payload['id'], 'n1')
+        self.assertTrue(payload['read'])
+        self.assertEqual(payload['metadata'], {})
+
+
+def _expired_store(notifications, entries):
+    """MagicMock db whose expiry queries hand out ``limit`` of the remaining docs."""
+    remaining = {'claims_notifications': notifications, 'inbox_entries': entries}
+
+    def query_for(name):
+        query = MagicMock()
+        query.where.return_value = query
+
+        def limit(count):
+            limited = MagicMock()
+
+            def get():
+                docs = [MagicMock(**{'to_dict.return_value': {'read': True}}) for _ in range(min(count, remaining[name]))]
+                remaining[name] -= len(docs)
+                return docs
+            limited.get.side_effect = get
+            return limited
+        query.limit.side_effect = limit
+        return query
+
+    db = MagicMock()
+    db.collection.side_effect = lambda name: query_for(name)
+    db.collection_group.side_effect = lambda name: query_for(name)
+    return db, remaining
+
+
+class NotificationSweeperTestCase(unittest.TestCase):
+    def test_cleanup_respects_delete_budget(self):
+        db, remaining = _expired_store(notifications=250, entries=300)
+        deleted = cleanup_expired_notifications(batch_size=100, db_override=db, max_deletes=320)
+        self.assertEqual(deleted, 320)
+        self.assertEqual(remaining, {'claims_notifications': 0, 'inbox_entries': 230})
+
+        self.assertEqual(cleanup_expired_notifications(batch_size=100, db_override=db), 230)
+
+    def test_run_once_skips_when_marker_not_claimed(self):
+        db, remaining = _expired_store(notifications=5, entries=0)
+        sweeper = NotificationSweeper(lambda: db, delete_budget=3)
+
+        with patch('utils.notification_sweeper.claim_run', return_value=False):
+            self.assertIsNone(sweeper.run_once())
+        self.assertEqual(remaining['claims_notifications'], 5)
+
+        with patch('utils.notification_sweeper.claim_run', return_value=True):
+            summary = sweeper.run_once()
+        self.assertEqual(summary['deleted'], 3)
+        self.assertTrue(summary['budget_exhausted'])
+
+
+def _user(doc_id, data, exists=True):
+    return MagicMock(id=doc_id, exists=exists, **{'to_dict.return_value': data})
+
+
+def _users_db(users, extra=()):
+    """MagicMock db whose users query returns ``users`` and get_all serves ``extra``."""
+    db = MagicMock()
+    db.collection.return_value.where.return_value.get.return_value = users
+    db.collection.return_value.document.side_effect = lambda doc_id: doc_id
+    extra_by_id = {snapshot.id: snapshot for snapshot in extra}
+    db.get_all.side_effect = lambda refs: [extra_by_id.get(ref) or _user(ref, None, exists=False) for ref in refs]
+    return db
+
+
+class RecipientIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.users = [
+            _user('u1', {'uid': 'uid-1', 'role': 'hospital_user', 'name': 'Asha', 'email': 'a@h1',
+                         'entity_assignments': {'hospitals': [{'id': 'H1', 'name': 'Nano'}]}}),
+            _user('p2', {'role': 'claim_processor_l2', 'display_name': 'Lead',
+                         'entity_assignments': {'hospitals': [{'id': 'H1'}, {'id': 'H2'}]}}),
+            _user('p1', {'role': 'claim_processor', 'full_name': 'Ravi',
+                         'entity_assignments': {'hospitals': [{'id': 'H1'}]}}),
+        ]
+
+    def test_lookups_share_one_users_query(self):
+        db = _users_db(self.users)
+        index = RecipientIndex(lambda: db)
+
+        self.assertEqual(index.hospital_users('H1'), [{
+            'user_id': 'uid-1', 'user_role': 'hospital_user', 'name': 'Asha',
+            'email': 'a@h1', 'hospital_name': 'Nano'
+        }])
+        self.assertEqual([p['user_id'] for p in index.hospital_processors('H1')], ['p1', 'p2'])
+        self.assertEqual(index.hospital_processors('H3'), [])
+        self.assertEqual(db.collection.return_value.where.return_value.get.call_count, 1)
+
+    def test_get_users_reads_misses_in_one_round_trip(self):
+        db = _users_db(self.users, extra=[_user('admin', {'role': 'admin', 'name': 'Root'})])
+        index = RecipientIndex(lambda: db)
+
+        profiles = index.get_users(['p1', 'admin', 'gone', 'p1'])
+
+        self.assertEqual(list(profiles), ['p1', 'admin', 'gone'])
+        self.assertEqual(profiles['p1']['full_name'], 'Ravi')
+        self.assertEqual(profiles['admin']['name'], 'Root')
+        self.assertIsNone(profiles['gone'])
+        db.get_all.assert_called_once_with(['admin', 'gone'])
+
+    def test_recipient_changes_invalidate_the_index(self):
+        db = _users_db(self.users)
+        index = RecipientIndex(lambda: db)
+        index.hospital_users('H1')
+
+        index.apply_change('u1', dict(self.users[0].to_dict.return_value, phone='123'))
+        index.apply_change('admin', {'role': 'admin'})
+        index.hospital_users('H1')
+        self.assertEqual(index.builds, 1)
+
+        index.apply_change('u1', dict(self.users[0].to_dict.return_value, entity_assignments={}))
+        index.hospital_users('H1')
+        self.assertEqual(index.builds, 2)
+
+        index.apply_change('new', {'role': 'claim_processor'})
+        index.hospital_users('H1')
+        self.assertEqual(index.builds, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from routes.processor_routes import (  # noqa: E402
+    INBOX_TAB_STATUSES,
+    MAX_INBOX_PAGE_SIZE,
+    MAX_QUERY_DISJUNCTIONS,
+    _fetch_inbox_page,
+    _inbox_hospital_ids,
+    _processor_can_view,
+)
+from utils.pagination import DOCUMENT_ID_FIELD, decode_page_token, encode_page_token  # noqa: E402
+
+BASE_TIME = datetime(2025, 1, 10, tzinfo=timezone.utc)
+
+
+class _Snapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class _Query:
+    """In-memory ``direct_claims`` query ordered by ``updated_at`` desc."""
+
+    def __init__(self, snapshots, indexed=True, ordered=False, after=None, size=None):
+        self.snapshots = snapshots
+        self.indexed = indexed
+        self.ordered = ordered
+        self.after = after
+        self.size = size
+
+    def _copy(self, **changes):
+        state = dict(indexed=self.indexed, ordered=self.ordered, after=self.after, size=self.size)
+        state.update(changes)
+        return _Query(self.snapshots, **state)
+
+    def order_by(self, field, direction=None):
+        return self._copy(ordered=True)
+
+    def start_after(self, cursor):
+        return self._copy(after=(cursor['updated_at'], cursor[DOCUMENT_ID_FIELD]))
+
+    def limit(self, size):
+        return self._copy(size=size)
+
+    def stream(self):
+        if self.ordered and not self.indexed:
+            raise Exception('The query requires an index')
+        docs = sorted(self.snapshots, key=lambda doc: (doc.to_dict()['updated_at'], doc.id), reverse=True)
+        if self.after is not None:
+            docs = [doc for doc in docs if (doc.to_dict()['updated_at'], doc.id) < self.after]
+        return iter(docs[:self.size] if self.size is not None else docs)
+
+    def get(self):
+        # Unordered, as Firestore returns an unsorted result set
+        return list(reversed(self.snapshots))
+
+
+def _claims(count, **data):
+    return [
+        _Snapshot(f'C{i:02d}', {'claim_status': 'qc_pending', 'updated_at': BASE_TIME + timedelta(minutes=i), **data})
+        for i in range(count)
+    ]
+
+
+def _accept_all(doc, claim_data):
+    return True
+
+
+def _read_all_pages(query, limit, accept=_accept_all):
+    pages = []
+    token = None
+    while True:
+        rows, last_consumed, exhausted = _fetch_inbox_page(query, query, limit, decode_page_token(token), accept)
+        pages.append([doc.id for doc, _ in rows])
+        if exhausted or last_consumed is None:
+            return pages
+        token = encode_page_token(*last_consumed)
+
+
+class InboxPagingTestCase(unittest.TestCase):
+    def test_page_token_round_trip(self):
+        token = encode_page_token(BASE_TIME, 'C01')
+        self.assertEqual(decode_page_token(token), (BASE_TIME, 'C01'))
+        self.assertIsNone(decode_page_token(None))
+        with self.assertRaises(ValueError):
+            decode_page_token('not-a-token')
+
+    def test_pages_resume_after_the_token(self):
+        pages = _read_all_pages(_Query(_claims(7)), limit=3)
+        self.assertEqual(pages, [['C06', 'C05', 'C04'], ['C03', 'C02', 'C01'], ['C00']])
+
+    def test_missing_index_falls_back_to_in_memory_ordering(self):
+        indexed = _read_all_pages(_Query(_claims(7)), limit=3)
+        unindexed = _read_all_pages(_Query(_claims(7), indexed=False), limit=3)
+        self.assertEqual(unindexed, indexed)
+
+    def test_rejected_claims_do_not_end_paging_early(self):
+        def accept(doc, claim_data):
+            return int(doc.id[1:]) % 2 == 0
+
+        for indexed in (True, False):
+            pages = _read_all_pages(_Query(_claims(7), indexed=indexed), limit=2, accept=accept)
+            self.assertEqual([claim for page in pages for claim in page], ['C06', 'C04', 'C02', 'C00'])
+
+    def test_sparse_hospital_gets_full_pages(self):
+        # The processor's hospital owns 1 in 40 claims, and none of the 300
+        # most recently updated ones
+        hospitals = [{'id': 'H1', 'name': 'Nano Hospital', 'code': ''}]
+        claims = [
+            _Snapshot(f'C{i:04d}', {
+                'claim_id': f'CLS-{i}',
+                'claim_status': 'qc_pending',
+                'updated_at': BASE_TIME + timedelta(minutes=i),
+                'hospital_id': 'H1' if i % 40 == 0 and i < 700 else 'H2',
+                'hospital_name': 'Nano Hospital' if i % 40 == 0 and i < 700 else 'Other Hospital',
+            })
+            for i in range(1000)
+        ]
+        self.assertIsNone(_inbox_hospital_ids(hospitals, INBOX_TAB_STATUSES['unprocessed']))
+
+        def accept(doc, claim_data):
+            return _processor_can_view(doc, claim_data, hospitals, float('inf'))
+
+        for indexed in (True, False):
+            pages = _read_all_pages(_Query(claims, indexed=indexed), limit=10, accept=accept)
+            self.assertEqual([len(page) for page in pages], [10, 8], indexed)
+
+        pages = _read_all_pages(_Query(claims), limit=MAX_INBOX_PAGE_SIZE, accept=accept)
+        self.assertEqual([len(page) for page in pages], [18])
+
+
+class InboxHospitalFilterTestCase(unittest.TestCase):
+    def _hospitals(self, count, name=''):
+        return [{'id': f'H{i}', 'name': name, 'code': ''} for i in range(count)]
+
+    def test_hospital_ids_respect_the_disjunction_limit(self):
+        statuses = INBOX_TAB_STATUSES['unprocessed']
+        fits = MAX_QUERY_DISJUNCTIONS // len(statuses)
+        self.assertEqual(len(_inbox_hospital_ids(self._hospitals(fits), statuses)), fits)
+        self.assertIsNone(_inbox_hospital_ids(self._hospitals(fits + 1), statuses))
+
+    def test_named_hospitals_are_filtered_in_python(self):
+        hospitals = [{'id': 'H1', 'name': 'Nano Hospital', 'code': ''}]
+        self.assertIsNone(_inbox_hospital_ids(hospitals, ['qc_pending']))
+
+        claim = {'claim_id': 'CLS-1', 'claim_status': 'qc_pending', 'hospital_id': 'H9',
+                 'hospital_name': 'Nano Hospital Annex'}
+        self.assertTrue(_processor_can_view(_Snapshot('C1', claim), claim, hospitals, float('inf')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import os
+import sys
+import unittest
+from datetime import datetime, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from routes.drafts import _serialize_draft  # noqa: E402
+from routes.processor_routes import _inbox_sort_time, _processor_can_view, _serialize_inbox_claim  # noqa: E402
+from routes.review_request_routes import _serialize_review_list_claim  # noqa: E402
+from routes.rm_routes import _serialize_rm_claim  # noqa: E402
+from utils.claims_export import belongs_to_hospital, claim_list_entry  # noqa: E402
+from utils.projections import VIEW_FIELDS  # noqa: E402
+
+NOW = datetime(2025, 1, 10, tzinfo=timezone.utc)
+
+
+class _RecordingDict(dict):
+    """
+    Document data that records the field paths read from it.
+
+    Reading a nested map records nothing by itself; reading a value inside it,
+    a missing key, or the whole map (copy, iteration) records that path.
+    """
+
+    def __init__(self, data, reads, prefix=''):
+        super().__init__({
+            key: _RecordingDict(value, reads, f'{prefix}{key}.') if isinstance(value, dict) else value
+            for key, value in data.items()
+        })
+        self._reads = reads
+        self._prefix = prefix
+
+    def _read(self, key):
+        value = dict.get(self, key)
+        if not isinstance(value, _RecordingDict):
+            self._reads.add(self._prefix + key)
+        return value
+
+    def get(self, key, default=None):
+        value = self._read(key)
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        self._read(key)
+        return dict.__getitem__(self, key)
+
+    def _whole(self):
+        self._reads.add(self._prefix.rstrip('.'))
+
+    def copy(self):
+        self._whole()
+        return dict(self)
+
+    def items(self):
+        self._whole()
+        return dict.items(self)
+
+    def __iter__(self):
+        self._whole()
+        return dict.__iter__(self)
+
+
+class _Snapshot:
+    def __init__(self, doc_id):
+        self.id = doc_id
+
+
+def _full_claim():
+    return {
+        'claim_id': 'CSHLSIP-2025-1',
+        'draft_id': 'DRAFT-1',
+        'claim_status': 'dispatched',
+        'status': 'dispatched',
+        'hospital_id': 'H1',
+        'hospital_name': 'Nano Hospital',
+        'created_at': NOW,
+        'updated_at': NOW,
+        'processed_at': NOW,
+        'submission_date': NOW,
+        'created_by_email': 'a@example.com',
+        'form_data': {'patient_name': 'P', 'claimed_amount': 100, 'payer_name': 'CGHS', 'specialty': 'Ortho'},
+        'payer_details': {'payer_name': 'CGHS'},
+        'patient_details': {'patient_name': 'P'},
+        'claim_metadata': {'payer_type': 'Government'},
+        'processor_decision': {'decision': 'approved'},
+        'review_data': {'approved_amount': 80},
+        'review_history': [{'reviewer_name': 'R', 'reviewed_at': NOW}],
+        'rm_data': {'settled_amount': 70},
+        'documents': [{'document_id': 'D1'}],
+    }
+
+
+def _reads(read_claim):
+    reads = set()
+    read_claim(_RecordingDict(_full_claim(), reads))
+    return reads
+
+
+class ProjectionCoverageTestCase(unittest.TestCase):
+    def assertCovered(self, view, read_claim):
+        fields = VIEW_FIELDS[view]
+        missing = sorted(
+            path for path in _reads(read_claim)
+            if not any(path == field or path.startswith(field + '.') for field in fields)
+        )
+        self.assertEqual(missing, [], f"'{view}' projection misses fields its list view reads")
+
+    def test_hospital_claims(self):
+        def read(claim_data):
+            belongs_to_hospital(claim_data, 'H1', 'Nano Hospital')
+            claim_list_entry('CSHLSIP-2025-1', claim_data)
+        self.assertCovered('hospital_claims', read)
+
+    def test_processor_inbox(self):
+        def read(claim_data):
+            doc = _Snapshot('C1')
+            _processor_can_view(doc, claim_data, [{'id': 'H2', 'name': 'Other', 'code': ''}], float('inf'))
+            _processor_can_view(doc, claim_data, [], float('inf'))
+            _inbox_sort_time(claim_data)
+            _serialize_inbox_claim(doc, claim_data)
+        self.assertCovered('processor_inbox', read)
+
+    def test_rm_inbox(self):
+        self.assertCovered('rm_inbox', lambda claim_data: _serialize_rm_claim(_Snapshot('C1'), claim_data))
+
+    def test_review_inbox(self):
+        self.assertCovered('review_inbox', lambda claim_data: _serialize_review_list_claim(_Snapshot('C1'), claim_data))
+
+    def test_drafts(self):
+        self.assertCovered('drafts', lambda draft_data: _serialize_draft(_Snapshot('D1'), draft_data))
+
+    def test_uncovered_reads_are_reported(self):
+        reads = _reads(lambda claim_data: (claim_data.get('rm_data').get('settled_amount'), claim_data['documents']))
+        self.assertEqual(reads, {'rm_data.settled_amount', 'documents'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+import base64
+import hashlib
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils.resumable_uploads import (  # noqa: E402
+    CHUNK_ALIGNMENT,
+    STATUS_COMPLETED,
+    LocalChunkStore,
+    ResumableUploadService,
+    UploadError,
+    normalize_md5,
+    parse_content_range,
+)
+
+
+class _Doc:
+    def __init__(self, store, doc_id):
+        self.store = store
+        self.id = doc_id
+
+    def get(self, **_):
+        data = self.store.get(self.id)
+        return MagicMock(exists=data is not None, **{'to_dict.return_value': dict(data) if data else None})
+
+    def set(self, data, merge=False):
+        self.store[self.id] = dict(data)
+
+    def update(self, data):
+        self.store[self.id].update(data)
+
+    def delete(self):
+        self.store.pop(self.id, None)
+
+
+class _Db:
+    """Just enough of a Firestore client for sessions, documents and claims."""
+
+    def __init__(self):
+        self.collections = {}
+
+    def collection(self, name):
+        docs = self.collections.setdefault(name, {})
+        return MagicMock(document=lambda doc_id: _Doc(docs, doc_id))
+
+    def transaction(self):
+        return MagicMock()
+
+
+def _claim_finalize(_transaction, session_ref):
+    return session_ref.get().to_dict()
+
+
+class ResumableUploadTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = _Db()
+        self.db.collection('claims').document('CSHLSIP-1').set({'documents': []})
+        self.bucket = MagicMock()
+        self.uploaded = {}
+        self.bucket.blob.return_value.upload_from_filename.side_effect = \
+            lambda path, **_: self.uploaded.update(body=open(path, 'rb').read())
+        signer = MagicMock(**{'sign.return_value': 'https://signed/url'})
+        self.service = ResumableUploadService(
+            lambda: self.db, lambda: self.bucket, LocalChunkStore(self.tmp.name),
+            chunk_size=CHUNK_ALIGNMENT, url_signer=signer
+        )
+        self.content = os.urandom(CHUNK_ALIGNMENT * 2 + 1000)
+        self.md5 = hashlib.md5(self.content).hexdigest()
+        patcher = patch('utils.resumable_uploads._claim_finalize', _claim_finalize)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _start(self, **overrides):
+        params = dict(user_id='u1', hospital_id='H1', target='claim', target_id='CSHLSIP-1',
+                      document_type='bill', document_name='Final bill', filename='bill.pdf',
+                      content_type='application/pdf', size=len(self.content), md5=self.md5)
+        params.update(overrides)
+        return self.service.start(**params)['upload_id']
+
+    def _put(self, upload_id, start, end):
+        header = f'bytes {start}-{end - 1}/{len(self.content)}'
+        return self.service.write_chunk(upload_id, 'u1', header, self.content[start:end])['offset']
+
+    def test_helpers(self):
+        self.assertEqual(parse_content_range('bytes 0-9/20'), (0, 9, 20))
+        with self.assertRaises(UploadError):
+            parse_content_range('bytes 0-9/*')
+        digest = hashlib.md5(b'x').digest()
+        self.assertEqual(normalize_md5(digest.hex()), base64.b64encode(digest).decode())
+        with self.assertRaises(UploadError):
+            normalize_md5('not-a-digest')
+
+    def test_resume_resends_only_missing_chunks(self):
+        upload_id = self._start()
+        self.assertEqual(self._put(upload_id, 0, CHUNK_ALIGNMENT), CHUNK_ALIGNMENT)
+
+        # Retrying a committed chunk is acknowledged without rewriting it
+        self.assertEqual(self._put(upload_id, 0, CHUNK_ALIGNMENT), CHUNK_ALIGNMENT)
+        # A chunk past the committed offset is refused with the offset to resume from
+        with self.assertRaises(UploadError) as caught:
+            self._put(upload_id, CHUNK_ALIGNMENT * 2, len(self.content))
+        self.assertEqual(caught.exception.status_code, 409)
+        self.assertEqual(caught.exception.details['offset'], CHUNK_ALIGNMENT)
+
+        offset = self.service.status(upload_id, 'u1')['offset']
+        offset = self._put(upload_id, offset, offset + CHUNK_ALIGNMENT)
+        self.assertEqual(self._put(upload_id, offset, len(self.content)), len(self.content))
+
+        session = self.service.finalize(upload_id, 'u1')
+        self.assertEqual(session['status'], STATUS_COMPLETED)
+        self.assertEqual(self.uploaded['body'], self.content)
+        document_id = session['result']['document_id']
+        document = self.db.collections['documents'][document_id]
+        self.assertEqual(document['storage_path'], session['storage_path'])
+        self.assertEqual(document['file_size'], len(self.content))
+        self.assertEqual(self.db.collections['claims']['CSHLSIP-1']['documents'][0]['document_id'], document_id)
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+        # Finalizing again returns the same document
+        self.assertEqual(self.service.finalize(upload_id, 'u1')['result']['document_id'], document_id)
+
+    def test_finalize_queues_large_files_for_background_compression(self):
+        compressor = MagicMock(enabled=True, **{'needs_compression.return_value': True})
+        self.service.compressor = compressor
+        upload_id = self._start()
+        for start in range(0, len(self.content), CHUNK_ALIGNMENT):
+            self._put(upload_id, start, min(start + CHUNK_ALIGNMENT, len(self.content)))
+
+        session = self.service.finalize(upload_id, 'u1')
+
+        # The original is published as is and compressed later
+        self.assertEqual(self.uploaded['body'], self.content)
+        document_id = session['result']['document_id']
+        compressor.submit.assert_called_once_with(document_id, session['storage_path'], 'application/pdf')
+        self.assertEqual(self.db.collections['documents'][document_id]['compression']['status'], 'pending')
+
+    def test_finalize_rejects_incomplete_and_corrupt_uploads(self):
+        upload_id = self._start(md5=hashlib.md5(b'other').hexdigest())
+        self._put(upload_id, 0, CHUNK_ALIGNMENT)
+        with self.assertRaises(UploadError) as caught:
+            self.service.finalize(upload_id, 'u1')
+        self.assertEqual(caught.exception.details['offset'], CHUNK_ALIGNMENT)
+
+        self._put(upload_id, CHUNK_ALIGNMENT, CHUNK_ALIGNMENT * 2)
+        self._put(upload_id, CHUNK_ALIGNMENT * 2, len(self.content))
+        with self.assertRaises(UploadError) as caught:
+            self.service.finalize(upload_id, 'u1')
+        self.assertEqual(caught.exception.status_code, 422)
+        self.assertNotIn(upload_id, self.db.collections['document_upload_sessions'])
+        self.assertNotIn('documents', self.db.collections)
+
+    def test_chunk_validation(self):
+        upload_id = self._start()
+        with self.assertRaises(UploadError):
+            # Non-final chunks must be aligned
+            self._put(upload_id, 0, 1000)
+        with self.assertRaises(UploadError) as caught:
+            self.service.write_chunk(upload_id, 'someone-else', 'bytes 0-9/10', b'0123456789')
+        self.assertEqual(caught.exception.status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import sys
+import unittest
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils.document_hydration import hydrate_claim_documents  # noqa: E402
+from utils.signed_urls import SignedUrlService  # noqa: E402
+
+
+def _bucket():
+    bucket = MagicMock()
+    bucket.blob.side_effect = lambda path: MagicMock(**{
+        'generate_signed_url.side_effect': lambda expiration, **_: f'https://signed/{path}?e={int(expiration.timestamp())}'
+    })
+    return bucket
+
+
+class SignedUrlServiceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.bucket = _bucket()
+        self.credentials = MagicMock()
+        self.service = SignedUrlService(lambda: self.bucket, lambda: self.credentials)
+
+    def test_urls_reused_within_expiry_bucket(self):
+        with patch('utils.signed_urls.time.time', return_value=1_000_000):
+            first = self.service.sign('IP_Claims//H1/a.pdf', timedelta(hours=1))
+        with patch('utils.signed_urls.time.time', return_value=1_000_000 + 400):
+            second = self.service.sign('IP_Claims/H1/a.pdf', timedelta(hours=1))
+        with patch('utils.signed_urls.time.time', return_value=1_000_000 + 1000):
+            third = self.service.sign('IP_Claims/H1/a.pdf', timedelta(hours=1))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(second, third)
+        self.assertEqual(self.bucket.blob.call_count, 2)
+        self.bucket.blob.assert_called_with('IP_Claims/H1/a.pdf')
+        self.assertEqual(self.service.stats()['hits'], 1)
+
+    def test_urls_valid_for_at_least_the_lifetime(self):
+        for now in (1_000_000, 1_000_001, 1_000_899):
+            expires_at = self.service.expires_at(timedelta(hours=1), now)
+            self.assertGreaterEqual(expires_at - now, 3600)
+            self.assertLess(expires_at - now, 3600 + 900)
+
+    def test_sign_many_isolates_failures(self):
+        self.bucket.blob.side_effect = None
+        self.bucket.blob.return_value.generate_signed_url.side_effect = [RuntimeError('bad key'), 'https://signed/b']
+
+        urls = self.service.sign_many(['a', 'b', None, 'a'])
+
+        self.assertEqual(urls, {'a': None, 'b': 'https://signed/b'})
+        signed_with = self.bucket.blob.return_value.generate_signed_url.call_args.kwargs
+        self.assertIs(signed_with['credentials'], self.credentials)
+        self.assertEqual(signed_with['version'], 'v2')
+
+    def test_hydration_signs_whole_claim_in_one_batch(self):
+        db = MagicMock()
+        db.collection.return_value.document.side_effect = lambda doc_id: doc_id
+        db.get_all.return_value = [
+            MagicMock(id='d1', exists=True, **{'to_dict.return_value': {
+                'document_id': 'd1', 'storage_path': 'IP_Claims/H1/d1.pdf', 'download_url': 'https://expired/d1'
+            }}),
+        ]
+        db.collection.return_value.where.return_value.get.return_value = []
+
+        documents = hydrate_claim_documents(db, {'claim_id': 'C1', 'documents': ['d1']}, signer=self.service)
+        self.assertTrue(documents[0]['download_url'].startswith('https://signed/IP_Claims/H1/d1.pdf'))
+
+        keyless = SignedUrlService(lambda: self.bucket, lambda: None)
+        documents = hydrate_claim_documents(db, {'claim_id': 'C1', 'documents': ['d1']}, signer=keyless)
+        self.assertEqual(documents[0]['download_url'], 'https://expired/d1')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,337 @@
+"""
+Response cache for the analytics overview endpoints.
+
+Dashboards poll the overviews with the same date range and payer filters.
+A cached response is keyed by the endpoint, the caller's scope (hospital IDs,
+assigned payers) and the normalized filters, plus the *data version* of every
+hospital in scope. Claim writes bump the version of the claim's hospital
+(see ``analytics_rollups.record_claim_change``), so stale entries are never
+served; they simply stop being looked up and age out of the store. Unscoped
+(all-hospital) views are keyed by every hospital's version, read when the
+request comes in, so no shared counter is written on each claim change.
+
+Responses carry an ``ETag`` derived from the same key and versions, so a
+browser revalidating with ``If-None-Match`` gets a 304 without the overview
+being recomputed or even loaded from the store.
+
+Two stores are available: an in-process LRU (default) and Redis
+(``ANALYTICS_CACHE_BACKEND=redis``, needs the ``redis`` package). Version
+counters live in Redis when it is the store, otherwise in the
+``analytics_versions`` collection so every worker sees the same versions.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from flask import Response, current_app, request
+from google.cloud import firestore
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+VERSIONS_COLLECTION = 'analytics_versions'
+# Change when the overview payload shape changes to orphan old entries.
+CACHE_SCHEMA = 1
+
+DEFAULT_TTL_SECONDS = 600
+DEFAULT_MAX_ENTRIES = 256
+
+
+def _digest(value) -> str:
+    raw = json.dumps(value, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class MemoryResponseStore:
+    """Bounded LRU of serialized responses with a TTL per entry."""
+
+    def __init__(self, ttl_seconds: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, int(max_entries))
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            body, stored_at = entry
+            if now - stored_at >= self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return body
+
+    def set(self, key: str, body: str) -> None:
+        with self._lock:
+            self._entries[key] = (body, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisResponseStore:
+    """Serialized responses in Redis, expired by Redis itself."""
+
+    PREFIX = 'analytics:overview:'
+
+    def __init__(self, client, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.client = client
+        self.ttl_seconds = int(ttl_seconds)
+
+    def get(self, key: str) -> Optional[str]:
+        body = self.client.get(self.PREFIX + key)
+        return body.decode('utf-8') if isinstance(body, bytes) else body
+
+    def set(self, key: str, body: str) -> None:
+        self.client.set(self.PREFIX + key, body, ex=self.ttl_seconds)
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(self.PREFIX + '*'):
+            self.client.delete(key)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.client.scan_iter(self.PREFIX + '*'))
+
+
+class FirestoreVersionCounters:
+    """Per-hospital data versions in ``analytics_versions/{hospital_id}``."""
+
+    def read(self, db, hospital_ids: Sequence[str]) -> List[int]:
+        refs = [db.collection(VERSIONS_COLLECTION).document(hid) for hid in hospital_ids]
+        versions = {}
+        for snapshot in db.get_all(refs, field_paths=['version']):
+            if snapshot.exists:
+                versions[snapshot.id] = (snapshot.to_dict() or {}).get('version', 0)
+        return [versions.get(hid, 0) for hid in hospital_ids]
+
+    def read_all(self, db) -> Dict[str, int]:
+        return {
+            snapshot.id: (snapshot.to_dict() or {}).get('version', 0)
+            for snapshot in db.collection(VERSIONS_COLLECTION).select(['version']).stream()
+        }
+
+    def bump(self, db, hospital_ids: Iterable[str]) -> None:
+        batch = db.batch()
+        for hid in hospital_ids:
+            batch.set(
+                db.collection(VERSIONS_COLLECTION).document(hid),
+                {'version': firestore.Increment(1), 'updated_at': firestore.SERVER_TIMESTAMP},
+                merge=True
+            )
+        batch.commit()
+
+
+class RedisVersionCounters:
+    """Per-hospital data versions as Redis counters."""
+
+    PREFIX = 'analytics:version:'
+
+    def __init__(self, client):
+        self.client = client
+
+    def read(self, db, hospital_ids: Sequence[str]) -> List[int]:
+        values = self.client.mget([self.PREFIX + hid for hid in hospital_ids])
+        return [int(value or 0) for value in values]
+
+    def read_all(self, db) -> Dict[str, int]:
+        keys = list(self.client.scan_iter(self.PREFIX + '*'))
+        if not keys:
+            return {}
+        names = [key.decode('utf-8') if isinstance(key, bytes) else key for key in keys]
+        return {
+            name[len(self.PREFIX):]: int(value or 0)
+            for name, value in zip(names, self.client.mget(keys))
+        }
+
+    def bump(self, db, hospital_ids: Iterable[str]) -> None:
+        pipeline = self.client.pipeline()
+        for hid in hospital_ids:
+            pipeline.incr(self.PREFIX + hid)
+        pipeline.execute()
+
+
+class CachedOverview:
+    """Cache lookup for one overview request; see ``AnalyticsResponseCache.entry``."""
+
+    def __init__(self, cache: 'AnalyticsResponseCache', key: str, etag: str):
+        self.cache = cache
+        self.key = key
+        self.etag = etag
+
+    def _finish(self, response: Response) -> Response:
+        response.set_etag(self.etag)
+        response.headers['Cache-Control'] = self.cache.cache_control
+        response.vary.add('Authorization')
+        return response
+
+    def cached_response(self) -> Optional[Response]:
+        """A 304 or cached 200 for this request, or None when it must be computed."""
+        if request.if_none_match.contains(self.etag):
+            self.cache._count('not_modified')
+            return self._finish(Response(status=304))
+
+        body = self.cache.store.get(self.key)
+        if body is None:
+            self.cache._count('misses')
+            return None
+        self.cache._count('hits')
+        return self._finish(Response(body, status=200, mimetype='application/json'))
+
+    def store(self, payload: Dict) -> Response:
+        """Cache a freshly computed payload and return it as the response."""
+        body = current_app.json.dumps(payload)
+        try:
+            self.cache.store.set(self.key, body)
+        except Exception as err:
+            logger.warning("analytics_cache: unable to store response: %s", err)
+        return self._finish(Response(body, status=200, mimetype='application/json'))
+
+
+class AnalyticsResponseCache:
+    """Versioned response cache for the overview endpoints."""
+
+    def __init__(self, store, versions, enabled: bool = True, browser_max_age: int = 0):
+        self.store = store
+        self.versions = versions
+        self.enabled = enabled
+        self.cache_control = (
+            f'private, max-age={int(browser_max_age)}' if browser_max_age > 0 else 'private, no-cache'
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def entry(
+        self,
+        db,
+        endpoint: str,
+        hospital_scope: Optional[Sequence[str]],
+        scope: Optional[Dict] = None,
+        filters: Optional[Dict] = None
+    ) -> Optional[CachedOverview]:
+        """
+        Build the cache entry for an overview request.
+
+        ``hospital_scope`` is the list of hospital IDs the response covers
+        (None for all hospitals); ``scope`` holds any other caller-specific
+        restriction and ``filters`` the normalized query filters. Returns
+        None when caching is disabled or the versions cannot be read.
+        """
+        if not self.enabled:
+            return None
+
+        hospitals = sorted({hid for hid in hospital_scope if hid}) if hospital_scope is not None else None
+        try:
+            if hospitals is None:
+                versions = sorted(self.versions.read_all(db).items())
+            else:
+                versions = self.versions.read(db, hospitals) if hospitals else []
+        except Exception as err:
+            logger.warning("analytics_cache: unable to read data versions: %s", err)
+            return None
+
+        key = _digest({
+            'schema': CACHE_SCHEMA,
+            'endpoint': endpoint,
+            'hospitals': hospitals,
+            'scope': scope or {},
+            'filters': filters or {},
+            'rollups': bool(getattr(Config, 'ANALYTICS_ROLLUPS_SERVE', False)),
+        })
+        etag = _digest([key, versions])[:32]
+        return CachedOverview(self, f'{key}:{etag}', etag)
+
+    def bump(self, db, hospital_ids: Iterable[Optional[str]]) -> None:
+        """Invalidate cached overviews covering any of ``hospital_ids``."""
+        if not self.enabled:
+            return
+        ids = sorted({hid for hid in hospital_ids if hid})
+        if ids:
+            self.versions.bump(db, ids)
+
+    def clear(self) -> None:
+        self.store.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.not_modified = 0
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses + self.not_modified
+            return {
+                'enabled': self.enabled,
+                'store': type(self.store).__name__,
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+                'hit_rate': round((self.hits + self.not_modified) / lookups, 4) if lookups else 0.0
+            }
+
+
+def _redis_client():
+    try:
+        import redis
+    except ImportError:
+        logger.warning("analytics_cache: redis package not installed, using in-process cache")
+        return None
+    try:
+        client = redis.Redis.from_url(getattr(Config, 'ANALYTICS_CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+        client.ping()
+        return client
+    except Exception as err:
+        logger.warning("analytics_cache: Redis unavailable (%s), using in-process cache", err)
+        return None
+
+
+# Singleton instance
+_analytics_cache = None
+
+
+def get_analytics_cache() -> AnalyticsResponseCache:
+    """Get singleton analytics response cache instance"""
+    global _analytics_cache
+    if _analytics_cache is None:
+        ttl_seconds = getattr(Config, 'ANALYTICS_CACHE_TTL_SECONDS', DEFAULT_TTL_SECONDS)
+        client = _redis_client() if getattr(Config, 'ANALYTICS_CACHE_BACKEND', 'memory') == 'redis' else None
+        if client is not None:
+            store = RedisResponseStore(client, ttl_seconds)
+            versions = RedisVersionCounters(client)
+        else:
+            store = MemoryResponseStore(
+                ttl_seconds, getattr(Config, 'ANALYTICS_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+            )
+            versions = FirestoreVersionCounters()
+        _analytics_cache = AnalyticsResponseCache(
+            store,
+            versions,
+            enabled=getattr(Config, 'ANALYTICS_CACHE_ENABLED', True),
+            browser_max_age=getattr(Config, 'ANALYTICS_CACHE_BROWSER_MAX_AGE', 0)
+        )
+    return _analytics_cache
+
+
+def bump_data_versions(db, hospital_ids: Iterable[Optional[str]]) -> None:
+    """Invalidation hook for code paths that change claim data."""
+    get_analytics_cache().bump(db, hospital_ids)
@@ -0,0 +1,717 @@
+"""
+Vectorized analytics kernel behind the overview endpoints.
+
+Claims are normalized once into an ``AnalyticsFrame``: float columns for the
+amounts, categorical codes for statuses, payers and days, epoch-second TAT
+milestones reduced to flat sample arrays. Each overview is then a handful of
+NumPy reductions and ``bincount`` group-bys instead of a Python loop per
+claim.
+
+A frame row stands for one claim (``from_claims``) or one rollup cell
+(``from_cells``). ``count`` holds the number of claims behind a row and the
+value columns hold sums, so both sources share the same builders.
+"""
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from dateutil.parser import parse
+
+from utils.analytics_rollups import (
+    DEBUG_COUNTERS,
+    QC_CLEARED_STATUSES,
+    QC_QUERY_STATUSES,
+    SETTLED_STATUSES,
+    TAT_METRICS,
+    UNKNOWN_DAY,
+    _amount,
+    _disallowance_reasons,
+)
+
+SECONDS_PER_DAY = 86400.0
+TAT_PERCENTILES = (50, 90)
+
+# Additive per-row columns; the same names are used by rollup cells.
+VALUE_COLUMNS = (
+    'claimed',
+    'billed',
+    'patient_paid',
+    'discount',
+    'approved',
+    'approved_pos',
+    'approved_pos_count',
+    'approved_or_claimed',
+    'disallowed',
+    'disallowed_pos',
+    'settled_value',
+    'settled_pos',
+    'settled_pos_count',
+    'outstanding_unsettled',
+    'rm_settled_value',
+    'rm_settled_pos',
+    'rm_settled_pos_count',
+    'rm_outstanding_unsettled',
+    'tds',
+    'net_payable',
+    'tds_settled_pos',
+    'net_payable_settled_pos',
+) + DEBUG_COUNTERS
+
+DIMENSION_DEFAULTS = (
+    ('claim_status', None),
+    ('review_status', 'pending'),
+    ('rm_status', None),
+    ('hospital_name', 'Unknown'),
+    ('payer_name', 'Unknown'),
+    ('payer_type', ''),
+    ('insurer_name', ''),
+    ('payment_mode', 'Unknown'),
+)
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _hashable(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+class Categorical:
+    """Integer codes into a list of distinct values."""
+
+    __slots__ = ('codes', 'categories')
+
+    def __init__(self, codes: np.ndarray, categories: List):
+        self.codes = codes
+        self.categories = categories
+
+    @classmethod
+    def from_values(cls, values: Sequence) -> 'Categorical':
+        index: Dict = {}
+        try:
+            codes = [index.setdefault(value, len(index)) for value in values]
+        except TypeError:
+            # Unhashable values (maps, lists) are grouped by their string form
+            index = {}
+            codes = [index.setdefault(_hashable(value), len(index)) for value in values]
+        return cls(np.array(codes, dtype=np.int64), list(index))
+
+    def take(self, rows: np.ndarray) -> 'Categorical':
+        return Categorical(self.codes[rows], self.categories)
+
+    def mask(self, predicate: Callable) -> np.ndarray:
+        """Row mask of values for which ``predicate`` holds (evaluated per category)."""
+        matching = np.fromiter(
+            (bool(predicate(category)) for category in self.categories),
+            dtype=bool,
+            count=len(self.categories)
+        )
+        return matching[self.codes] if len(self.categories) else np.zeros(len(self.codes), dtype=bool)
+
+    def isin(self, values: Iterable) -> np.ndarray:
+        values = set(values)
+        return self.mask(lambda category: category in values)
+
+    def sums(self, weights: np.ndarray) -> Dict:
+        """Group-by sum of ``weights``, keyed by category (empty groups omitted)."""
+        totals = np.bincount(self.codes, weights=weights, minlength=len(self.categories))
+        present = np.bincount(self.codes, minlength=len(self.categories)) > 0
+        return {
+            self.categories[i]: totals[i]
+            for i in np.flatnonzero(present)
+        }
+
+
+def _first(mapping: Dict, keys: Sequence[str]):
+    for key in keys:
+        value = mapping.get(key)
+        if value:
+            return value
+    return None
+
+
+def _epoch(value) -> float:
+    """
+    Seconds since the epoch of the value's wall-clock time, NaN when missing.
+
+    Offset-aware values keep their local date and time (the offset is dropped,
+    as the per-claim analytics always did) so day buckets and TAT match it.
+    """
+    if not value:
+        return np.nan
+    if isinstance(value, datetime):
+        return (value.replace(tzinfo=None) - _EPOCH).total_seconds()
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            try:
+                value = parse(value)
+            except (ValueError, OverflowError):
+                return np.nan
+    elif hasattr(value, 'to_datetime'):
+        try:
+            value = value.to_datetime()
+        except Exception:
+            return np.nan
+    else:
+        return np.nan
+    return (value.replace(tzinfo=None) - _EPOCH).total_seconds()
+
+
+def _to_floats(raw: List) -> np.ndarray:
+    try:
+        return np.array(raw, dtype=float)
+    except (TypeError, ValueError):
+        # Some value is not numeric; coerce one by one like the scalar path
+        return np.array([_amount(value) for value in raw], dtype=float)
+
+
+def _amounts(dicts: Sequence[Dict], *keys: str) -> np.ndarray:
+    if len(keys) == 1:
+        key = keys[0]
+        return _to_floats([d.get(key) or 0 for d in dicts])
+    return _to_floats([_first(d, keys) or 0 for d in dicts])
+
+
+def _epochs(values: List) -> np.ndarray:
+    return np.array([_epoch(value) if value else np.nan for value in values], dtype=float)
+
+
+def _fill_missing(target: np.ndarray, mask: np.ndarray, claims: Sequence[Dict], getter: Callable) -> None:
+    """Fill rows selected by ``mask`` with epochs read by ``getter`` (only those rows are parsed)."""
+    rows = np.flatnonzero(mask)
+    if len(rows):
+        target[rows] = _epochs([getter(claims[row]) for row in rows])
+
+
+def _fallback(*columns: np.ndarray) -> np.ndarray:
+    """Take the first non-zero column per row, like ``a or b or c``."""
+    result = columns[-1]
+    for column in reversed(columns[:-1]):
+        result = np.where(column != 0, column, result)
+    return result
+
+
+def _day_categorical(epochs: np.ndarray) -> Categorical:
+    known = ~np.isnan(epochs)
+    day_numbers = np.where(known, np.floor(np.nan_to_num(epochs) / SECONDS_PER_DAY), -1).astype(np.int64)
+    unique, codes = np.unique(day_numbers, return_inverse=True)
+    categories = [
+        UNKNOWN_DAY if number < 0 else str(np.datetime64(int(number), 'D'))
+        for number in unique
+    ]
+    return Categorical(codes.astype(np.int64).ravel(), categories)
+
+
+def _tat_days(start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    days = np.floor((end - start) / SECONDS_PER_DAY)
+    return np.where(days < 0, 0, days)
+
+
+class AnalyticsFrame:
+    """Columnar rows (claims or rollup cells) the overview builders reduce."""
+
+    def __init__(
+        self,
+        count: np.ndarray,
+        values: Dict[str, np.ndarray],
+        dims: Dict[str, Categorical],
+        day: Categorical,
+        tat: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray],
+        reasons: Tuple[np.ndarray, Categorical, np.ndarray]
+    ):
+        self.count = count
+        self.values = values
+        self.dims = dims
+        self.day = day
+        # (row, metric index, days, weight) per TAT sample group
+        self.tat = tat
+        # (row, reason, weight) per disallowance reason
+        self.reasons = reasons
+
+    def __len__(self) -> int:
+        return len(self.count)
+
+    @classmethod
+    def from_claims(cls, claims: Sequence[Dict]) -> 'AnalyticsFrame':
+        """Normalize raw claim documents (drafts must already be excluded)."""
+        n = len(claims)
+        forms = [claim.get('form_data') or {} for claim in claims]
+        reviews = [claim.get('review_data') or {} for claim in claims]
+        rms = [claim.get('rm_data') or {} for claim in claims]
+        statuses = [claim.get('claim_status') for claim in claims]
+
+        claimed = _amounts(forms, 'claimed_amount')
+        approved = _amounts(reviews, 'approved_amount')
+        rm_settled = _amounts(rms, 'settled_amount')
+        settled = _fallback(
+            rm_settled,
+            _amounts(rms, 'settled_amount_without_tds'),
+            _amounts(rms, 'settled_tds_amount')
+        )
+        entry_totals = np.fromiter(
+            (
+                sum(_amount(e.get('amount')) for e in rm['disallowance_entries'] if isinstance(e, dict))
+                if isinstance(rm.get('disallowance_entries'), list) else 0.0
+                for rm in rms
+            ),
+            dtype=float,
+            count=n
+        )
+        disallowed = _fallback(
+            _amounts(rms, 'disallowed_amount'),
+            _amounts(rms, 'disallowance_total'),
+            entry_totals,
+            _amounts(reviews, 'disallowed_amount')
+        )
+        outstanding = claimed - np.where(approved > 0, approved, 0)
+        outstanding = np.where(outstanding > 0, outstanding, claimed)
+        tds = _amounts(rms, 'tds_amount')
+        net_payable = _amounts(rms, 'net_payable')
+
+        approved_pos = approved > 0
+        settled_pos = settled > 0
+        rm_settled_pos = rm_settled > 0
+
+        values = {
+            'claimed': claimed,
+            'billed': _amounts(forms, 'total_bill_amount', 'total_billed_amount'),
+            'patient_paid': _amounts(forms, 'total_patient_paid_amount', 'patient_paid_amount'),
+            'discount': _amounts(forms, 'patient_discount_amount') + _amounts(forms, 'mou_discount_amount'),
+            'approved': approved,
+            'approved_pos': np.where(approved_pos, approved, 0.0),
+            'approved_pos_count': approved_pos.astype(float),
+            'approved_or_claimed': np.where(approved_pos, approved, claimed),
+            'disallowed': disallowed,
+            'disallowed_pos': np.where(disallowed > 0, disallowed, 0.0),
+            'settled_value': np.where(settled_pos, settled, approved),
+            'settled_pos': np.where(settled_pos, settled, 0.0),
+            'settled_pos_count': settled_pos.astype(float),
+            'outstanding_unsettled': np.where(settled_pos, 0.0, outstanding),
+            'rm_settled_value': np.where(rm_settled_pos, rm_settled, approved),
+            'rm_settled_pos': np.where(rm_settled_pos, rm_settled, 0.0),
+            'rm_settled_pos_count': rm_settled_pos.astype(float),
+            'rm_outstanding_unsettled': np.where(rm_settled_pos, 0.0, outstanding),
+            'tds': tds,
+            'net_payable': net_payable,
+            'tds_settled_pos': np.where(rm_settled_pos, tds, 0.0),
+            'net_payable_settled_pos': np.where(rm_settled_pos, net_payable, 0.0),
+        }
+
+        dims = {
+            'claim_status': Categorical.from_values(statuses),
+            'review_status': Categorical.from_values([c.get('review_status', 'pending') for c in claims]),
+            'rm_status': Categorical.from_values(
+                [c.get('rm_status') or s for c, s in zip(claims, statuses)]
+            ),
+            'hospital_name': Categorical.from_values([c.get('hospital_name', 'Unknown') for c in claims]),
+            'payer_name': Categorical.from_values([f.get('payer_name', 'Unknown') for f in forms]),
+            'payer_type': Categorical.from_values([f.get('payer_type', '') for f in forms]),
+            'insurer_name': Categorical.from_values([f.get('insurer_name', '') for f in forms]),
+            'payment_mode': Categorical.from_values([r.get('payment_mode', 'Unknown') for r in rms]),
+        }
+        status_codes = dims['claim_status']
+
+        # --- TAT milestones as epoch seconds (NaN when absent) ---
+        created_raw = _epochs([c.get('created_at') for c in claims])
+        created = created_raw.copy()
+        _fill_missing(
+            created, np.array([not c.get('created_at') for c in claims], dtype=bool),
+            claims, lambda c: c.get('submission_date')
+        )
+        discharge = _epochs(
+            [_first(f, ('discharge_date', 'date_of_discharge', 'service_end_date')) for f in forms]
+        )
+        processed = _epochs([c.get('processed_at') for c in claims])
+
+        qc_clear = _epochs([c.get('qc_clear_date') for c in claims])
+        qc_clear = np.where(
+            np.isnan(qc_clear) & status_codes.isin(QC_CLEARED_STATUSES), processed, qc_clear
+        )
+        queried = status_codes.isin(QC_QUERY_STATUSES) | np.array(
+            [bool(c.get('qc_query_details')) for c in claims], dtype=bool
+        )
+        qc_query = np.where(queried, processed, np.nan)
+        dispatched = _epochs([c.get('dispatched_at') for c in claims])
+
+        settled_at = _epochs(
+            [_first(r, ('settled_date', 'settlement_date', 'settlement_processed_date')) for r in rms]
+        )
+        _fill_missing(settled_at, np.isnan(settled_at), claims, lambda c: c.get('rm_status_raised_date'))
+        _fill_missing(
+            settled_at, np.isnan(settled_at) & status_codes.isin(SETTLED_STATUSES),
+            claims, lambda c: c.get('updated_at') or c.get('rm_updated_at')
+        )
+
+        for name, milestone in (
+            ('claims_with_discharge_date', discharge),
+            ('claims_with_created_at', created),
+            ('claims_with_qc_clear', qc_clear),
+            ('claims_with_qc_query', qc_query),
+            ('claims_with_dispatch', dispatched),
+            ('claims_with_settlement', settled_at),
+        ):
+            values[name] = (~np.isnan(milestone)).astype(float)
+
+        tat_rows, tat_metrics, tat_days = [], [], []
+        for metric_index, (start, end) in enumerate((
+            (discharge, created),
+            (created, qc_clear),
+            (created, qc_query),
+            (qc_clear, dispatched),
+            (dispatched, settled_at),
+        )):
+            days = _tat_days(start, end)
+            rows = np.flatnonzero(~np.isnan(days))
+            tat_rows.append(rows)
+            tat_metrics.append(np.full(len(rows), metric_index, dtype=np.int64))
+            tat_days.append(days[rows].astype(np.int64))
+        tat_rows = np.concatenate(tat_rows)
+        tat = (
+            tat_rows,
+            np.concatenate(tat_metrics),
+            np.concatenate(tat_days),
+            np.ones(len(tat_rows), dtype=np.int64),
+        )
+
+        reason_rows, reason_values = [], []
+        for row, (rm, review) in enumerate(zip(rms, reviews)):
+            if rm or review:
+                for reason in _disallowance_reasons(rm, review):
+                    reason_rows.append(row)
+                    reason_values.append(reason)
+        reasons = (
+            np.array(reason_rows, dtype=np.int64),
+            Categorical.from_values(reason_values),
+            np.ones(len(reason_rows), dtype=np.int64),
+        )
+
+        return cls(
+            np.ones(n, dtype=np.int64), values, dims, _day_categorical(created_raw), tat, reasons
+        )
+
+    @classmethod
+    def from_cells(cls, cells: Sequence[Tuple[str, Dict]]) -> 'AnalyticsFrame':
+        """Normalize ``(day, cell)`` pairs loaded from the rollup documents."""
+        n = len(cells)
+        count = np.fromiter((cell.get('count', 0) for _, cell in cells), dtype=np.int64, count=n)
+        values = {}
+        for name in VALUE_COLUMNS:
+            source = 'debug' if name in DEBUG_COUNTERS else 'values'
+            values[name] = np.fromiter(
+                (float((cell.get(source) or {}).get(name, 0) or 0) for _, cell in cells),
+                dtype=float,
+                count=n
+            )
+        dims = {
+            name: Categorical.from_values(
+                [(cell.get('dims') or {}).get(name, default) for _, cell in cells]
+            )
+            for name, default in DIMENSION_DEFAULTS
+        }
+        day = Categorical.from_values([day for day, _ in cells])
+
+        metric_index = {metric: i for i, metric in enumerate(TAT_METRICS)}
+        tat_rows, tat_metrics, tat_days, tat_weights = [], [], [], []
+        reason_rows, reason_values, reason_weights = [], [], []
+        for row, (_, cell) in enumerate(cells):
+            for metric, histogram in (cell.get('tat') or {}).items():
+                if metric not in metric_index:
+                    continue
+                for days, occurrences in histogram.items():
+                    if occurrences > 0:
+                        tat_rows.append(row)
+                        tat_metrics.append(metric_index[metric])
+                        tat_days.append(int(days))
+                        tat_weights.append(int(occurrences))
+            for entry in (cell.get('reasons') or {}).values():
+                if entry.get('count', 0) > 0:
+                    reason_rows.append(row)
+                    reason_values.append(entry.get('reason'))
+                    reason_weights.append(int(entry['count']))
+
+        tat = (
+            np.array(tat_rows, dtype=np.int64),
+            np.array(tat_metrics, dtype=np.int64),
+            np.array(tat_days, dtype=np.int64),
+            np.array(tat_weights, dtype=np.int64),
+        )
+        reasons = (
+            np.array(reason_rows, dtype=np.int64),
+            Categorical.from_values(reason_values),
+            np.array(reason_weights, dtype=np.int64),
+        )
+        return cls(count, values, dims, day, tat, reasons)
+
+    def select(self, mask: np.ndarray) -> 'AnalyticsFrame':
+        """Keep only the rows where ``mask`` is True."""
+        rows = np.flatnonzero(mask)
+        remap = np.cumsum(mask) - 1
+
+        tat_rows, tat_metrics, tat_days, tat_weights = self.tat
+        keep_tat = mask[tat_rows] if len(tat_rows) else np.zeros(0, dtype=bool)
+        reason_rows, reason_values, reason_weights = self.reasons
+        keep_reasons = mask[reason_rows] if len(reason_rows) else np.zeros(0, dtype=bool)
+
+        return AnalyticsFrame(
+            self.count[rows],
+            {name: column[rows] for name, column in self.values.items()},
+            {name: column.take(rows) for name, column in self.dims.items()},
+            self.day.take(rows),
+            (
+                remap[tat_rows[keep_tat]],
+                tat_metrics[keep_tat],
+                tat_days[keep_tat],
+                tat_weights[keep_tat],
+            ),
+            (
+                remap[reason_rows[keep_reasons]],
+                reason_values.take(np.flatnonzero(keep_reasons)),
+                reason_weights[keep_reasons],
+            ),
+        )
+
+    def filter(
+        self,
+        payer_name: str = '',
+        payer_type: str = '',
+        insurer_name: str = '',
+        claim_statuses: Optional[Sequence[str]] = None,
+        assigned_payer_names: Optional[Sequence[str]] = None
+    ) -> 'AnalyticsFrame':
+        """Apply the dashboards' payer, insurer and status filters."""
+        mask = np.ones(len(self), dtype=bool)
+        payers = self.dims['payer_name']
+        if claim_statuses is not None:
+            mask &= self.dims['claim_status'].isin(claim_statuses)
+        if assigned_payer_names:
+            names = [name for name in assigned_payer_names if name]
+            if names:
+                mask &= payers.mask(
+                    lambda payer: any(name in str(payer or '').strip().upper() for name in names)
+                )
+        if payer_name:
+            mask &= payers.mask(lambda payer: payer_name in str(payer or '').strip().lower())
+        if payer_type:
+            mask &= self.dims['payer_type'].mask(
+                lambda value: payer_type == str(value or '').lower()
+            )
+        if insurer_name:
+            mask &= self.dims['insurer_name'].mask(
+                lambda value: insurer_name in str(value or '').lower()
+            )
+        return self if mask.all() else self.select(mask)
+
+    def total(self, column: str, mask: Optional[np.ndarray] = None) -> float:
+        values = self.values[column]
+        return float(values[mask].sum() if mask is not None else values.sum())
+
+    def tat_samples(self) -> Dict[str, np.ndarray]:
+        """Expand TAT sample groups into one array of day counts per metric."""
+        _, metrics, days, weights = self.tat
+        return {
+            metric: np.repeat(days[metrics == index], weights[metrics == index])
+            for index, metric in enumerate(TAT_METRICS)
+        }
+
+
+# ==========================================
+# Overview builders
+# ==========================================
+
+def _counts(mapping: Dict) -> Dict:
+    return {key: int(round(value)) for key, value in mapping.items() if round(value) > 0}
+
+
+def _empty_tat() -> Dict[str, List[int]]:
+    return {metric: [] for metric in TAT_METRICS}
+
+
+def summarize_tat(samples: Dict[str, np.ndarray]) -> Dict:
+    """Count, mean, percentiles and a day histogram for each TAT metric."""
+    summary = {}
+    for metric in TAT_METRICS:
+        values = samples.get(metric, np.zeros(0, dtype=np.int64))
+        entry = {'count': int(len(values)), 'avg': None, 'histogram': {}}
+        for percentile in TAT_PERCENTILES:
+            entry[f'p{percentile}'] = None
+        if len(values):
+            entry['avg'] = round(float(values.mean()), 2)
+            for percentile, value in zip(TAT_PERCENTILES, np.percentile(values, TAT_PERCENTILES)):
+                entry[f'p{percentile}'] = round(float(value), 2)
+            days, occurrences = np.unique(values, return_counts=True)
+            entry['histogram'] = {str(int(d)): int(c) for d, c in zip(days, occurrences)}
+        summary[metric] = entry
+    return summary
+
+
+def _common_stats(frame: AnalyticsFrame, payer_approved_statuses: Sequence[str]) -> Dict:
+    count = frame.count.astype(float)
+    status = frame.dims['claim_status']
+    payers = frame.dims['payer_name']
+
+    payer_approved = np.where(
+        status.isin(payer_approved_statuses), count, frame.values['approved_pos_count']
+    )
+    payer_counts = payers.sums(count)
+    payer_amounts = payers.sums(frame.values['claimed'])
+    payer_approvals = payers.sums(payer_approved)
+
+    reason_rows, reason_values, reason_weights = frame.reasons
+    claims_over_time = _counts(frame.day.sums(count))
+    claims_over_time.pop(UNKNOWN_DAY, None)
+
+    return {
+        'total_claims': int(frame.count.sum()),
+        'total_amount': frame.total('claimed'),
+        'total_billed_amount': frame.total('billed'),
+        'outstanding_claims': 0,
+        'outstanding_amount': 0,
+        'settled_claims': 0,
+        'settled_amount': 0,
+        'total_patient_paid': frame.total('patient_paid'),
+        'total_discount': frame.total('discount'),
+        'total_disallowed': frame.total('disallowed_pos'),
+        'approved_amount': frame.total('approved_pos'),
+        'status_distribution': {},
+        'claims_over_time': dict(sorted(claims_over_time.items())),
+        'payer_performance': {
+            payer: {
+                'count': int(round(payer_counts[payer])),
+                'amount': float(payer_amounts.get(payer, 0)),
+                'approved': int(round(payer_approvals.get(payer, 0))),
+            }
+            for payer in payer_counts
+            if payer_counts[payer] > 0
+        },
+        'disallowance_reasons': _counts(reason_values.sums(reason_weights.astype(float))),
+        'tat_metrics': _empty_tat(),
+    }
+
+
+def _apply_settlement(stats: Dict, frame: AnalyticsFrame) -> None:
+    """Settled/outstanding split keyed on claim_status (non-RM views)."""
+    count = frame.count.astype(float)
+    values = frame.values
+    in_settled = frame.dims['claim_status'].isin(SETTLED_STATUSES)
+    settled_claims = np.where(in_settled, count, values['settled_pos_count'])
+    stats['settled_claims'] = int(round(settled_claims.sum()))
+    stats['settled_amount'] = float(np.where(in_settled, values['settled_value'], values['settled_pos']).sum())
+    stats['outstanding_claims'] = int(round((count - settled_claims).sum()))
+    stats['outstanding_amount'] = float(np.where(in_settled, 0.0, values['outstanding_unsettled']).sum())
+
+
+def hospital_overview(frame: AnalyticsFrame) -> Dict:
+    stats = _common_stats(frame, ('approved', 'settled', 'claim_approved'))
+    stats['claims_created'] = stats['total_claims']
+    _apply_settlement(stats, frame)
+
+    status = frame.dims['claim_status']
+    stats['status_distribution'] = _counts({
+        ('unknown' if key is None else key): value
+        for key, value in status.sums(frame.count.astype(float)).items()
+    })
+    stats['approved_amount'] = float(np.where(
+        status.isin(('approved', 'settled', 'claim_approved', 'qc_clear')),
+        frame.values['approved_or_claimed'],
+        frame.values['approved_pos']
+    ).sum())
+
+    samples = frame.tat_samples()
+    stats['tat_metrics'] = {metric: samples[metric].tolist() for metric in TAT_METRICS}
+    stats['tat_summary'] = summarize_tat(samples)
+    stats['_debug'] = {name: int(round(frame.total(name))) for name in DEBUG_COUNTERS}
+    return stats
+
+
+def processor_overview(frame: AnalyticsFrame) -> Dict:
+    stats = _common_stats(frame, ('approved', 'settled', 'claim_approved'))
+    _apply_settlement(stats, frame)
+
+    count = frame.count.astype(float)
+    status = frame.dims['claim_status']
+    stats['status_distribution'] = _counts(status.sums(count))
+
+    pending = status.isin(('qc_pending', 'qc_answered', 'answered'))
+    stats['pending_workload'] = int(frame.count[pending].sum())
+    stats['total_processed'] = int(frame.count[~pending].sum())
+    stats['decisions'] = {
+        'approved': int(frame.count[status.isin(('claim_approved', 'approved'))].sum()),
+        'rejected': int(frame.count[status.isin(('claim_denial', 'rejected'))].sum()),
+        'query': int(frame.count[status.isin(('qc_query', 'queried'))].sum()),
+        'cleared': int(frame.count[status.isin(('qc_clear',))].sum()),
+    }
+    stats['avg_processing_time'] = 0
+
+    hospitals = frame.dims['hospital_name']
+    hospital_pending = status.isin(('qc_pending', 'qc_answered'))
+    totals = hospitals.sums(count)
+    pending_counts = hospitals.sums(np.where(hospital_pending, count, 0.0))
+    stats['hospital_performance'] = {
+        name: {
+            'total': int(round(total)),
+            'processed': int(round(total - pending_counts.get(name, 0))),
+            'pending': int(round(pending_counts.get(name, 0))),
+        }
+        for name, total in totals.items()
+        if total > 0
+    }
+    return stats
+
+
+def review_overview(frame: AnalyticsFrame) -> Dict:
+    stats = _common_stats(frame, ('approved', 'settled', 'claim_approved', 'review_approved'))
+    _apply_settlement(stats, frame)
+
+    count = frame.count
+    status = frame.dims['claim_status']
+    review_status = frame.dims['review_status']
+    stats['status_distribution'] = _counts(review_status.sums(count.astype(float)))
+
+    pending = (status.isin(('dispatched',)) | review_status.isin(('pending', 'under_review')))
+    escalated = ~pending & review_status.isin(('review_escalated',))
+    reviewed = ~pending & review_status.isin(
+        ('reviewed', 'review_completed', 'review_approved', 'review_rejected')
+    )
+    stats['pending_review'] = int(count[pending].sum())
+    stats['escalated'] = int(count[escalated].sum())
+    stats['total_reviewed'] = int(count[reviewed].sum())
+
+    financial = review_status.isin(('reviewed',))
+    stats['financials'] = {
+        'claimed': frame.total('claimed', financial),
+        'approved': frame.total('approved', financial),
+        'disallowed': frame.total('disallowed', financial),
+    }
+    return stats
+
+
+def rm_overview(frame: AnalyticsFrame) -> Dict:
+    stats = _common_stats(frame, ('approved', 'settled', 'claim_approved'))
+
+    count = frame.count.astype(float)
+    values = frame.values
+    rm_status = frame.dims['rm_status']
+    stats['status_distribution'] = _counts(frame.dims['claim_status'].sums(count))
+    stats['settlement_status'] = _counts(rm_status.sums(count))
+
+    # RM settlement is keyed on rm_status and settled_amount only
+    in_settled = rm_status.isin(SETTLED_STATUSES)
+    settled_claims = np.where(in_settled, count, values['rm_settled_pos_count'])
+    settled_value = np.where(in_settled, values['rm_settled_value'], values['rm_settled_pos'])
+    unsettled = count - settled_claims
+
+    stats['settled_claims'] = int(round(settled_claims.sum()))
+    stats['settled_amount'] = float(settled_value.sum())
+    stats['outstanding_claims'] = int(round(unsettled.sum()))
+    stats['active_claims'] = stats['outstanding_claims']
+    stats['outstanding_amount'] = float(np.where(in_settled, 0.0, values['rm_outstanding_unsettled']).sum())
+    stats['financials'] = {
+        'settled': stats['settled_amount'],
+        'tds': float(np.where(in_settled, values['tds'], values['tds_settled_pos']).sum()),
+        'net_payable': float(np.where(in_settled, values['net_payable'], values['net_payable_settled_pos']).sum()),
+    }
+    stats['payment_modes'] = _counts(frame.dims['payment_mode'].sums(settled_claims))
+    return stats
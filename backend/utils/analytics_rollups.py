@@ -0,0 +1,626 @@
+"""
+Pre-aggregated analytics rollups for the overview dashboards.
+
+The overview endpoints in ``routes/analytics_routes.py`` used to read every
+claim in the requested range. Rollups keep the same figures pre-aggregated in
+``analytics_rollups/{hospital_id}__{YYYY-MM-DD}`` documents, one per hospital
+and creation day (the wall-clock date of ``created_at``, offset ignored).
+Each document holds a map of *cells*, one per combination of the dimensions
+the dashboards group or filter by (statuses, payer, insurer, payment mode).
+A cell carries additive counters, TAT histograms and disallowance-reason
+counts.
+
+The contribution last applied for every claim is kept in
+``analytics_rollup_state/{claim_doc_id}``. ``refresh_claim_rollup`` derives
+the claim's new contribution and applies the difference with
+``firestore.Increment`` inside a transaction, so re-running it never double
+counts. ``rebuild_rollups`` recomputes everything from ``direct_claims`` and
+is exposed as ``backfill_analytics_rollups.py``. The overviews themselves are
+computed from the loaded cells by ``utils.analytics_kernel``.
+"""
+import hashlib
+import json
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from dateutil.parser import parse
+from google.cloud import firestore
+
+from config import Config
+from utils.analytics_cache import bump_data_versions
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_COLLECTION = 'analytics_rollups'
+STATE_COLLECTION = 'analytics_rollup_state'
+CLAIMS_COLLECTION = 'direct_claims'
+
+UNKNOWN_DAY = 'unknown'
+NO_HOSPITAL = '_none'
+# Firestore caps 'in' filters at 30 values and a batch at 500 writes.
+MAX_IN_VALUES = 30
+MAX_BATCH_WRITES = 500
+# Claims refreshed per transaction: each writes its state document and at
+# most two rollup documents, keeping a transaction under MAX_BATCH_WRITES.
+MAX_TRANSACTION_CLAIMS = 150
+
+SETTLED_STATUSES = ('settled', 'partially_settled', 'reconciliation')
+QC_CLEARED_STATUSES = (
+    'qc_clear', 'dispatched', 'settled', 'partially_settled', 'reconciliation',
+    'reviewed', 'review_approved'
+)
+QC_QUERY_STATUSES = ('qc_query', 'qc_answered', 'answered')
+
+TAT_METRICS = (
+    'discharge_to_qc_pending',
+    'qc_pending_to_qc_clear',
+    'qc_pending_to_qc_query',
+    'qc_clear_to_despatch',
+    'despatch_to_settle',
+)
+
+DEBUG_COUNTERS = (
+    'claims_with_discharge_date',
+    'claims_with_created_at',
+    'claims_with_qc_clear',
+    'claims_with_qc_query',
+    'claims_with_dispatch',
+    'claims_with_settlement',
+)
+
+# Dimensions a cell is keyed by; every filter and breakdown on the
+# dashboards is expressed over these.
+DIMENSIONS = (
+    'claim_status',
+    'review_status',
+    'rm_status',
+    'hospital_name',
+    'payer_name',
+    'payer_type',
+    'insurer_name',
+    'payment_mode',
+)
+
+# Fields read by ``claim_facts``; used to project the backfill scan.
+SOURCE_FIELDS = (
+    'claim_status',
+    'review_status',
+    'rm_status',
+    'hospital_id',
+    'hospital_name',
+    'created_at',
+    'submission_date',
+    'updated_at',
+    'rm_updated_at',
+    'processed_at',
+    'qc_clear_date',
+    'qc_query_details',
+    'dispatched_at',
+    'rm_status_raised_date',
+    'form_data',
+    'review_data',
+    'rm_data',
+)
+
+
+def _amount(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _to_datetime(value) -> Optional[datetime]:
+    """Coerce Firestore timestamps, datetimes and ISO strings to naive wall-clock datetimes."""
+    if not value:
+        return None
+    dt = None
+    if isinstance(value, datetime):
+        dt = value
+    elif hasattr(value, 'to_datetime'):
+        try:
+            dt = value.to_datetime()
+        except Exception:
+            dt = None
+    elif isinstance(value, str):
+        try:
+            dt = parse(value)
+        except (ValueError, OverflowError):
+            dt = None
+    if dt is None:
+        return None
+    # Drop any offset rather than converting, like the per-claim analytics
+    if dt.tzinfo:
+        dt = dt.replace(tzinfo=None)
+    return dt
+
+
+def _calc_days(start: Optional[datetime], end: Optional[datetime]) -> Optional[int]:
+    if start and end:
+        diff = (end - start).days
+        return diff if diff >= 0 else 0
+    return None
+
+
+def day_key(value) -> str:
+    """``YYYY-MM-DD`` bucket of a ``created_at`` value's own (wall-clock) date."""
+    dt = _to_datetime(value)
+    return dt.strftime('%Y-%m-%d') if dt else UNKNOWN_DAY
+
+
+def rollup_doc_id(hospital_id: Optional[str], day: str) -> str:
+    return f"{hospital_id or NO_HOSPITAL}__{day}"
+
+
+def _short_hash(value) -> str:
+    raw = json.dumps(value, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha1(raw).hexdigest()[:16]
+
+
+def cell_key(dims: Dict) -> str:
+    """Stable map key for a dimension tuple (safe as a Firestore field name)."""
+    return 'c' + _short_hash([dims.get(name) for name in DIMENSIONS])
+
+
+def _disallowance_reasons(rm_data: Dict, review_data: Dict) -> List[str]:
+    reasons = []
+    entries = rm_data.get('disallowance_entries', [])
+    if isinstance(entries, list):
+        for entry in entries:
+            if isinstance(entry, dict):
+                reason = entry.get('reason') or entry.get('category')
+                if reason:
+                    reasons.append(str(reason))
+    if not reasons and rm_data.get('disallowance_reason'):
+        reasons.append(str(rm_data.get('disallowance_reason')))
+    if not reasons and review_data.get('disallowance_reason'):
+        reasons.append(str(review_data.get('disallowance_reason')))
+    return reasons
+
+
+def claim_facts(claim: Dict) -> Optional[Dict]:
+    """
+    Reduce a claim document to its rollup contribution.
+
+    Returns None for drafts, which never appear on the dashboards. The
+    amount and settlement rules mirror the per-claim loops the overview
+    endpoints ran before rollups existed.
+    """
+    if not claim or claim.get('claim_status') == 'draft':
+        return None
+
+    status = claim.get('claim_status')
+    form_data = claim.get('form_data') or {}
+    review_data = claim.get('review_data') or {}
+    rm_data = claim.get('rm_data') or {}
+
+    claimed = _amount(form_data.get('claimed_amount'))
+    billed = _amount(form_data.get('total_bill_amount') or form_data.get('total_billed_amount'))
+    patient_paid = _amount(
+        form_data.get('total_patient_paid_amount') or form_data.get('patient_paid_amount')
+    )
+    discount = (
+        _amount(form_data.get('patient_discount_amount'))
+        + _amount(form_data.get('mou_discount_amount'))
+    )
+    approved = _amount(review_data.get('approved_amount'))
+
+    # Hospital/processor/review views fall back through the settlement fields;
+    # the RM view only trusts settled_amount.
+    settled = _amount(rm_data.get('settled_amount'))
+    rm_settled = settled
+    if settled == 0:
+        settled = _amount(rm_data.get('settled_amount_without_tds'))
+    if settled == 0:
+        settled = _amount(rm_data.get('settled_tds_amount'))
+
+    disallowed = _amount(rm_data.get('disallowed_amount'))
+    if disallowed == 0:
+        disallowed = _amount(rm_data.get('disallowance_total'))
+    if disallowed == 0:
+        entries = rm_data.get('disallowance_entries', [])
+        if isinstance(entries, list) and entries:
+            disallowed = sum(
+                _amount(entry.get('amount')) for entry in entries if isinstance(entry, dict)
+            )
+    if disallowed == 0:
+        disallowed = _amount(review_data.get('disallowed_amount'))
+
+    outstanding = claimed - (approved if approved > 0 else 0)
+    if outstanding <= 0:
+        outstanding = claimed
+
+    tds = _amount(rm_data.get('tds_amount'))
+    net_payable = _amount(rm_data.get('net_payable'))
+
+    values = {
+        'claimed': claimed,
+        'billed': billed,
+        'patient_paid': patient_paid,
+        'discount': discount,
+        'approved': approved,
+        'approved_pos': approved if approved > 0 else 0.0,
+        'approved_pos_count': 1 if approved > 0 else 0,
+        'approved_or_claimed': approved if approved > 0 else claimed,
+        'disallowed': disallowed,
+        'disallowed_pos': disallowed if disallowed > 0 else 0.0,
+        'settled_value': settled if settled > 0 else approved,
+        'settled_pos': settled if settled > 0 else 0.0,
+        'settled_pos_count': 1 if settled > 0 else 0,
+        'outstanding_unsettled': outstanding if settled <= 0 else 0.0,
+        'rm_settled_value': rm_settled if rm_settled > 0 else approved,
+        'rm_settled_pos': rm_settled if rm_settled > 0 else 0.0,
+        'rm_settled_pos_count': 1 if rm_settled > 0 else 0,
+        'rm_outstanding_unsettled': outstanding if rm_settled <= 0 else 0.0,
+        'tds': tds,
+        'net_payable': net_payable,
+        'tds_settled_pos': tds if rm_settled > 0 else 0.0,
+        'net_payable_settled_pos': net_payable if rm_settled > 0 else 0.0,
+    }
+
+    dims = {
+        'claim_status': status,
+        'review_status': claim.get('review_status', 'pending'),
+        'rm_status': claim.get('rm_status') or status,
+        'hospital_name': claim.get('hospital_name', 'Unknown'),
+        'payer_name': form_data.get('payer_name', 'Unknown'),
+        'payer_type': form_data.get('payer_type', ''),
+        'insurer_name': form_data.get('insurer_name', ''),
+        'payment_mode': rm_data.get('payment_mode', 'Unknown'),
+    }
+
+    reasons: Dict[str, int] = {}
+    for reason in _disallowance_reasons(rm_data, review_data):
+        reasons[reason] = reasons.get(reason, 0) + 1
+
+    # --- TAT milestones ---
+    discharge_at = _to_datetime(
+        form_data.get('discharge_date')
+        or form_data.get('date_of_discharge')
+        or form_data.get('service_end_date')
+    )
+    created_at = _to_datetime(claim.get('created_at') or claim.get('submission_date'))
+
+    qc_clear_at = _to_datetime(claim.get('qc_clear_date'))
+    if not qc_clear_at and status in QC_CLEARED_STATUSES:
+        qc_clear_at = _to_datetime(claim.get('processed_at'))
+
+    qc_query_at = None
+    if status in QC_QUERY_STATUSES or claim.get('qc_query_details'):
+        qc_query_at = _to_datetime(claim.get('processed_at'))
+
+    dispatched_at = _to_datetime(claim.get('dispatched_at'))
+
+    settled_at = _to_datetime(
+        rm_data.get('settled_date')
+        or rm_data.get('settlement_date')
+        or rm_data.get('settlement_processed_date')
+    )
+    if not settled_at:
+        settled_at = _to_datetime(claim.get('rm_status_raised_date'))
+    if not settled_at and status in SETTLED_STATUSES:
+        settled_at = _to_datetime(claim.get('updated_at') or claim.get('rm_updated_at'))
+
+    tat = {}
+    for metric, start, end in (
+        ('discharge_to_qc_pending', discharge_at, created_at),
+        ('qc_pending_to_qc_clear', created_at, qc_clear_at),
+        ('qc_pending_to_qc_query', created_at, qc_query_at),
+        ('qc_clear_to_despatch', qc_clear_at, dispatched_at),
+        ('despatch_to_settle', dispatched_at, settled_at),
+    ):
+        days = _calc_days(start, end)
+        if days is not None:
+            tat[metric] = days
+
+    debug = {
+        name: 1 for name, present in (
+            ('claims_with_discharge_date', discharge_at),
+            ('claims_with_created_at', created_at),
+            ('claims_with_qc_clear', qc_clear_at),
+            ('claims_with_qc_query', qc_query_at),
+            ('claims_with_dispatch', dispatched_at),
+            ('claims_with_settlement', settled_at),
+        ) if present
+    }
+
+    return {
+        'hospital_id': claim.get('hospital_id') or None,
+        'day': day_key(claim.get('created_at')),
+        'dims': dims,
+        'values': values,
+        'reasons': reasons,
+        'tat': tat,
+        'debug': debug,
+    }
+
+
+# ==========================================
+# Maintenance
+# ==========================================
+
+def _accumulate(docs: Dict[str, Dict], contribution: Dict, sign: int = 1) -> None:
+    """Add (or with ``sign=-1`` subtract) a contribution to rollup doc payloads."""
+    rollup_id = rollup_doc_id(contribution.get('hospital_id'), contribution['day'])
+    doc = docs.setdefault(rollup_id, {
+        'hospital_id': contribution.get('hospital_id'),
+        'day': contribution['day'],
+        'cells': {},
+    })
+    dims = contribution['dims']
+    cell = doc['cells'].setdefault(cell_key(dims), {
+        'dims': dims, 'count': 0, 'values': {}, 'reasons': {}, 'tat': {}, 'debug': {}
+    })
+    cell['count'] += sign
+
+    for name, value in contribution.get('values', {}).items():
+        cell['values'][name] = cell['values'].get(name, 0) + sign * value
+
+    for reason, count in contribution.get('reasons', {}).items():
+        entry = cell['reasons'].setdefault('r' + _short_hash(reason), {'reason': reason, 'count': 0})
+        entry['count'] += sign * count
+
+    for metric, days in contribution.get('tat', {}).items():
+        histogram = cell['tat'].setdefault(metric, {})
+        histogram[str(days)] = histogram.get(str(days), 0) + sign
+
+    for name, count in contribution.get('debug', {}).items():
+        cell['debug'][name] = cell['debug'].get(name, 0) + sign * count
+
+
+def _as_increments(payload: Dict) -> Dict:
+    """
+    Convert a delta payload into a merge-safe update.
+
+    Numeric leaves become ``firestore.Increment``; zero deltas and maps left
+    empty are dropped, since merging an empty map would wipe stored data.
+    """
+    update = {}
+    for key, value in payload.items():
+        if key in ('dims', 'reason', 'hospital_id', 'day'):
+            update[key] = value
+        elif isinstance(value, dict):
+            nested = _as_increments(value)
+            if any(k not in ('dims', 'reason') for k in nested):
+                update[key] = nested
+        elif isinstance(value, (int, float)) and value != 0:
+            update[key] = firestore.Increment(value)
+    return update
+
+
+@firestore.transactional
+def _refresh_in_transaction(transaction, db, claim_doc_ids: Sequence[str]) -> List[Optional[str]]:
+    claim_refs = [db.collection(CLAIMS_COLLECTION).document(doc_id) for doc_id in claim_doc_ids]
+    state_refs = [db.collection(STATE_COLLECTION).document(doc_id) for doc_id in claim_doc_ids]
+    snapshots = {
+        snapshot.reference.path: snapshot
+        for snapshot in transaction.get_all(claim_refs + state_refs)
+    }
+
+    # The deltas of all claims, grouped by rollup document
+    deltas: Dict[str, Dict] = {}
+    for claim_ref, state_ref in zip(claim_refs, state_refs):
+        claim_snapshot = snapshots.get(claim_ref.path)
+        state_snapshot = snapshots.get(state_ref.path)
+        new = claim_facts(claim_snapshot.to_dict()) if claim_snapshot is not None and claim_snapshot.exists else None
+        old = (state_snapshot.to_dict() or {}).get('contribution') \
+            if state_snapshot is not None and state_snapshot.exists else None
+        if old == new:
+            continue
+
+        if old:
+            _accumulate(deltas, old, -1)
+        if new:
+            _accumulate(deltas, new, 1)
+            transaction.set(state_ref, {'contribution': new, 'updated_at': firestore.SERVER_TIMESTAMP})
+        else:
+            transaction.delete(state_ref)
+
+    for rollup_id, payload in deltas.items():
+        update = _as_increments(payload)
+        update['updated_at'] = firestore.SERVER_TIMESTAMP
+        transaction.set(db.collection(ROLLUP_COLLECTION).document(rollup_id), update, merge=True)
+    return list({payload['hospital_id'] for payload in deltas.values()})
+
+
+def refresh_claim_rollup(db, claim_doc_id: str) -> List[Optional[str]]:
+    """
+    Bring the rollups in line with the current state of one claim.
+
+    Returns the hospital IDs whose rollups changed (empty when the claim's
+    contribution is unchanged). Safe to call repeatedly.
+    """
+    return _refresh_in_transaction(db.transaction(), db, [claim_doc_id])
+
+
+def refresh_claim_rollups(db, claim_doc_ids: Sequence[str]) -> List[Optional[str]]:
+    """
+    ``refresh_claim_rollup`` for many claims.
+
+    Claims are refreshed ``MAX_TRANSACTION_CLAIMS`` at a time, one
+    transaction each, so a rollup document shared by the claims is written
+    once per transaction rather than once per claim.
+    """
+    hospital_ids = set()
+    for start in range(0, len(claim_doc_ids), MAX_TRANSACTION_CLAIMS):
+        chunk = claim_doc_ids[start:start + MAX_TRANSACTION_CLAIMS]
+        hospital_ids.update(_refresh_in_transaction(db.transaction(), db, chunk))
+    return list(hospital_ids)
+
+
+def record_claim_change(db, claim_doc_id: str) -> None:
+    """
+    Write-path hook: refresh rollups and invalidate cached overviews after a
+    claim write.
+
+    Never raises; a failed refresh is logged and corrected by the next write
+    to the claim or by a backfill.
+    """
+    if not claim_doc_id:
+        return
+    try:
+        if getattr(Config, 'ANALYTICS_ROLLUPS_ENABLED', True):
+            hospital_ids = refresh_claim_rollup(db, claim_doc_id)
+        else:
+            snapshot = db.collection(CLAIMS_COLLECTION).document(claim_doc_id).get()
+            hospital_ids = [(snapshot.to_dict() or {}).get('hospital_id')] if snapshot.exists else []
+        if hospital_ids:
+            bump_data_versions(db, hospital_ids)
+    except Exception as err:
+        logger.warning("analytics_rollups: refresh failed for claim %s: %s", claim_doc_id, err)
+
+
+def record_claim_changes(db, claim_doc_ids: Iterable[str]) -> None:
+    """
+    ``record_claim_change`` for a set of claims written together (bulk
+    processing): rollups are refreshed in shared transactions and data
+    versions bumped once. Never raises.
+    """
+    claim_doc_ids = list(dict.fromkeys(doc_id for doc_id in claim_doc_ids if doc_id))
+    if not claim_doc_ids:
+        return
+    try:
+        if getattr(Config, 'ANALYTICS_ROLLUPS_ENABLED', True):
+            hospital_ids = refresh_claim_rollups(db, claim_doc_ids)
+        else:
+            refs = [db.collection(CLAIMS_COLLECTION).document(doc_id) for doc_id in claim_doc_ids]
+            hospital_ids = list({
+                (snapshot.to_dict() or {}).get('hospital_id')
+                for snapshot in db.get_all(refs, field_paths=['hospital_id'])
+                if snapshot.exists
+            })
+        if hospital_ids:
+            bump_data_versions(db, hospital_ids)
+    except Exception as err:
+        logger.warning("analytics_rollups: refresh failed for %d claims: %s", len(claim_doc_ids), err)
+
+
+def _commit_in_batches(db, operations: Iterable[Tuple[str, object, Optional[Dict]]]) -> int:
+    batch = db.batch()
+    pending = 0
+    total = 0
+    for op, ref, data in operations:
+        if op == 'delete':
+            batch.delete(ref)
+        else:
+            batch.set(ref, data)
+        pending += 1
+        total += 1
+        if pending >= MAX_BATCH_WRITES:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+    return total
+
+
+def rebuild_rollups(db, dry_run: bool = False) -> Dict:
+    """
+    Recompute every rollup and state document from ``direct_claims``.
+
+    Claim writes made while the rebuild runs may be overwritten; run it in a
+    quiet window or re-run it afterwards.
+    """
+    docs: Dict[str, Dict] = {}
+    states: Dict[str, Dict] = {}
+    scanned = 0
+    skipped = 0
+
+    query = db.collection(CLAIMS_COLLECTION).select(list(SOURCE_FIELDS))
+    for snapshot in query.stream():
+        scanned += 1
+        contribution = claim_facts(snapshot.to_dict() or {})
+        if contribution is None:
+            skipped += 1
+            continue
+        _accumulate(docs, contribution)
+        states[snapshot.id] = contribution
+
+    summary = {
+        'claims_scanned': scanned,
+        'claims_skipped': skipped,
+        'rollup_docs': len(docs),
+        'state_docs': len(states),
+    }
+    if dry_run:
+        return summary
+
+    rollups_ref = db.collection(ROLLUP_COLLECTION)
+    state_ref = db.collection(STATE_COLLECTION)
+
+    def operations():
+        for existing in rollups_ref.list_documents():
+            if existing.id not in docs:
+                yield 'delete', existing, None
+        for existing in state_ref.list_documents():
+            if existing.id not in states:
+                yield 'delete', existing, None
+        for rollup_id, payload in docs.items():
+            yield 'set', rollups_ref.document(rollup_id), {
+                **payload, 'updated_at': firestore.SERVER_TIMESTAMP
+            }
+        for claim_doc_id, contribution in states.items():
+            yield 'set', state_ref.document(claim_doc_id), {
+                'contribution': contribution, 'updated_at': firestore.SERVER_TIMESTAMP
+            }
+
+    summary['writes'] = _commit_in_batches(db, operations())
+    bump_data_versions(db, {payload['hospital_id'] for payload in docs.values()})
+    return summary
+
+
+# ==========================================
+# Reading
+# ==========================================
+
+def _day_bound(value: Optional[datetime]) -> Optional[str]:
+    if value is None:
+        return None
+    return value.strftime('%Y-%m-%d')
+
+
+def load_cells(
+    db,
+    hospital_ids: Optional[Sequence[str]] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> List[Tuple[str, Dict]]:
+    """
+    Fetch ``(day, cell)`` pairs for the given hospitals and creation range.
+
+    ``hospital_ids=None`` means every hospital. Claims without a creation
+    date are only included when no date bound is given, as with the scans.
+    """
+    start_day = _day_bound(start_date)
+    end_day = _day_bound(end_date)
+
+    def base_query():
+        query = db.collection(ROLLUP_COLLECTION)
+        if start_day:
+            query = query.where('day', '>=', start_day)
+        if end_day:
+            query = query.where('day', '<=', end_day)
+        return query
+
+    if hospital_ids is None:
+        queries = [base_query()]
+    else:
+        ids = [hid for hid in dict.fromkeys(hospital_ids) if hid]
+        queries = [
+            base_query().where('hospital_id', 'in', ids[i:i + MAX_IN_VALUES])
+            for i in range(0, len(ids), MAX_IN_VALUES)
+        ]
+
+    cells = []
+    for query in queries:
+        for snapshot in query.stream():
+            data = snapshot.to_dict() or {}
+            day = data.get('day', UNKNOWN_DAY)
+            if day == UNKNOWN_DAY and (start_day or end_day):
+                continue
+            for cell in (data.get('cells') or {}).values():
+                if cell.get('count', 0) > 0:
+                    cells.append((day, cell))
+    return cells
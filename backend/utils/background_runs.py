@@ -0,0 +1,62 @@
+"""
+Run markers for background maintenance jobs.
+
+Every process may run a maintenance job (notification sweeper, lock reaper),
+but a run only starts after it claims the job's ``maintenance_runs/{name}``
+marker in a transaction: the marker records when the last run started and
+holds a short lease while one is in progress, so across all processes at
+most one run per job happens per interval.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+
+from google.cloud import firestore
+
+MARKER_COLLECTION = 'maintenance_runs'
+
+
+def marker_ref(db, name: str):
+    return db.collection(MARKER_COLLECTION).document(name)
+
+
+@firestore.transactional
+def claim_run(transaction, marker_ref, owner: str, interval_seconds: float,
+              lease_seconds: float, force: bool) -> bool:
+    """
+    Take the lease on ``marker_ref`` for ``owner``.
+
+    Returns False when another owner holds an unexpired lease or, unless
+    ``force``, when the last run started less than ``interval_seconds`` ago.
+    """
+    snapshot = marker_ref.get(transaction=transaction)
+    marker = snapshot.to_dict() if snapshot.exists else {}
+    now = datetime.now(timezone.utc)
+
+    running_until = marker.get('running_until')
+    if running_until is not None and running_until > now and marker.get('owner') != owner:
+        return False
+    last_started_at = marker.get('last_started_at')
+    if not force and last_started_at is not None \
+            and last_started_at + timedelta(seconds=interval_seconds) > now:
+        return False
+
+    transaction.set(marker_ref, {
+        'owner': owner,
+        'last_started_at': now,
+        'running_until': now + timedelta(seconds=lease_seconds),
+    }, merge=True)
+    return True
+
+
+def finish_run(marker_ref, summary: Dict) -> None:
+    """Release the lease and record the run's summary."""
+    marker_ref.set({
+        'running_until': None,
+        'last_finished_at': firestore.SERVER_TIMESTAMP,
+        'last_result': summary,
+    }, merge=True)
+
+
+def abandon_run(marker_ref) -> None:
+    """Release the lease of a failed run without recording a result."""
+    marker_ref.set({'running_until': None}, merge=True)
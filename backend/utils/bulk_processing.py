@@ -0,0 +1,228 @@
+"""
+Bulk status changes for processors.
+
+``BulkClaimProcessor.process`` applies one status to many claims with a
+fixed number of round trips rather than several per claim:
+
+1. The claims are read with one ``get_all`` over their document IDs; IDs that
+   are not document IDs are looked up by their ``claim_id`` field with
+   ``in`` queries of up to ``MAX_IN_VALUES`` values.
+2. Hospital status options are looked up once per hospital in the request.
+3. Each claim's update and its audit transaction
+   (``direct_claims/{id}/transactions/{transaction_id}``, as written by
+   ``create_transaction``) go into WriteBatches of at most
+   ``MAX_BATCH_WRITES`` writes. A failed batch fails only its own claims.
+4. The analytics rollups of the committed claims are refreshed together (see
+   ``record_claim_changes``), so each shared rollup document and data version
+   is written once per request rather than once per claim.
+5. Notifications for the committed claims are sent from a thread pool.
+
+Every requested claim gets an entry in the returned results.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from google.cloud import firestore
+
+from config import Config
+from utils.analytics_rollups import record_claim_changes
+from utils.notification_client import get_notification_client
+from utils.transaction_helper import TransactionType, build_transaction_record
+
+logger = logging.getLogger(__name__)
+
+CLAIMS_COLLECTION = 'direct_claims'
+MAX_BATCH_WRITES = 500
+# Firestore limit on the values of one 'in' filter
+MAX_IN_VALUES = 30
+DEFAULT_WORKERS = 8
+
+TRANSACTION_TYPES = {
+    'qc_clear': TransactionType.CLEARED,
+    'claim_approved': TransactionType.APPROVED,
+    'claim_denial': TransactionType.REJECTED,
+    'need_more_info': TransactionType.QUERIED
+}
+
+NOTIFIERS = {
+    'need_more_info': 'notify_need_more_info',
+    'qc_clear': 'notify_qc_clear',
+    'claim_approved': 'notify_approved',
+    'claim_denial': 'notify_denial'
+}
+
+
+def _chunks(items: Sequence, size: int) -> Iterable[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def resolve_claims(db, claim_ids: Sequence[str]) -> Dict[str, object]:
+    """
+    Snapshots of the requested claims keyed by the requested ID.
+
+    IDs are tried as document IDs first and then as ``claim_id`` values;
+    IDs matching neither are left out.
+    """
+    collection = db.collection(CLAIMS_COLLECTION)
+    resolved = {}
+    for snapshot in db.get_all([collection.document(claim_id) for claim_id in claim_ids]):
+        if snapshot.exists:
+            resolved[snapshot.id] = snapshot
+
+    missing = [claim_id for claim_id in claim_ids if claim_id not in resolved]
+    for chunk in _chunks(missing, MAX_IN_VALUES):
+        for snapshot in collection.where('claim_id', 'in', list(chunk)).stream():
+            claim_id = (snapshot.to_dict() or {}).get('claim_id')
+            if claim_id in chunk and claim_id not in resolved:
+                resolved[claim_id] = snapshot
+    return resolved
+
+
+class BulkClaimProcessor:
+    """Applies a processor status to many claims at once."""
+
+    def __init__(self, db_factory, workers: int = DEFAULT_WORKERS, notification_client_factory=None):
+        self.db_factory = db_factory
+        self.workers = max(1, int(workers))
+        self.notification_client_factory = notification_client_factory or get_notification_client
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bulk-process')
+
+    def process(self, claim_ids: Sequence[str], status: str, remarks: str, actor: Dict,
+                status_options: Callable[[object, str], Dict],
+                optional_flags: Optional[Dict[str, str]] = None) -> List[Dict]:
+        """
+        Set ``status`` on every claim in ``claim_ids``.
+
+        ``actor`` holds the processor's ``id``, ``email`` and ``name``.
+        ``status_options(db, hospital_id)`` returns a hospital's status
+        toggles; when ``optional_flags`` maps ``status`` to a toggle, claims of
+        hospitals with the toggle off are refused.
+
+        Returns one result per distinct claim ID, in request order, with
+        ``success`` and either ``error`` or the claim's ``document_id``,
+        ``previous_status`` and ``notified``.
+        """
+        db = self.db_factory()
+        claim_ids = list(dict.fromkeys(claim_ids))
+        snapshots = resolve_claims(db, claim_ids)
+
+        optional_flag = (optional_flags or {}).get(status)
+        hospital_options: Dict[str, Dict] = {}
+        results = {}
+        accepted = []
+        for claim_id in claim_ids:
+            snapshot = snapshots.get(claim_id)
+            if snapshot is None:
+                results[claim_id] = {'claim_id': claim_id, 'success': False, 'error': f'Claim {claim_id} not found'}
+                continue
+            claim_data = snapshot.to_dict() or {}
+            hospital_id = claim_data.get('hospital_id', '')
+            if optional_flag:
+                if hospital_id not in hospital_options:
+                    hospital_options[hospital_id] = status_options(db, hospital_id)
+                if not hospital_options[hospital_id].get(optional_flag, False):
+                    results[claim_id] = {
+                        'claim_id': claim_id,
+                        'success': False,
+                        'error': f"Status '{status}' is disabled for hospital {hospital_id or 'UNKNOWN'}"
+                    }
+                    continue
+            accepted.append((claim_id, snapshot, claim_data))
+
+        update_data = {
+            'claim_status': status,
+            'processed_at': firestore.SERVER_TIMESTAMP,
+            'processed_by': actor['id'],
+            'processed_by_email': actor['email'],
+            'processing_remarks': remarks,
+            'updated_at': firestore.SERVER_TIMESTAMP
+        }
+
+        committed = []
+        # Two writes per claim: the update and its audit transaction
+        for chunk in _chunks(accepted, MAX_BATCH_WRITES // 2):
+            batch = db.batch()
+            for claim_id, snapshot, claim_data in chunk:
+                batch.update(snapshot.reference, update_data)
+                transaction_id, transaction_data = build_transaction_record(
+                    claim_id=snapshot.id,
+                    transaction_type=TRANSACTION_TYPES.get(status, TransactionType.UPDATED),
+                    performed_by=actor['id'],
+                    performed_by_email=actor['email'],
+                    performed_by_name=actor['name'],
+                    performed_by_role='processor',
+                    previous_status=claim_data.get('claim_status'),
+                    new_status=status,
+                    remarks=remarks,
+                    metadata={'processing_action': status, 'bulk': True}
+                )
+                batch.set(snapshot.reference.collection('transactions').document(transaction_id), transaction_data)
+            try:
+                batch.commit()
+            except Exception as err:
+                logger.error("bulk_processing: batch of %d claims failed: %s", len(chunk), err)
+                for claim_id, _, _ in chunk:
+                    results[claim_id] = {
+                        'claim_id': claim_id,
+                        'success': False,
+                        'error': f'Error processing claim {claim_id}: {err}'
+                    }
+                continue
+            committed.extend(chunk)
+
+        record_claim_changes(db, [snapshot.id for _, snapshot, _ in committed])
+
+        def notify(item):
+            claim_id, _, claim_data = item
+            return self._notify(claim_id, {**claim_data, **update_data}, status, remarks, actor)
+
+        for (claim_id, snapshot, claim_data), notified in zip(committed, self._executor.map(notify, committed)):
+            results[claim_id] = {
+                'claim_id': claim_id,
+                'success': True,
+                'document_id': snapshot.id,
+                'previous_status': claim_data.get('claim_status'),
+                'notified': notified
+            }
+
+        return [results[claim_id] for claim_id in claim_ids]
+
+    def _notify(self, claim_id: str, claim_data: Dict, status: str, remarks: str, actor: Dict) -> bool:
+        notifier = NOTIFIERS.get(status)
+        if not notifier:
+            return False
+        kwargs = {
+            'claim_id': claim_id,
+            'claim_data': claim_data,
+            'processor_id': actor['id'],
+            'processor_name': actor['name'],
+            'processor_email': actor['email'],
+            'remarks': remarks
+        }
+        if status == 'claim_denial':
+            kwargs['rejection_reason'] = remarks
+        try:
+            return bool(getattr(self.notification_client_factory(), notifier)(**kwargs))
+        except Exception as err:
+            # Log but don't fail bulk processing if notification fails
+            logger.error("Failed to send notification for bulk processed claim %s: %s", claim_id, err)
+            return False
+
+
+# Singleton instance
+_bulk_claim_processor = None
+
+
+def get_bulk_claim_processor() -> BulkClaimProcessor:
+    """Get singleton bulk claim processor instance"""
+    global _bulk_claim_processor
+    if _bulk_claim_processor is None:
+        from firebase_config import get_firestore
+
+        _bulk_claim_processor = BulkClaimProcessor(
+            get_firestore,
+            workers=getattr(Config, 'BULK_PROCESS_WORKERS', DEFAULT_WORKERS)
+        )
+    return _bulk_claim_processor
@@ -0,0 +1,114 @@
+"""
+Claim ID allocation.
+
+Claims are numbered ``CSHLSIP-YYYYMMDD-N`` with ``N`` counting up from 0
+each day. The next ``N`` lives in a per-day counter document,
+``claim_id_sequences/CSHLSIP-YYYYMMDD``, advanced in a Firestore
+transaction, so an ID costs one document read and write however many claims
+the day already has, and concurrent submissions never get the same ID.
+
+The first allocation of a day creates the counter. Claims numbered by the
+old scan-and-``max()`` scheme may already exist for that day (on the day
+this is deployed), so that one transaction seeds the counter past them.
+
+With ``block_size`` > 1 each worker reserves that many IDs per transaction
+and hands them out from memory. IDs then stay unique but are no longer
+issued in submission order across workers, and a block a worker does not
+use up before restarting or the day ending is skipped, leaving gaps.
+"""
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from google.cloud import firestore
+
+from config import Config
+
+SEQUENCES_COLLECTION = 'claim_id_sequences'
+CLAIMS_COLLECTION = 'direct_claims'
+CLAIM_ID_PREFIX = 'CSHLSIP'
+# The old allocator fell back to epoch seconds as N when its scan failed
+FALLBACK_SEQUENCE_MIN = 10 ** 9
+
+
+def day_prefix(day: str) -> str:
+    return f'{CLAIM_ID_PREFIX}-{day}-'
+
+
+def _highest_existing_sequence(transaction, db, prefix: str) -> int:
+    """Highest ``N`` among existing claims with ``prefix``, or -1, ignoring timestamp fallbacks."""
+    query = (
+        db.collection(CLAIMS_COLLECTION)
+        .where('claim_id', '>=', prefix)
+        .where('claim_id', '<', prefix + '\uf8ff')
+    )
+    highest = -1
+    for snapshot in transaction.get(query):
+        suffix = (snapshot.to_dict() or {}).get('claim_id', '')[len(prefix):]
+        if suffix.isdigit() and int(suffix) < FALLBACK_SEQUENCE_MIN:
+            highest = max(highest, int(suffix))
+    return highest
+
+
+@firestore.transactional
+def _reserve(transaction, db, counter_ref, prefix: str, count: int) -> int:
+    """Reserve ``count`` consecutive sequence numbers; returns the first."""
+    snapshot = counter_ref.get(transaction=transaction)
+    if snapshot.exists:
+        first = (snapshot.to_dict() or {}).get('next', 0)
+    else:
+        first = _highest_existing_sequence(transaction, db, prefix) + 1
+    transaction.set(counter_ref, {
+        'prefix': prefix,
+        'next': first + count,
+        'updated_at': firestore.SERVER_TIMESTAMP
+    })
+    return first
+
+
+class ClaimIdAllocator:
+    """Hands out claim IDs from per-day counters, optionally in leased blocks."""
+
+    def __init__(self, db_factory, block_size: int = 1):
+        self.db_factory = db_factory
+        self.block_size = max(1, int(block_size))
+        self._blocks: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def _reserve(self, day: str, count: int) -> int:
+        db = self.db_factory()
+        counter_ref = db.collection(SEQUENCES_COLLECTION).document(f'{CLAIM_ID_PREFIX}-{day}')
+        return _reserve(db.transaction(), db, counter_ref, day_prefix(day), count)
+
+    def allocate(self, day: Optional[str] = None) -> str:
+        """The next claim ID for ``day`` (YYYYMMDD, default today)."""
+        day = day or datetime.now().strftime('%Y%m%d')
+        if self.block_size == 1:
+            return f'{day_prefix(day)}{self._reserve(day, 1)}'
+
+        with self._lock:
+            next_sequence, end = self._blocks.get(day, (0, 0))
+            if next_sequence >= end:
+                next_sequence = self._reserve(day, self.block_size)
+                end = next_sequence + self.block_size
+                # Blocks of earlier days can no longer be used
+                self._blocks = {}
+            self._blocks[day] = (next_sequence + 1, end)
+        return f'{day_prefix(day)}{next_sequence}'
+
+
+# Singleton instance
+_claim_id_allocator = None
+
+
+def get_claim_id_allocator() -> ClaimIdAllocator:
+    """Get singleton claim ID allocator instance"""
+    global _claim_id_allocator
+    if _claim_id_allocator is None:
+        from firebase_config import get_firestore
+
+        _claim_id_allocator = ClaimIdAllocator(
+            get_firestore,
+            block_size=getattr(Config, 'CLAIM_ID_BLOCK_SIZE', 1)
+        )
+    return _claim_id_allocator
@@ -0,0 +1,271 @@
+"""
+Claim reference resolution.
+
+Routes receive claims by document ID, by ``claim_id`` or by a loosely typed
+variant of either (``CSHLSIP 20260101 5``, lower case, ...). Resolving these
+used to mean a document read per guessed ID and then a ``claim_id`` query per
+guess, so an unknown ID cost a dozen or more round trips.
+
+``ClaimResolver.get`` resolves a reference instead with:
+
+1. An in-process cache of ``alias key -> document ID``. A hit costs one read,
+   of the claim itself. Unknown references are cached too, for
+   ``negative_ttl_seconds``.
+2. On a miss, one ``get_all`` of every candidate document ID together with
+   the reference's alias document, ``claim_id_aliases/{alias key}``, which
+   maps the key to the claim's document ID. Claims stored under their own
+   claim ID are found here, and so are claims with an alias.
+3. Failing that, one ``claim_id`` ``in`` query over the candidates. A claim
+   found this way gets an alias document so the next lookup does not need
+   the query.
+
+The alias key is the normalized ID in upper case (see ``alias_key``). New
+claims are registered when they are created, and ``backfill_claim_aliases.py``
+writes aliases for existing claims whose document ID is not a variant of
+their claim ID.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from google.cloud import firestore
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+CLAIMS_COLLECTION = 'direct_claims'
+ALIASES_COLLECTION = 'claim_id_aliases'
+
+DEFAULT_TTL_SECONDS = 600
+DEFAULT_NEGATIVE_TTL_SECONDS = 30
+DEFAULT_MAX_ENTRIES = 10000
+MAX_BATCH_WRITES = 500
+
+# Cached marker for references that resolved to no claim
+_NOT_FOUND = ''
+
+
+def normalize_claim_id(raw_claim_id) -> str:
+    """Normalize claim IDs to a canonical format used in Firestore."""
+    if not raw_claim_id:
+        return ''
+    value = str(raw_claim_id).strip()
+    replacements = (
+        ('CSHLSIP ', 'CSHLSIP-'),
+        ('CLS ', 'CLS-'),
+    )
+    for old, new in replacements:
+        value = value.replace(old, new)
+    value = value.replace('  ', ' ')
+    return value.replace(' ', '-')
+
+
+def _valid_document_id(value: str) -> bool:
+    return bool(value) and '/' not in value and value not in ('.', '..') \
+        and not (value.startswith('__') and value.endswith('__')) and len(value.encode('utf-8')) <= 1500
+
+
+def alias_key(raw_claim_id) -> str:
+    """Cache and alias document key of a claim reference ('' if unusable)."""
+    key = normalize_claim_id(raw_claim_id).upper()
+    return key if _valid_document_id(key) else ''
+
+
+def claim_id_candidates(raw_claim_id) -> List[str]:
+    """Variants a claim reference may be stored under, most literal first."""
+    base = str(raw_claim_id or '').strip()
+    normalized = normalize_claim_id(base)
+    variants = [
+        base,
+        normalized,
+        base.replace(' ', '-'),
+        base.replace(' ', ''),
+        normalized.replace(' ', ''),
+        base.upper(),
+        base.lower(),
+        normalized.upper(),
+        normalized.lower(),
+    ]
+    return [candidate for candidate in dict.fromkeys(variants) if _valid_document_id(candidate)]
+
+
+class ClaimResolver:
+    """Resolves claim references to ``direct_claims`` snapshots."""
+
+    def __init__(self, db_factory, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 negative_ttl_seconds: float = DEFAULT_NEGATIVE_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.db_factory = db_factory
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_entries = max_entries
+        self._cache: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def _cached(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            doc_id, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return doc_id
+
+    def _remember(self, key: str, doc_id: str) -> None:
+        ttl = self.ttl_seconds if doc_id else self.negative_ttl_seconds
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._cache[key] = (doc_id, time.monotonic() + ttl)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def invalidate(self, raw_claim_id) -> None:
+        key = alias_key(raw_claim_id)
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def get(self, raw_claim_id, db=None):
+        """
+        Snapshot of the claim ``raw_claim_id`` refers to, or None.
+
+        ``db`` defaults to the resolver's client.
+        """
+        key = alias_key(raw_claim_id)
+        if not key:
+            return None
+        db = db or self.db_factory()
+        claims = db.collection(CLAIMS_COLLECTION)
+
+        doc_id = self._cached(key)
+        if doc_id == _NOT_FOUND:
+            self.negative_hits += 1
+            return None
+        if doc_id:
+            snapshot = claims.document(doc_id).get()
+            if snapshot.exists:
+                self.hits += 1
+                return snapshot
+            # Deleted since it was cached
+            self.invalidate(key)
+
+        self.misses += 1
+        candidates = claim_id_candidates(raw_claim_id)
+        alias_ref = db.collection(ALIASES_COLLECTION).document(key)
+        snapshots = {
+            snapshot.reference.path: snapshot
+            for snapshot in db.get_all([claims.document(candidate) for candidate in candidates] + [alias_ref])
+        }
+        for candidate in candidates:
+            snapshot = snapshots.get(claims.document(candidate).path)
+            if snapshot is not None and snapshot.exists:
+                self._remember(key, snapshot.id)
+                return snapshot
+
+        alias = snapshots.get(alias_ref.path)
+        if alias is not None and alias.exists:
+            snapshot = claims.document((alias.to_dict() or {}).get('doc_id', '') or key).get()
+            if snapshot.exists:
+                self._remember(key, snapshot.id)
+                return snapshot
+
+        matches = claims.where('claim_id', 'in', candidates).limit(1).get() if candidates else []
+        if not matches:
+            self._remember(key, _NOT_FOUND)
+            return None
+        snapshot = matches[0]
+        try:
+            alias_ref.set(_alias_document(snapshot))
+        except Exception as err:
+            logger.warning("claim_resolver: failed to store alias %s: %s", key, err)
+        self._remember(key, snapshot.id)
+        return snapshot
+
+    def register(self, claim_id: str, doc_id: str, db=None) -> None:
+        """
+        Record where a newly written claim lives.
+
+        Writes an alias document only when ``doc_id`` is not one of the
+        claim ID's candidates, i.e. when ``get`` could not find it directly.
+        """
+        key = alias_key(claim_id)
+        if not key:
+            return
+        if doc_id not in claim_id_candidates(claim_id):
+            db = db or self.db_factory()
+            db.collection(ALIASES_COLLECTION).document(key).set({
+                'claim_id': claim_id,
+                'doc_id': doc_id,
+                'updated_at': firestore.SERVER_TIMESTAMP
+            })
+        self._remember(key, doc_id)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = len(self._cache)
+        return {'entries': entries, 'hits': self.hits, 'negative_hits': self.negative_hits, 'misses': self.misses}
+
+
+def _alias_document(snapshot) -> Dict:
+    return {
+        'claim_id': (snapshot.to_dict() or {}).get('claim_id'),
+        'doc_id': snapshot.id,
+        'updated_at': firestore.SERVER_TIMESTAMP
+    }
+
+
+def backfill_aliases(db, dry_run: bool = False) -> Dict:
+    """
+    Write alias documents for claims stored under a document ID that is not a
+    variant of their claim ID. Returns counts.
+    """
+    summary = {'scanned': 0, 'aliases': 0}
+    batch = db.batch()
+    pending = 0
+    for snapshot in db.collection(CLAIMS_COLLECTION).select(['claim_id']).stream():
+        summary['scanned'] += 1
+        claim_id = (snapshot.to_dict() or {}).get('claim_id')
+        key = alias_key(claim_id)
+        if not key or snapshot.id in claim_id_candidates(claim_id):
+            continue
+        summary['aliases'] += 1
+        if dry_run:
+            continue
+        batch.set(db.collection(ALIASES_COLLECTION).document(key), _alias_document(snapshot))
+        pending += 1
+        if pending >= MAX_BATCH_WRITES:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+    return summary
+
+
+# Singleton instance
+_claim_resolver = None
+
+
+def get_claim_resolver() -> ClaimResolver:
+    """Get singleton claim resolver instance"""
+    global _claim_resolver
+    if _claim_resolver is None:
+        from firebase_config import get_firestore
+
+        _claim_resolver = ClaimResolver(
+            get_firestore,
+            ttl_seconds=getattr(Config, 'CLAIM_RESOLVER_TTL_SECONDS', DEFAULT_TTL_SECONDS),
+            negative_ttl_seconds=getattr(Config, 'CLAIM_RESOLVER_NEGATIVE_TTL_SECONDS', DEFAULT_NEGATIVE_TTL_SECONDS),
+            max_entries=getattr(Config, 'CLAIM_RESOLVER_CACHE_SIZE', DEFAULT_MAX_ENTRIES)
+        )
+    return _claim_resolver
@@ -0,0 +1,264 @@
+"""
+Streaming CSV export of a hospital's claims.
+
+The export pages through ``direct_claims`` with Firestore cursors and yields
+CSV rows as they are read, so worker memory stays flat however many claims a
+hospital has and the first bytes reach the client before the scan finishes.
+Output can be gzip-encoded on the fly, and progress (pages, rows, bytes,
+elapsed time) is logged while the export runs.
+"""
+import csv
+import logging
+import time
+import zlib
+from io import StringIO
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from google.cloud import firestore
+
+from utils.pagination import DOCUMENT_ID_FIELD, cursor_for
+from utils.projections import select_fields
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 500
+# Flush the CSV buffer to the client once it grows past this many characters.
+CHUNK_SIZE = 64 * 1024
+# Log export progress every this many rows.
+PROGRESS_EVERY_ROWS = 5000
+
+EXPORT_COLUMNS = (
+    ('Claim ID', 'claim_id'),
+    ('Status', 'claim_status'),
+    ('Patient Name', 'patient_name'),
+    ('Claimed Amount', 'claimed_amount'),
+    ('Specialty', 'specialty'),
+    ('Hospital Name', 'hospital_name'),
+    ('Hospital ID', 'hospital_id'),
+    ('Created By (Email)', 'created_by_email'),
+    ('Created At', 'created_at'),
+    ('Submission Date', 'submission_date'),
+)
+
+
+def hospital_claims_query(db, status: str = 'all', start_date: Optional[str] = None,
+                          end_date: Optional[str] = None):
+    """
+    Projected ``direct_claims`` query for the hospital claim list and export.
+
+    ``start_date``/``end_date`` are inclusive ``YYYY-MM-DD`` bounds on
+    ``created_at``; a malformed date raises ValueError.
+    """
+    query = select_fields(db.collection('direct_claims'), 'hospital_claims')
+
+    if status != 'all':
+        query = query.where('claim_status', '==', status)
+
+    if start_date:
+        query = query.where('created_at', '>=', datetime.strptime(start_date, '%Y-%m-%d'))
+
+    if end_date:
+        query = query.where('created_at', '<', datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1))
+
+    return query
+
+
+def belongs_to_hospital(claim_data: Dict, user_hospital_id: str, user_hospital_name: str) -> bool:
+    """Match a claim to the user's hospital by ID, or by name (case-insensitive)."""
+    claim_hospital_id = (claim_data.get('hospital_id') or '').strip()
+    claim_hospital_name = (claim_data.get('hospital_name') or '').strip()
+    if claim_hospital_id and user_hospital_id and claim_hospital_id == user_hospital_id:
+        return True
+    return bool(
+        claim_hospital_name and user_hospital_name
+        and claim_hospital_name.upper() == user_hospital_name.upper()
+    )
+
+
+def claim_list_entry(doc_id: str, claim_data: Dict) -> Optional[Dict]:
+    """
+    Serialize a claim for the hospital claim list and export.
+
+    Returns None for drafts and for documents that are not claim form
+    submissions.
+    """
+    status_value = claim_data.get('claim_status', '') or claim_data.get('status', '')
+    claim_id_value = claim_data.get('claim_id', doc_id)
+
+    # Skip drafts (drafts have claim_status == 'draft')
+    if status_value == 'draft' or 'draft' in claim_id_value.lower():
+        return None
+    if not (claim_id_value.startswith('CSHLSIP') or claim_id_value.startswith('CLS')):
+        return None
+
+    form_data = claim_data.get('form_data', {})
+    patient_name = (
+        form_data.get('patient_name', '') or
+        claim_data.get('email', '') or
+        claim_data.get('created_by_name', '')
+    )
+    payer_name = form_data.get('payer_name', '') or claim_data.get('payer_name', '')
+    claimed_amount = form_data.get('claimed_amount', '') or claim_data.get('total_bill_amount', '')
+    specialty = form_data.get('specialty', '') or claim_data.get('stage', '')
+
+    created_at = claim_data.get('created_at', '')
+    if hasattr(created_at, 'isoformat'):
+        created_at = created_at.isoformat()
+
+    submission_date = claim_data.get('submission_date', '')
+    if hasattr(submission_date, 'isoformat'):
+        submission_date = submission_date.isoformat()
+
+    return {
+        'claim_id': claim_id_value,
+        'claim_status': status_value,
+        'created_at': str(created_at),
+        'submission_date': str(submission_date),
+        'patient_name': patient_name,
+        'payer_name': payer_name,
+        'claimed_amount': claimed_amount,
+        'specialty': specialty,
+        'hospital_name': claim_data.get('hospital_name', ''),
+        'hospital_id': claim_data.get('hospital_id', ''),
+        'created_by_email': claim_data.get('created_by_email', '') or claim_data.get('email', '')
+    }
+
+
+class ExportProgress:
+    """Counters for one running export, logged periodically and at the end."""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.started = time.monotonic()
+        self.pages = 0
+        self.scanned = 0
+        self.rows = 0
+        self.bytes = 0
+        self._next_report = PROGRESS_EVERY_ROWS
+
+    def row_written(self) -> None:
+        self.rows += 1
+        if self.rows >= self._next_report:
+            self._next_report += PROGRESS_EVERY_ROWS
+            self.log('progress')
+
+    def as_dict(self) -> Dict:
+        return {
+            'pages': self.pages,
+            'scanned': self.scanned,
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'elapsed_seconds': round(time.monotonic() - self.started, 3)
+        }
+
+    def log(self, stage: str) -> None:
+        logger.info("claims_export[%s] %s: %s", self.label, stage, self.as_dict())
+
+
+def iter_query_page_batches(query, order_field: str, page_size: int = DEFAULT_PAGE_SIZE,
+                            cursor: Optional[Tuple[Any, str]] = None) -> Iterator[List]:
+    """
+    Yield the documents matching ``query`` newest first, one page (list) at a time.
+
+    Each page is a separate ``stream()`` resumed with ``start_after`` on
+    ``(order_field, __name__)``, so no single RPC runs for the whole export
+    and only one page of snapshots is alive at a time. ``cursor`` is an
+    ``(order_value, document_id)`` pair to resume after. Documents missing
+    ``order_field`` are not returned (Firestore ordering semantics).
+    """
+    ordered = (
+        query.order_by(order_field, direction=firestore.Query.DESCENDING)
+        .order_by(DOCUMENT_ID_FIELD, direction=firestore.Query.DESCENDING)
+        .limit(page_size)
+    )
+    last = cursor_for(order_field, *cursor) if cursor is not None else None
+    while True:
+        page = ordered.start_after(last) if last is not None else ordered
+        snapshots = list(page.stream())
+        if snapshots:
+            yield snapshots
+            last = snapshots[-1]
+        if len(snapshots) < page_size:
+            return
+
+
+def iter_query_pages(query, order_field: str, page_size: int = DEFAULT_PAGE_SIZE,
+                     progress: Optional[ExportProgress] = None) -> Iterator:
+    """Stream every document matching ``query``; see ``iter_query_page_batches``."""
+    for snapshots in iter_query_page_batches(query, order_field, page_size):
+        if progress is not None:
+            progress.pages += 1
+        yield from snapshots
+
+
+def iter_hospital_claims(snapshots: Iterable, user_hospital_id: str, user_hospital_name: str,
+                         limit: Optional[int] = None,
+                         progress: Optional[ExportProgress] = None) -> Iterator[Dict]:
+    """Yield export entries for the user's hospital, stopping after ``limit`` rows."""
+    if limit is not None and limit <= 0:
+        return
+    produced = 0
+    for snapshot in snapshots:
+        if progress is not None:
+            progress.scanned += 1
+        claim_data = snapshot.to_dict() or {}
+        if not belongs_to_hospital(claim_data, user_hospital_id, user_hospital_name):
+            continue
+        entry = claim_list_entry(snapshot.id, claim_data)
+        if entry is None:
+            continue
+        yield entry
+        produced += 1
+        if limit is not None and produced >= limit:
+            return
+
+
+def iter_csv(entries: Iterable[Dict], progress: Optional[ExportProgress] = None,
+             gzip: bool = False, header: bool = True) -> Iterator[bytes]:
+    """
+    Encode export entries as CSV chunks of roughly ``CHUNK_SIZE``.
+
+    With ``gzip`` the chunks form a single gzip stream suitable for
+    ``Content-Encoding: gzip``.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow([title for title, _ in EXPORT_COLUMNS])
+
+    def flush(final: bool = False) -> bytes:
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        if compressor is not None:
+            data = compressor.compress(data)
+            if final:
+                data += compressor.flush()
+        if progress is not None:
+            progress.bytes += len(data)
+        return data
+
+    try:
+        for entry in entries:
+            writer.writerow([entry.get(key, '') for _, key in EXPORT_COLUMNS])
+            if progress is not None:
+                progress.row_written()
+            if buffer.tell() >= CHUNK_SIZE:
+                chunk = flush()
+                if chunk:
+                    yield chunk
+        chunk = flush(final=True)
+        if chunk:
+            yield chunk
+        if progress is not None:
+            progress.log('completed')
+    except GeneratorExit:
+        if progress is not None:
+            progress.log('aborted by client')
+        raise
+    except Exception as err:
+        if progress is not None:
+            progress.log(f'failed ({err})')
+        raise
@@ -6,6 +6,14 @@ from PIL import Image
 from werkzeug.datastructures import FileStorage
 from typing import Tuple, Optional
 
+try:
+    import pypdf
+except ImportError:  # PDF compression is skipped without pypdf
+    pypdf = None
+
+# Images embedded in PDFs are downsampled to this width
+PDF_IMAGE_MAX_WIDTH = 1600
+
 def compress_image(file: FileStorage, max_width: int = 1920, quality: int = 85) -> Tuple[FileStorage, int]:
     """
     Compress image files while maintaining quality
@@ -24,38 +32,15 @@ def compress_image(file: FileStorage, max_width: int = 1920, quality: int = 85)
         original_size = file.tell()
         file.seek(0)  # Reset to beginning
         
-        # Open image
-        image = Image.open(file)
-        
-        # Convert RGBA to RGB if necessary
-        if image.mode in ('RGBA', 'LA'):
-            # Create white background
-            background = Image.new('RGB', image.size, (255, 255, 255))
-            if image.mode == 'RGBA':
-                background.paste(image, mask=image.split()[-1])
-            else:
-                background.paste(image)
-            image = background
-        elif image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # Resize if too large
-        if image.width > max_width:
-            ratio = max_width / image.width
-            new_height = int(image.height * ratio)
-            image = image.resize((max_width, new_height), Image.Resampling.LANCZOS)
-        
-        # Compress to bytes
-        output = io.BytesIO()
-        image.save(output, format='JPEG', quality=quality, optimize=True)
-        output.seek(0)
+        compressed, content_type = compress_image_bytes(file.read(), max_width=max_width, quality=quality)
+        output = io.BytesIO(compressed)
         
         # Create new FileStorage object
         compressed_file = FileStorage(
             stream=output,
             filename=file.filename,
-            content_type='image/jpeg',
-            content_length=output.getbuffer().nbytes
+            content_type=content_type,
+            content_length=len(compressed)
         )
         
         return compressed_file, original_size
@@ -66,9 +51,88 @@ def compress_image(file: FileStorage, max_width: int = 1920, quality: int = 85)
         file.seek(0)
         return file, file.tell()
 
+def _to_rgb(image: Image.Image) -> Image.Image:
+    """Flatten transparency onto white and convert to RGB for JPEG encoding"""
+    if image.mode in ('RGBA', 'LA'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        if image.mode == 'RGBA':
+            background.paste(image, mask=image.split()[-1])
+        else:
+            background.paste(image)
+        return background
+    if image.mode != 'RGB':
+        return image.convert('RGB')
+    return image
+
+def compress_image_bytes(data: bytes, max_width: int = 1920, quality: int = 85) -> Tuple[bytes, str]:
+    """
+    Resize and re-encode an image as JPEG
+    
+    Pure function of its arguments so it can run in a worker process.
+    
+    Returns:
+        Tuple of (jpeg_bytes, content_type)
+    """
+    image = _to_rgb(Image.open(io.BytesIO(data)))
+    if image.width > max_width:
+        ratio = max_width / image.width
+        image = image.resize((max_width, int(image.height * ratio)), Image.Resampling.LANCZOS)
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=quality, optimize=True)
+    return output.getvalue(), 'image/jpeg'
+
+def compress_pdf_bytes(data: bytes, max_image_width: int = PDF_IMAGE_MAX_WIDTH, quality: int = 85) -> bytes:
+    """
+    Compress a PDF: downsample and re-encode embedded images, recompress
+    content streams and drop duplicate or unused objects
+    
+    Returns the original bytes when pypdf is unavailable or the result is
+    not smaller.
+    """
+    if pypdf is None:
+        return data
+    
+    writer = pypdf.PdfWriter(clone_from=pypdf.PdfReader(io.BytesIO(data)))
+    for page in writer.pages:
+        for embedded in page.images:
+            try:
+                image = embedded.image
+                if image.mode not in ('RGB', 'L'):
+                    image = _to_rgb(image)
+                if image.width > max_image_width:
+                    ratio = max_image_width / image.width
+                    image = image.resize((max_image_width, max(1, int(image.height * ratio))), Image.Resampling.LANCZOS)
+                embedded.replace(image, quality=quality)
+            except Exception as e:
+                # Leave images pypdf cannot decode (e.g. JBIG2) as they are
+                print(f"Skipping PDF image during compression: {e}")
+        page.compress_content_streams(level=9)
+    writer.compress_identical_objects()
+    
+    output = io.BytesIO()
+    writer.write(output)
+    compressed = output.getvalue()
+    return compressed if len(compressed) < len(data) else data
+
+def compress_bytes(data: bytes, content_type: str, quality: int = 85) -> Tuple[bytes, str]:
+    """
+    Compress file content according to its type
+    
+    Entry point for the compression worker pool.
+    
+    Returns:
+        Tuple of (content, content_type); unsupported types come back unchanged
+    """
+    content_type = content_type or ''
+    if content_type.startswith('image/'):
+        return compress_image_bytes(data, quality=quality)
+    if content_type == 'application/pdf':
+        return compress_pdf_bytes(data, quality=quality), content_type
+    return data, content_type
+
 def compress_pdf(file: FileStorage) -> Tuple[FileStorage, int]:
     """
-    Compress PDF files (placeholder - would need PyPDF2 or similar)
+    Compress PDF files (embedded images and content streams)
     
     Args:
         file: Original PDF file
@@ -76,12 +140,29 @@ def compress_pdf(file: FileStorage) -> Tuple[FileStorage, int]:
     Returns:
         Tuple of (compressed_file, original_size)
     """
-    # For now, return original file
-    # In production, you'd use PyPDF2 or similar library
     file.seek(0, 2)
     original_size = file.tell()
     file.seek(0)
-    return file, original_size
+    try:
+        data = file.read()
+        compressed = compress_pdf_bytes(data)
+    except Exception as e:
+        print(f"Error compressing PDF: {e}")
+        file.seek(0)
+        return file, original_size
+    
+    if compressed is data:
+        file.seek(0)
+        return file, original_size
+    
+    output = io.BytesIO(compressed)
+    compressed_file = FileStorage(
+        stream=output,
+        filename=file.filename,
+        content_type='application/pdf',
+        content_length=len(compressed)
+    )
+    return compressed_file, original_size
 
 def compress_document(file: FileStorage, max_size_mb: float = 5.0, quality: int = 85) -> Tuple[FileStorage, int, bool]:
     """
@@ -0,0 +1,198 @@
+"""
+Background compression of uploaded documents.
+
+Upload requests store the original file and return; when the file is large
+enough to be worth compressing, its ``documents/{id}`` record gets
+``compression.status = 'pending'`` and the document is queued here. A small
+thread pool downloads the original, hands the bytes to a process pool for
+the CPU-bound work (Pillow resizing/JPEG encoding, PDF image downsampling and
+stream recompression, see ``utils.compression``), and swaps the result in
+place of the original when it is smaller. The object path does not change,
+so signed URLs stay valid; the upload is conditional on the original's
+generation so a file replaced in the meantime is never overwritten.
+
+The outcome is recorded on the document: ``file_size``/``file_type`` of the
+stored object and ``compression`` stats with a ``status`` of 'completed',
+'skipped' (not smaller) or 'failed'. Queued work lives in memory only; a
+worker restart leaves such documents uncompressed with status 'pending'.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from google.api_core import exceptions as gcloud_exceptions
+from google.cloud import firestore
+
+from config import Config
+from utils.compression import compress_bytes, compress_document, get_compression_stats
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+DEFAULT_THRESHOLD_BYTES = 5 * 1024 * 1024
+DEFAULT_QUALITY = 85
+
+STATUS_PENDING = 'pending'
+STATUS_COMPLETED = 'completed'
+STATUS_SKIPPED = 'skipped'
+STATUS_FAILED = 'failed'
+
+
+def compression_metadata(original_size: int, stored_size: int, was_compressed: bool,
+                         status: Optional[str] = None) -> Dict:
+    """The ``compression`` field of a document record."""
+    stats = get_compression_stats(original_size, stored_size)
+    metadata = {
+        'was_compressed': was_compressed,
+        'compression_ratio': stats['compression_ratio'],
+        'size_reduction_percent': stats['size_reduction_percent'],
+        'bytes_saved': stats['bytes_saved']
+    }
+    if status:
+        metadata['status'] = status
+    return metadata
+
+
+class CompressionPipeline:
+    """Compresses stored documents off the request path."""
+
+    def __init__(self, db_factory, bucket_factory, workers: int = DEFAULT_WORKERS,
+                 threshold_bytes: int = DEFAULT_THRESHOLD_BYTES, quality: int = DEFAULT_QUALITY,
+                 enabled: bool = True, use_processes: bool = True):
+        self.db_factory = db_factory
+        self.bucket_factory = bucket_factory
+        self.workers = max(1, int(workers))
+        self.threshold_bytes = threshold_bytes
+        self.quality = quality
+        self.enabled = enabled
+        self.use_processes = use_processes
+        self._threads = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='compression')
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def needs_compression(self, size: int, content_type: Optional[str]) -> bool:
+        content_type = content_type or ''
+        return size > self.threshold_bytes and (
+            content_type.startswith('image/') or content_type == 'application/pdf'
+        )
+
+    def prepare(self, file) -> Tuple[object, int, bool, bool]:
+        """
+        Decide how an incoming upload is stored.
+
+        Returns ``(file_to_store, original_size, was_compressed, deferred)``.
+        With the pipeline enabled the original is stored as is and
+        ``deferred`` says whether to ``submit`` it once its record exists;
+        otherwise the file is compressed inline as before.
+        """
+        file.seek(0, 2)
+        original_size = file.tell()
+        file.seek(0)
+        if not self.enabled:
+            compressed_file, original_size, was_compressed = compress_document(
+                file, max_size_mb=self.threshold_bytes / (1024 * 1024), quality=self.quality
+            )
+            return compressed_file, original_size, was_compressed, False
+        return file, original_size, False, self.needs_compression(original_size, file.content_type)
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._processes is None:
+                # Spawned, not forked: the parent holds gRPC threads and locks
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._processes
+
+    def _compress(self, data: bytes, content_type: str) -> Tuple[bytes, str]:
+        if not self.use_processes:
+            return compress_bytes(data, content_type, self.quality)
+        return self._process_pool().submit(compress_bytes, data, content_type, self.quality).result()
+
+    def submit(self, document_id: str, storage_path: str, content_type: str) -> Future:
+        return self._threads.submit(self._run_guarded, document_id, storage_path, content_type)
+
+    def _run_guarded(self, document_id: str, storage_path: str, content_type: str) -> Optional[str]:
+        try:
+            return self.run(document_id, storage_path, content_type)
+        except Exception as err:
+            logger.error("compression: document %s failed: %s", document_id, err)
+            try:
+                self._record(document_id, {'compression.status': STATUS_FAILED, 'compression.error': str(err)})
+            except Exception:
+                pass
+            return STATUS_FAILED
+
+    def _record(self, document_id: str, fields: Dict) -> None:
+        self.db_factory().collection('documents').document(document_id).update(fields)
+
+    def _record_shared(self, storage_path: str, document_id: str, fields: Dict) -> None:
+        # Deduplicated uploads (utils.document_dedup) reference the same object
+        db = self.db_factory()
+        for snapshot in db.collection('documents').where('storage_path', '==', storage_path).get():
+            if snapshot.id != document_id:
+                snapshot.reference.update(fields)
+
+    def run(self, document_id: str, storage_path: str, content_type: str) -> str:
+        """Compress one stored document and record the outcome; returns the status."""
+        bucket = self.bucket_factory()
+        original = bucket.get_blob(storage_path)
+        if original is None:
+            raise FileNotFoundError(storage_path)
+        data = original.download_as_bytes(if_generation_match=original.generation)
+
+        compressed, compressed_type = self._compress(data, content_type)
+        if len(compressed) >= len(data):
+            self._record(document_id, {
+                'compression': compression_metadata(len(data), len(data), False, STATUS_SKIPPED)
+            })
+            return STATUS_SKIPPED
+
+        try:
+            bucket.blob(storage_path).upload_from_string(
+                compressed, content_type=compressed_type, if_generation_match=original.generation
+            )
+        except gcloud_exceptions.PreconditionFailed:
+            logger.info("compression: %s changed while compressing, keeping it", storage_path)
+            self._record(document_id, {'compression.status': STATUS_SKIPPED})
+            return STATUS_SKIPPED
+
+        compression = compression_metadata(len(data), len(compressed), True, STATUS_COMPLETED)
+        compression['completed_at'] = firestore.SERVER_TIMESTAMP
+        fields = {
+            'file_size': len(compressed),
+            'file_type': compressed_type,
+            'compression': compression
+        }
+        self._record(document_id, fields)
+        self._record_shared(storage_path, document_id, fields)
+        logger.info(
+            "compression: %s %s -> %s bytes", document_id, len(data), len(compressed)
+        )
+        return STATUS_COMPLETED
+
+    def shutdown(self) -> None:
+        self._threads.shutdown(wait=False)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False)
+
+
+# Singleton instance
+_compression_pipeline = None
+
+
+def get_compression_pipeline() -> CompressionPipeline:
+    """Get singleton compression pipeline instance"""
+    global _compression_pipeline
+    if _compression_pipeline is None:
+        from firebase_config import get_firestore, get_storage
+
+        _compression_pipeline = CompressionPipeline(
+            get_firestore,
+            get_storage,
+            workers=getattr(Config, 'COMPRESSION_WORKERS', DEFAULT_WORKERS),
+            enabled=getattr(Config, 'COMPRESSION_ASYNC', True)
+        )
+    return _compression_pipeline
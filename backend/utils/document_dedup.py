@@ -0,0 +1,193 @@
+"""
+Content-addressed storage of uploaded documents.
+
+Hospitals regularly upload the same discharge summary or bill to a draft
+and again to the submitted claim. Each upload is hashed (SHA-256, read in
+chunks from the spooled upload, never whole in memory) and looked up in
+``document_contents/{hospital_id}_{sha256}``. A known hash makes the new
+``documents`` entry point at the object already stored, so nothing is
+uploaded or compressed again; an unknown one is stored under
+``IP_Claims/{hospital_id}/content/{sha256}-{token}.{ext}``.
+
+Every ``documents`` entry holds one reference. Deleting a document releases
+it in a transaction and the object is only deleted with the last reference.
+Contents are scoped per hospital, so a reference never grants access to
+another hospital's files. The ``token`` in the object name changes each time
+a hash is stored afresh: an object being deleted for its last reference can
+never be one a concurrent upload has just started referencing again.
+
+Documents stored before this (no ``content_sha256``) keep their own objects
+and are deleted as before.
+"""
+import hashlib
+import logging
+import os
+import uuid
+from typing import Dict, Optional, Tuple
+
+from google.cloud import firestore
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+CONTENTS_COLLECTION = 'document_contents'
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(file, chunk_size: int = HASH_CHUNK_SIZE) -> Tuple[str, int]:
+    """SHA-256 hex digest and size of an uploaded file, leaving it rewound."""
+    stream = getattr(file, 'stream', file)
+    stream.seek(0)
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        digest.update(chunk)
+        size += len(chunk)
+    stream.seek(0)
+    return digest.hexdigest(), size
+
+
+def content_id(hospital_id: str, sha256: str) -> str:
+    return f'{hospital_id}_{sha256}'
+
+
+def content_storage_path(hospital_id: str, sha256: str, extension: str = '') -> str:
+    suffix = f'.{extension}' if extension else ''
+    return f"IP_Claims/{hospital_id}/content/{sha256}-{uuid.uuid4().hex[:8]}{suffix}"
+
+
+@firestore.transactional
+def _acquire(transaction, content_ref, candidate: Dict) -> Tuple[Dict, bool]:
+    """Take a reference to a stored content; returns ``(entry, created)``."""
+    snapshot = content_ref.get(transaction=transaction)
+    entry = snapshot.to_dict() if snapshot.exists else None
+    if entry and entry.get('ref_count', 0) > 0:
+        transaction.update(content_ref, {
+            'ref_count': entry['ref_count'] + 1,
+            'last_referenced_at': firestore.SERVER_TIMESTAMP
+        })
+        return entry, False
+    transaction.set(content_ref, candidate)
+    return candidate, True
+
+
+@firestore.transactional
+def _release(transaction, content_ref) -> Optional[Dict]:
+    """Drop a reference; returns the entry when it was the last one."""
+    snapshot = content_ref.get(transaction=transaction)
+    if not snapshot.exists:
+        return None
+    entry = snapshot.to_dict() or {}
+    remaining = entry.get('ref_count', 0) - 1
+    if remaining > 0:
+        transaction.update(content_ref, {'ref_count': remaining})
+        return None
+    transaction.delete(content_ref)
+    return entry
+
+
+class ContentStore:
+    """Stores uploads once per hospital and content, with reference counts."""
+
+    def __init__(self, db_factory, bucket_factory, enabled: bool = True,
+                 chunk_size: int = HASH_CHUNK_SIZE):
+        self.db_factory = db_factory
+        self.bucket_factory = bucket_factory
+        self.enabled = enabled
+        self.chunk_size = chunk_size
+
+    def _ref(self, db, hospital_id: str, sha256: str):
+        return db.collection(CONTENTS_COLLECTION).document(content_id(hospital_id, sha256))
+
+    def store(self, file, hospital_id: str, storage_path: str) -> Dict:
+        """
+        Store an uploaded file and return where it lives.
+
+        ``storage_path`` is the per-upload path used when deduplication is
+        disabled; its extension is kept for content paths. The result has
+        ``storage_path``, ``size`` and ``content_type`` of the stored object,
+        the ``sha256`` of the upload (None when disabled) and whether an
+        existing object was ``deduplicated``.
+        """
+        bucket = self.bucket_factory()
+        if not self.enabled:
+            file.seek(0, 2)
+            size = file.tell()
+            file.seek(0)
+            bucket.blob(storage_path).upload_from_file(file, content_type=file.content_type)
+            return {'storage_path': storage_path, 'size': size, 'content_type': file.content_type,
+                    'sha256': None, 'deduplicated': False}
+
+        sha256, size = hash_file(file, self.chunk_size)
+        extension = os.path.splitext(storage_path)[1].lstrip('.').lower()
+        db = self.db_factory()
+        content_ref = self._ref(db, hospital_id, sha256)
+        candidate = {
+            'hospital_id': hospital_id,
+            'sha256': sha256,
+            'storage_path': content_storage_path(hospital_id, sha256, extension),
+            'size': size,
+            'content_type': file.content_type,
+            'ref_count': 1,
+            'created_at': firestore.SERVER_TIMESTAMP
+        }
+        entry, created = _acquire(db.transaction(), content_ref, candidate)
+        content_path = entry['storage_path']
+
+        if not created:
+            existing = bucket.get_blob(content_path)
+            if existing is not None:
+                logger.info("document_dedup: %s reuses %s", sha256[:12], content_path)
+                return {'storage_path': content_path, 'size': existing.size,
+                        'content_type': existing.content_type or file.content_type,
+                        'sha256': sha256, 'deduplicated': True}
+            # The first uploader has not finished storing it yet; the bytes
+            # are identical, so storing them again is harmless
+
+        try:
+            bucket.blob(content_path).upload_from_file(file, content_type=file.content_type)
+        except Exception:
+            self._release(db, content_ref)
+            raise
+        return {'storage_path': content_path, 'size': size, 'content_type': file.content_type,
+                'sha256': sha256, 'deduplicated': False}
+
+    def _release(self, db, content_ref) -> Optional[Dict]:
+        entry = _release(db.transaction(), content_ref)
+        if entry is not None:
+            self.bucket_factory().blob(entry['storage_path']).delete()
+        return entry
+
+    def release(self, doc_data: Dict) -> bool:
+        """
+        Release the object of a deleted document; returns whether it was
+        deleted (False while other documents still reference it).
+        """
+        sha256 = doc_data.get('content_sha256')
+        if not sha256:
+            self.bucket_factory().blob(doc_data.get('storage_path')).delete()
+            return True
+        db = self.db_factory()
+        return self._release(db, self._ref(db, doc_data.get('hospital_id', ''), sha256)) is not None
+
+
+# Singleton instance
+_content_store = None
+
+
+def get_content_store() -> ContentStore:
+    """Get singleton content store instance"""
+    global _content_store
+    if _content_store is None:
+        from firebase_config import get_firestore, get_storage
+
+        _content_store = ContentStore(
+            get_firestore,
+            get_storage,
+            enabled=getattr(Config, 'DOCUMENT_DEDUP_ENABLED', True)
+        )
+    return _content_store
@@ -0,0 +1,134 @@
+"""
+Document metadata for claim detail views.
+
+Claims reference their uploads by ID (``documents``, legacy
+``document_uploads`` or ``form_data.documents``), and some uploads are only
+linked through ``documents.claim_id``. The detail endpoints used to read
+each referenced ``documents/{id}`` on its own, then run the ``claim_id``
+query and sign a URL for every document without a stored one. Here all
+referenced documents are read with one ``get_all`` and merged with the
+``claim_id`` query in a single pass: two round trips per claim regardless of
+how many attachments it has.
+
+When a ``signer`` that signs locally is passed (see ``utils.signed_urls``),
+every document with a ``storage_path`` gets a fresh URL from it in one batch,
+without network calls. Otherwise no URLs are signed while hydrating:
+documents without a stored ``download_url`` carry a ``download_endpoint``
+instead, which the client calls (``GET /api/v1/documents/download/<id>``)
+only when the user opens the file.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+DOCUMENTS_COLLECTION = 'documents'
+DOWNLOAD_ENDPOINT = '/api/v1/documents/download/{document_id}'
+
+
+def referenced_document_ids(claim_data: Dict[str, Any]) -> List[str]:
+    """Document IDs a claim links to, in claim order (supports legacy storage)."""
+    documents = claim_data.get('documents', []) or []
+    if not documents:
+        documents = claim_data.get('document_uploads', []) or []
+    if not documents:
+        # Some legacy records keep uploads within form_data
+        form_documents = (claim_data.get('form_data') or {}).get('documents') or []
+        if isinstance(form_documents, list):
+            documents = form_documents
+    if not isinstance(documents, list):
+        documents = []
+
+    doc_ids = []
+    for doc in documents:
+        doc_id = None
+        if isinstance(doc, dict):
+            doc_id = doc.get('document_id') or doc.get('id') or doc.get('documentId')
+        elif isinstance(doc, str):
+            doc_id = doc
+        if doc_id:
+            doc_ids.append(doc_id)
+    return doc_ids
+
+
+def fetch_documents(db, doc_ids: Iterable[str]) -> List[Tuple[str, Dict[str, Any]]]:
+    """``(doc_id, data)`` for the existing documents among ``doc_ids``, in order, via one ``get_all``."""
+    ids = list(dict.fromkeys(doc_id for doc_id in doc_ids if doc_id))
+    if not ids:
+        return []
+    refs = [db.collection(DOCUMENTS_COLLECTION).document(doc_id) for doc_id in ids]
+    found = {
+        snapshot.id: snapshot.to_dict() or {}
+        for snapshot in db.get_all(refs)
+        if snapshot.exists
+    }
+    return [(doc_id, found[doc_id]) for doc_id in ids if doc_id in found]
+
+
+def document_entry(doc_id: str, doc_data: Dict[str, Any], linked: bool = True,
+                   format_timestamp: Callable[[Any], Any] = lambda value: str(value or ''),
+                   signed_url: Optional[str] = None) -> Dict[str, Any]:
+    """
+    API representation of a document.
+
+    ``linked`` is False for documents found only through the ``claim_id``
+    query; their status defaults to 'uploaded'. ``signed_url`` replaces the
+    stored (possibly expired) ``download_url``.
+    """
+    document_id = doc_data.get('document_id') or doc_id
+    entry = {
+        'document_id': document_id,
+        'document_type': doc_data.get('document_type'),
+        'document_name': doc_data.get('document_name'),
+        'original_filename': doc_data.get('original_filename', doc_data.get('filename')),
+        'download_url': signed_url or doc_data.get('download_url') or doc_data.get('url') or '',
+        'file_size': doc_data.get('file_size'),
+        'file_type': doc_data.get('file_type'),
+        'uploaded_at': format_timestamp(doc_data.get('uploaded_at')),
+        'status': doc_data.get('status') if linked else doc_data.get('status', 'uploaded')
+    }
+    if not entry['download_url'] and doc_data.get('storage_path'):
+        entry['download_endpoint'] = DOWNLOAD_ENDPOINT.format(document_id=document_id)
+    return entry
+
+
+def hydrate_claim_documents(db, claim_data: Dict[str, Any], claim_id: Optional[str] = None,
+                            format_timestamp: Callable[[Any], Any] = lambda value: str(value or ''),
+                            on_query_error: Optional[Callable[[Exception], None]] = None,
+                            signer=None) -> List[Dict[str, Any]]:
+    """
+    All documents of a claim: the ones it references, then any others whose
+    ``claim_id`` matches (uploads that were never linked to the claim).
+
+    When ``on_query_error`` is given, a failing ``claim_id`` query is reported
+    to it and only the referenced documents are returned.
+    """
+    documents = [
+        (doc_id, doc_data, True)
+        for doc_id, doc_data in fetch_documents(db, referenced_document_ids(claim_data))
+    ]
+
+    claim_id = claim_id if claim_id is not None else claim_data.get('claim_id', '')
+    unlinked = []
+    if claim_id:
+        try:
+            unlinked = db.collection(DOCUMENTS_COLLECTION).where('claim_id', '==', claim_id).get()
+        except Exception as err:
+            if on_query_error is None:
+                raise
+            on_query_error(err)
+
+    existing_doc_ids = {doc_data.get('document_id') or doc_id for doc_id, doc_data, _ in documents}
+    for snapshot in unlinked:
+        doc_data = snapshot.to_dict() or {}
+        doc_id = doc_data.get('document_id')
+        if doc_id and doc_id not in existing_doc_ids:
+            documents.append((doc_id, doc_data, False))
+            existing_doc_ids.add(doc_id)
+
+    signed_urls = {}
+    if signer is not None and signer.signs_locally:
+        signed_urls = signer.sign_many(doc_data.get('storage_path') for _, doc_data, _ in documents)
+
+    return [
+        document_entry(doc_id, doc_data, linked, format_timestamp,
+                       signed_url=signed_urls.get(doc_data.get('storage_path')))
+        for doc_id, doc_data, linked in documents
+    ]
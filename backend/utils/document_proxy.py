@@ -0,0 +1,229 @@
+"""
+Streaming reads of stored documents for the document proxy.
+
+Objects are streamed in ranged reads of ``chunk_size`` bytes, each pinned to
+the object generation seen when the request started, so memory per download
+is bounded by the chunk size whatever the file size, and a file replaced
+mid-download fails instead of mixing two versions. The generation doubles as
+the ETag, which makes ``If-None-Match`` revalidation and ``If-Range`` exact.
+
+Hot documents can additionally be kept in a local on-disk LRU cache
+(``DOCUMENT_CACHE_DIR``) that all workers on the host share: files are
+written to a temporary name while the first full download streams through
+and renamed into place when complete, so readers only ever see whole files.
+"""
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+from typing import Iterator, Optional, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_CACHE_MAX_FILE_BYTES = 25 * 1024 * 1024
+
+_RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(ValueError):
+    """The requested byte range lies outside the document."""
+
+
+def etag_for(generation) -> str:
+    return f'"{generation}"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Whether an ``If-None-Match`` / ``If-Range`` header value matches ``etag``."""
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(',')]
+    # Weak comparison, as If-None-Match requires
+    return '*' in candidates or any(value.replace('W/', '', 1) == etag for value in candidates)
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Inclusive ``(start, end)`` for a single-range ``Range`` header.
+
+    Returns None when the whole document should be sent (no header, or a
+    form this proxy does not serve, such as multiple ranges) and raises
+    ``RangeNotSatisfiable`` for ranges outside the document.
+    """
+    if not header:
+        return None
+    match = _RANGE_PATTERN.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable(header)
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable(header)
+    return start, end
+
+
+def iter_blob_range(blob, start: int, end: int, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield bytes ``start..end`` (inclusive) of ``blob`` in ranged reads of ``chunk_size``."""
+    chunk_size = max(1, int(chunk_size))
+    position = start
+    while position <= end:
+        chunk_end = min(position + chunk_size - 1, end)
+        yield blob.download_as_bytes(start=position, end=chunk_end, if_generation_match=blob.generation)
+        position = chunk_end + 1
+
+
+def iter_file_range(handle, start: int, end: int, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield bytes ``start..end`` (inclusive) of an open file, closing it afterwards."""
+    with handle:
+        handle.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = handle.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+class DiskDocumentCache:
+    """Size-bounded LRU cache of whole documents on local disk."""
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+                 max_file_bytes: int = DEFAULT_CACHE_MAX_FILE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, storage_path: str, generation) -> str:
+        digest = hashlib.sha256(storage_path.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f'{digest}-{generation}')
+
+    def open(self, storage_path: str, generation):
+        """
+        The cached file opened for reading and marked recently used, or None.
+
+        The open handle stays readable even if the file is evicted meanwhile.
+        """
+        path = self.path_for(storage_path, generation)
+        try:
+            handle = open(path, 'rb')
+        except OSError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return handle
+
+    def accepts(self, size: int) -> bool:
+        return 0 < size <= self.max_file_bytes
+
+    def fill(self, storage_path: str, generation, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        """
+        Pass ``chunks`` through while writing them to the cache.
+
+        The file only becomes visible once every chunk has been written; an
+        abandoned or failed download leaves nothing behind.
+        """
+        handle = tempfile.NamedTemporaryFile(dir=self.directory, prefix='.partial-', delete=False)
+        complete = False
+        try:
+            for chunk in chunks:
+                handle.write(chunk)
+                yield chunk
+            complete = True
+        finally:
+            handle.close()
+            if complete:
+                os.replace(handle.name, self.path_for(storage_path, generation))
+                self.evict()
+            else:
+                try:
+                    os.unlink(handle.name)
+                except OSError:
+                    pass
+
+    def evict(self) -> None:
+        """Remove least recently used files until the cache fits ``max_bytes``."""
+        with self._lock:
+            entries = []
+            total = 0
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    if entry.name.startswith('.partial-') or not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(path)
+                    total -= size
+                except OSError:
+                    pass
+
+
+# Singleton instance
+_document_cache = None
+_document_cache_loaded = False
+
+
+def get_document_cache() -> Optional[DiskDocumentCache]:
+    """Get the singleton on-disk document cache, or None when it is disabled"""
+    global _document_cache, _document_cache_loaded
+    if not _document_cache_loaded:
+        _document_cache_loaded = True
+        directory = getattr(Config, 'DOCUMENT_CACHE_DIR', '')
+        if directory:
+            try:
+                _document_cache = DiskDocumentCache(
+                    directory,
+                    max_bytes=getattr(Config, 'DOCUMENT_CACHE_MAX_BYTES', DEFAULT_CACHE_MAX_BYTES),
+                    max_file_bytes=getattr(Config, 'DOCUMENT_CACHE_MAX_FILE_BYTES', DEFAULT_CACHE_MAX_FILE_BYTES)
+                )
+            except OSError as err:
+                logger.warning("document_proxy: cache directory %s unusable, caching disabled: %s", directory, err)
+    return _document_cache
+
+
+def document_stream(blob, storage_path: str, byte_range: Optional[Tuple[int, int]],
+                    chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    cache: Optional[DiskDocumentCache] = None) -> Iterator[bytes]:
+    """
+    Chunks of ``blob`` (a loaded blob with size and generation) for
+    ``byte_range``, or the whole object when it is None, served from and
+    filling ``cache`` when one is given.
+    """
+    size = blob.size or 0
+    start, end = byte_range if byte_range is not None else (0, size - 1)
+    if end < start:
+        return iter(())
+
+    if cache is not None:
+        cached = cache.open(storage_path, blob.generation)
+        if cached is not None:
+            return iter_file_range(cached, start, end, chunk_size)
+        if byte_range is None and cache.accepts(size):
+            return cache.fill(storage_path, blob.generation, iter_blob_range(blob, start, end, chunk_size))
+    return iter_blob_range(blob, start, end, chunk_size)
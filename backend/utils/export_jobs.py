@@ -0,0 +1,482 @@
+"""
+Background claim export jobs.
+
+Large reports are produced by a worker pool instead of inside the request:
+``POST /claims/export-jobs`` queues a job, the client polls it, then
+downloads the finished CSV.
+
+Jobs live in ``claim_export_jobs/{job_id}`` where the job ID is a hash of the
+hospital and the normalized filters, so repeating a request while its report
+is still fresh reuses the same job and file.
+
+A job writes one CSV part per Firestore page (part 0 is the header) and, after
+each part, checkpoints the page cursor and part count on the job document.
+The worker holds a lease on the job that it renews at every checkpoint; a job
+whose lease has expired (its worker crashed or was recycled) is picked up
+again on the next poll and resumes from the checkpoint instead of starting
+over. Parts go to the Firebase Storage bucket (composed into one object at
+the end) or to a local directory (``EXPORT_JOBS_BACKEND=local``).
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from google.api_core import exceptions as gcloud_exceptions
+from google.cloud import firestore
+
+from config import Config
+from utils.claims_export import (
+    DEFAULT_PAGE_SIZE,
+    ExportProgress,
+    hospital_claims_query,
+    iter_csv,
+    iter_hospital_claims,
+    iter_query_page_batches,
+)
+
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = 'claim_export_jobs'
+ORDER_FIELD = 'created_at'
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_COMPLETED = 'completed'
+STATUS_FAILED = 'failed'
+
+DEFAULT_LEASE_SECONDS = 120
+DEFAULT_RESULT_TTL_SECONDS = 3600
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Google Cloud Storage composes at most 32 source objects per request.
+MAX_COMPOSE_SOURCES = 32
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def normalize_export_filters(status: Optional[str] = None, limit=None,
+                             start_date: Optional[str] = None,
+                             end_date: Optional[str] = None) -> Dict:
+    """
+    Normalize export filters so equivalent requests hash to the same job.
+
+    Raises ValueError for malformed dates or limits.
+    """
+    for value in (start_date, end_date):
+        if value:
+            datetime.strptime(value, '%Y-%m-%d')
+    if limit in (None, '', 'all'):
+        limit = None
+    else:
+        limit = int(limit)
+        if limit <= 0:
+            raise ValueError('limit must be positive')
+    return {
+        'status': (status or 'all').strip() or 'all',
+        'limit': limit,
+        'start_date': start_date or None,
+        'end_date': end_date or None,
+    }
+
+
+def export_job_id(hospital_id: str, hospital_name: str, filters: Dict) -> str:
+    """Deterministic job ID for a hospital and normalized filter set."""
+    raw = json.dumps(
+        {'hospital_id': hospital_id or '', 'hospital_name': (hospital_name or '').upper(), 'filters': filters},
+        sort_keys=True,
+        separators=(',', ':')
+    )
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+
+def public_job(job: Dict) -> Dict:
+    """Job fields returned to API clients."""
+    def iso(value):
+        return value.isoformat() if hasattr(value, 'isoformat') else value
+
+    return {
+        'job_id': job.get('job_id'),
+        'status': job.get('status'),
+        'filters': job.get('filters', {}),
+        'rows_written': job.get('rows_written', 0),
+        'scanned': job.get('scanned', 0),
+        'parts': job.get('part_count', 0),
+        'size_bytes': job.get('size_bytes'),
+        'error': job.get('error'),
+        'created_at': iso(job.get('created_at')),
+        'updated_at': iso(job.get('updated_at')),
+        'completed_at': iso(job.get('completed_at')),
+        'expires_at': iso(job.get('expires_at')),
+    }
+
+
+class LocalArtifactStore:
+    """Report parts and finished files under a local directory."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _part_path(self, job_id: str, index: int) -> str:
+        return os.path.join(self.root, job_id, f'part-{index:05d}.csv')
+
+    def _file_path(self, job_id: str) -> str:
+        return os.path.join(self.root, f'{job_id}.csv')
+
+    def write_part(self, job_id: str, index: int, data: bytes) -> None:
+        path = self._part_path(job_id, index)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so a crash never leaves a half-written part behind
+        with open(path + '.tmp', 'wb') as handle:
+            handle.write(data)
+        os.replace(path + '.tmp', path)
+
+    def finalize(self, job_id: str, part_count: int) -> int:
+        target = self._file_path(job_id)
+        with open(target + '.tmp', 'wb') as output:
+            for index in range(part_count):
+                with open(self._part_path(job_id, index), 'rb') as part:
+                    shutil.copyfileobj(part, output)
+        os.replace(target + '.tmp', target)
+        shutil.rmtree(os.path.join(self.root, job_id), ignore_errors=True)
+        return os.path.getsize(target)
+
+    def exists(self, job_id: str) -> bool:
+        return os.path.exists(self._file_path(job_id))
+
+    def iter_bytes(self, job_id: str) -> Iterator[bytes]:
+        with open(self._file_path(job_id), 'rb') as handle:
+            while True:
+                chunk = handle.read(DOWNLOAD_CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+
+
+class StorageArtifactStore:
+    """Report parts and finished files in the Firebase Storage bucket."""
+
+    PREFIX = 'exports/claims/'
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    def _part_blob(self, job_id: str, index: int):
+        return self.bucket.blob(f'{self.PREFIX}{job_id}/part-{index:05d}.csv')
+
+    def _file_blob(self, job_id: str):
+        return self.bucket.blob(f'{self.PREFIX}{job_id}.csv')
+
+    def write_part(self, job_id: str, index: int, data: bytes) -> None:
+        self._part_blob(job_id, index).upload_from_string(data, content_type='text/csv')
+
+    def finalize(self, job_id: str, part_count: int) -> int:
+        parts = [self._part_blob(job_id, index) for index in range(part_count)]
+        target = self._file_blob(job_id)
+        target.content_type = 'text/csv'
+        target.compose(parts[:MAX_COMPOSE_SOURCES])
+        for start in range(MAX_COMPOSE_SOURCES, len(parts), MAX_COMPOSE_SOURCES - 1):
+            target.compose([target] + parts[start:start + MAX_COMPOSE_SOURCES - 1])
+        for part in parts:
+            try:
+                part.delete()
+            except gcloud_exceptions.NotFound:
+                pass
+        target.reload()
+        return target.size or 0
+
+    def exists(self, job_id: str) -> bool:
+        return self._file_blob(job_id).exists()
+
+    def iter_bytes(self, job_id: str) -> Iterator[bytes]:
+        with self._file_blob(job_id).open('rb') as handle:
+            while True:
+                chunk = handle.read(DOWNLOAD_CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+
+
+class LeaseLost(Exception):
+    """Raised when another worker has taken over a job mid-run."""
+
+
+def write_export_parts(job: Dict, pages: Iterable[List], store,
+                       checkpoint: Callable[[Dict], None]) -> Dict:
+    """
+    Write CSV parts for ``pages`` and checkpoint after each one.
+
+    ``job`` supplies the resume state (``part_count``, ``rows_written``,
+    ``scanned``) and the hospital/filters; ``checkpoint`` persists the
+    updated state, including the cursor of the last document consumed.
+    Returns the final state.
+    """
+    filters = job.get('filters', {})
+    limit = filters.get('limit')
+    state = {
+        'part_count': job.get('part_count', 0),
+        'rows_written': job.get('rows_written', 0),
+        'scanned': job.get('scanned', 0),
+    }
+    progress = ExportProgress(job['job_id'])
+
+    if state['part_count'] == 0:
+        store.write_part(job['job_id'], 0, b''.join(iter_csv([], header=True)))
+        state['part_count'] = 1
+        checkpoint(dict(state))
+
+    for snapshots in pages:
+        if limit is not None and state['rows_written'] >= limit:
+            break
+        remaining = None if limit is None else limit - state['rows_written']
+        entries = list(iter_hospital_claims(
+            snapshots, job.get('hospital_id', ''), job.get('hospital_name', ''), remaining, progress
+        ))
+        if entries:
+            store.write_part(job['job_id'], state['part_count'], b''.join(iter_csv(entries, header=False)))
+            state['part_count'] += 1
+            state['rows_written'] += len(entries)
+        state['scanned'] += len(snapshots)
+        last = snapshots[-1]
+        state['cursor'] = {'value': (last.to_dict() or {}).get(ORDER_FIELD), 'id': last.id}
+        checkpoint(dict(state))
+
+    progress.log('completed')
+    return state
+
+
+class ExportJobService:
+    """Creates, runs and resumes claim export jobs."""
+
+    def __init__(self, db_factory, store, workers: int = 2, page_size: int = DEFAULT_PAGE_SIZE,
+                 lease_seconds: int = DEFAULT_LEASE_SECONDS,
+                 result_ttl_seconds: int = DEFAULT_RESULT_TTL_SECONDS):
+        self.db_factory = db_factory
+        self.store = store
+        self.page_size = page_size
+        self.lease_seconds = lease_seconds
+        self.result_ttl_seconds = result_ttl_seconds
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='claims-export')
+        self._running = set()
+        self._lock = threading.Lock()
+
+    def _ref(self, job_id: str):
+        return self.db_factory().collection(JOBS_COLLECTION).document(job_id)
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+    def request_job(self, hospital_id: str, hospital_name: str, user_email: str,
+                    filters: Dict) -> Tuple[Dict, bool]:
+        """
+        Return the job for these filters, creating or restarting it if needed.
+
+        The second value is True when an existing, still fresh report is
+        reused as-is.
+        """
+        job_id = export_job_id(hospital_id, hospital_name, filters)
+        db = self.db_factory()
+        job, reused = _request_in_transaction(
+            db.transaction(), self._ref(job_id), job_id, hospital_id, hospital_name,
+            user_email, filters, self.store
+        )
+        self._resume_if_idle(job)
+        return job, reused
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """Read a job, resuming it when its worker has gone away."""
+        snapshot = self._ref(job_id).get()
+        if not snapshot.exists:
+            return None
+        job = snapshot.to_dict()
+        self._resume_if_idle(job)
+        return job
+
+    def iter_result(self, job_id: str) -> Iterator[bytes]:
+        return self.store.iter_bytes(job_id)
+
+    # ------------------------------------------------------------------
+    # Worker side
+    # ------------------------------------------------------------------
+    def _resume_if_idle(self, job: Dict) -> None:
+        status = job.get('status')
+        if status == STATUS_QUEUED:
+            self.submit(job['job_id'])
+        elif status == STATUS_RUNNING:
+            lease_expires_at = job.get('lease_expires_at')
+            if lease_expires_at is None or lease_expires_at <= _now():
+                logger.info("export_jobs: resuming job %s after expired lease", job['job_id'])
+                self.submit(job['job_id'])
+
+    def submit(self, job_id: str) -> None:
+        with self._lock:
+            if job_id in self._running:
+                return
+            self._running.add(job_id)
+        self._executor.submit(self._run_guarded, job_id)
+
+    def _run_guarded(self, job_id: str) -> None:
+        try:
+            self.run(job_id)
+        except Exception as err:
+            logger.error("export_jobs: job %s crashed: %s", job_id, err)
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+
+    def run(self, job_id: str) -> None:
+        db = self.db_factory()
+        job_ref = self._ref(job_id)
+        job = _acquire_lease(db.transaction(), job_ref, self.worker_id, self.lease_seconds)
+        if job is None:
+            return
+        update_time = job_ref.get().update_time
+
+        def checkpoint(state: Dict) -> None:
+            nonlocal update_time
+            state.update({
+                'lease_expires_at': _now() + timedelta(seconds=self.lease_seconds),
+                'updated_at': firestore.SERVER_TIMESTAMP,
+            })
+            try:
+                result = job_ref.update(state, option=db.write_option(last_update_time=update_time))
+            except (gcloud_exceptions.FailedPrecondition, gcloud_exceptions.NotFound) as err:
+                raise LeaseLost(str(err)) from err
+            update_time = result.update_time
+
+        try:
+            filters = job.get('filters', {})
+            query = hospital_claims_query(db, filters.get('status', 'all'), filters.get('start_date'), filters.get('end_date'))
+            cursor = job.get('cursor')
+            pages = iter_query_page_batches(
+                query, ORDER_FIELD, self.page_size,
+                cursor=(cursor['value'], cursor['id']) if cursor else None
+            )
+            state = write_export_parts(job, pages, self.store, checkpoint)
+            size_bytes = self.store.finalize(job_id, state['part_count'])
+            checkpoint({
+                'status': STATUS_COMPLETED,
+                'size_bytes': size_bytes,
+                'completed_at': _now(),
+                'expires_at': _now() + timedelta(seconds=self.result_ttl_seconds),
+                'lease_owner': None,
+                'error': None,
+            })
+            logger.info("export_jobs: job %s completed (%s rows, %s bytes)",
+                        job_id, state['rows_written'], size_bytes)
+        except LeaseLost:
+            logger.warning("export_jobs: lost lease on job %s, another worker took over", job_id)
+        except Exception as err:
+            logger.error("export_jobs: job %s failed: %s", job_id, err)
+            try:
+                checkpoint({'status': STATUS_FAILED, 'error': str(err), 'lease_owner': None})
+            except LeaseLost:
+                pass
+
+
+@firestore.transactional
+def _request_in_transaction(transaction, job_ref, job_id, hospital_id, hospital_name,
+                            user_email, filters, store) -> Tuple[Dict, bool]:
+    snapshot = job_ref.get(transaction=transaction)
+    now = _now()
+    job = snapshot.to_dict() if snapshot.exists else None
+
+    if job is not None:
+        status = job.get('status')
+        if status in (STATUS_QUEUED, STATUS_RUNNING):
+            return job, False
+        if status == STATUS_COMPLETED and job.get('expires_at') and job['expires_at'] > now \
+                and store.exists(job_id):
+            return job, True
+        if status == STATUS_FAILED:
+            # Retry from the last checkpoint
+            update = {'status': STATUS_QUEUED, 'error': None, 'updated_at': now}
+            transaction.update(job_ref, update)
+            job.update(update)
+            return job, False
+
+    # New job, or an expired report that has to be regenerated from scratch
+    job = {
+        'job_id': job_id,
+        'status': STATUS_QUEUED,
+        'hospital_id': hospital_id or '',
+        'hospital_name': hospital_name or '',
+        'requested_by': user_email or '',
+        'filters': filters,
+        'part_count': 0,
+        'rows_written': 0,
+        'scanned': 0,
+        'cursor': None,
+        'attempts': 0,
+        'created_at': now,
+        'updated_at': now,
+    }
+    transaction.set(job_ref, job)
+    return job, False
+
+
+@firestore.transactional
+def _acquire_lease(transaction, job_ref, owner: str, lease_seconds: int) -> Optional[Dict]:
+    snapshot = job_ref.get(transaction=transaction)
+    if not snapshot.exists:
+        return None
+    job = snapshot.to_dict()
+    now = _now()
+    status = job.get('status')
+    if status not in (STATUS_QUEUED, STATUS_RUNNING):
+        return None
+    lease_expires_at = job.get('lease_expires_at')
+    if status == STATUS_RUNNING and job.get('lease_owner') != owner \
+            and lease_expires_at is not None and lease_expires_at > now:
+        return None
+
+    update = {
+        'status': STATUS_RUNNING,
+        'lease_owner': owner,
+        'lease_expires_at': now + timedelta(seconds=lease_seconds),
+        'attempts': job.get('attempts', 0) + 1,
+        'updated_at': now,
+    }
+    transaction.update(job_ref, update)
+    job.update(update)
+    return job
+
+
+# Singleton instance
+_export_job_service = None
+_export_job_service_lock = threading.Lock()
+
+
+def get_export_job_service() -> ExportJobService:
+    """Get singleton export job service instance"""
+    global _export_job_service
+    with _export_job_service_lock:
+        if _export_job_service is None:
+            from firebase_config import get_firestore, get_storage
+
+            if getattr(Config, 'EXPORT_JOBS_BACKEND', 'storage') == 'local':
+                root = getattr(Config, 'EXPORT_JOBS_LOCAL_DIR', '') or os.path.join(
+                    tempfile.gettempdir(), 'claims_exports'
+                )
+                store = LocalArtifactStore(root)
+            else:
+                store = StorageArtifactStore(get_storage())
+            _export_job_service = ExportJobService(
+                get_firestore,
+                store,
+                workers=getattr(Config, 'EXPORT_JOBS_WORKERS', 2),
+                page_size=getattr(Config, 'CLAIMS_EXPORT_PAGE_SIZE', DEFAULT_PAGE_SIZE),
+                lease_seconds=getattr(Config, 'EXPORT_JOB_LEASE_SECONDS', DEFAULT_LEASE_SECONDS),
+                result_ttl_seconds=getattr(Config, 'EXPORT_JOB_RESULT_TTL_SECONDS', DEFAULT_RESULT_TTL_SECONDS)
+            )
+    return _export_job_service
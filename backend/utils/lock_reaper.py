@@ -0,0 +1,165 @@
+"""
+Background reaper for expired processor locks.
+
+Lock requests evaluate expiry themselves (see ``ClaimLockService`` in
+``utils.lock_utils``), so nothing on the request path scans for expired
+locks. This reaper clears them from ``direct_claims`` afterwards so that
+claim lists and lock checks stop showing stale holders. It runs as a daemon
+thread (in the gunicorn master or in each worker, see ``gunicorn.conf.py``)
+or from the command line with ``reap_claim_locks.py``.
+
+Runs are coordinated through the ``maintenance_runs/lock_reaper`` marker
+(see ``utils.background_runs``), as the notification sweeper's are, so
+across all workers at most one reap runs per interval. Each run clears at
+most ``clear_budget`` locks.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from config import Config
+from utils.background_runs import abandon_run, claim_run, finish_run, marker_ref as run_marker
+from utils.lock_utils import cleanup_expired_locks
+
+logger = logging.getLogger(__name__)
+
+MARKER_DOCUMENT = 'lock_reaper'
+
+DEFAULT_INTERVAL_SECONDS = 60
+DEFAULT_JITTER_SECONDS = 15
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_CLEAR_BUDGET = 2000
+DEFAULT_LEASE_SECONDS = 300
+
+
+class LockReaper:
+    """Periodically clears expired processor locks."""
+
+    def __init__(self, db_factory, interval_seconds: float = DEFAULT_INTERVAL_SECONDS,
+                 jitter_seconds: float = DEFAULT_JITTER_SECONDS,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 clear_budget: int = DEFAULT_CLEAR_BUDGET,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS):
+        self.db_factory = db_factory
+        self.interval_seconds = interval_seconds
+        self.jitter_seconds = jitter_seconds
+        self.batch_size = batch_size
+        self.clear_budget = clear_budget
+        self.lease_seconds = lease_seconds
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self.runs = 0
+        self.skipped_runs = 0
+        self.failed_runs = 0
+        self.locks_cleared = 0
+        self.last_result: Optional[Dict] = None
+
+    def run_once(self, force: bool = False) -> Optional[Dict]:
+        """
+        Reap if no other process has reaped within the interval.
+
+        Returns the run summary, or None when the run was skipped.
+        """
+        db = self.db_factory()
+        marker_ref = run_marker(db, MARKER_DOCUMENT)
+        if not claim_run(db.transaction(), marker_ref, self.owner,
+                          self.interval_seconds, self.lease_seconds, force):
+            with self._stats_lock:
+                self.skipped_runs += 1
+            logger.debug("lock_reaper: another process reaped recently, skipping")
+            return None
+
+        started = datetime.now(timezone.utc)
+        try:
+            cleared = cleanup_expired_locks(db, batch_size=self.batch_size, max_clears=self.clear_budget)
+        except Exception:
+            with self._stats_lock:
+                self.failed_runs += 1
+            abandon_run(marker_ref)
+            raise
+        summary = {
+            'owner': self.owner,
+            'cleared': cleared,
+            'budget_exhausted': cleared >= self.clear_budget,
+            'duration_seconds': round((datetime.now(timezone.utc) - started).total_seconds(), 3),
+        }
+        finish_run(marker_ref, summary)
+        with self._stats_lock:
+            self.runs += 1
+            self.locks_cleared += cleared
+            self.last_result = dict(summary, finished_at=datetime.now(timezone.utc).isoformat())
+        logger.info("lock_reaper: %s", summary)
+        return summary
+
+    def stats(self) -> Dict:
+        """Counters of this process's reaper."""
+        with self._stats_lock:
+            return {
+                'running': self._thread is not None and self._thread.is_alive(),
+                'interval_seconds': self.interval_seconds,
+                'runs': self.runs,
+                'skipped_runs': self.skipped_runs,
+                'failed_runs': self.failed_runs,
+                'locks_cleared': self.locks_cleared,
+                'last_result': self.last_result,
+            }
+
+    def _loop(self) -> None:
+        # Stagger the first run too, so workers started together don't race
+        while not self._stop.wait(self.interval_seconds + random.uniform(0, self.jitter_seconds)):
+            try:
+                self.run_once()
+            except Exception as err:
+                logger.error("lock_reaper: reap failed: %s", err)
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='lock-reaper', daemon=True)
+        self._thread.start()
+        logger.info(
+            "lock_reaper: started (interval=%ss, jitter=%ss, budget=%s)",
+            self.interval_seconds, self.jitter_seconds, self.clear_budget
+        )
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+# Singleton instance
+_lock_reaper = None
+
+
+def get_lock_reaper() -> LockReaper:
+    """Get singleton lock reaper instance"""
+    global _lock_reaper
+    if _lock_reaper is None:
+        from firebase_config import get_firestore
+
+        _lock_reaper = LockReaper(
+            get_firestore,
+            interval_seconds=getattr(Config, 'LOCK_REAPER_INTERVAL_SECONDS', DEFAULT_INTERVAL_SECONDS),
+            jitter_seconds=getattr(Config, 'LOCK_REAPER_JITTER_SECONDS', DEFAULT_JITTER_SECONDS),
+            clear_budget=getattr(Config, 'LOCK_REAPER_CLEAR_BUDGET', DEFAULT_CLEAR_BUDGET)
+        )
+    return _lock_reaper
+
+
+def start_lock_reaper(mode: str) -> bool:
+    """
+    Start the background reaper if ``LOCK_REAPER_MODE`` equals ``mode``
+    ('master' or 'worker', as for ``start_notification_sweeper``). Returns
+    True when the reaper was started.
+    """
+    if getattr(Config, 'LOCK_REAPER_MODE', 'worker') != mode:
+        return False
+    get_lock_reaper().start()
+    return True
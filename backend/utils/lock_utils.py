@@ -1,89 +1,333 @@
 """Utility helpers for managing claim processor locks."""
 
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import pytz
+from google.cloud import firestore
 
+CLAIMS_COLLECTION = 'direct_claims'
+LEDGERS_COLLECTION = 'processor_lock_ledgers'
+DEFAULT_MAX_LOCKS = 3
+DEFAULT_LOCK_TTL_SECONDS = 3600
 
-def cleanup_expired_locks(db):
-    """Clear processor locks that have crossed their expiry time."""
-    ist = pytz.timezone('Asia/Kolkata')
-    current_time = datetime.now(ist)
+IST = pytz.timezone('Asia/Kolkata')
 
-    try:
-        # Try fetching only claims that have an expiry timestamp
-        locked_claims = list(
-            db.collection('claims')
-            .where('lock_expires_at', '!=', None)
-            .limit(1000)
+CLEARED_LOCK_FIELDS = {
+    'locked_by_processor': None,
+    'locked_by_processor_email': None,
+    'locked_by_processor_name': None,
+    'locked_at': None,
+    'lock_expires_at': None,
+}
+
+
+def cleanup_expired_locks(db, batch_size=200, max_clears=None, now=None):
+    """
+    Clear processor locks on ``direct_claims`` that have passed their expiry.
+
+    Runs from the background lock reaper (``utils.lock_reaper``), not from
+    request handlers, which evaluate expiry themselves when acquiring. Only
+    Timestamp-typed ``lock_expires_at`` values are matched by the range
+    query; run ``reap_claim_locks.py --migrate`` once to convert older ISO
+    strings.
+
+    Each expired claim is cleared with a precondition on the update time it
+    was read with, so a lock renewed or taken over in the meantime is left
+    alone. Returns the number of locks cleared.
+    """
+    now = now or datetime.now(IST)
+    cleared_count = 0
+
+    def next_limit():
+        if max_clears is None:
+            return batch_size
+        return min(batch_size, max_clears - cleared_count)
+
+    while next_limit() > 0:
+        expired = list(
+            db.collection(CLAIMS_COLLECTION)
+            .where('lock_expires_at', '<', now)
+            .limit(next_limit())
             .stream()
         )
-    except Exception as query_error:  # pragma: no cover - logging only
-        # Some environments may not have the required composite index
-        print(
-            "⚠️ cleanup_expired_locks: index-based query failed "
-            f"({query_error}); falling back to full scan."
-        )
-        locked_claims = list(db.collection('claims').stream())
+        if not expired:
+            break
 
-    cleared_count = 0
+        batch = db.batch()
+        for doc in expired:
+            batch.update(doc.reference, CLEARED_LOCK_FIELDS,
+                         option=db.write_option(last_update_time=doc.update_time))
+        try:
+            batch.commit()
+            cleared = len(expired)
+        except Exception as batch_error:
+            # One claim changed since it was read; the batch is all or
+            # nothing, so clear the others one by one
+            print(f"⚠️ cleanup_expired_locks: batch failed ({batch_error}); clearing claims individually")
+            cleared = 0
+            for doc in expired:
+                try:
+                    doc.reference.update(CLEARED_LOCK_FIELDS,
+                                         option=db.write_option(last_update_time=doc.update_time))
+                    cleared += 1
+                except Exception as update_error:
+                    print(f"⚠️ cleanup_expired_locks: left claim {doc.id} alone: {update_error}")
+        cleared_count += cleared
+        if cleared == 0 or len(expired) < batch_size:
+            break
+
+    if cleared_count:
+        print(f"✅ cleanup_expired_locks: Cleared {cleared_count} expired lock(s)")
+    return cleared_count
 
-    for doc in locked_claims:
-        claim_data = doc.to_dict() or {}
-        lock_expires_at = claim_data.get('lock_expires_at')
-        locked_by_processor = claim_data.get('locked_by_processor')
 
-        # Only proceed if there is a lock we might need to clear
-        if not lock_expires_at or not locked_by_processor:
-            continue
+def migrate_lock_expiry(db, batch_size=400, dry_run=False):
+    """
+    Convert ISO-string ``lock_expires_at`` values on ``direct_claims`` to
+    Timestamps so that ``cleanup_expired_locks`` can find them.
 
-        # Convert Firestore value to timezone-aware datetime
-        expires_time = None
-        if hasattr(lock_expires_at, 'to_pydatetime'):
-            expires_time = lock_expires_at.to_pydatetime()
-        elif isinstance(lock_expires_at, str):
-            try:
-                expires_time = datetime.fromisoformat(
-                    lock_expires_at.replace('Z', '+00:00')
-                )
-            except ValueError:
-                print(
-                    "⚠️ cleanup_expired_locks: unable to parse lock_expires_at "
-                    f"'{lock_expires_at}' for claim {doc.id}"
-                )
-                continue
-        else:
-            # Unexpected format — skip
+    Returns counts of the values ``converted`` and those ``unparseable``
+    (left as they are; such locks never expire).
+    """
+    # Strings sort after every other type, so this matches all string values
+    query = db.collection(CLAIMS_COLLECTION).where('lock_expires_at', '>=', '')
+    summary = {'scanned': 0, 'converted': 0, 'unparseable': 0}
+    batch = db.batch()
+    pending = 0
+    for doc in query.stream():
+        summary['scanned'] += 1
+        value = (doc.to_dict() or {}).get('lock_expires_at')
+        expires_at = parse_lock_expiry(value)
+        if expires_at is None:
+            summary['unparseable'] += 1
+            print(f"⚠️ migrate_lock_expiry: unable to parse lock_expires_at '{value}' for claim {doc.id}")
+            continue
+        summary['converted'] += 1
+        if dry_run:
             continue
+        batch.update(doc.reference, {'lock_expires_at': expires_at})
+        pending += 1
+        if pending >= batch_size:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+    return summary
 
-        if expires_time.tzinfo is None:
-            expires_time = ist.localize(expires_time)
-        else:
-            expires_time = expires_time.astimezone(ist)
-
-        if current_time > expires_time:
-            try:
-                db.collection('claims').document(doc.id).update(
-                    {
-                        'locked_by_processor': None,
-                        'locked_by_processor_email': None,
-                        'locked_by_processor_name': None,
-                        'locked_at': None,
-                        'lock_expires_at': None,
-                    }
-                )
-                cleared_count += 1
-                print(
-                    f"🧹 cleanup_expired_locks: Cleared expired lock for claim {doc.id}"
-                )
-            except Exception as update_error:  # pragma: no cover - logging only
-                print(
-                    "❌ cleanup_expired_locks: Failed to clear lock for claim "
-                    f"{doc.id}: {update_error}"
-                )
 
-    if cleared_count:
-        print(
-            f"✅ cleanup_expired_locks: Cleared {cleared_count} expired lock(s)"
+# ---------------------------------------------------------------------------
+# Transactional lock service
+# ---------------------------------------------------------------------------
+#
+# A processor locks a claim while working on it and may hold at most
+# ``max_locks`` unexpired locks. The claim carries the lock fields
+# (``locked_by_processor``, ``lock_expires_at``, ...) and
+# ``processor_lock_ledgers/{processor_id}`` maps the claims that processor
+# holds to their expiry. Acquire and release are each one transaction over
+# the claim and the ledger, so the limit is checked from one document instead
+# of a query over ``direct_claims``, and two processors (or two tabs) can
+# never both win the same claim or exceed the limit together.
+#
+# Expiry is evaluated lazily at acquire time: an expired lock on the claim is
+# simply taken over, and expired ledger entries stop counting and are dropped
+# when the ledger is next written. Requests never scan for expired locks; the
+# background reaper (``utils.lock_reaper``) clears them from the claims so
+# lock listings stay accurate. ``lock_expires_at`` is written as a Timestamp.
+
+
+class LockError(Exception):
+    """A lock request that cannot be granted, with the HTTP status to answer with."""
+
+    def __init__(self, message, status_code=409, **details):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.details = details
+
+
+def parse_lock_expiry(value):
+    """``lock_expires_at`` (ISO string, datetime or Firestore timestamp) as an aware IST datetime, or None."""
+    if not value:
+        return None
+    if hasattr(value, 'to_pydatetime'):
+        value = value.to_pydatetime()
+    elif isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        return IST.localize(value)
+    return value.astimezone(IST)
+
+
+def lock_is_active(claim_data, now=None, processor_id=None):
+    """
+    Whether the claim is locked by someone other than ``processor_id``.
+
+    Locks without a readable expiry never expire, as before.
+    """
+    holder = claim_data.get('locked_by_processor')
+    if not holder or holder == processor_id:
+        return False
+    expires_at = parse_lock_expiry(claim_data.get('lock_expires_at'))
+    if expires_at is None:
+        return True
+    return (now or datetime.now(IST)) <= expires_at
+
+
+def _live_entries(ledger_data, now):
+    """Ledger entries whose lock has not expired."""
+    claims = (ledger_data or {}).get('claims') or {}
+    live = {}
+    for claim_id, expires_at in claims.items():
+        expiry = parse_lock_expiry(expires_at)
+        if expiry is None or expiry >= now:
+            live[claim_id] = expires_at
+    return live
+
+
+def _seed_ledger(transaction, db, processor_id, now):
+    """Entries for a processor without a ledger yet, from the claims locked before ledgers existed."""
+    query = db.collection(CLAIMS_COLLECTION).where('locked_by_processor', '==', processor_id)
+    entries = {}
+    for snapshot in transaction.get(query):
+        claim_data = snapshot.to_dict() or {}
+        entries[snapshot.id] = claim_data.get('lock_expires_at')
+    return _live_entries({'claims': entries}, now)
+
+
+@firestore.transactional
+def _acquire(transaction, db, claim_ref, ledger_ref, processor, ttl_seconds, max_locks):
+    now = datetime.now(IST)
+    claim_snapshot = claim_ref.get(transaction=transaction)
+    if not claim_snapshot.exists:
+        raise LockError('Claim not found', 404)
+    claim_data = claim_snapshot.to_dict() or {}
+
+    if lock_is_active(claim_data, now, processor['id']):
+        holder_email = claim_data.get('locked_by_processor_email', '')
+        locked_at = claim_data.get('locked_at')
+        raise LockError(
+            f'Claim is currently being processed by {holder_email}. Please try again later.',
+            409,
+            locked_by=holder_email,
+            locked_at=str(locked_at) if locked_at else 'Unknown',
+            expires_at=str(claim_data.get('lock_expires_at') or '')
+        )
+
+    ledger_snapshot = ledger_ref.get(transaction=transaction)
+    if ledger_snapshot.exists:
+        held = _live_entries(ledger_snapshot.to_dict(), now)
+    else:
+        held = _seed_ledger(transaction, db, processor['id'], now)
+    held.pop(claim_ref.id, None)
+    if len(held) >= max_locks:
+        raise LockError(
+            f'You have reached the maximum limit of {max_locks} locked claims. '
+            'Please unlock a claim before locking another one.',
+            400,
+            current_locked_count=len(held),
+            max_allowed=max_locks
+        )
+
+    expires_at = now + timedelta(seconds=ttl_seconds)
+    lock_data = {
+        'locked_by_processor': processor['id'],
+        'locked_by_processor_email': processor.get('email', ''),
+        'locked_by_processor_name': processor.get('name') or 'Unknown User',
+        'locked_at': firestore.SERVER_TIMESTAMP,
+        'lock_expires_at': expires_at,
+    }
+    held[claim_ref.id] = expires_at
+    transaction.update(claim_ref, lock_data)
+    transaction.set(ledger_ref, {'claims': held, 'updated_at': firestore.SERVER_TIMESTAMP})
+    return lock_data
+
+
+@firestore.transactional
+def _release(transaction, claim_ref, ledger_ref, processor_id, updates, require_owner):
+    now = datetime.now(IST)
+    claim_snapshot = claim_ref.get(transaction=transaction)
+    if not claim_snapshot.exists:
+        raise LockError('Claim not found', 404)
+    claim_data = claim_snapshot.to_dict() or {}
+    ledger_snapshot = ledger_ref.get(transaction=transaction)
+
+    holder = claim_data.get('locked_by_processor')
+    if require_owner:
+        if not holder:
+            raise LockError('Claim is not currently locked', 400)
+        if holder != processor_id:
+            raise LockError('You can only unlock claims that you have locked', 403)
+
+    claim_updates = dict(updates or {})
+    if holder == processor_id:
+        claim_updates.update(CLEARED_LOCK_FIELDS)
+    if claim_updates:
+        transaction.update(claim_ref, claim_updates)
+
+    if ledger_snapshot.exists:
+        held = _live_entries(ledger_snapshot.to_dict(), now)
+        held.pop(claim_ref.id, None)
+        transaction.set(ledger_ref, {'claims': held, 'updated_at': firestore.SERVER_TIMESTAMP})
+    return holder == processor_id
+
+
+class ClaimLockService:
+    """Acquires and releases processor locks on claims."""
+
+    def __init__(self, db_factory, max_locks=DEFAULT_MAX_LOCKS, ttl_seconds=DEFAULT_LOCK_TTL_SECONDS):
+        self.db_factory = db_factory
+        self.max_locks = max_locks
+        self.ttl_seconds = ttl_seconds
+
+    def _refs(self, db, claim_id, processor_id):
+        return (
+            db.collection(CLAIMS_COLLECTION).document(claim_id),
+            db.collection(LEDGERS_COLLECTION).document(processor_id),
         )
 
+    def acquire(self, claim_id, processor_id, email='', name=''):
+        """
+        Lock ``claim_id`` for the processor (or renew their lock) and return
+        the lock fields written. Raises ``LockError`` when another processor
+        holds an unexpired lock or the processor is at the limit.
+        """
+        db = self.db_factory()
+        claim_ref, ledger_ref = self._refs(db, claim_id, processor_id)
+        processor = {'id': processor_id, 'email': email, 'name': name}
+        return _acquire(db.transaction(), db, claim_ref, ledger_ref, processor, self.ttl_seconds, self.max_locks)
+
+    def release(self, claim_id, processor_id, updates=None, require_owner=False):
+        """
+        Drop the processor's lock on ``claim_id``, writing ``updates`` to the
+        claim in the same transaction. With ``require_owner`` a claim that is
+        not locked by the processor raises ``LockError`` instead. Returns
+        whether the processor held the lock.
+        """
+        db = self.db_factory()
+        claim_ref, ledger_ref = self._refs(db, claim_id, processor_id)
+        return _release(db.transaction(), claim_ref, ledger_ref, processor_id, updates, require_owner)
+
+
+# Singleton instance
+_claim_lock_service = None
+
+
+def get_claim_lock_service():
+    """Get singleton claim lock service instance"""
+    global _claim_lock_service
+    if _claim_lock_service is None:
+        from config import Config
+        from firebase_config import get_firestore
+
+        _claim_lock_service = ClaimLockService(
+            get_firestore,
+            max_locks=getattr(Config, 'CLAIM_LOCK_MAX_PER_PROCESSOR', DEFAULT_MAX_LOCKS),
+            ttl_seconds=getattr(Config, 'CLAIM_LOCK_TTL_SECONDS', DEFAULT_LOCK_TTL_SECONDS)
+        )
+    return _claim_lock_service
@@ -3,8 +3,10 @@ Utility helpers for managing lifecycle of in-app notifications.
 """
 import logging
 from datetime import datetime, timedelta, timezone
+from typing import Optional
 
 from firebase_config import get_firestore
+from utils.notification_inbox import ENTRIES_COLLECTION, purge_entries
 
 logger = logging.getLogger(__name__)
 
@@ -14,18 +16,25 @@ DEFAULT_NOTIFICATION_TTL_HOURS = 6
 def cleanup_expired_notifications(
     ttl_hours: int = DEFAULT_NOTIFICATION_TTL_HOURS,
     batch_size: int = 200,
-    db_override=None
+    db_override=None,
+    max_deletes: Optional[int] = None
 ) -> int:
     """
-    Remove notifications whose created_at timestamp is older than ttl_hours.
+    Remove notifications whose created_at timestamp is older than ttl_hours,
+    along with their per-recipient inbox entries.
+
+    Runs from the background sweeper (``utils.notification_sweeper``), not
+    from request handlers.
 
     Args:
         ttl_hours: Age threshold in hours. Must be positive.
         batch_size: Maximum documents deleted per Firestore batch write.
         db_override: Optional Firestore client instance (useful for testing).
+        max_deletes: Optional cap on documents deleted in this call; the
+            rest are left for the next call.
 
     Returns:
-        The total number of notifications deleted.
+        The total number of notifications and inbox entries deleted.
     """
     if ttl_hours <= 0:
         logger.warning("cleanup_expired_notifications: ttl_hours must be positive, skipping cleanup")
@@ -40,12 +49,18 @@ def cleanup_expired_notifications(
     cutoff = datetime.now(timezone.utc) - timedelta(hours=ttl_hours)
     total_deleted = 0
 
+    def next_limit() -> int:
+        if max_deletes is None:
+            return batch_size
+        return min(batch_size, max_deletes - total_deleted)
+
     try:
-        while True:
+        while next_limit() > 0:
+            limit = next_limit()
             expired_docs = (
                 db.collection('claims_notifications')
                 .where('created_at', '<', cutoff)
-                .limit(batch_size)
+                .limit(limit)
                 .get()
             )
 
@@ -66,11 +81,33 @@ def cleanup_expired_notifications(
                 total_deleted,
             )
 
-            if deleted_count < batch_size:
+            if deleted_count < limit:
                 break
     except Exception as err:
         logger.error("cleanup_expired_notifications: Failed to delete expired notifications: %s", err)
 
-    return total_deleted
+    try:
+        while next_limit() > 0:
+            limit = next_limit()
+            expired_entries = (
+                db.collection_group(ENTRIES_COLLECTION)
+                .where('created_at', '<', cutoff)
+                .limit(limit)
+                .get()
+            )
+            if not expired_entries:
+                break
 
+            total_deleted += purge_entries(db, expired_entries)
+            logger.debug(
+                "cleanup_expired_notifications: Deleted %d expired inbox entries, total so far %d",
+                len(expired_entries),
+                total_deleted,
+            )
 
+            if len(expired_entries) < limit:
+                break
+    except Exception as err:
+        logger.error("cleanup_expired_notifications: Failed to delete expired inbox entries: %s", err)
+
+    return total_deleted
@@ -2,14 +2,14 @@
 Notification Client for Claims Module
 Handles all notification calls to the external notification service
 """
-import requests
 import logging
 from typing import Dict, Optional, List
 from config import Config
 from firebase_config import get_firestore
 from firebase_admin import firestore as firebase_firestore
-from utils.notification_cleanup import cleanup_expired_notifications, DEFAULT_NOTIFICATION_TTL_HOURS
 from utils.notification_helpers import get_hospital_users, get_processors_for_claim
+from utils.notification_dispatcher import get_notification_dispatcher
+from utils.notification_inbox import fan_out_notification
 
 logger = logging.getLogger(__name__)
 
@@ -22,36 +22,28 @@ class ClaimsNotificationClient:
             logger.warning("NOTIFICATION_SERVICE_URL not configured. Notifications will be skipped.")
     
     def _send_notification(self, endpoint: str, payload: Dict) -> bool:
-        """Internal method to send notification request"""
+        """
+        Hand a notification to the dispatcher.
+
+        With NOTIFICATION_DISPATCH_ASYNC (default) the payload is queued and
+        delivered in the background, and the return value means "accepted for
+        delivery"; otherwise it is posted inline over the pooled session.
+        """
         if not self.base_url:
             logger.debug(f"Skipping notification to {endpoint} - service URL not configured")
             return False
         
         try:
-            url = f"{self.base_url.rstrip('/')}/{endpoint.lstrip('/')}"
-            response = requests.post(
-                url,
-                json=payload,
-                headers={'Content-Type': 'application/json'},
-                timeout=5  # 5 second timeout
-            )
-            
-            if response.status_code == 200:
+            dispatcher = get_notification_dispatcher(self.base_url)
+            if getattr(Config, 'NOTIFICATION_DISPATCH_ASYNC', True):
+                return dispatcher.enqueue(endpoint, payload)
+
+            ok, _, error = dispatcher.post(endpoint, payload)
+            if ok:
                 logger.info(f"Notification sent successfully to {endpoint} for claim {payload.get('claim_id')}")
-                return True
             else:
-                logger.warning(
-                    f"Notification failed for {endpoint}: "
-                    f"Status {response.status_code}, Response: {response.text}"
-                )
-                return False
-                
-        except requests.exceptions.Timeout:
-            logger.error(f"Notification timeout for {endpoint} - service may be down")
-            return False
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Notification request failed for {endpoint}: {str(e)}")
-            return False
+                logger.warning(f"Notification failed for {endpoint}: {error}")
+            return ok
         except Exception as e:
             logger.error(f"Unexpected error sending notification to {endpoint}: {str(e)}")
             return False
@@ -77,11 +69,6 @@ class ClaimsNotificationClient:
             recipient_ids = [r.get('user_id') for r in recipients if r.get('user_id')]
             recipient_roles = sorted({r.get('user_role') for r in recipients if r.get('user_role')})
 
-            try:
-                cleanup_expired_notifications(ttl_hours=DEFAULT_NOTIFICATION_TTL_HOURS, db_override=db)
-            except Exception as cleanup_err:  # pragma: no cover - defensive logging
-                logger.error("Failed to cleanup expired notifications: %s", cleanup_err)
-
             notification_doc = {
                 'claim_id': claim_id,
                 'event_type': event_type,
@@ -99,7 +86,7 @@ class ClaimsNotificationClient:
                 'updated_at': firebase_firestore.SERVER_TIMESTAMP
             }
 
-            db.collection('claims_notifications').add(notification_doc)
+            fan_out_notification(db, notification_doc)
         except Exception as e:
             logger.error(f"Failed to store notification {event_type} for claim {claim_id}: {str(e)}")
 
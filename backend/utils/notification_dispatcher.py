@@ -0,0 +1,476 @@
+"""
+Asynchronous delivery of notifications to the external notification service.
+
+``ClaimsNotificationClient`` used to POST to the service inside the request
+that changed the claim, so every claim transition (and every claim of a bulk
+action) waited on it. Messages now go onto an in-process queue and request
+handlers return immediately; dispatcher threads drain the queue, group
+messages per endpoint and deliver them over one pooled keep-alive
+``requests.Session``. Failed deliveries (timeouts, connection errors, 429 and
+5xx) are retried with exponential backoff and jitter.
+
+The queue dies with the process. For at-least-once delivery across restarts
+set ``NOTIFICATION_OUTBOX`` to ``firestore`` or ``sqlite``: each message is
+then written to the outbox before it is queued, leased by the process that
+queued it, and marked sent or failed after delivery. Messages whose lease
+expires (the process died first) are replayed by whichever process scans the
+outbox next.
+"""
+import atexit
+import heapq
+import itertools
+import json
+import logging
+import os
+import queue
+import random
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 20
+DEFAULT_FLUSH_SECONDS = 0.5
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BACKOFF_SECONDS = 2.0
+MAX_BACKOFF_SECONDS = 300.0
+DEFAULT_TIMEOUT_SECONDS = 5.0
+DEFAULT_QUEUE_SIZE = 1000
+# How long a queued outbox message is reserved for the process that queued it.
+OUTBOX_LEASE_SECONDS = 300
+OUTBOX_REPLAY_INTERVAL_SECONDS = 60
+# Time allowed at interpreter exit to flush queued messages.
+SHUTDOWN_FLUSH_SECONDS = 5.0
+
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class OutboundMessage:
+    """One notification payload on its way to an endpoint."""
+
+    __slots__ = ('endpoint', 'payload', 'attempts', 'outbox_id')
+
+    def __init__(self, endpoint: str, payload: Dict, attempts: int = 0, outbox_id: Optional[str] = None):
+        self.endpoint = endpoint
+        self.payload = payload
+        self.attempts = attempts
+        self.outbox_id = outbox_id
+
+
+def backoff_delay(attempts: int, base_seconds: float) -> float:
+    """Exponential backoff with +/-50% jitter for the given attempt count."""
+    delay = min(MAX_BACKOFF_SECONDS, base_seconds * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.5, 1.5)
+
+
+class FirestoreOutbox:
+    """Durable outbox in the ``notification_outbox`` collection."""
+
+    COLLECTION = 'notification_outbox'
+
+    def __init__(self, db_factory, owner: str):
+        self.db_factory = db_factory
+        self.owner = owner
+
+    def _ref(self, message_id: str):
+        return self.db_factory().collection(self.COLLECTION).document(message_id)
+
+    def add(self, message: OutboundMessage) -> str:
+        message_id = uuid.uuid4().hex
+        now = datetime.now(timezone.utc)
+        self._ref(message_id).set({
+            'endpoint': message.endpoint,
+            'payload': message.payload,
+            'status': 'pending',
+            'attempts': 0,
+            'owner': self.owner,
+            'leased_until': now + timedelta(seconds=OUTBOX_LEASE_SECONDS),
+            'created_at': now,
+        })
+        return message_id
+
+    def mark_retry(self, message_id: str, attempts: int, next_attempt_in: float, error: str) -> None:
+        self._ref(message_id).update({
+            'attempts': attempts,
+            'last_error': error,
+            'leased_until': datetime.now(timezone.utc) + timedelta(seconds=next_attempt_in + OUTBOX_LEASE_SECONDS),
+        })
+
+    def mark_sent(self, message_id: str) -> None:
+        self._ref(message_id).update({'status': 'sent', 'sent_at': datetime.now(timezone.utc)})
+
+    def mark_failed(self, message_id: str, error: str) -> None:
+        self._ref(message_id).update({'status': 'failed', 'last_error': error})
+
+    def claim_expired(self, limit: int) -> List[OutboundMessage]:
+        """Lease pending messages whose previous owner is gone."""
+        from google.cloud import firestore
+
+        db = self.db_factory()
+        now = datetime.now(timezone.utc)
+        candidates = (
+            db.collection(self.COLLECTION)
+            .where('status', '==', 'pending')
+            .where('leased_until', '<', now)
+            .limit(limit)
+            .get()
+        )
+
+        @firestore.transactional
+        def claim(transaction, ref):
+            snapshot = ref.get(transaction=transaction)
+            data = snapshot.to_dict() or {}
+            if data.get('status') != 'pending' or data.get('leased_until', now) >= now:
+                return None
+            transaction.update(ref, {
+                'owner': self.owner,
+                'leased_until': now + timedelta(seconds=OUTBOX_LEASE_SECONDS),
+            })
+            return data
+
+        claimed = []
+        for snapshot in candidates:
+            data = claim(db.transaction(), snapshot.reference)
+            if data is not None:
+                claimed.append(OutboundMessage(
+                    data['endpoint'], data.get('payload') or {}, data.get('attempts', 0), snapshot.id
+                ))
+        return claimed
+
+
+class SQLiteOutbox:
+    """Durable outbox in a local SQLite file (for single-host deployments)."""
+
+    def __init__(self, path: str, owner: str):
+        self.owner = owner
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS notification_outbox ('
+            ' id TEXT PRIMARY KEY, endpoint TEXT NOT NULL, payload TEXT NOT NULL,'
+            ' status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, owner TEXT,'
+            ' leased_until REAL NOT NULL, last_error TEXT, created_at REAL NOT NULL)'
+        )
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS notification_outbox_pending'
+            ' ON notification_outbox (status, leased_until)'
+        )
+
+    def _execute(self, sql: str, params: Tuple = ()):
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def add(self, message: OutboundMessage) -> str:
+        message_id = uuid.uuid4().hex
+        now = time.time()
+        self._execute(
+            'INSERT INTO notification_outbox (id, endpoint, payload, status, owner, leased_until, created_at)'
+            " VALUES (?, ?, ?, 'pending', ?, ?, ?)",
+            (message_id, message.endpoint, json.dumps(message.payload, default=str), self.owner,
+             now + OUTBOX_LEASE_SECONDS, now)
+        )
+        return message_id
+
+    def mark_retry(self, message_id: str, attempts: int, next_attempt_in: float, error: str) -> None:
+        self._execute(
+            'UPDATE notification_outbox SET attempts = ?, last_error = ?, leased_until = ? WHERE id = ?',
+            (attempts, error, time.time() + next_attempt_in + OUTBOX_LEASE_SECONDS, message_id)
+        )
+
+    def mark_sent(self, message_id: str) -> None:
+        self._execute("UPDATE notification_outbox SET status = 'sent' WHERE id = ?", (message_id,))
+
+    def mark_failed(self, message_id: str, error: str) -> None:
+        self._execute(
+            "UPDATE notification_outbox SET status = 'failed', last_error = ? WHERE id = ?",
+            (error, message_id)
+        )
+
+    def claim_expired(self, limit: int) -> List[OutboundMessage]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, endpoint, payload, attempts FROM notification_outbox"
+                    " WHERE status = 'pending' AND leased_until < ? LIMIT ?",
+                    (now, limit)
+                ).fetchall()
+                self._conn.executemany(
+                    'UPDATE notification_outbox SET owner = ?, leased_until = ? WHERE id = ?',
+                    [(self.owner, now + OUTBOX_LEASE_SECONDS, row[0]) for row in rows]
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return [OutboundMessage(endpoint, json.loads(payload), attempts, message_id)
+                for message_id, endpoint, payload, attempts in rows]
+
+
+class NotificationDispatcher:
+    """Queue and background delivery for notification service requests."""
+
+    def __init__(
+        self,
+        base_url: str,
+        workers: int = 1,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_seconds: float = DEFAULT_FLUSH_SECONDS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+        timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        batch_api: bool = False,
+        outbox=None,
+        session: Optional[requests.Session] = None
+    ):
+        self.base_url = base_url.rstrip('/')
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_seconds = backoff_seconds
+        self.timeout_seconds = timeout_seconds
+        self.batch_api = batch_api
+        self.outbox = outbox
+        self.session = session or self._build_session()
+
+        self._queue: "queue.Queue[OutboundMessage]" = queue.Queue(maxsize=queue_size)
+        self._retries: List[Tuple[float, int, OutboundMessage]] = []
+        self._retry_seq = itertools.count()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.stats = {'queued': 0, 'sent': 0, 'retried': 0, 'failed': 0, 'dropped': 0}
+
+    def _build_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(2, self.workers))
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({'Content-Type': 'application/json'})
+        return session
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[counter] += amount
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+    def enqueue(self, endpoint: str, payload: Dict) -> bool:
+        """
+        Queue a payload for delivery; never blocks on the notification service.
+
+        Returns True when the message was accepted (queued, or persisted to
+        the outbox for replay if the in-process queue is full).
+        """
+        message = OutboundMessage(endpoint, payload)
+        if self.outbox is not None:
+            try:
+                message.outbox_id = self.outbox.add(message)
+            except Exception as err:
+                logger.error("notification_dispatcher: outbox write failed for %s: %s", endpoint, err)
+
+        self.start()
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            if message.outbox_id is None:
+                self._count('dropped')
+                logger.error("notification_dispatcher: queue full, dropped notification to %s", endpoint)
+                return False
+            logger.warning("notification_dispatcher: queue full, %s left in outbox for replay", endpoint)
+        self._count('queued')
+        return True
+
+    # ------------------------------------------------------------------
+    # Delivery side
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(
+                    target=self._run, name=f'notification-dispatch-{index}', daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+            if self.outbox is not None:
+                thread = threading.Thread(target=self._replay_outbox, name='notification-outbox', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _due_retries(self) -> Tuple[List[OutboundMessage], Optional[float]]:
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            while self._retries and self._retries[0][0] <= now:
+                due.append(heapq.heappop(self._retries)[2])
+            next_due = self._retries[0][0] - now if self._retries else None
+        return due, next_due
+
+    def _next_batch(self) -> List[OutboundMessage]:
+        batch, next_due = self._due_retries()
+        wait = self.flush_seconds if next_due is None else min(self.flush_seconds, next_due)
+        try:
+            if not batch:
+                batch.append(self._queue.get(timeout=max(0.01, wait)))
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                batch.append(self._queue.get(timeout=remaining))
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self) -> None:
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if not batch:
+                continue
+            groups: Dict[str, List[OutboundMessage]] = {}
+            for message in batch:
+                groups.setdefault(message.endpoint, []).append(message)
+            for endpoint, messages in groups.items():
+                try:
+                    self.deliver(endpoint, messages)
+                except Exception as err:  # pragma: no cover - defensive logging
+                    logger.error("notification_dispatcher: delivery to %s crashed: %s", endpoint, err)
+
+    def post(self, endpoint: str, body) -> Tuple[bool, bool, str]:
+        """POST ``body``; returns ``(ok, retryable, error)``."""
+        url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        try:
+            response = self.session.post(url, json=body, timeout=self.timeout_seconds)
+        except requests.exceptions.Timeout:
+            return False, True, 'timeout'
+        except requests.exceptions.RequestException as err:
+            return False, True, str(err)
+        if 200 <= response.status_code < 300:
+            return True, False, ''
+        return (
+            False,
+            response.status_code in RETRYABLE_STATUS_CODES,
+            f'status {response.status_code}: {response.text[:200]}'
+        )
+
+    def deliver(self, endpoint: str, messages: List[OutboundMessage]) -> None:
+        """Deliver messages for one endpoint, scheduling retries for failures."""
+        if self.batch_api and len(messages) > 1:
+            ok, retryable, error = self.post(
+                f"{endpoint.rstrip('/')}/batch", {'notifications': [m.payload for m in messages]}
+            )
+            for message in messages:
+                self._settle(message, ok, retryable, error)
+            return
+        for message in messages:
+            self._settle(message, *self.post(endpoint, message.payload))
+
+    def _settle(self, message: OutboundMessage, ok: bool, retryable: bool, error: str) -> None:
+        message.attempts += 1
+        claim_id = message.payload.get('claim_id')
+        if ok:
+            self._count('sent')
+            logger.info("Notification sent successfully to %s for claim %s", message.endpoint, claim_id)
+            self._outbox_call('mark_sent', message.outbox_id)
+            return
+
+        if retryable and message.attempts < self.max_attempts:
+            delay = backoff_delay(message.attempts, self.backoff_seconds)
+            self._count('retried')
+            logger.warning(
+                "Notification to %s for claim %s failed (%s); retry %d/%d in %.1fs",
+                message.endpoint, claim_id, error, message.attempts, self.max_attempts - 1, delay
+            )
+            self._outbox_call('mark_retry', message.outbox_id, message.attempts, delay, error)
+            with self._lock:
+                heapq.heappush(self._retries, (time.monotonic() + delay, next(self._retry_seq), message))
+            return
+
+        self._count('failed')
+        logger.error(
+            "Notification to %s for claim %s failed after %d attempt(s): %s",
+            message.endpoint, claim_id, message.attempts, error
+        )
+        self._outbox_call('mark_failed', message.outbox_id, error)
+
+    def _outbox_call(self, method: str, outbox_id: Optional[str], *args) -> None:
+        if self.outbox is None or outbox_id is None:
+            return
+        try:
+            getattr(self.outbox, method)(outbox_id, *args)
+        except Exception as err:
+            logger.warning("notification_dispatcher: outbox %s failed for %s: %s", method, outbox_id, err)
+
+    def _replay_outbox(self) -> None:
+        while not self._stopping.wait(OUTBOX_REPLAY_INTERVAL_SECONDS * random.uniform(0.5, 1.5)):
+            try:
+                for message in self.outbox.claim_expired(self.batch_size * 5):
+                    logger.info("notification_dispatcher: replaying %s from outbox", message.endpoint)
+                    try:
+                        self._queue.put_nowait(message)
+                    except queue.Full:
+                        break
+            except Exception as err:
+                logger.warning("notification_dispatcher: outbox replay failed: %s", err)
+
+    def flush(self, timeout: float = SHUTDOWN_FLUSH_SECONDS) -> None:
+        """Stop accepting work and give queued messages ``timeout`` to go out."""
+        self._stopping.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+
+# Singleton instance
+_notification_dispatcher = None
+_notification_dispatcher_lock = threading.Lock()
+
+
+def _build_outbox(owner: str):
+    kind = getattr(Config, 'NOTIFICATION_OUTBOX', '')
+    if kind == 'firestore':
+        from firebase_config import get_firestore
+        return FirestoreOutbox(get_firestore, owner)
+    if kind == 'sqlite':
+        return SQLiteOutbox(getattr(Config, 'NOTIFICATION_OUTBOX_SQLITE_PATH', 'notification_outbox.sqlite3'), owner)
+    return None
+
+
+def get_notification_dispatcher(base_url: str) -> NotificationDispatcher:
+    """Get singleton notification dispatcher instance"""
+    global _notification_dispatcher
+    with _notification_dispatcher_lock:
+        if _notification_dispatcher is None:
+            owner = f'{socket.gethostname()}:{os.getpid()}'
+            _notification_dispatcher = NotificationDispatcher(
+                base_url,
+                workers=getattr(Config, 'NOTIFICATION_DISPATCH_WORKERS', 1),
+                batch_size=getattr(Config, 'NOTIFICATION_DISPATCH_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+                flush_seconds=getattr(Config, 'NOTIFICATION_DISPATCH_FLUSH_SECONDS', DEFAULT_FLUSH_SECONDS),
+                max_attempts=getattr(Config, 'NOTIFICATION_DISPATCH_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS),
+                backoff_seconds=getattr(Config, 'NOTIFICATION_DISPATCH_BACKOFF_SECONDS', DEFAULT_BACKOFF_SECONDS),
+                timeout_seconds=getattr(Config, 'NOTIFICATION_DISPATCH_TIMEOUT_SECONDS', DEFAULT_TIMEOUT_SECONDS),
+                queue_size=getattr(Config, 'NOTIFICATION_DISPATCH_QUEUE_SIZE', DEFAULT_QUEUE_SIZE),
+                batch_api=getattr(Config, 'NOTIFICATION_BATCH_API', False),
+                outbox=_build_outbox(owner)
+            )
+            atexit.register(_notification_dispatcher.flush)
+    return _notification_dispatcher
@@ -0,0 +1,213 @@
+"""
+Per-recipient notification inboxes.
+
+Notifications are fanned out on write: besides the ``claims_notifications``
+document, every recipient gets an entry in
+``notification_inboxes/{user_id}/inbox_entries/{notification_id}`` carrying
+the fields the inbox renders plus the recipient's own ``read`` flag. Listing
+is then a single ordered query over the user's entries (O(page size) reads
+at any volume), paginated with ``created_at``/document ID cursors.
+
+``notification_inboxes/{user_id}.unread_count`` is maintained alongside the
+entries (incremented on fan-out, decremented when an unread entry is read or
+removed) so badges never have to count entries. If the counter is missing it
+is rebuilt from an aggregation query.
+"""
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from google.cloud import firestore
+
+from utils.pagination import DOCUMENT_ID_FIELD, cursor_for
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATIONS_COLLECTION = 'claims_notifications'
+INBOX_COLLECTION = 'notification_inboxes'
+ENTRIES_COLLECTION = 'inbox_entries'
+
+MAX_BATCH_WRITES = 500
+# Mark-read and delete run in one transaction per chunk of this many entries.
+MAX_TRANSACTION_ENTRIES = 200
+
+ENTRY_FIELDS = (
+    'claim_id',
+    'event_type',
+    'title',
+    'message',
+    'metadata',
+    'status',
+    'triggered_by',
+    'delivery_success',
+)
+
+
+def inbox_ref(db, user_id: str):
+    return db.collection(INBOX_COLLECTION).document(user_id)
+
+
+def entries_ref(db, user_id: str):
+    return inbox_ref(db, user_id).collection(ENTRIES_COLLECTION)
+
+
+def _chunks(items: Sequence, size: int) -> Iterable[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def fan_out_notification(db, notification_doc: Dict) -> str:
+    """
+    Store a notification and add an unread entry to each recipient's inbox.
+
+    ``notification_doc`` is the ``claims_notifications`` document; its
+    ``recipient_ids`` decide the inboxes. Returns the notification ID.
+    """
+    notification_ref = db.collection(NOTIFICATIONS_COLLECTION).document()
+    recipient_ids = sorted({uid for uid in notification_doc.get('recipient_ids', []) if uid})
+
+    entry = {field: notification_doc.get(field) for field in ENTRY_FIELDS}
+    entry.update({
+        'notification_id': notification_ref.id,
+        'read': False,
+        'read_at': None,
+        'created_at': firestore.SERVER_TIMESTAMP,
+    })
+
+    writes = [(notification_ref, notification_doc, False)]
+    for user_id in recipient_ids:
+        writes.append((entries_ref(db, user_id).document(notification_ref.id), entry, False))
+        writes.append((inbox_ref(db, user_id), {'unread_count': firestore.Increment(1)}, True))
+
+    for chunk in _chunks(writes, MAX_BATCH_WRITES):
+        batch = db.batch()
+        for ref, data, merge in chunk:
+            batch.set(ref, data, merge=merge)
+        batch.commit()
+    return notification_ref.id
+
+
+def serialize_entry(doc_id: str, data: Dict) -> Dict:
+    """Inbox entry in the shape the notifications API returns."""
+    def iso(value):
+        if value and hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return str(value) if value else value
+
+    return {
+        'id': doc_id,
+        'claim_id': data.get('claim_id'),
+        'event_type': data.get('event_type'),
+        'title': data.get('title'),
+        'message': data.get('message'),
+        'metadata': data.get('metadata') or {},
+        'status': data.get('status'),
+        'triggered_by': data.get('triggered_by') or {},
+        'delivery_success': data.get('delivery_success', False),
+        'created_at': iso(data.get('created_at')),
+        'updated_at': iso(data.get('read_at') or data.get('created_at')),
+        'read': bool(data.get('read'))
+    }
+
+
+def list_inbox(db, user_id: str, limit: int, unread_only: bool = False,
+               cursor: Optional[Tuple[Any, str]] = None) -> Tuple[List, Optional[Tuple[Any, str]]]:
+    """
+    Read one page of a user's inbox, newest first.
+
+    Returns ``(snapshots, next_cursor)``; ``next_cursor`` is None on the last
+    page.
+    """
+    query = entries_ref(db, user_id)
+    if unread_only:
+        query = query.where('read', '==', False)
+    query = (
+        query.order_by('created_at', direction=firestore.Query.DESCENDING)
+        .order_by(DOCUMENT_ID_FIELD, direction=firestore.Query.DESCENDING)
+    )
+    if cursor is not None:
+        query = query.start_after(cursor_for('created_at', *cursor))
+
+    snapshots = list(query.limit(limit + 1).stream())
+    if len(snapshots) <= limit:
+        return snapshots, None
+    snapshots = snapshots[:limit]
+    last = snapshots[-1]
+    return snapshots, ((last.to_dict() or {}).get('created_at'), last.id)
+
+
+def recount_unread(db, user_id: str) -> int:
+    """Rebuild a user's unread counter from their entries."""
+    result = entries_ref(db, user_id).where('read', '==', False).count().get()
+    unread = int(result[0][0].value) if result else 0
+    inbox_ref(db, user_id).set({'unread_count': unread}, merge=True)
+    return unread
+
+
+def unread_count(db, user_id: str) -> int:
+    snapshot = inbox_ref(db, user_id).get()
+    if not snapshot.exists or 'unread_count' not in (snapshot.to_dict() or {}):
+        return recount_unread(db, user_id)
+    return max(0, int(snapshot.get('unread_count') or 0))
+
+
+@firestore.transactional
+def _update_entries_in_transaction(transaction, db, user_id: str, notification_ids: Sequence[str],
+                                   delete: bool) -> Tuple[int, int]:
+    refs = [entries_ref(db, user_id).document(nid) for nid in notification_ids]
+    snapshots = [snapshot for snapshot in db.get_all(refs, transaction=transaction) if snapshot.exists]
+
+    unread_removed = 0
+    for snapshot in snapshots:
+        was_unread = not (snapshot.to_dict() or {}).get('read')
+        if delete:
+            transaction.delete(snapshot.reference)
+        elif was_unread:
+            transaction.update(snapshot.reference, {'read': True, 'read_at': firestore.SERVER_TIMESTAMP})
+        if was_unread:
+            unread_removed += 1
+
+    if unread_removed:
+        transaction.set(inbox_ref(db, user_id), {'unread_count': firestore.Increment(-unread_removed)}, merge=True)
+    return len(snapshots), unread_removed
+
+
+def mark_read(db, user_id: str, notification_ids: Sequence[str]) -> int:
+    """Mark entries read; returns how many were unread."""
+    changed = 0
+    ids = list(dict.fromkeys(notification_ids))
+    for chunk in _chunks(ids, MAX_TRANSACTION_ENTRIES):
+        changed += _update_entries_in_transaction(db.transaction(), db, user_id, chunk, False)[1]
+    return changed
+
+
+def delete_entries(db, user_id: str, notification_ids: Sequence[str]) -> int:
+    """Remove entries from a user's inbox; returns how many existed."""
+    deleted = 0
+    ids = list(dict.fromkeys(notification_ids))
+    for chunk in _chunks(ids, MAX_TRANSACTION_ENTRIES):
+        deleted += _update_entries_in_transaction(db.transaction(), db, user_id, chunk, True)[0]
+    return deleted
+
+
+def purge_entries(db, snapshots: Sequence) -> int:
+    """
+    Delete inbox entry snapshots (from any inboxes) in batches.
+
+    Unread counters of the owning inboxes are decremented for unread entries.
+    Used by the expiry sweep, where entries come from a collection group query.
+    """
+    writes = []
+    for snapshot in snapshots:
+        writes.append(('delete', snapshot.reference))
+        if not (snapshot.to_dict() or {}).get('read'):
+            writes.append(('decrement', snapshot.reference.parent.parent))
+
+    for chunk in _chunks(writes, MAX_BATCH_WRITES):
+        batch = db.batch()
+        for operation, ref in chunk:
+            if operation == 'delete':
+                batch.delete(ref)
+            else:
+                batch.set(ref, {'unread_count': firestore.Increment(-1)}, merge=True)
+        batch.commit()
+    return len(snapshots)
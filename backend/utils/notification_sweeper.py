@@ -0,0 +1,141 @@
+"""
+Background sweeper for expired notifications.
+
+Request handlers never delete notifications; expiry is handled here, off the
+request path. The sweeper runs as a daemon thread (in the gunicorn master or
+in each worker, see ``gunicorn.conf.py``) or from the command line with
+``sweep_notifications.py``.
+
+Every process may run a sweeper, but a run only starts after it claims the
+``maintenance_runs/notification_sweeper`` marker (see
+``utils.background_runs``), so across all workers at most one sweep runs per
+interval.
+Each run deletes at most ``delete_budget`` documents; anything left over is
+picked up by the next run.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from config import Config
+from utils.background_runs import claim_run, finish_run, marker_ref as run_marker
+from utils.notification_cleanup import DEFAULT_NOTIFICATION_TTL_HOURS, cleanup_expired_notifications
+
+logger = logging.getLogger(__name__)
+
+MARKER_DOCUMENT = 'notification_sweeper'
+
+DEFAULT_INTERVAL_SECONDS = 300
+DEFAULT_JITTER_SECONDS = 60
+DEFAULT_DELETE_BUDGET = 2000
+# A sweep that has not finished after this long is assumed dead.
+DEFAULT_LEASE_SECONDS = 600
+
+
+class NotificationSweeper:
+    """Periodically deletes expired notifications and inbox entries."""
+
+    def __init__(self, db_factory, ttl_hours: int = DEFAULT_NOTIFICATION_TTL_HOURS,
+                 interval_seconds: float = DEFAULT_INTERVAL_SECONDS,
+                 jitter_seconds: float = DEFAULT_JITTER_SECONDS,
+                 delete_budget: int = DEFAULT_DELETE_BUDGET,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS):
+        self.db_factory = db_factory
+        self.ttl_hours = ttl_hours
+        self.interval_seconds = interval_seconds
+        self.jitter_seconds = jitter_seconds
+        self.delete_budget = delete_budget
+        self.lease_seconds = lease_seconds
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self, force: bool = False) -> Optional[Dict]:
+        """
+        Sweep if no other process has swept within the interval.
+
+        Returns the run summary, or None when the run was skipped.
+        """
+        db = self.db_factory()
+        marker_ref = run_marker(db, MARKER_DOCUMENT)
+        if not claim_run(db.transaction(), marker_ref, self.owner,
+                          self.interval_seconds, self.lease_seconds, force):
+            logger.debug("notification_sweeper: another process swept recently, skipping")
+            return None
+
+        started = datetime.now(timezone.utc)
+        deleted = cleanup_expired_notifications(
+            ttl_hours=self.ttl_hours,
+            db_override=db,
+            max_deletes=self.delete_budget
+        )
+        summary = {
+            'owner': self.owner,
+            'deleted': deleted,
+            'budget_exhausted': deleted >= self.delete_budget,
+            'duration_seconds': round((datetime.now(timezone.utc) - started).total_seconds(), 3),
+        }
+        finish_run(marker_ref, summary)
+        logger.info("notification_sweeper: %s", summary)
+        return summary
+
+    def _loop(self) -> None:
+        # Stagger the first run too, so workers started together don't race
+        while not self._stop.wait(self.interval_seconds + random.uniform(0, self.jitter_seconds)):
+            try:
+                self.run_once()
+            except Exception as err:
+                logger.error("notification_sweeper: sweep failed: %s", err)
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='notification-sweeper', daemon=True)
+        self._thread.start()
+        logger.info(
+            "notification_sweeper: started (interval=%ss, jitter=%ss, budget=%s)",
+            self.interval_seconds, self.jitter_seconds, self.delete_budget
+        )
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+# Singleton instance
+_notification_sweeper = None
+
+
+def get_notification_sweeper() -> NotificationSweeper:
+    """Get singleton notification sweeper instance"""
+    global _notification_sweeper
+    if _notification_sweeper is None:
+        from firebase_config import get_firestore
+
+        _notification_sweeper = NotificationSweeper(
+            get_firestore,
+            ttl_hours=getattr(Config, 'NOTIFICATION_TTL_HOURS', DEFAULT_NOTIFICATION_TTL_HOURS),
+            interval_seconds=getattr(Config, 'NOTIFICATION_SWEEP_INTERVAL_SECONDS', DEFAULT_INTERVAL_SECONDS),
+            jitter_seconds=getattr(Config, 'NOTIFICATION_SWEEP_JITTER_SECONDS', DEFAULT_JITTER_SECONDS),
+            delete_budget=getattr(Config, 'NOTIFICATION_SWEEP_DELETE_BUDGET', DEFAULT_DELETE_BUDGET)
+        )
+    return _notification_sweeper
+
+
+def start_notification_sweeper(mode: str) -> bool:
+    """
+    Start the background sweeper if ``NOTIFICATION_SWEEPER_MODE`` equals ``mode``.
+
+    ``mode`` is where the caller runs: 'master' (gunicorn master), 'worker'
+    (each gunicorn worker or a plain ``app.run`` server). Returns True when
+    the sweeper was started.
+    """
+    if getattr(Config, 'NOTIFICATION_SWEEPER_MODE', 'worker') != mode:
+        return False
+    get_notification_sweeper().start()
+    return True
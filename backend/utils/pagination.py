@@ -0,0 +1,57 @@
+"""
+Opaque page tokens for Firestore cursor pagination.
+
+A page token carries the ordered field value and document ID of the last
+document a page consumed, so the next page can resume with ``start_after``
+instead of re-reading (or offset-skipping) everything before it.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+DOCUMENT_ID_FIELD = '__name__'
+
+
+def _encode_value(value: Any) -> Dict:
+    if isinstance(value, datetime):
+        return {'t': 'ts', 'v': value.isoformat()}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return {'t': 'raw', 'v': value}
+    # Unknown Firestore types are compared by their string form
+    return {'t': 'raw', 'v': str(value)}
+
+
+def _decode_value(encoded: Dict) -> Any:
+    if encoded.get('t') == 'ts':
+        return datetime.fromisoformat(encoded['v'])
+    return encoded.get('v')
+
+
+def encode_page_token(order_value: Any, document_id: str) -> str:
+    """Build a URL-safe token for the document a page ended on."""
+    payload = {'o': _encode_value(order_value), 'id': document_id}
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_page_token(token: Optional[str]) -> Optional[Tuple[Any, str]]:
+    """
+    Parse a token produced by ``encode_page_token``.
+
+    Returns ``(order_value, document_id)`` or None when no token is given.
+    Raises ValueError for malformed tokens so callers can return a 400.
+    """
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return _decode_value(payload['o']), str(payload['id'])
+    except Exception as exc:
+        raise ValueError('Invalid page_token') from exc
+
+
+def cursor_for(order_field: str, order_value: Any, document_id: str) -> Dict:
+    """Cursor dict for ``query.start_after`` on ``(order_field, __name__)``."""
+    return {order_field: order_value, DOCUMENT_ID_FIELD: document_id}
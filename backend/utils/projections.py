@@ -0,0 +1,140 @@
+"""
+Field projections for list endpoints.
+
+List views only render a handful of fields per claim, but ``direct_claims``
+documents also carry large ``form_data`` maps, ``review_history``,
+``rm_data`` and ``documents`` arrays. Each view declares the field paths its
+serializer reads (including sort and filter fields), and ``select_fields``
+turns the query into a Firestore projection so only those are downloaded.
+
+When a serializer starts reading a new field, add it to the view here;
+fields missing from the projection come back absent from ``to_dict()``.
+"""
+from typing import Dict, Tuple
+
+_INBOX_FORM_FIELDS = (
+    'form_data.patient_name',
+    'form_data.claimed_amount',
+    'form_data.payer_name',
+    'form_data.specialty',
+)
+
+_LOCK_FIELDS = (
+    'locked_by_processor',
+    'locked_by_processor_email',
+    'locked_by_processor_name',
+    'locked_at',
+    'lock_expires_at',
+)
+
+VIEW_FIELDS: Dict[str, Tuple[str, ...]] = {
+    # claims.py: _fetch_claims_for_user (get-all-claims, export)
+    'hospital_claims': (
+        'claim_id',
+        'claim_status',
+        'status',
+        'hospital_id',
+        'hospital_name',
+        'created_at',
+        'updated_at',
+        'submission_date',
+        'created_by_email',
+        'created_by_name',
+        'email',
+        'payer_name',
+        'total_bill_amount',
+        'stage',
+    ) + _INBOX_FORM_FIELDS,
+
+    # processor_routes.py: get_claims_to_process
+    'processor_inbox': (
+        'claim_id',
+        'claim_status',
+        'hospital_id',
+        'hospital_name',
+        'created_at',
+        'updated_at',
+        'processed_at',
+        'submission_date',
+        'created_by_email',
+    ) + _INBOX_FORM_FIELDS + _LOCK_FIELDS,
+
+    # rm_routes.py: get_rm_claims
+    'rm_inbox': (
+        'claim_id',
+        'claim_status',
+        'hospital_id',
+        'hospital_name',
+        'created_at',
+        'updated_at',
+        'submission_date',
+        'created_by_email',
+        'rm_updated_at',
+        'rm_updated_by_name',
+    ) + _INBOX_FORM_FIELDS,
+
+    # review_request_routes.py: get_review_claims
+    'review_inbox': (
+        'claim_id',
+        'claim_status',
+        'hospital_id',
+        'hospital_name',
+        'created_at',
+        'updated_at',
+        'submission_date',
+        'claim_type',
+        'claimed_amount',
+        'authorization_number',
+        'form_data.authorization_number',
+        'form_data.ccn_number',
+        'form_data.admission_date',
+        'form_data.date_of_admission',
+        'form_data.discharge_date',
+        'form_data.date_of_discharge',
+        'form_data.payer_type',
+        'form_data.payer_name',
+        'form_data.doctor',
+        'form_data.doctor_name',
+        'form_data.treating_doctor',
+        'form_data.treating_doctor_name',
+        'form_data.patient_name',
+        'form_data.claim_type',
+        'form_data.total_bill_amount',
+        'form_data.total_bill_amount_value',
+        'form_data.total_billed_amount',
+        'form_data.patient_paid_amount',
+        'form_data.advance_paid_amount',
+        'form_data.patient_share_amount',
+        'form_data.discount_amount',
+        'form_data.total_discount_amount',
+        'form_data.claimed_amount',
+        'payer_details.authorization_number',
+        'payer_details.payer_type',
+        'payer_details.payer_name',
+        'patient_details.patient_name',
+        'claim_metadata',
+        'review_data',
+        'processor_decision',
+        # Needed for the last reviewer and the history count
+        'review_history',
+    ),
+
+    # drafts.py: get_drafts (claims collection)
+    'drafts': (
+        'draft_id',
+        'claim_status',
+        'hospital_id',
+        'hospital_name',
+        'created_at',
+        'updated_at',
+        'created_by_email',
+        'form_data.patient_name',
+        'form_data.claimed_amount',
+        'form_data.specialty',
+    ),
+}
+
+
+def select_fields(query, view: str):
+    """Restrict a Firestore query (or collection) to the fields of ``view``."""
+    return query.select(list(VIEW_FIELDS[view]))
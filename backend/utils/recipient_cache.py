@@ -0,0 +1,210 @@
+"""
+Per-process index of notification recipients by hospital.
+
+Resolving who to notify used to query every hospital user (and, for
+processors, five role queries) and scan their ``entity_assignments`` on each
+notification. Instead, one ``users`` query over the recipient roles builds a
+``hospital_id -> recipients`` map that is reused until it expires, so a
+lookup is a dict access returning O(recipients) entries.
+
+The index is rebuilt after ``ttl_seconds`` and dropped immediately when the
+``users`` listener of the profile cache (``USER_CACHE_LISTENER_ENABLED``)
+reports a change to a recipient, or when ``invalidate_recipients`` is called.
+Profiles of individual users (assigned processors) are served from the same
+index and fetched with a single ``get_all`` when they are not in it.
+"""
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 300
+
+HOSPITAL_USER_ROLE = 'hospital_user'
+PROCESSOR_ROLES = (
+    'claim_processor',
+    'claim_processor_l1',
+    'claim_processor_l2',
+    'claim_processor_l3',
+    'claim_processor_l4',
+)
+RECIPIENT_ROLES = (HOSPITAL_USER_ROLE,) + PROCESSOR_ROLES
+
+# Fields the index is derived from; a change to any of them drops it.
+INDEXED_FIELDS = ('uid', 'role', 'entity_assignments', 'name', 'display_name', 'full_name', 'email')
+
+
+def display_name(user_data: Dict, fallback: str = 'Unknown') -> str:
+    return user_data.get('name') or user_data.get('display_name') or user_data.get('full_name') or fallback
+
+
+def _recipient(doc_id: str, user_data: Dict) -> Dict:
+    # Use uid field if available, otherwise use the document ID
+    return {
+        'user_id': user_data.get('uid') or doc_id,
+        'user_role': user_data.get('role', 'claim_processor'),
+        'name': display_name(user_data),
+        'email': user_data.get('email', '')
+    }
+
+
+class RecipientIndex:
+    """hospital_id -> hospital users / processors, rebuilt from one query."""
+
+    def __init__(self, db_factory, ttl_seconds: float = DEFAULT_TTL_SECONDS, enabled: bool = True):
+        self.db_factory = db_factory
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._index: Optional[Dict] = None
+        self._built_at = 0.0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self.builds = 0
+        self.invalidations = 0
+
+    def _fresh_index(self) -> Optional[Dict]:
+        with self._lock:
+            if self._index is not None and time.monotonic() - self._built_at < self.ttl_seconds:
+                return self._index
+            return None
+
+    def _build(self) -> Dict:
+        db = self.db_factory()
+        hospital_users: Dict[str, List[Dict]] = {}
+        processors: Dict[str, List[Dict]] = {}
+        profiles: Dict[str, Dict] = {}
+
+        for doc in db.collection('users').where('role', 'in', list(RECIPIENT_ROLES)).get():
+            user_data = doc.to_dict() or {}
+            profiles[doc.id] = user_data
+            role = user_data.get('role')
+            seen_hospitals = set()
+            for hospital in (user_data.get('entity_assignments') or {}).get('hospitals', []) or []:
+                hospital_id = (hospital or {}).get('id')
+                if not hospital_id or hospital_id in seen_hospitals:
+                    continue
+                seen_hospitals.add(hospital_id)
+                recipient = _recipient(doc.id, user_data)
+                if role == HOSPITAL_USER_ROLE:
+                    recipient['hospital_name'] = hospital.get('name', 'Unknown Hospital')
+                    hospital_users.setdefault(hospital_id, []).append(recipient)
+                else:
+                    processors.setdefault(hospital_id, []).append(recipient)
+
+        # Same order as the per-role queries this replaces
+        for entries in processors.values():
+            entries.sort(key=lambda entry: PROCESSOR_ROLES.index(entry['user_role']))
+
+        self.builds += 1
+        return {'hospital_users': hospital_users, 'processors': processors, 'profiles': profiles}
+
+    def _current(self) -> Dict:
+        index = self._fresh_index() if self.enabled else None
+        if index is not None:
+            return index
+
+        # One rebuild at a time; concurrent callers wait and reuse it
+        with self._build_lock:
+            index = self._fresh_index() if self.enabled else None
+            if index is not None:
+                return index
+            generation = self._generation
+            index = self._build()
+            if self.enabled:
+                with self._lock:
+                    # Don't keep an index that a concurrent change invalidated
+                    if generation == self._generation:
+                        self._index = index
+                        self._built_at = time.monotonic()
+            return index
+
+    def hospital_users(self, hospital_id: str) -> List[Dict]:
+        return [dict(entry) for entry in self._current()['hospital_users'].get(hospital_id, [])]
+
+    def hospital_processors(self, hospital_id: str) -> List[Dict]:
+        return [dict(entry) for entry in self._current()['processors'].get(hospital_id, [])]
+
+    def get_users(self, user_ids: Iterable[str]) -> Dict[str, Optional[Dict]]:
+        """
+        Profiles for ``users/{id}`` documents, None for missing ones.
+
+        Recipients come from the index; any others are read with one
+        ``get_all`` round trip.
+        """
+        ids = list(dict.fromkeys(uid for uid in user_ids if uid))
+        profiles = self._current()['profiles'] if ids else {}
+        found = {uid: dict(profiles[uid]) for uid in ids if uid in profiles}
+
+        missing = [uid for uid in ids if uid not in found]
+        if missing:
+            db = self.db_factory()
+            refs = [db.collection('users').document(uid) for uid in missing]
+            for snapshot in db.get_all(refs):
+                found[snapshot.id] = (snapshot.to_dict() or {}) if snapshot.exists else None
+        return {uid: found.get(uid) for uid in ids}
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            if self._index is not None:
+                self._index = None
+                self.invalidations += 1
+
+    def apply_change(self, uid: str, new_data: Optional[Dict]) -> None:
+        """Drop the index when a change affects who gets notified."""
+        with self._lock:
+            index = self._index
+        if index is None:
+            return
+
+        cached = index['profiles'].get(uid)
+        if cached is None:
+            relevant = new_data is not None and new_data.get('role') in RECIPIENT_ROLES
+        else:
+            relevant = new_data is None or any(
+                cached.get(field) != new_data.get(field) for field in INDEXED_FIELDS
+            )
+        if relevant:
+            self.invalidate()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            index = self._index
+            return {
+                'enabled': self.enabled,
+                'ttl_seconds': self.ttl_seconds,
+                'hospitals': len(set(index['hospital_users']) | set(index['processors'])) if index else 0,
+                'recipients': len(index['profiles']) if index else 0,
+                'builds': self.builds,
+                'invalidations': self.invalidations
+            }
+
+
+# Singleton instance
+_recipient_index = None
+
+
+def get_recipient_index() -> RecipientIndex:
+    """Get singleton recipient index instance"""
+    global _recipient_index
+    if _recipient_index is None:
+        from firebase_config import get_firestore
+        from utils.user_cache import get_user_cache
+
+        _recipient_index = RecipientIndex(
+            get_firestore,
+            ttl_seconds=getattr(Config, 'RECIPIENT_CACHE_TTL_SECONDS', DEFAULT_TTL_SECONDS),
+            enabled=getattr(Config, 'RECIPIENT_CACHE_ENABLED', True)
+        )
+        get_user_cache().add_change_callback(_recipient_index.apply_change)
+    return _recipient_index
+
+
+def invalidate_recipients() -> None:
+    """Invalidation hook for code paths that modify users or their assignments."""
+    get_recipient_index().invalidate()
@@ -0,0 +1,562 @@
+"""
+Resumable, chunked document uploads.
+
+The single-request upload endpoints buffer the whole file, so a dropped
+connection on a large scan means starting over. Resumable uploads split the
+file into chunks the client sends one request at a time:
+
+1. ``POST /api/v1/documents/uploads`` opens a session (target claim or
+   draft, file name, type, size and optionally its MD5) and returns the
+   ``upload_id`` and the chunk size to use.
+2. ``PUT /api/v1/documents/uploads/<upload_id>`` with a
+   ``Content-Range: bytes <start>-<end>/<size>`` header sends one chunk.
+   Each response carries the committed ``offset``; after a failure the
+   client asks ``GET .../uploads/<upload_id>`` for it and resends only the
+   bytes from there.
+3. ``POST .../uploads/<upload_id>/finalize`` verifies the MD5, records the
+   document, links it to its claim or draft and queues large images/PDFs
+   for background compression like the single-request path (see
+   ``utils.compression_pipeline``).
+
+Chunks are written straight through: into a Cloud Storage resumable session
+for the final object (``DOCUMENT_UPLOADS_BACKEND=storage``), or to a staging
+file on local disk that is uploaded on finalize (``local``; all workers of a
+host share it). Only one chunk is held in memory at a time. Session state
+lives in ``document_upload_sessions/{upload_id}``.
+"""
+import base64
+import binascii
+import contextlib
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, Optional, Tuple
+
+import requests
+from google.api_core import exceptions as gcloud_exceptions
+from google.cloud import firestore
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
+
+from config import Config
+from utils.compression import compress_document
+from utils.compression_pipeline import STATUS_PENDING as STATUS_PENDING_COMPRESSION, compression_metadata
+
+logger = logging.getLogger(__name__)
+
+SESSIONS_COLLECTION = 'document_upload_sessions'
+
+STATUS_UPLOADING = 'uploading'
+STATUS_COMPLETED = 'completed'
+
+# Cloud Storage requires every chunk but the last to be a multiple of 256 KiB
+CHUNK_ALIGNMENT = 256 * 1024
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_MAX_UPLOAD_BYTES = 100 * 1024 * 1024
+DEFAULT_SESSION_TTL_SECONDS = 24 * 3600
+COPY_BUFFER_SIZE = 64 * 1024
+# A finalize that has not finished after this long is assumed dead
+FINALIZE_LEASE_SECONDS = 300
+
+# Same thresholds as the single-request upload endpoints
+COMPRESSION_THRESHOLD_MB = 5.0
+COMPRESSION_QUALITY = 85
+
+_CONTENT_RANGE_PATTERN = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class UploadError(Exception):
+    """A request the upload protocol rejects; carries the HTTP status to answer with."""
+
+    def __init__(self, message: str, status_code: int = 400, **details):
+        super().__init__(message)
+        self.status_code = status_code
+        self.details = details
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def aligned_chunk_size(chunk_size: int) -> int:
+    return max(CHUNK_ALIGNMENT, int(chunk_size) // CHUNK_ALIGNMENT * CHUNK_ALIGNMENT)
+
+
+def parse_content_range(header: Optional[str]) -> Tuple[int, int, int]:
+    """``(start, end, total)`` of a ``Content-Range: bytes start-end/total`` header."""
+    match = _CONTENT_RANGE_PATTERN.match((header or '').strip())
+    if not match:
+        raise UploadError('Content-Range header must look like "bytes <start>-<end>/<size>"')
+    start, end, total = (int(value) for value in match.groups())
+    if end < start:
+        raise UploadError('Content-Range end is before its start')
+    return start, end, total
+
+
+def normalize_md5(value: Optional[str]) -> Optional[str]:
+    """Base64 MD5 (the form Cloud Storage reports) from a hex or base64 digest."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        if re.fullmatch(r'[0-9a-fA-F]{32}', value):
+            return base64.b64encode(binascii.unhexlify(value)).decode('ascii')
+        if len(base64.b64decode(value, validate=True)) == 16:
+            return value
+    except (binascii.Error, ValueError):
+        pass
+    raise UploadError('md5 must be a hex or base64 MD5 digest')
+
+
+def public_session(session: Dict) -> Dict:
+    return {
+        'upload_id': session.get('upload_id'),
+        'status': session.get('status'),
+        'size': session.get('size'),
+        'chunk_size': session.get('chunk_size'),
+        'offset': session.get('offset', 0),
+        'filename': session.get('filename'),
+        'document_id': (session.get('result') or {}).get('document_id'),
+    }
+
+
+@firestore.transactional
+def _claim_finalize(transaction, session_ref) -> Dict:
+    snapshot = session_ref.get(transaction=transaction)
+    session = snapshot.to_dict() or {}
+    if session.get('status') == STATUS_COMPLETED:
+        return session
+    now = _now()
+    finalizing_until = session.get('finalizing_until')
+    if finalizing_until is not None and finalizing_until > now:
+        raise UploadError('Upload is already being finalized', 409)
+    transaction.update(session_ref, {'finalizing_until': now + timedelta(seconds=FINALIZE_LEASE_SECONDS)})
+    return session
+
+
+class LocalChunkStore:
+    """Stages chunks in one file per upload under a local directory."""
+
+    backend = 'local'
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, session: Dict) -> str:
+        return os.path.join(self.root, f"{session['upload_id']}.part")
+
+    def begin(self, session: Dict, blob) -> Dict:
+        open(self._path(session), 'wb').close()
+        return {}
+
+    def offset(self, session: Dict) -> int:
+        try:
+            return os.path.getsize(self._path(session))
+        except OSError:
+            raise UploadError('Upload session has expired, start a new upload', 410)
+
+    def write(self, session: Dict, start: int, data: bytes) -> int:
+        path = self._path(session)
+        with open(path, 'r+b') as handle:
+            handle.seek(start)
+            handle.write(data)
+        return os.path.getsize(path)
+
+    def md5(self, session: Dict, blob) -> str:
+        digest = hashlib.md5()
+        with open(self._path(session), 'rb') as handle:
+            for piece in iter(lambda: handle.read(COPY_BUFFER_SIZE), b''):
+                digest.update(piece)
+        return base64.b64encode(digest.digest()).decode('ascii')
+
+    @contextlib.contextmanager
+    def staged_file(self, session: Dict, blob) -> Iterator:
+        with open(self._path(session), 'rb') as handle:
+            yield handle
+
+    def publish(self, session: Dict, blob) -> None:
+        blob.upload_from_filename(self._path(session), content_type=session.get('content_type'))
+
+    def cleanup(self, session: Dict) -> None:
+        try:
+            os.unlink(self._path(session))
+        except OSError:
+            pass
+
+    def discard(self, session: Dict, blob) -> None:
+        self.cleanup(session)
+
+
+class StorageChunkStore:
+    """Streams chunks into a Cloud Storage resumable session for the final object."""
+
+    backend = 'storage'
+
+    def begin(self, session: Dict, blob) -> Dict:
+        return {'session_url': blob.create_resumable_upload_session(
+            content_type=session.get('content_type'), size=session['size']
+        )}
+
+    @staticmethod
+    def _committed(response, size: int) -> int:
+        if response.status_code in (200, 201):
+            return size
+        if response.status_code == 308:
+            # "Range: bytes=0-N" lists what Cloud Storage has persisted
+            committed = response.headers.get('Range')
+            return int(committed.rsplit('-', 1)[1]) + 1 if committed else 0
+        if response.status_code in (404, 410):
+            raise UploadError('Upload session has expired, start a new upload', 410)
+        raise UploadError(f'Storage rejected the chunk ({response.status_code})', 502)
+
+    def offset(self, session: Dict) -> int:
+        response = requests.put(
+            session['store']['session_url'],
+            headers={'Content-Range': f"bytes */{session['size']}", 'Content-Length': '0'},
+            timeout=30
+        )
+        return self._committed(response, session['size'])
+
+    def write(self, session: Dict, start: int, data: bytes) -> int:
+        response = requests.put(
+            session['store']['session_url'],
+            data=data,
+            headers={'Content-Range': f"bytes {start}-{start + len(data) - 1}/{session['size']}"},
+            timeout=120
+        )
+        return self._committed(response, session['size'])
+
+    def md5(self, session: Dict, blob) -> Optional[str]:
+        blob.reload()
+        return blob.md5_hash
+
+    @contextlib.contextmanager
+    def staged_file(self, session: Dict, blob) -> Iterator:
+        with tempfile.TemporaryFile() as handle:
+            blob.download_to_file(handle)
+            handle.seek(0)
+            yield handle
+
+    def publish(self, session: Dict, blob) -> None:
+        # The bytes already are the final object
+        return None
+
+    def cleanup(self, session: Dict) -> None:
+        return None
+
+    def discard(self, session: Dict, blob) -> None:
+        try:
+            requests.delete(session['store']['session_url'], timeout=30)
+        except requests.RequestException:
+            pass
+        # A completed session already created the object
+        try:
+            blob.delete()
+        except gcloud_exceptions.NotFound:
+            pass
+
+
+class ResumableUploadService:
+    """Opens upload sessions, accepts their chunks and turns them into documents."""
+
+    def __init__(self, db_factory, bucket_factory, store,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 max_upload_bytes: int = DEFAULT_MAX_UPLOAD_BYTES,
+                 session_ttl_seconds: int = DEFAULT_SESSION_TTL_SECONDS,
+                 url_signer=None, compressor=None):
+        self.db_factory = db_factory
+        self.bucket_factory = bucket_factory
+        self.store = store
+        self.chunk_size = aligned_chunk_size(chunk_size)
+        self.max_upload_bytes = max_upload_bytes
+        self.session_ttl_seconds = session_ttl_seconds
+        self.url_signer = url_signer
+        # utils.compression_pipeline.CompressionPipeline; None compresses inline
+        self.compressor = compressor
+
+    def _ref(self, upload_id: str):
+        return self.db_factory().collection(SESSIONS_COLLECTION).document(upload_id)
+
+    def _blob(self, session: Dict):
+        return self.bucket_factory().blob(session['storage_path'])
+
+    def _load(self, upload_id: str, user_id: str) -> Dict:
+        snapshot = self._ref(upload_id).get()
+        session = snapshot.to_dict() if snapshot.exists else None
+        if not session or session.get('uploaded_by') != user_id:
+            raise UploadError('Upload not found', 404)
+        expires_at = session.get('expires_at')
+        if session.get('status') != STATUS_COMPLETED and expires_at is not None and expires_at <= _now():
+            raise UploadError('Upload session has expired, start a new upload', 410)
+        return session
+
+    def start(self, user_id: str, hospital_id: str, target: str, target_id: str,
+              document_type: str, document_name: str, filename: str,
+              content_type: Optional[str], size: int, md5: Optional[str] = None) -> Dict:
+        if target not in ('claim', 'draft'):
+            raise UploadError("target must be 'claim' or 'draft'")
+        if not target_id or not document_type or not document_name or not filename:
+            raise UploadError('claim_id (or draft_id), document_type, document_name and filename are required')
+        if '.' not in filename:
+            raise UploadError('filename must have an extension')
+        if size <= 0 or size > self.max_upload_bytes:
+            raise UploadError(f'size must be between 1 and {self.max_upload_bytes} bytes')
+
+        upload_id = uuid.uuid4().hex
+        file_extension = filename.rsplit('.', 1)[1].lower()
+        session = {
+            'upload_id': upload_id,
+            'status': STATUS_UPLOADING,
+            'uploaded_by': user_id,
+            'hospital_id': hospital_id,
+            'target': target,
+            'target_id': target_id,
+            'document_type': document_type,
+            'document_name': document_name,
+            'filename': filename,
+            'content_type': content_type or 'application/octet-stream',
+            'size': size,
+            'md5': normalize_md5(md5),
+            'chunk_size': self.chunk_size,
+            # Same layout as single-request uploads
+            'storage_path': f"IP_Claims/{hospital_id}/{target_id}/{document_type}/{uuid.uuid4().hex}.{file_extension}",
+            'backend': self.store.backend,
+            'created_at': _now(),
+            'expires_at': _now() + timedelta(seconds=self.session_ttl_seconds),
+        }
+        session['store'] = self.store.begin(session, self._blob(session))
+        self._ref(upload_id).set(session)
+        session['offset'] = 0
+        return session
+
+    def status(self, upload_id: str, user_id: str) -> Dict:
+        session = self._load(upload_id, user_id)
+        if session.get('status') == STATUS_COMPLETED:
+            session['offset'] = session['size']
+        else:
+            session['offset'] = self.store.offset(session)
+        return session
+
+    def write_chunk(self, upload_id: str, user_id: str, content_range: Optional[str], data: bytes) -> Dict:
+        start, end, total = parse_content_range(content_range)
+        session = self._load(upload_id, user_id)
+        size = session['size']
+        if session.get('status') == STATUS_COMPLETED:
+            session['offset'] = size
+            return session
+        if total != size:
+            raise UploadError(f'Content-Range total must be the declared size ({size})')
+        if len(data) != end - start + 1:
+            raise UploadError('Chunk length does not match its Content-Range')
+        if len(data) > session['chunk_size']:
+            raise UploadError(f"Chunks may be at most {session['chunk_size']} bytes")
+        if end + 1 < size and len(data) % CHUNK_ALIGNMENT:
+            raise UploadError(f'Every chunk but the last must be a multiple of {CHUNK_ALIGNMENT} bytes')
+
+        offset = self.store.offset(session)
+        if end < offset:
+            # A retried chunk that was already committed
+            session['offset'] = offset
+            return session
+        if start != offset:
+            raise UploadError('Chunk does not start at the committed offset', 409, offset=offset)
+
+        session['offset'] = self.store.write(session, start, data)
+        return session
+
+    def finalize(self, upload_id: str, user_id: str, md5: Optional[str] = None) -> Dict:
+        """
+        Verify, compress and record a fully uploaded file.
+
+        Returns the session, whose ``result`` matches the single-request
+        upload response. Finalizing again returns the same result.
+        """
+        session = self._load(upload_id, user_id)
+        if session.get('status') == STATUS_COMPLETED:
+            return session
+
+        size = session['size']
+        offset = self.store.offset(session)
+        if offset < size:
+            raise UploadError('Upload is incomplete', 409, offset=offset)
+
+        # Concurrent finalize calls (client retries) must not record the document twice
+        session_ref = self._ref(upload_id)
+        session = _claim_finalize(self.db_factory().transaction(), session_ref)
+        if session.get('status') == STATUS_COMPLETED:
+            return session
+
+        blob = self._blob(session)
+        expected_md5 = normalize_md5(md5) or session.get('md5')
+        if not expected_md5:
+            raise UploadError('md5 of the file is required to finalize the upload')
+        actual_md5 = self.store.md5(session, blob)
+        if actual_md5 != expected_md5:
+            self.store.discard(session, blob)
+            session_ref.delete()
+            raise UploadError('Checksum mismatch, the upload was discarded; start a new upload', 422)
+
+        compress_later = (
+            self.compressor is not None and self.compressor.enabled
+            and self.compressor.needs_compression(size, session['content_type'])
+        )
+        if compress_later:
+            self.store.publish(session, blob)
+            stored_size, content_type, was_compressed = size, session['content_type'], False
+        else:
+            stored_size, content_type, was_compressed = self._store_final_object(session, blob)
+        self.store.cleanup(session)
+
+        db = self.db_factory()
+        result = record_uploaded_document(
+            db, session, blob, stored_size, content_type, was_compressed, self.url_signer,
+            compression_status=STATUS_PENDING_COMPRESSION if compress_later else None
+        )
+        if compress_later:
+            self.compressor.submit(result['document_id'], session['storage_path'], content_type)
+        session_ref.update({
+            'status': STATUS_COMPLETED,
+            'completed_at': firestore.SERVER_TIMESTAMP,
+            'result': result,
+        })
+        session.update({'status': STATUS_COMPLETED, 'result': result, 'offset': size})
+        return session
+
+    def _store_final_object(self, session: Dict, blob) -> Tuple[int, str, bool]:
+        """Put the (possibly compressed) bytes at the storage path; returns size, type, was_compressed."""
+        size = session['size']
+        content_type = session['content_type']
+        if size / (1024 * 1024) <= COMPRESSION_THRESHOLD_MB:
+            self.store.publish(session, blob)
+            return size, content_type, False
+
+        with self.store.staged_file(session, blob) as handle:
+            original = FileStorage(stream=handle, filename=session['filename'], content_type=content_type)
+            compressed, _, was_compressed = compress_document(
+                original, max_size_mb=COMPRESSION_THRESHOLD_MB, quality=COMPRESSION_QUALITY
+            )
+            if compressed is original:
+                self.store.publish(session, blob)
+                return size, content_type, was_compressed
+
+            compressed.stream.seek(0, 2)
+            compressed_size = compressed.stream.tell()
+            compressed.stream.seek(0)
+            blob.upload_from_file(compressed.stream, content_type=compressed.content_type)
+            return compressed_size, compressed.content_type, was_compressed
+
+
+def record_uploaded_document(db, session: Dict, blob, stored_size: int, content_type: str,
+                             was_compressed: bool, url_signer=None,
+                             compression_status: Optional[str] = None) -> Dict:
+    """
+    Write ``documents/{id}`` and link it to the claim or draft, the way the
+    single-request upload endpoints do. Returns their response payload.
+    """
+    storage_path = session['storage_path']
+    if url_signer is not None:
+        download_url = url_signer.sign(storage_path, timedelta(days=7))
+    else:
+        download_url = blob.generate_signed_url(expiration=timedelta(days=7))
+
+    document_id = f"doc_{uuid.uuid4().hex[:8]}"
+    document_metadata = {
+        'document_id': document_id,
+        # Drafts use their draft_id as claim_id
+        'claim_id': session['target_id'],
+        'document_type': session['document_type'],
+        'document_name': session['document_name'],
+        'original_filename': secure_filename(session['filename']),
+        'storage_path': storage_path,
+        'download_url': download_url,
+        'file_size': stored_size,
+        'original_file_size': session['size'],
+        'file_type': content_type,
+        'uploaded_by': session['uploaded_by'],
+        'hospital_id': session['hospital_id'],
+        'uploaded_at': firestore.SERVER_TIMESTAMP,
+        'status': 'uploaded',
+        'compression': compression_metadata(session['size'], stored_size, was_compressed, compression_status),
+        'upload_id': session['upload_id'],
+    }
+    db.collection('documents').document(document_id).set(document_metadata)
+
+    entry = {
+        'document_id': document_id,
+        'document_type': session['document_type'],
+        'document_name': session['document_name'],
+        'uploaded_at': str(document_metadata['uploaded_at']),
+        'status': 'uploaded'
+    }
+    if session['target'] == 'draft':
+        entry['download_url'] = download_url
+    parent_ref = db.collection('claims').document(session['target_id'])
+    parent_doc = parent_ref.get()
+    if parent_doc.exists:
+        documents = (parent_doc.to_dict() or {}).get('documents', [])
+        documents.append(entry)
+        parent_ref.update({
+            'documents': documents,
+            'updated_at': firestore.SERVER_TIMESTAMP
+        })
+
+    return {
+        'document_id': document_id,
+        'download_url': download_url,
+        'storage_path': storage_path
+    }
+
+
+def prune_local_staging(root: str, max_age_seconds: int) -> int:
+    """Delete local staging files of abandoned uploads; returns how many were removed."""
+    removed = 0
+    cutoff = _now().timestamp() - max_age_seconds
+    with os.scandir(root) as scan:
+        for entry in scan:
+            if entry.name.endswith('.part') and entry.stat().st_mtime < cutoff:
+                try:
+                    os.unlink(entry.path)
+                    removed += 1
+                except OSError:
+                    pass
+    return removed
+
+
+# Singleton instance
+_upload_service = None
+
+
+def get_upload_service() -> ResumableUploadService:
+    """Get singleton resumable upload service instance"""
+    global _upload_service
+    if _upload_service is None:
+        from firebase_config import get_firestore, get_storage
+        from utils.compression_pipeline import get_compression_pipeline
+        from utils.signed_urls import get_signed_url_service
+
+        session_ttl = getattr(Config, 'DOCUMENT_UPLOAD_SESSION_TTL_SECONDS', DEFAULT_SESSION_TTL_SECONDS)
+        if getattr(Config, 'DOCUMENT_UPLOADS_BACKEND', 'storage') == 'local':
+            root = getattr(Config, 'DOCUMENT_UPLOADS_LOCAL_DIR', '') or os.path.join(
+                tempfile.gettempdir(), 'claims-uploads'
+            )
+            store = LocalChunkStore(root)
+            prune_local_staging(root, session_ttl)
+        else:
+            store = StorageChunkStore()
+
+        _upload_service = ResumableUploadService(
+            get_firestore,
+            get_storage,
+            store,
+            chunk_size=getattr(Config, 'DOCUMENT_UPLOAD_CHUNK_SIZE', DEFAULT_CHUNK_SIZE),
+            max_upload_bytes=getattr(Config, 'DOCUMENT_UPLOAD_MAX_BYTES', DEFAULT_MAX_UPLOAD_BYTES),
+            session_ttl_seconds=session_ttl,
+            url_signer=get_signed_url_service(),
+            compressor=get_compression_pipeline()
+        )
+    return _upload_service
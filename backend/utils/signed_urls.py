@@ -0,0 +1,202 @@
+"""
+Signed download URLs for Cloud Storage objects.
+
+URLs are signed in-process with the private key of the service account the
+Firebase Admin SDK was initialized with, so signing is a local RSA operation
+and never a network call (no ``blob.exists()``, no IAM ``signBlob``). Only
+when the app runs on keyless application-default credentials does signing
+fall back to the storage client's default behaviour.
+
+Expiry times are rounded up to an *expiry bucket*: every URL requested for a
+path within the same bucket gets the same expiry and therefore the same
+(V2) URL, so URLs are cached per ``(storage_path, expires_at)`` and reused
+for the whole bucket. Rounding up means a returned URL is always valid for at
+least the requested lifetime; entries are dropped once they come within
+``refresh_margin`` of expiring.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional, Union
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIFETIME = timedelta(days=7)
+DEFAULT_MAX_ENTRIES = 4096
+# Bucket width as a fraction of the requested lifetime
+DEFAULT_REUSE_FRACTION = 0.25
+DEFAULT_REFRESH_MARGIN_SECONDS = 300
+MIN_BUCKET_SECONDS = 60
+
+
+def normalize_storage_path(storage_path: str) -> str:
+    # Older uploads were stored with a double slash after the root folder
+    if storage_path and 'IP_Claims//' in storage_path:
+        return storage_path.replace('IP_Claims//', 'IP_Claims/')
+    return storage_path
+
+
+def _seconds(lifetime: Union[timedelta, int, float]) -> int:
+    if isinstance(lifetime, timedelta):
+        return int(lifetime.total_seconds())
+    return int(lifetime)
+
+
+def _load_signing_credentials():
+    """Service-account credentials of the Firebase app, if they can sign locally."""
+    try:
+        import firebase_admin
+        from google.auth.credentials import Signing
+
+        credentials = firebase_admin.get_app().credential.get_credential()
+    except Exception as err:
+        logger.warning("signed_urls: no Firebase credentials available: %s", err)
+        return None
+    if isinstance(credentials, Signing) and getattr(credentials, 'signer', None) is not None:
+        return credentials
+    logger.warning(
+        "signed_urls: %s cannot sign locally; falling back to the storage client's signing",
+        type(credentials).__name__
+    )
+    return None
+
+
+class SignedUrlService:
+    """Signs and caches V2 download URLs for storage paths."""
+
+    def __init__(
+        self,
+        bucket_factory,
+        credentials_factory=_load_signing_credentials,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        reuse_fraction: float = DEFAULT_REUSE_FRACTION,
+        refresh_margin_seconds: float = DEFAULT_REFRESH_MARGIN_SECONDS,
+        enabled: bool = True
+    ):
+        self.bucket_factory = bucket_factory
+        self.credentials_factory = credentials_factory
+        self.max_entries = max(1, int(max_entries))
+        self.reuse_fraction = reuse_fraction
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.enabled = enabled
+        self._entries: "OrderedDict[tuple, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._credentials = None
+        self._credentials_loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    def _signing_credentials(self):
+        if not self._credentials_loaded:
+            self._credentials = self.credentials_factory()
+            self._credentials_loaded = True
+        return self._credentials
+
+    @property
+    def signs_locally(self) -> bool:
+        return self._signing_credentials() is not None
+
+    def expires_at(self, lifetime: Union[timedelta, int, float] = DEFAULT_LIFETIME,
+                   now: Optional[float] = None) -> int:
+        """Epoch second a URL requested now for ``lifetime`` will expire at."""
+        lifetime_seconds = _seconds(lifetime)
+        now = time.time() if now is None else now
+        bucket = max(MIN_BUCKET_SECONDS, int(lifetime_seconds * self.reuse_fraction))
+        return int(math.ceil((now + lifetime_seconds) / bucket) * bucket)
+
+    def _sign(self, storage_path: str, expires_at: int) -> str:
+        blob = self.bucket_factory().blob(storage_path)
+        return blob.generate_signed_url(
+            expiration=datetime.fromtimestamp(expires_at, tz=timezone.utc),
+            version='v2',
+            credentials=self._signing_credentials()
+        )
+
+    def _prune(self, now: float) -> None:
+        # Entries are ordered by insertion, which is roughly by expiry
+        while self._entries:
+            (_, expires_at), _ = next(iter(self._entries.items()))
+            if expires_at - self.refresh_margin_seconds > now:
+                break
+            self._entries.popitem(last=False)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def sign(self, storage_path: str, lifetime: Union[timedelta, int, float] = DEFAULT_LIFETIME) -> str:
+        """A download URL for ``storage_path`` valid for at least ``lifetime``."""
+        storage_path = normalize_storage_path(storage_path)
+        now = time.time()
+        key = (storage_path, self.expires_at(lifetime, now))
+        if self.enabled:
+            with self._lock:
+                url = self._entries.get(key)
+                if url is not None:
+                    self.hits += 1
+                    return url
+                self.misses += 1
+
+        url = self._sign(storage_path, key[1])
+        if self.enabled:
+            with self._lock:
+                self._entries[key] = url
+                self._prune(now)
+        return url
+
+    def sign_many(self, storage_paths: Iterable[str],
+                  lifetime: Union[timedelta, int, float] = DEFAULT_LIFETIME) -> Dict[str, Optional[str]]:
+        """
+        URLs for several paths (e.g. every document of a claim).
+
+        Paths that fail to sign map to None so one bad path does not hide the
+        others.
+        """
+        urls: Dict[str, Optional[str]] = {}
+        for storage_path in dict.fromkeys(path for path in storage_paths if path):
+            try:
+                urls[storage_path] = self.sign(storage_path, lifetime)
+            except Exception as err:
+                logger.warning("signed_urls: could not sign %s: %s", storage_path, err)
+                urls[storage_path] = None
+        return urls
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'signs_locally': self._credentials is not None,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+# Singleton instance
+_signed_url_service = None
+
+
+def get_signed_url_service() -> SignedUrlService:
+    """Get singleton signed-URL service instance"""
+    global _signed_url_service
+    if _signed_url_service is None:
+        from firebase_config import get_storage
+
+        _signed_url_service = SignedUrlService(
+            get_storage,
+            max_entries=getattr(Config, 'SIGNED_URL_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES),
+            enabled=getattr(Config, 'SIGNED_URL_CACHE_ENABLED', True)
+        )
+    return _signed_url_service
@@ -0,0 +1,163 @@
+"""
+In-process cache of verified Firebase ID tokens.
+
+Verifying an ID token means checking its signature against Google's public
+certificates. The result only changes when the token expires, so the decoded
+claims can be reused until the token's own ``exp`` claim. Entries are keyed
+by a SHA-256 hash of the raw token, so bearer tokens are never held as keys.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 2048
+# Drop entries slightly before the token expires so a token is never served
+# from cache after Firebase would have rejected it.
+DEFAULT_EXPIRY_LEEWAY_SECONDS = 5
+
+
+def hash_token(token: str) -> str:
+    """Return the cache key for a raw ID token."""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class VerifiedTokenCache:
+    """Bounded LRU cache of decoded tokens that expires entries at ``exp``."""
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        expiry_leeway_seconds: int = DEFAULT_EXPIRY_LEEWAY_SECONDS,
+        enabled: bool = True
+    ):
+        self.max_entries = max(1, int(max_entries))
+        self.expiry_leeway_seconds = expiry_leeway_seconds
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, token: str) -> Optional[Dict]:
+        """Return the cached decoded token, or None on a miss or expiry."""
+        if not self.enabled:
+            return None
+
+        key = hash_token(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            decoded_token, expires_at = entry
+            if now >= expires_at:
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return decoded_token
+
+    def put(self, token: str, decoded_token: Dict) -> None:
+        """Store a freshly verified token until its ``exp`` claim."""
+        if not self.enabled:
+            return
+
+        try:
+            exp = float(decoded_token.get('exp'))
+        except (TypeError, ValueError):
+            # Without an expiry we cannot bound the entry's lifetime safely.
+            return
+
+        expires_at = exp - self.expiry_leeway_seconds
+        if expires_at <= time.time():
+            return
+
+        key = hash_token(token)
+        with self._lock:
+            self._entries[key] = (decoded_token, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, token: str) -> bool:
+        """Drop a single token (e.g. after it has been revoked)."""
+        with self._lock:
+            return self._entries.pop(hash_token(token), None) is not None
+
+    def invalidate_uid(self, uid: str) -> int:
+        """
+        Drop every cached token issued to ``uid``.
+
+        Call this after ``auth.revoke_refresh_tokens(uid)`` or when a user is
+        disabled, since revocation applies to all of the user's sessions.
+        """
+        with self._lock:
+            stale_keys = [
+                key for key, (decoded_token, _) in self._entries.items()
+                if decoded_token.get('uid') == uid
+            ]
+            for key in stale_keys:
+                del self._entries[key]
+        if stale_keys:
+            logger.info("token_cache: invalidated %d token(s) for uid %s", len(stale_keys), uid)
+        return len(stale_keys)
+
+    def clear(self) -> None:
+        """Remove all entries and reset counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+# Singleton instance
+_token_cache = None
+
+
+def get_token_cache() -> VerifiedTokenCache:
+    """Get singleton verified-token cache instance"""
+    global _token_cache
+    if _token_cache is None:
+        _token_cache = VerifiedTokenCache(
+            max_entries=getattr(Config, 'TOKEN_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES),
+            enabled=getattr(Config, 'TOKEN_CACHE_ENABLED', True)
+        )
+    return _token_cache
+
+
+def invalidate_token(token: str) -> bool:
+    """Invalidation hook for a single revoked token."""
+    return get_token_cache().invalidate(token)
+
+
+def invalidate_user_tokens(uid: str) -> int:
+    """Invalidation hook for all tokens belonging to a revoked user."""
+    return get_token_cache().invalidate_uid(uid)
@@ -10,6 +10,7 @@ from firebase_config import get_firestore
 from google.cloud import firestore
 import uuid
 from datetime import datetime
+from utils.analytics_rollups import record_claim_change
 
 class TransactionType:
     """Transaction types for claim audit trail"""
@@ -28,6 +29,56 @@ class TransactionType:
     REVIEW_STATUS_UPDATED = "REVIEW_STATUS_UPDATED"
     ESCALATED = "ESCALATED"
 
+def build_transaction_record(
+    claim_id,
+    transaction_type,
+    performed_by,
+    performed_by_email,
+    performed_by_name,
+    performed_by_role,
+    previous_status=None,
+    new_status=None,
+    remarks=None,
+    metadata=None
+):
+    """
+    Build a transaction document without writing it
+
+    Used by create_transaction and by callers that write transactions in
+    batches. Arguments as for create_transaction.
+
+    Returns:
+        (transaction_id, transaction_data)
+    """
+    transaction_id = str(uuid.uuid4())
+
+    transaction_data = {
+        'transaction_id': transaction_id,
+        'claim_id': claim_id,
+        'transaction_type': transaction_type,
+        'performed_by': performed_by,
+        'performed_by_email': performed_by_email,
+        'performed_by_name': performed_by_name,
+        'performed_by_role': performed_by_role,
+        'performed_at': firestore.SERVER_TIMESTAMP,
+        'created_at': firestore.SERVER_TIMESTAMP
+    }
+
+    # Add optional fields
+    if previous_status:
+        transaction_data['previous_status'] = previous_status
+
+    if new_status:
+        transaction_data['new_status'] = new_status
+
+    if remarks:
+        transaction_data['remarks'] = remarks
+
+    if metadata:
+        transaction_data['metadata'] = metadata
+
+    return transaction_id, transaction_data
+
 def create_transaction(
     claim_id,
     transaction_type,
@@ -77,35 +128,24 @@ def create_transaction(
             from firebase_admin import firestore as fs
             db = fs.client()
         
-        transaction_id = str(uuid.uuid4())
-        
-        transaction_data = {
-            'transaction_id': transaction_id,
-            'claim_id': claim_id,
-            'transaction_type': transaction_type,
-            'performed_by': performed_by,
-            'performed_by_email': performed_by_email,
-            'performed_by_name': performed_by_name,
-            'performed_by_role': performed_by_role,
-            'performed_at': firestore.SERVER_TIMESTAMP,
-            'created_at': firestore.SERVER_TIMESTAMP
-        }
-        
-        # Add optional fields
-        if previous_status:
-            transaction_data['previous_status'] = previous_status
-        
-        if new_status:
-            transaction_data['new_status'] = new_status
-        
-        if remarks:
-            transaction_data['remarks'] = remarks
-        
-        if metadata:
-            transaction_data['metadata'] = metadata
+        transaction_id, transaction_data = build_transaction_record(
+            claim_id,
+            transaction_type,
+            performed_by,
+            performed_by_email,
+            performed_by_name,
+            performed_by_role,
+            previous_status=previous_status,
+            new_status=new_status,
+            remarks=remarks,
+            metadata=metadata
+        )
         
         # Create transaction document in claim's subcollection
         db.collection('direct_claims').document(claim_id).collection('transactions').document(transaction_id).set(transaction_data)
+
+        # Transactions are recorded after every claim status change
+        record_claim_change(db, claim_id)
         
         return transaction_id
         
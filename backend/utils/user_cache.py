@@ -0,0 +1,210 @@
+"""
+Per-process cache of ``users/{uid}`` profile documents.
+
+Every authenticated request needs the caller's role and entity assignments.
+Profiles change rarely (they are managed from the admin app), so they are
+cached with a configurable staleness window. When the optional Firestore
+listener is enabled, entries are evicted as soon as a user's role or
+``entity_assignments`` change instead of waiting for the TTL.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_MAX_ENTRIES = 1024
+
+# Fields that drive authorization; a change to any of them evicts the entry.
+ACCESS_FIELDS = ('role', 'entity_assignments', 'status', 'is_active')
+
+
+class UserProfileCache:
+    """Bounded LRU cache of user profile dicts with a TTL per entry."""
+
+    def __init__(
+        self,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        enabled: bool = True
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, int(max_entries))
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._watch = None
+        self._listener_attempted = False
+        self._change_callbacks = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, uid: str) -> Optional[Dict]:
+        """Return a copy of the cached profile, or None on a miss or expiry."""
+        if not self.enabled or self.ttl_seconds <= 0:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(uid)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            user_data, stored_at = entry
+            if now - stored_at >= self.ttl_seconds:
+                del self._entries[uid]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(uid)
+            self.hits += 1
+            return dict(user_data)
+
+    def put(self, uid: str, user_data: Dict) -> None:
+        """Store a profile fetched from Firestore."""
+        if not self.enabled or self.ttl_seconds <= 0:
+            return
+
+        with self._lock:
+            self._entries[uid] = (dict(user_data), time.monotonic())
+            self._entries.move_to_end(uid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, uid: str) -> bool:
+        """Drop a single user's cached profile."""
+        with self._lock:
+            removed = self._entries.pop(uid, None) is not None
+            if removed:
+                self.invalidations += 1
+            return removed
+
+    def clear(self) -> None:
+        """Remove all entries and reset counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.invalidations = 0
+
+    def apply_change(self, uid: str, new_data: Optional[Dict]) -> None:
+        """
+        Reconcile a cached entry with a changed Firestore document.
+
+        Deleted users and access-relevant changes evict the entry; any other
+        edit (name, phone, ...) refreshes the cached copy in place.
+        """
+        with self._lock:
+            entry = self._entries.get(uid)
+            if entry is None:
+                return
+
+            cached_data, stored_at = entry
+            if new_data is None or any(
+                cached_data.get(field) != new_data.get(field) for field in ACCESS_FIELDS
+            ):
+                del self._entries[uid]
+                self.invalidations += 1
+                return
+
+            self._entries[uid] = (dict(new_data), stored_at)
+
+    def add_change_callback(self, callback) -> None:
+        """
+        Also pass listener changes to ``callback(uid, new_data)``.
+
+        Lets other per-process caches derived from ``users`` share this
+        listener instead of opening their own. ``new_data`` is None for
+        deleted users.
+        """
+        if callback not in self._change_callbacks:
+            self._change_callbacks.append(callback)
+
+    def _on_snapshot(self, _docs, changes, _read_time) -> None:
+        for change in changes:
+            try:
+                document = change.document
+                new_data = None if change.type.name == 'REMOVED' else (document.to_dict() or {})
+                self.apply_change(document.id, new_data)
+                for callback in self._change_callbacks:
+                    callback(document.id, new_data)
+            except Exception as err:  # pragma: no cover - defensive logging
+                logger.error("user_cache: failed to apply user change: %s", err)
+
+    def start_listener(self, db) -> bool:
+        """
+        Watch the ``users`` collection and evict entries on change.
+
+        Returns True when a listener is running. Safe to call repeatedly; a
+        failed start is not retried until ``stop_listener`` is called.
+        """
+        if self._watch is not None:
+            return True
+        if self._listener_attempted:
+            return False
+        self._listener_attempted = True
+        try:
+            self._watch = db.collection('users').on_snapshot(self._on_snapshot)
+            logger.info("user_cache: users listener started")
+            return True
+        except Exception as err:
+            logger.warning("user_cache: unable to start users listener, relying on TTL: %s", err)
+            self._watch = None
+            return False
+
+    def stop_listener(self) -> None:
+        """Stop the Firestore listener if one is running."""
+        self._listener_attempted = False
+        if self._watch is not None:
+            try:
+                self._watch.unsubscribe()
+            finally:
+                self._watch = None
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'ttl_seconds': self.ttl_seconds,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'listener_active': self._watch is not None,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+# Singleton instance
+_user_cache = None
+
+
+def get_user_cache() -> UserProfileCache:
+    """Get singleton user-profile cache instance"""
+    global _user_cache
+    if _user_cache is None:
+        _user_cache = UserProfileCache(
+            ttl_seconds=getattr(Config, 'USER_CACHE_TTL_SECONDS', DEFAULT_TTL_SECONDS),
+            max_entries=getattr(Config, 'USER_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES),
+            enabled=getattr(Config, 'USER_CACHE_ENABLED', True)
+        )
+    return _user_cache
+
+
+def invalidate_user(uid: str) -> bool:
+    """Invalidation hook for code paths that modify a user document."""
+    return get_user_cache().invalidate(uid)
@@ -51,6 +51,9 @@ export default function ProcessorInboxPage() {
   const [startDate, setStartDate] = useState('')
   const [endDate, setEndDate] = useState('')
   const [activeTab, setActiveTab] = useState<'unprocessed' | 'processed'>('unprocessed')
+  // Token for the next page of the current tab; null once every claim is loaded
+  const [nextPageToken, setNextPageToken] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
 
   // Check if user has processor access
   useEffect(() => {
@@ -86,6 +89,40 @@ export default function ProcessorInboxPage() {
     filterClaims()
   }, [claims, searchTerm, statusFilter, startDate, endDate, activeTab])
 
+  const buildClaimsUrl = (pageToken?: string) => {
+    // Build query parameters
+    const params = new URLSearchParams()
+    params.append('tab', activeTab) // Add tab parameter
+    if (startDate) {
+      params.append('start_date', startDate)
+    }
+    if (endDate) {
+      params.append('end_date', endDate)
+    }
+    if (pageToken) {
+      params.append('page_token', pageToken)
+    }
+    return `${API_BASE_URL}/processor-routes/get-claims-to-process?${params.toString()}`
+  }
+
+  // Transform the data structure from processor API
+  const transformClaim = (claim: any): Claim => ({
+    claim_id: claim.claim_id,
+    patient_name: claim.patient_name || 'N/A',
+    payer_name: claim.payer_name || 'N/A',
+    amount: claim.claimed_amount || 0,
+    claim_status: claim.claim_status || 'pending',
+    submission_date: claim.submission_date,
+    created_at: claim.created_at,
+    updated_at: claim.created_at, // Using created_at as fallback
+    // Lock information
+    locked_by_processor: claim.locked_by_processor || '',
+    locked_by_processor_email: claim.locked_by_processor_email || '',
+    locked_by_processor_name: claim.locked_by_processor_name || '',
+    locked_at: claim.locked_at || '',
+    lock_expires_at: claim.lock_expires_at || ''
+  })
+
   const fetchClaims = async () => {
     if (fetchingRef.current) {
       console.log('⏳ Claims already fetching, skipping...')
@@ -102,17 +139,7 @@ export default function ProcessorInboxPage() {
         throw new Error('No authentication token found')
       }
 
-      // Build query parameters
-      const params = new URLSearchParams()
-      params.append('tab', activeTab) // Add tab parameter
-      if (startDate) {
-        params.append('start_date', startDate)
-      }
-      if (endDate) {
-        params.append('end_date', endDate)
-      }
-      
-      const url = `${API_BASE_URL}/processor-routes/get-claims-to-process?${params.toString()}`
+      const url = buildClaimsUrl()
       
       console.log('🔍 Fetching claims for tab:', activeTab)
       console.log('🔍 API URL:', url)
@@ -155,23 +182,8 @@ export default function ProcessorInboxPage() {
       if (data.success) {
         // Update ref for interval checks
         claimsRef.current = data.claims || []
-        // Transform the data structure from processor API
-        const transformedClaims = data.claims.map((claim: any) => ({
-          claim_id: claim.claim_id,
-          patient_name: claim.patient_name || 'N/A',
-          payer_name: claim.payer_name || 'N/A',
-          amount: claim.claimed_amount || 0,
-          claim_status: claim.claim_status || 'pending',
-          submission_date: claim.submission_date,
-          created_at: claim.created_at,
-          updated_at: claim.created_at, // Using created_at as fallback
-          // Lock information
-          locked_by_processor: claim.locked_by_processor || '',
-          locked_by_processor_email: claim.locked_by_processor_email || '',
-          locked_by_processor_name: claim.locked_by_processor_name || '',
-          locked_at: claim.locked_at || '',
-          lock_expires_at: claim.lock_expires_at || ''
-        }))
+        const transformedClaims = data.claims.map(transformClaim)
+        setNextPageToken(data.next_page_token || null)
         
         // Debug: Print lock information for each claim
         transformedClaims.forEach((claim: Claim) => {
@@ -222,6 +234,48 @@ export default function ProcessorInboxPage() {
     }
   }
 
+  const loadMoreClaims = async () => {
+    if (!nextPageToken || fetchingRef.current) {
+      return
+    }
+
+    try {
+      fetchingRef.current = true
+      setLoadingMore(true)
+      const token = localStorage.getItem('auth_token')
+
+      if (!token) {
+        throw new Error('No authentication token found')
+      }
+
+      const response = await fetch(buildClaimsUrl(nextPageToken), {
+        headers: {
+          'Authorization': `Bearer ${token}`,
+          'Content-Type': 'application/json'
+        }
+      })
+      const data = await response.json()
+      if (!response.ok || !data.success) {
+        throw new Error(data.error || `HTTP error! status: ${response.status}`)
+      }
+
+      const pageClaims: Claim[] = (data.claims || []).map(transformClaim)
+      setNextPageToken(data.next_page_token || null)
+      setClaims(prevClaims => {
+        const loadedIds = new Set(prevClaims.map(c => c.claim_id))
+        const updatedClaims = [...prevClaims, ...pageClaims.filter(c => !loadedIds.has(c.claim_id))]
+        claimsRef.current = updatedClaims // Update ref
+        return updatedClaims
+      })
+    } catch (err: any) {
+      console.error('Error loading more claims:', err)
+      setError(err.message || 'An error occurred while loading more claims')
+    } finally {
+      fetchingRef.current = false
+      setLoadingMore(false)
+    }
+  }
+
   const filterClaims = () => {
     let filtered = claims
 
@@ -625,7 +679,7 @@ export default function ProcessorInboxPage() {
               : 'text-gray-600 hover:text-gray-900'
           }`}
         >
-          Unprocessed ({getUnprocessedCount()})
+          Unprocessed ({getUnprocessedCount()}{activeTab === 'unprocessed' && nextPageToken ? '+' : ''})
         </button>
         <button
           onClick={() => {
@@ -638,7 +692,7 @@ export default function ProcessorInboxPage() {
               : 'text-gray-600 hover:text-gray-900'
           }`}
         >
-          Processed ({getProcessedCount()})
+          Processed ({getProcessedCount()}{activeTab === 'processed' && nextPageToken ? '+' : ''})
         </button>
       </div>
 
@@ -724,7 +778,7 @@ export default function ProcessorInboxPage() {
       <Card>
         <CardHeader>
           <CardTitle>
-            Claims ({filteredClaims.length})
+            Claims ({filteredClaims.length}{nextPageToken ? ' loaded, more available' : ''})
           </CardTitle>
         </CardHeader>
         <CardContent>
@@ -853,6 +907,13 @@ export default function ProcessorInboxPage() {
               </TableBody>
             </Table>
           )}
+          {nextPageToken && (
+            <div className="flex justify-center mt-4">
+              <Button onClick={loadMoreClaims} variant="outline" disabled={loadingMore}>
+                {loadingMore ? 'Loading...' : 'Load more claims'}
+              </Button>
+            </div>
+          )}
         </CardContent>
       </Card>
     </div>
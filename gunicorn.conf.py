@@ -46,3 +46,31 @@ raw_env = [
     f"HOST={os.environ.get('HOST', '0.0.0.0')}",
     f"PORT={os.environ.get('PORT', '10000')}",
 ]
+
+
+# Background notification expiry sweeper (see NOTIFICATION_SWEEPER_MODE)
+def _start_notification_sweeper(mode, log):
+    try:
+        from utils.notification_sweeper import start_notification_sweeper
+        start_notification_sweeper(mode)
+    except Exception as err:
+        log.warning("Notification sweeper not started in %s: %s", mode, err)
+
+
+# Background expired-lock reaper (see LOCK_REAPER_MODE)
+def _start_lock_reaper(mode, log):
+    try:
+        from utils.lock_reaper import start_lock_reaper
+        start_lock_reaper(mode)
+    except Exception as err:
+        log.warning("Lock reaper not started in %s: %s", mode, err)
+
+
+def when_ready(server):
+    _start_notification_sweeper('master', server.log)
+    _start_lock_reaper('master', server.log)
+
+
+def post_worker_init(worker):
+    _start_notification_sweeper('worker', worker.log)
+    _start_lock_reaper('worker', worker.log)
@@ -16,9 +16,13 @@ os.environ.setdefault('PORT', os.environ.get('PORT', '10000'))
 
 # Import and run the Flask app
 from backend.app import create_app
+from utils.lock_reaper import start_lock_reaper
+from utils.notification_sweeper import start_notification_sweeper
 
 if __name__ == '__main__':
     app = create_app()
+    start_notification_sweeper('worker')
+    start_lock_reaper('worker')
     
     # Get port from environment variable
     port = int(os.environ.get('PORT', 10000))